@@ -23,7 +23,8 @@ from requests.utils import quote
 # Added for graphs showing Redis data
 import traceback
 # import redis
-from msgpack import Unpacker
+# @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+# from msgpack import Unpacker
 import datetime as dt
 # @added 20180809 - Bug #2498: Incorrect scale in some graphs
 # @modified 20181025 - Feature #2618: alert_slack
@@ -78,6 +79,8 @@ if True:
     import skyline_version
     from skyline_functions import (
         write_data_to_file, mkdir_p,
+        # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+        decode_timeseries, timeseries_array_to_list,
         # @added 20170603 - Feature #2034: analyse_derivatives
         # nonNegativeDerivative, in_list,
         nonNegativeDerivative,
@@ -582,16 +585,23 @@ def alert_smtp(alert, metric, context):
         try:
             if LOCAL_DEBUG:
                 logger.info('debug :: alert_smtp - Memory usage before get Redis timeseries data: %s (kb)' % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
-            unpacker = Unpacker(use_list=True)
-            unpacker.feed(raw_series)
-            timeseries_x = [float(item[0]) for item in unpacker]
-            unpacker = Unpacker(use_list=True)
-            unpacker.feed(raw_series)
-            timeseries_y = [item[1] for item in unpacker]
-
-            unpacker = Unpacker(use_list=False)
-            unpacker.feed(raw_series)
-            timeseries = list(unpacker)
+            # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+            # Decode the time series once with decode_timeseries which decodes
+            # either storage format
+            # unpacker = Unpacker(use_list=True)
+            # unpacker.feed(raw_series)
+            # timeseries_x = [float(item[0]) for item in unpacker]
+            # unpacker = Unpacker(use_list=True)
+            # unpacker.feed(raw_series)
+            # timeseries_y = [item[1] for item in unpacker]
+
+            # unpacker = Unpacker(use_list=False)
+            # unpacker.feed(raw_series)
+            # timeseries = list(unpacker)
+            timeseries_array = decode_timeseries(raw_series)
+            timeseries_x = timeseries_array['timestamp'].astype(float).tolist()
+            timeseries_y = timeseries_array['value'].tolist()
+            timeseries = timeseries_array_to_list(timeseries_array)
             if LOCAL_DEBUG:
                 logger.info('debug :: alert_smtp - Memory usage after get Redis timeseries data: %s (kb)' % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
         except:
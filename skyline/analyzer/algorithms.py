@@ -10,8 +10,14 @@ from ast import literal_eval
 
 import pandas
 import numpy as np
-import scipy
-import statsmodels.api as sm
+# @modified 20261018 - Feature #3934: Lazy imports
+# scipy is no longer used, the arrays are numpy arrays and ks_2samp is imported
+# from scipy.stats if ks_test is enabled
+# import scipy
+# @modified 20261018 - Feature #3934: Lazy imports
+# statsmodels and scipy.stats are only used by ks_test and are only imported if
+# ks_test is enabled
+# import statsmodels.api as sm
 import traceback
 
 from settings import (
@@ -36,6 +42,18 @@ from settings import (
 
 # modified 20201020 - Feature #3792: algorithm_exceptions - EmptyTimeseries
 from algorithm_exceptions import TooShort, Stale, Boring, EmptyTimeseries
+# @added 20261018 - Feature #3934: Lazy imports
+# Only import the scipy.stats and statsmodels modules used by ks_test if
+# ks_test is enabled.  They are imported at the module level, not in
+# ks_test, so that they are imported once in the parent and the processes
+# forked from the parent inherit them rather than each importing them.
+if 'ks_test' in ALGORITHMS:
+    # @modified 20261018 - Feature #3934: Lazy imports
+    # import scipy.stats
+    from scipy.stats import ks_2samp
+    from statsmodels.tsa.stattools import adfuller
+# @added 20261018 - Feature #3932: grubbs_table
+from grubbs_table import get_grubbs_score
 
 if ENABLE_SECOND_ORDER:
     from redis import StrictRedis
@@ -248,9 +266,13 @@ def grubbs(timeseries):
         tail_average = tail_avg(timeseries)
         z_score = (tail_average - mean) / stdDev
         len_series = len(series)
-        threshold = scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)
-        threshold_squared = threshold * threshold
-        grubbs_score = ((len_series - 1) / np.sqrt(len_series)) * np.sqrt(threshold_squared / (len_series - 2 + threshold_squared))
+        # @modified 20261018 - Feature #3932: grubbs_table
+        # The Grubbs score only depends on the length of the time series so
+        # it is looked up in the memoised table
+        # threshold = scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)
+        # threshold_squared = threshold * threshold
+        # grubbs_score = ((len_series - 1) / np.sqrt(len_series)) * np.sqrt(threshold_squared / (len_series - 2 + threshold_squared))
+        grubbs_score = get_grubbs_score(len_series)
 
         return z_score > grubbs_score
     except:
@@ -441,7 +463,11 @@ def histogram_bins(timeseries):
     """
 
     try:
-        series = scipy.array([x[1] for x in timeseries])
+        # @modified 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+        # scipy.array was only ever an alias of numpy.array and has been
+        # removed from scipy
+        # series = scipy.array([x[1] for x in timeseries])
+        series = np.array([x[1] for x in timeseries])
         t = tail_avg(timeseries)
         h = np.histogram(series, bins=15)
         bins = h[1]
@@ -474,16 +500,24 @@ def ks_test(timeseries):
     try:
         hour_ago = time() - 3600
         ten_minutes_ago = time() - 600
-        reference = scipy.array([x[1] for x in timeseries if x[0] >= hour_ago and x[0] < ten_minutes_ago])
-        probe = scipy.array([x[1] for x in timeseries if x[0] >= ten_minutes_ago])
+        # @modified 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+        # reference = scipy.array([x[1] for x in timeseries if x[0] >= hour_ago and x[0] < ten_minutes_ago])
+        # probe = scipy.array([x[1] for x in timeseries if x[0] >= ten_minutes_ago])
+        reference = np.array([x[1] for x in timeseries if x[0] >= hour_ago and x[0] < ten_minutes_ago])
+        probe = np.array([x[1] for x in timeseries if x[0] >= ten_minutes_ago])
 
         if reference.size < 20 or probe.size < 20:
             return False
 
-        ks_d, ks_p_value = scipy.stats.ks_2samp(reference, probe)
+        # @modified 20261018 - Feature #3934: Lazy imports
+        # ks_2samp and adfuller are imported at the module level if ks_test is
+        # enabled
+        # ks_d, ks_p_value = scipy.stats.ks_2samp(reference, probe)
+        ks_d, ks_p_value = ks_2samp(reference, probe)
 
         if ks_p_value < 0.05 and ks_d > 0.5:
-            adf = sm.tsa.stattools.adfuller(reference, 10)
+            # adf = sm.tsa.stattools.adfuller(reference, 10)
+            adf = adfuller(reference, 10)
             if adf[1] < 0.05:
                 return True
 
@@ -906,9 +940,22 @@ def is_anomalously_anomalous(metric_name, ensemble, datapoint):
 # @modified 20200501 - Feature #3400: Identify air gaps in the metric data
 # Added airgapped_metrics_filled and check_for_airgaps_only
 # def run_selected_algorithm(timeseries, metric_name, airgapped_metrics, run_negatives_present):
-def run_selected_algorithm(timeseries, metric_name, airgapped_metrics, airgapped_metrics_filled, run_negatives_present, check_for_airgaps_only):
+# @modified 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+# Added precomputed_algorithm_results
+def run_selected_algorithm(
+        timeseries, metric_name, airgapped_metrics, airgapped_metrics_filled,
+        run_negatives_present, check_for_airgaps_only,
+        precomputed_algorithm_results=None):
     """
     Filter timeseries and run selected algorithm.
+
+    :param precomputed_algorithm_results: an optional dict of algorithm results
+        for the timeseries keyed by algorithm, as calculated by
+        :func:`analyzer.algorithms_vectorized.run_vectorized_algorithms`.  Any
+        algorithm in ALGORITHMS that is in the dict is not run again, its
+        result is used in the ensemble.  The ensemble and CONSENSUS are
+        determined in exactly the same way.
+    :type precomputed_algorithm_results: dict
     """
 
     # @added 20180807 - Feature #2492: alert on stale metrics
@@ -1296,11 +1343,16 @@ def run_selected_algorithm(timeseries, metric_name, airgapped_metrics, airgapped
             number_of_algorithms_run += 1
             if send_algorithm_run_metrics:
                 start = timer()
-            try:
-                algorithm_result = [globals()[test_algorithm](timeseries) for test_algorithm in run_algorithm]
-            except:
-                # logger.error('%s failed' % (algorithm))
-                algorithm_result = [None]
+            # @added 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+            # Use the vectorized result if one was calculated
+            if precomputed_algorithm_results and algorithm in precomputed_algorithm_results:
+                algorithm_result = [precomputed_algorithm_results[algorithm]]
+            else:
+                try:
+                    algorithm_result = [globals()[test_algorithm](timeseries) for test_algorithm in run_algorithm]
+                except:
+                    # logger.error('%s failed' % (algorithm))
+                    algorithm_result = [None]
 
             # @added 20200603 - Feature #3566: custom_algorithms
             algorithms_run.append(algorithm)
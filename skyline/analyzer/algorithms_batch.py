@@ -7,7 +7,10 @@ from timeit import default_timer as timer
 import pandas
 import numpy as np
 import scipy
-import statsmodels.api as sm
+# @modified 20261018 - Feature #3934: Lazy imports
+# statsmodels and scipy.stats are only used by ks_test and are only imported if
+# ks_test is enabled
+# import statsmodels.api as sm
 import traceback
 
 from settings import (
@@ -27,6 +30,18 @@ from settings import (
 )
 
 from algorithm_exceptions import TooShort, Stale, Boring
+# @added 20261018 - Feature #3934: Lazy imports
+# Only import the scipy.stats and statsmodels modules used by ks_test if
+# ks_test is enabled.  They are imported at the module level, not in
+# ks_test, so that they are imported once in the parent and the processes
+# forked from the parent inherit them rather than each importing them.
+if 'ks_test' in ALGORITHMS:
+    # @modified 20261018 - Feature #3934: Lazy imports
+    # import scipy.stats
+    from scipy.stats import ks_2samp
+    from statsmodels.tsa.stattools import adfuller
+# @added 20261018 - Feature #3932: grubbs_table
+from grubbs_table import get_grubbs_score
 
 # @added 20200607 - Feature #3566: custom_algorithms
 try:
@@ -183,9 +198,13 @@ def grubbs(timeseries, use_full_duration):
         tail_average = tail_avg(timeseries, use_full_duration)
         z_score = (tail_average - mean) / stdDev
         len_series = len(series)
-        threshold = scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)
-        threshold_squared = threshold * threshold
-        grubbs_score = ((len_series - 1) / np.sqrt(len_series)) * np.sqrt(threshold_squared / (len_series - 2 + threshold_squared))
+        # @modified 20261018 - Feature #3932: grubbs_table
+        # The Grubbs score only depends on the length of the time series so
+        # it is looked up in the memoised table
+        # threshold = scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)
+        # threshold_squared = threshold * threshold
+        # grubbs_score = ((len_series - 1) / np.sqrt(len_series)) * np.sqrt(threshold_squared / (len_series - 2 + threshold_squared))
+        grubbs_score = get_grubbs_score(len_series)
 
         return z_score > grubbs_score
     except:
@@ -424,10 +443,15 @@ def ks_test(timeseries, use_full_duration):
         if reference.size < 20 or probe.size < 20:
             return False
 
-        ks_d, ks_p_value = scipy.stats.ks_2samp(reference, probe)
+        # @modified 20261018 - Feature #3934: Lazy imports
+        # ks_2samp and adfuller are imported at the module level if ks_test is
+        # enabled
+        # ks_d, ks_p_value = scipy.stats.ks_2samp(reference, probe)
+        ks_d, ks_p_value = ks_2samp(reference, probe)
 
         if ks_p_value < 0.05 and ks_d > 0.5:
-            adf = sm.tsa.stattools.adfuller(reference, 10)
+            # adf = sm.tsa.stattools.adfuller(reference, 10)
+            adf = adfuller(reference, 10)
             if adf[1] < 0.05:
                 return True
 
@@ -0,0 +1,410 @@
+"""
+algorithms_incremental.py
+
+@added 20261018 - Feature #3930: ANALYZER_INCREMENTAL_STATS
+
+Incremental versions of the three-sigma algorithms defined in
+:mod:`analyzer.algorithms` that only depend on the mean, standard deviation,
+exponentially weighted moving average and least squares fit of the time series.
+
+Rather than calculating these over every data point of the time series on every
+run, the sufficient statistics of each metric time series are kept between
+runs - the Welford mean and sum of squared deviations, the co-moment of the
+timestamps and values for the least squares fit, the first hour mean and
+deviations and the exponentially weighted mean and deviations - with the
+timestamp of the last data point included (the watermark).  Each run only the
+data points newer than the watermark are added, so the algorithms are evaluated
+in O(new data points).
+
+The statistics are recalculated from the full time series if:
+
+- there are no statistics for the metric
+- the first data point of the time series has changed, e.g. roomba has trimmed
+  the time series, as the values of the removed data points are not known
+- the number of data points up to the watermark has changed, e.g. airgaps have
+  been filled or data points were added out of order
+- the time series changed between a derivative and non derivative time series
+- the statistics are older than ANALYZER_INCREMENTAL_STATS_RECOMPUTE_PERIOD, to
+  correct any floating point drift
+
+median_absolute_deviation, histogram_bins and ks_test depend on the
+distribution of all the values and are not included, they are run by
+run_selected_algorithm in the normal manner.  The results are passed to
+:func:`analyzer.algorithms.run_selected_algorithm` as the
+``precomputed_algorithm_results``.
+"""
+from __future__ import division
+import struct
+from math import sqrt, isinf, isnan
+from time import time
+
+import numpy as np
+# @modified 20261018 - Feature #3932: grubbs_table
+# import scipy.stats
+
+from settings import FULL_DURATION
+# @added 20261018 - Feature #3932: grubbs_table
+from grubbs_table import get_grubbs_score
+
+INCREMENTAL_STATS_KEY = 'analyzer.incremental_stats'
+
+INCREMENTAL_ALGORITHMS = [
+    'grubbs', 'first_hour_average', 'stddev_from_average',
+    'stddev_from_moving_average', 'mean_subtraction_cumulation',
+    'least_squares']
+
+# The com used by stddev_from_moving_average
+EWM_COM = 50
+
+STATE_VERSION = 1
+STATE_FIELDS = [
+    'series_kind', 'n', 'first_ts', 'last_ts', 'computed_at', 'mean', 'm2',
+    'x_mean', 'x_m2', 'xy_c', 'fh_threshold', 'fh_n', 'fh_mean', 'fh_m2',
+    'ew_w', 'ew_w2', 'ew_mean', 'ew_s']
+STATE_STRUCT = struct.Struct('<BBq16d')
+
+
+def pack_incremental_state(state):
+    """
+    Pack the state into the compact binary form stored in the Redis hash.
+
+    :param state: the state
+    :type state: dict
+    :return: packed state
+    :rtype: bytes
+
+    """
+    return STATE_STRUCT.pack(STATE_VERSION, *[state[field] for field in STATE_FIELDS])
+
+
+def unpack_incremental_state(packed_state):
+    """
+    Unpack a state packed by :func:`pack_incremental_state`
+
+    :param packed_state: the packed state
+    :type packed_state: bytes
+    :return: the state or None if it is not a valid state
+    :rtype: dict
+
+    """
+    if not packed_state or len(packed_state) != STATE_STRUCT.size:
+        return None
+    unpacked = STATE_STRUCT.unpack(packed_state)
+    if unpacked[0] != STATE_VERSION:
+        return None
+    return dict(zip(STATE_FIELDS, unpacked[1:]))
+
+
+def _bisect_timestamp(timeseries, timestamp, right=False):
+    """
+    The index at which timestamp would be inserted in the sorted timeseries,
+    after any equal timestamps if right.
+    """
+    lo = 0
+    hi = len(timeseries)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        mid_timestamp = timeseries[mid][0]
+        if mid_timestamp < timestamp or (right and mid_timestamp == timestamp):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _welford_add(n, mean, m2, value):
+    n += 1
+    delta = value - mean
+    mean += delta / n
+    m2 += delta * (value - mean)
+    return n, mean, m2
+
+
+def full_incremental_state(timeseries, now, series_kind=0):
+    """
+    Calculate the state from the full time series.
+
+    :param timeseries: the time series
+    :param now: the current timestamp
+    :param series_kind: 1 if the time series is a derivative time series
+    :type timeseries: list
+    :type now: float
+    :type series_kind: int
+    :return: the state or None if the time series has non finite values
+    :rtype: dict
+
+    """
+    try:
+        timeseries_array = np.array(timeseries, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+    if timeseries_array.ndim != 2 or not len(timeseries_array):
+        return None
+    if not np.isfinite(timeseries_array).all():
+        return None
+    timestamps = timeseries_array[:, 0]
+    values = timeseries_array[:, 1]
+    n = len(values)
+    first_ts = float(timestamps[0])
+    mean = float(values.mean())
+    deviations = values - mean
+    m2 = float((deviations ** 2).sum())
+    x = timestamps - first_ts
+    x_mean = float(x.mean())
+    x_deviations = x - x_mean
+    x_m2 = float((x_deviations ** 2).sum())
+    xy_c = float((x_deviations * deviations).sum())
+
+    fh_threshold = now - (FULL_DURATION - 3600)
+    fh_values = values[timestamps < fh_threshold]
+    fh_n = len(fh_values)
+    if fh_n:
+        fh_mean = float(fh_values.mean())
+        fh_m2 = float(((fh_values - fh_mean) ** 2).sum())
+    else:
+        fh_mean = 0.0
+        fh_m2 = 0.0
+
+    decay = 1. - (1. / (1. + EWM_COM))
+    weights = decay ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    ew_w = float(weights.sum())
+    ew_w2 = float((weights ** 2).sum())
+    ew_mean = float((weights * values).sum() / ew_w)
+    ew_s = float((weights * (values - ew_mean) ** 2).sum())
+
+    return {
+        'series_kind': int(series_kind), 'n': n, 'first_ts': first_ts,
+        'last_ts': float(timestamps[-1]), 'computed_at': float(now),
+        'mean': mean, 'm2': m2, 'x_mean': x_mean, 'x_m2': x_m2, 'xy_c': xy_c,
+        'fh_threshold': float(fh_threshold), 'fh_n': float(fh_n),
+        'fh_mean': fh_mean, 'fh_m2': fh_m2, 'ew_w': ew_w, 'ew_w2': ew_w2,
+        'ew_mean': ew_mean, 'ew_s': ew_s}
+
+
+def update_incremental_state(state, timeseries, now, series_kind=0, recompute_period=3600):
+    """
+    Update the state with the data points newer than the state watermark, or
+    recalculate the state from the full time series if the state cannot be
+    updated incrementally.
+
+    :param state: the state or None
+    :param timeseries: the sorted time series
+    :param now: the current timestamp
+    :param series_kind: 1 if the time series is a derivative time series
+    :param recompute_period: the seconds after which the state is recalculated
+        from the full time series
+    :type state: dict
+    :type timeseries: list
+    :type now: float
+    :type series_kind: int
+    :type recompute_period: int
+    :return: (state, recomputed)
+    :rtype: tuple
+
+    """
+    if not timeseries:
+        return None, False
+    recompute = False
+    if not state:
+        recompute = True
+    elif state['series_kind'] != int(series_kind):
+        recompute = True
+    elif state['first_ts'] != float(timeseries[0][0]):
+        recompute = True
+    elif (now - state['computed_at']) > recompute_period:
+        recompute = True
+    fh_threshold = now - (FULL_DURATION - 3600)
+    if not recompute:
+        if fh_threshold < state['fh_threshold']:
+            recompute = True
+        elif _bisect_timestamp(timeseries, state['last_ts'], right=True) != state['n']:
+            recompute = True
+    if recompute:
+        return full_incremental_state(timeseries, now, series_kind), True
+
+    state = dict(state)
+    n = int(state['n'])
+    mean = state['mean']
+    m2 = state['m2']
+    x_mean = state['x_mean']
+    x_m2 = state['x_m2']
+    xy_c = state['xy_c']
+    ew_w = state['ew_w']
+    ew_w2 = state['ew_w2']
+    ew_mean = state['ew_mean']
+    ew_s = state['ew_s']
+    decay = 1. - (1. / (1. + EWM_COM))
+    first_ts = state['first_ts']
+    for timestamp, value in timeseries[n:]:
+        try:
+            timestamp = float(timestamp)
+            value = float(value)
+        except (TypeError, ValueError):
+            return None, False
+        if isnan(value) or isinf(value):
+            return None, False
+        # Welford mean and deviations and the timestamp and value co-moment
+        x = timestamp - first_ts
+        n += 1
+        x_delta = x - x_mean
+        x_mean += x_delta / n
+        x_m2 += x_delta * (x - x_mean)
+        delta = value - mean
+        mean += delta / n
+        m2 += delta * (value - mean)
+        xy_c += x_delta * (value - mean)
+        # Weighted (West) update of the exponentially weighted mean and
+        # deviations, the existing weights decay and the new weight is 1
+        ew_w = (decay * ew_w) + 1.
+        ew_w2 = (decay * decay * ew_w2) + 1.
+        ew_s = decay * ew_s
+        ew_delta = value - ew_mean
+        ew_mean += ew_delta / ew_w
+        ew_s += ew_delta * (value - ew_mean)
+        state['last_ts'] = timestamp
+
+    # The first hour data points are always the first fh_n data points of the
+    # time series, add the data points that are now before the threshold
+    fh_n = int(state['fh_n'])
+    fh_mean = state['fh_mean']
+    fh_m2 = state['fh_m2']
+    fh_end = _bisect_timestamp(timeseries, fh_threshold)
+    for timestamp, value in timeseries[fh_n:fh_end]:
+        fh_n, fh_mean, fh_m2 = _welford_add(fh_n, fh_mean, fh_m2, float(value))
+
+    state.update({
+        'n': n, 'mean': mean, 'm2': m2, 'x_mean': x_mean, 'x_m2': x_m2,
+        'xy_c': xy_c, 'fh_threshold': float(fh_threshold), 'fh_n': float(fh_n),
+        'fh_mean': fh_mean, 'fh_m2': fh_m2, 'ew_w': ew_w, 'ew_w2': ew_w2,
+        'ew_mean': ew_mean, 'ew_s': ew_s})
+    return state, False
+
+
+def _sample_std(n, m2):
+    if n < 2:
+        return float('nan')
+    return sqrt(max(m2, 0.0) / (n - 1))
+
+
+def incremental_algorithm_results(state, timeseries, algorithms):
+    """
+    Determine the results of the incremental algorithms from the state and the
+    last data points of the time series.
+
+    :param state: the state for the time series
+    :param timeseries: the time series
+    :param algorithms: the algorithms to run, normally settings.ALGORITHMS
+    :type state: dict
+    :type timeseries: list
+    :type algorithms: list
+    :return: a dict keyed by algorithm with the True or False result
+    :rtype: dict
+
+    """
+    results = {}
+    n = int(state['n'])
+    last_value = float(timeseries[-1][1])
+    if n >= 3:
+        tail_average = (float(timeseries[-1][1]) + float(timeseries[-2][1]) + float(timeseries[-3][1])) / 3
+    else:
+        tail_average = last_value
+    mean = state['mean']
+    std_dev = _sample_std(n, state['m2'])
+
+    if 'stddev_from_average' in algorithms:
+        results['stddev_from_average'] = bool(abs(tail_average - mean) > 3 * std_dev)
+
+    if 'grubbs' in algorithms:
+        if std_dev == 0:
+            results['grubbs'] = False
+        elif n < 3:
+            results['grubbs'] = False
+        else:
+            z_score = (tail_average - mean) / std_dev
+            # @modified 20261018 - Feature #3932: grubbs_table
+            # threshold = scipy.stats.t.isf(.05 / (2 * n), n - 2)
+            # threshold_squared = threshold * threshold
+            # grubbs_score = ((n - 1) / np.sqrt(n)) * np.sqrt(threshold_squared / (n - 2 + threshold_squared))
+            grubbs_score = get_grubbs_score(n)
+            results['grubbs'] = bool(z_score > grubbs_score)
+
+    if 'first_hour_average' in algorithms:
+        fh_n = int(state['fh_n'])
+        if fh_n:
+            fh_std_dev = _sample_std(fh_n, state['fh_m2'])
+            results['first_hour_average'] = bool(abs(tail_average - state['fh_mean']) > 3 * fh_std_dev)
+        else:
+            results['first_hour_average'] = False
+
+    if 'stddev_from_moving_average' in algorithms:
+        numerator = state['ew_w'] * state['ew_w']
+        denominator = numerator - state['ew_w2']
+        if denominator > 0:
+            ew_std_dev = sqrt(max(state['ew_s'] / state['ew_w'], 0.0) * (numerator / denominator))
+            results['stddev_from_moving_average'] = bool(abs(last_value - state['ew_mean']) > 3 * ew_std_dev)
+        else:
+            results['stddev_from_moving_average'] = False
+
+    if 'mean_subtraction_cumulation' in algorithms:
+        # The statistics of all the data points but the last
+        if n > 2:
+            previous_n = n - 1
+            previous_mean = ((n * mean) - last_value) / previous_n
+            previous_m2 = state['m2'] - ((last_value - previous_mean) * (last_value - mean))
+            previous_std_dev = _sample_std(previous_n, previous_m2)
+            results['mean_subtraction_cumulation'] = bool(abs(last_value - previous_mean) > 3 * previous_std_dev)
+        else:
+            results['mean_subtraction_cumulation'] = False
+
+    if 'least_squares' in algorithms:
+        if n < 3:
+            results['least_squares'] = False
+        elif state['x_m2'] > 0:
+            m = state['xy_c'] / state['x_m2']
+            c = mean - (m * state['x_mean'])
+            errors = [
+                float(value) - ((m * (float(timestamp) - state['first_ts'])) + c)
+                for timestamp, value in timeseries[-3:]]
+            residual_m2 = state['m2'] - ((state['xy_c'] * state['xy_c']) / state['x_m2'])
+            errors_std_dev = _sample_std(n, residual_m2)
+            t = (errors[-1] + errors[-2] + errors[-3]) / 3
+            results['least_squares'] = bool(
+                abs(t) > errors_std_dev * 3 and round(errors_std_dev) != 0 and round(t) != 0)
+    return results
+
+
+def run_incremental_algorithms(
+        timeseries, state, algorithms, now=None, series_kind=0,
+        recompute_period=3600):
+    """
+    Update the incremental state of a time series and determine the results of
+    the incremental algorithms.
+
+    :param timeseries: the sorted time series
+    :param state: the state from the previous run or None
+    :param algorithms: the algorithms to run, normally settings.ALGORITHMS
+    :param now: the current timestamp, time() if not passed
+    :param series_kind: 1 if the time series is a derivative time series
+    :param recompute_period: the seconds after which the state is recalculated
+        from the full time series
+    :type timeseries: list
+    :type state: dict
+    :type algorithms: list
+    :type now: float
+    :type series_kind: int
+    :type recompute_period: int
+    :return: (results, state, recomputed) the results is a dict keyed by
+        algorithm, empty if the state could not be determined
+    :rtype: tuple
+
+    """
+    if now is None:
+        now = time()
+    state, recomputed = update_incremental_state(
+        state, timeseries, now, series_kind, recompute_period)
+    if not state:
+        return {}, None, recomputed
+    incremental_algorithms = [
+        algorithm for algorithm in algorithms if algorithm in INCREMENTAL_ALGORITHMS]
+    results = incremental_algorithm_results(state, timeseries, incremental_algorithms)
+    return results, state, recomputed
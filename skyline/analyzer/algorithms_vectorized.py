@@ -0,0 +1,426 @@
+"""
+algorithms_vectorized.py
+
+@added 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+
+Vectorized versions of the three-sigma algorithms defined in
+:mod:`analyzer.algorithms`.  Rather than building a pandas.Series per metric
+per algorithm, a chunk of time series is decoded into a single NaN padded
+NumPy 2D array (plus the length of each time series) and every vectorized
+algorithm is calculated for all the time series in the chunk in a few array
+passes.
+
+The results are passed to :func:`analyzer.algorithms.run_selected_algorithm`
+as the ``precomputed_algorithm_results`` so that the ensemble, CONSENSUS,
+RUN_OPTIMIZED_WORKFLOW and custom_algorithms logic remains exactly as it is.
+Any algorithm that does not have a vectorized version (e.g. ks_test) and any
+time series that cannot be vectorized (empty or with non finite values) is
+not included in the results and is run by run_selected_algorithm in the normal
+per metric manner.
+"""
+from __future__ import division
+import logging
+from time import time
+
+import numpy as np
+# @modified 20261018 - Feature #3932: grubbs_table
+# import scipy.stats
+
+from settings import FULL_DURATION
+# @added 20261018 - Feature #3932: grubbs_table
+from grubbs_table import populate_grubbs_table, grubbs_critical_values_table
+
+skyline_app = 'analyzer'
+skyline_app_logger = '%sLog' % skyline_app
+logger = logging.getLogger(skyline_app_logger)
+
+# The number of time series padded into a single 2D array, this bounds the
+# memory used by a chunk to roughly
+# VECTORIZED_CHUNK_SIZE * longest time series * 8 bytes * ~6 arrays
+VECTORIZED_CHUNK_SIZE = 500
+
+
+def timeseries_to_padded_arrays(timeseries_list):
+    """
+    Convert a list of time series into NaN padded 2D arrays of timestamps and
+    values and an array of the time series lengths.  Each time series is
+    left aligned, index 0 is the first data point and index ``length - 1`` is
+    the last data point, everything after the last data point is NaN.
+
+    :param timeseries_list: a list of time series, each a list of
+        (timestamp, value) items or a timestamp and value structured array as
+        returned by :func:`skyline_functions.decode_timeseries`
+    :type timeseries_list: list
+    :return: (timestamps, values, lengths, vectorizable)
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray)
+
+    ``vectorizable`` is a boolean array, False for time series that are empty,
+    could not be converted or contain non finite values.  These time series
+    are handled by the normal per metric algorithms.
+
+    """
+    number_of_timeseries = len(timeseries_list)
+    lengths = np.zeros(number_of_timeseries, dtype=np.intp)
+    for index, timeseries in enumerate(timeseries_list):
+        try:
+            lengths[index] = len(timeseries)
+        except TypeError:
+            lengths[index] = 0
+    max_length = int(lengths.max()) if number_of_timeseries else 0
+    timestamps = np.full((number_of_timeseries, max_length), np.nan)
+    values = np.full((number_of_timeseries, max_length), np.nan)
+    vectorizable = lengths > 0
+    for index, timeseries in enumerate(timeseries_list):
+        if not vectorizable[index]:
+            continue
+        try:
+            # @added 20261018 - Feature #3900: Zero copy msgpack time series decode
+            # Accept the structured arrays from decode_timeseries as is
+            if isinstance(timeseries, np.ndarray) and timeseries.dtype.names:
+                timestamps[index, :lengths[index]] = timeseries['timestamp']
+                values[index, :lengths[index]] = timeseries['value']
+            else:
+                np_timeseries = np.array(timeseries, dtype=np.float64)
+                timestamps[index, :lengths[index]] = np_timeseries[:, 0]
+                values[index, :lengths[index]] = np_timeseries[:, 1]
+        except (TypeError, ValueError, IndexError):
+            vectorizable[index] = False
+            continue
+        if not np.isfinite(timestamps[index, :lengths[index]]).all() or \
+                not np.isfinite(values[index, :lengths[index]]).all():
+            vectorizable[index] = False
+    # Zero out anything that is not going to be vectorized so that it does
+    # not generate warnings or affect any array wide calculations
+    timestamps[~vectorizable] = np.nan
+    values[~vectorizable] = np.nan
+    lengths[~vectorizable] = 0
+    return timestamps, values, lengths, vectorizable
+
+
+def _mask(values, lengths):
+    """
+    The boolean mask of the data points in the padded array.
+    """
+    return np.arange(values.shape[1])[np.newaxis, :] < lengths[:, np.newaxis]
+
+
+def _last_values(values, lengths, offset):
+    """
+    The value at ``length - offset`` for each row, NaN where the row does not
+    have that many data points.
+    """
+    indices = lengths - offset
+    has_value = indices >= 0
+    last = np.full(values.shape[0], np.nan)
+    rows = np.arange(values.shape[0])[has_value]
+    last[has_value] = values[rows, indices[has_value]]
+    return last
+
+
+def _masked_sum(values, mask):
+    return np.where(mask, values, 0.0).sum(axis=1)
+
+
+def _masked_mean(values, mask):
+    counts = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _masked_sum(values, mask) / counts
+
+
+def _masked_std(values, mask, mean=None):
+    """
+    The sample standard deviation (ddof=1) of each row as calculated by
+    pandas.Series.std, NaN where a row has less than 2 data points.
+    """
+    counts = mask.sum(axis=1)
+    if mean is None:
+        mean = _masked_mean(values, mask)
+    deviations = np.where(mask, values - mean[:, np.newaxis], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (deviations ** 2).sum(axis=1) / (counts - 1)
+    variance[counts < 2] = np.nan
+    return np.sqrt(variance)
+
+
+def tail_avg_vectorized(values, lengths):
+    """
+    The vectorized version of :func:`analyzer.algorithms.tail_avg`, the
+    average of the last three data points or the last data point if there are
+    less than three data points.  The additions are done in the same order as
+    tail_avg so the results are identical.
+    """
+    last = _last_values(values, lengths, 1)
+    tail = (last + _last_values(values, lengths, 2) + _last_values(values, lengths, 3)) / 3
+    return np.where(lengths >= 3, tail, last)
+
+
+def median_absolute_deviation_vectorized(timestamps, values, lengths):
+    """
+    The vectorized version of
+    :func:`analyzer.algorithms.median_absolute_deviation`
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        median = np.nanmedian(values, axis=1)
+        demedianed = np.abs(values - median[:, np.newaxis])
+        median_deviation = np.nanmedian(demedianed, axis=1)
+        test_statistic = _last_values(demedianed, lengths, 1) / median_deviation
+    # The test statistic is infinite when the median is zero, so skip when
+    # this happens as per the original algorithm
+    return (test_statistic > 6) & (median_deviation != 0)
+
+
+def grubbs_vectorized(timestamps, values, lengths):
+    """
+    The vectorized version of :func:`analyzer.algorithms.grubbs`
+    """
+    mask = _mask(values, lengths)
+    mean = _masked_mean(values, mask)
+    std_dev = _masked_std(values, mask, mean)
+    tail_average = tail_avg_vectorized(values, lengths)
+    len_series = lengths.astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_score = (tail_average - mean) / std_dev
+        threshold = grubbs_critical_values(lengths)
+        threshold_squared = threshold * threshold
+        grubbs_score = ((len_series - 1) / np.sqrt(len_series)) * np.sqrt(threshold_squared / (len_series - 2 + threshold_squared))
+    return (z_score > grubbs_score) & (std_dev != 0)
+
+
+def grubbs_critical_values(lengths):
+    """
+    The t distribution critical values used by the grubbs algorithm for each
+    time series length, NaN for lengths less than 3.
+    """
+    # @modified 20261018 - Feature #3932: grubbs_table
+    # len_series = np.asarray(lengths, dtype=np.float64)
+    # with np.errstate(invalid='ignore', divide='ignore'):
+    #     return scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)
+    lengths = [int(length) for length in lengths]
+    populate_grubbs_table(lengths)
+    return np.array([grubbs_critical_values_table[length] for length in lengths], dtype=np.float64)
+
+
+def first_hour_average_vectorized(timestamps, values, lengths, now=None):
+    """
+    The vectorized version of :func:`analyzer.algorithms.first_hour_average`
+
+    :param now: the timestamp to use as the current time, if not passed
+        time() is used.
+    """
+    if now is None:
+        now = time()
+    last_hour_threshold = now - (FULL_DURATION - 3600)
+    mask = _mask(values, lengths)
+    with np.errstate(invalid='ignore'):
+        mask = mask & (timestamps < last_hour_threshold)
+    mean = _masked_mean(values, mask)
+    std_dev = _masked_std(values, mask, mean)
+    t = tail_avg_vectorized(values, lengths)
+    with np.errstate(invalid='ignore'):
+        return np.abs(t - mean) > 3 * std_dev
+
+
+def stddev_from_average_vectorized(timestamps, values, lengths):
+    """
+    The vectorized version of :func:`analyzer.algorithms.stddev_from_average`
+    """
+    mask = _mask(values, lengths)
+    mean = _masked_mean(values, mask)
+    std_dev = _masked_std(values, mask, mean)
+    t = tail_avg_vectorized(values, lengths)
+    with np.errstate(invalid='ignore'):
+        return np.abs(t - mean) > 3 * std_dev
+
+
+def stddev_from_moving_average_vectorized(timestamps, values, lengths, com=50):
+    """
+    The vectorized version of
+    :func:`analyzer.algorithms.stddev_from_moving_average`
+
+    Only the last value of the exponentially weighted moving average and
+    standard deviation are used by the algorithm, so rather than calculating
+    the entire ewm series only the closed form of the last values is
+    calculated, which is what pandas.Series.ewm with adjust=True and
+    std(bias=False) calculates.
+    """
+    mask = _mask(values, lengths)
+    alpha = 1. / (1. + com)
+    exponents = (lengths[:, np.newaxis] - 1) - np.arange(values.shape[1])[np.newaxis, :]
+    weights = np.where(mask, (1. - alpha) ** np.where(mask, exponents, 0), 0.0)
+    sum_weights = weights.sum(axis=1)
+    sum_weights_squared = (weights ** 2).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        exp_average = _masked_sum(values * weights, mask) / sum_weights
+        deviations = np.where(mask, values - exp_average[:, np.newaxis], 0.0)
+        biased_variance = (weights * deviations ** 2).sum(axis=1) / sum_weights
+        numerator = sum_weights * sum_weights
+        denominator = numerator - sum_weights_squared
+        variance = np.where(denominator > 0, (numerator / denominator) * biased_variance, np.nan)
+        std_dev = np.sqrt(variance)
+        return np.abs(_last_values(values, lengths, 1) - exp_average) > 3 * std_dev
+
+
+def mean_subtraction_cumulation_vectorized(timestamps, values, lengths):
+    """
+    The vectorized version of
+    :func:`analyzer.algorithms.mean_subtraction_cumulation`
+    """
+    # The original algorithm replaces None and 0 values with 0, non finite
+    # values are not vectorized so only the mask needs to be applied
+    previous_mask = _mask(values, lengths - 1)
+    with np.errstate(invalid='ignore'):
+        series = values - _masked_mean(values, previous_mask)[:, np.newaxis]
+        std_dev = _masked_std(series, previous_mask)
+        return np.abs(_last_values(series, lengths, 1)) > 3 * std_dev
+
+
+def least_squares_vectorized(timestamps, values, lengths):
+    """
+    The vectorized version of :func:`analyzer.algorithms.least_squares`
+
+    The least squares fit is determined with the closed form solution on the
+    centred timestamps, rather than with numpy.linalg.lstsq per time series.
+    Time series where all the timestamps are the same have no closed form
+    solution and are returned as None to be run with the original algorithm.
+    """
+    mask = _mask(values, lengths)
+    x_mean = _masked_mean(timestamps, mask)
+    y_mean = _masked_mean(values, mask)
+    x_centred = np.where(mask, timestamps - x_mean[:, np.newaxis], 0.0)
+    y_centred = np.where(mask, values - y_mean[:, np.newaxis], 0.0)
+    x_variance = (x_centred ** 2).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        m = (x_centred * y_centred).sum(axis=1) / x_variance
+        errors = np.where(mask, y_centred - (m[:, np.newaxis] * x_centred), np.nan)
+        std_dev = _masked_std(errors, mask)
+        t = (_last_values(errors, lengths, 1) + _last_values(errors, lengths, 2) + _last_values(errors, lengths, 3)) / 3
+        result = (np.abs(t) > std_dev * 3) & (np.round(std_dev) != 0) & (np.round(t) != 0)
+    result = result.astype(object)
+    result[lengths < 3] = False
+    result[(lengths >= 3) & (x_variance == 0)] = None
+    return result
+
+
+def histogram_bins_vectorized(timestamps, values, lengths, bins=15, max_bin_size=20):
+    """
+    The vectorized version of :func:`analyzer.algorithms.histogram_bins`
+
+    The bin edges and bin counts are determined in the same manner that
+    numpy.histogram determines them for equal width bins, so that the values
+    on the edges of bins are assigned to the same bins.
+    """
+    mask = _mask(values, lengths)
+    first_edge = np.where(mask, values, np.inf).min(axis=1)
+    last_edge = np.where(mask, values, -np.inf).max(axis=1)
+    equal = first_edge == last_edge
+    first_edge[equal] = first_edge[equal] - 0.5
+    last_edge[equal] = last_edge[equal] + 0.5
+    # Rows that are not being vectorized are given a dummy range
+    no_data = lengths == 0
+    first_edge[no_data] = 0.
+    last_edge[no_data] = 1.
+    bin_edges = np.linspace(first_edge, last_edge, bins + 1, axis=1)
+    norm = bins / (last_edge - first_edge)
+    rows, columns = np.nonzero(mask)
+    row_values = values[rows, columns]
+    f_indices = (row_values - first_edge[rows]) * norm[rows]
+    indices = f_indices.astype(np.intp)
+    indices[indices == bins] -= 1
+    decrement = row_values < bin_edges[rows, indices]
+    indices[decrement] -= 1
+    increment = (row_values >= bin_edges[rows, indices + 1]) & (indices != bins - 1)
+    indices[increment] += 1
+    counts = np.bincount(
+        (rows * bins) + indices,
+        minlength=values.shape[0] * bins).reshape(values.shape[0], bins)
+    t = tail_avg_vectorized(values, lengths)[:, np.newaxis]
+    small_bins = counts <= max_bin_size
+    # Is it in the first bin?  As per the original algorithm the first bin
+    # only matches if the tail_avg is less than or equal to the first edge
+    in_first_bin = small_bins[:, 0] & (t[:, 0] <= bin_edges[:, 0])
+    # Is it in the current bin?
+    in_bin = small_bins[:, 1:] & (t >= bin_edges[:, 1:-1]) & (t < bin_edges[:, 2:])
+    return in_first_bin | in_bin.any(axis=1)
+
+
+VECTORIZED_ALGORITHMS = {
+    'histogram_bins': histogram_bins_vectorized,
+    'first_hour_average': first_hour_average_vectorized,
+    'stddev_from_average': stddev_from_average_vectorized,
+    'grubbs': grubbs_vectorized,
+    'mean_subtraction_cumulation': mean_subtraction_cumulation_vectorized,
+    'median_absolute_deviation': median_absolute_deviation_vectorized,
+    'stddev_from_moving_average': stddev_from_moving_average_vectorized,
+    'least_squares': least_squares_vectorized,
+}
+
+
+def run_vectorized_algorithms(timeseries_list, algorithms, now=None, chunk_size=VECTORIZED_CHUNK_SIZE):
+    """
+    Run all the vectorized algorithms in ``algorithms`` on all the time
+    series in ``timeseries_list``.  The time series are ordered by length and
+    processed in chunks of ``chunk_size`` so that the padded arrays are kept
+    as small as possible.
+
+    :param timeseries_list: a list of time series, each a list of
+        (timestamp, value) items or a timestamp and value structured array as
+        returned by :func:`skyline_functions.decode_timeseries`
+    :param algorithms: the algorithms to run, normally settings.ALGORITHMS,
+        algorithms that do not have a vectorized version are ignored
+    :param now: the timestamp passed to first_hour_average
+    :param chunk_size: the maximum number of time series in a padded array
+    :type timeseries_list: list
+    :type algorithms: list
+    :type now: float
+    :type chunk_size: int
+    :return: a list with a dict per time series, in the same order as
+        ``timeseries_list``, keyed by algorithm with the True or False result.
+        Algorithms that were not or could not be vectorized for the time
+        series are not present in the dict.
+    :rtype: list
+
+    """
+    results = [{} for timeseries in timeseries_list]
+    vectorized_algorithms = [
+        algorithm for algorithm in algorithms
+        if algorithm in VECTORIZED_ALGORITHMS]
+    if not vectorized_algorithms or not timeseries_list:
+        return results
+    if now is None:
+        now = time()
+
+    lengths = []
+    for timeseries in timeseries_list:
+        try:
+            lengths.append(len(timeseries))
+        except TypeError:
+            lengths.append(0)
+    ordered_indices = np.argsort(lengths, kind='stable')
+    chunk_size = max(int(chunk_size), 1)
+
+    for chunk_start in range(0, len(ordered_indices), chunk_size):
+        chunk_indices = ordered_indices[chunk_start:(chunk_start + chunk_size)]
+        chunk_timeseries = [timeseries_list[index] for index in chunk_indices]
+        timestamps, values, chunk_lengths, vectorizable = timeseries_to_padded_arrays(chunk_timeseries)
+        if not vectorizable.any():
+            continue
+        for algorithm in vectorized_algorithms:
+            try:
+                if algorithm == 'first_hour_average':
+                    algorithm_results = VECTORIZED_ALGORITHMS[algorithm](timestamps, values, chunk_lengths, now)
+                else:
+                    algorithm_results = VECTORIZED_ALGORITHMS[algorithm](timestamps, values, chunk_lengths)
+            except Exception as e:
+                # Leave the algorithm to be run per metric by
+                # run_selected_algorithm
+                logger.error('error :: run_vectorized_algorithms :: %s failed - %s' % (
+                    algorithm, e))
+                continue
+            for chunk_index, index in enumerate(chunk_indices):
+                if not vectorizable[chunk_index]:
+                    continue
+                result = algorithm_results[chunk_index]
+                if result is None:
+                    continue
+                results[index][algorithm] = bool(result)
+    return results
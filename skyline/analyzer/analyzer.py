@@ -13,7 +13,10 @@ from collections import defaultdict
 # processes
 # from multiprocessing import Process, Manager, Queue
 from multiprocessing import Process, Queue
-from msgpack import Unpacker, packb
+# @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+# Horizon time series are decoded with decode_timeseries and encoded with
+# encode_horizon_datapoint
+# from msgpack import Unpacker, packb
 import os
 from os import path, kill, getpid
 from math import ceil
@@ -43,17 +46,27 @@ from skyline_functions import (
     #                   Feature #3480: batch_processing
     is_batch_metric,
     # @added 20200506 - Feature #3532: Sort all time series
-    sort_timeseries)
+    sort_timeseries,
+    # @added 20261018 - Feature #3900: Zero copy msgpack time series decode
+    decode_timeseries, timeseries_array_to_list,
+    # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+    encode_horizon_datapoint,
+    # @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+    add_to_mirage_check_queue, MIRAGE_CHECK_QUEUE_LOW_PRIORITY_OFFSET)
 
 # @added 20200425 - Feature #3512: matched_or_regexed_in_list function
 #                   Feature #3508: ionosphere.untrainable_metrics
 #                   Feature #3486: analyzer_batch
 from matched_or_regexed_in_list import matched_or_regexed_in_list
+# @added 20261018 - Feature #3902: MetricClassificationIndex
+from metric_classification_index import MetricClassificationIndex
 
 from alerters import trigger_alert
 from algorithms import run_selected_algorithm
 # modified 20201020 - Feature #3792: algorithm_exceptions - EmptyTimeseries
 from algorithm_exceptions import TooShort, Stale, Boring, EmptyTimeseries
+# @added 20261018 - Feature #3932: grubbs_table
+from grubbs_table import populate_grubbs_table
 
 try:
     send_algorithm_run_metrics = settings.ENABLE_ALGORITHM_RUN_METRICS
@@ -318,6 +331,62 @@ try:
 except:
     ANALYZER_CHECK_LAST_TIMESTAMP = False
 
+# @added 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+try:
+    ANALYZER_VECTORIZED_ALGORITHMS = settings.ANALYZER_VECTORIZED_ALGORITHMS
+except:
+    ANALYZER_VECTORIZED_ALGORITHMS = False
+try:
+    ANALYZER_VECTORIZED_CHUNK_SIZE = int(settings.ANALYZER_VECTORIZED_CHUNK_SIZE)
+except:
+    ANALYZER_VECTORIZED_CHUNK_SIZE = 500
+if ANALYZER_VECTORIZED_ALGORITHMS:
+    from algorithms_vectorized import run_vectorized_algorithms
+
+# @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+try:
+    MIRAGE_CHECK_QUEUE = settings.MIRAGE_CHECK_QUEUE
+except:
+    MIRAGE_CHECK_QUEUE = False
+
+# @added 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+try:
+    ANALYZER_WORKER_POOL = settings.ANALYZER_WORKER_POOL
+except:
+    ANALYZER_WORKER_POOL = False
+try:
+    ANALYZER_WORKER_POOL_MAX_RUNS = int(settings.ANALYZER_WORKER_POOL_MAX_RUNS)
+except:
+    ANALYZER_WORKER_POOL_MAX_RUNS = 100
+if ANALYZER_WORKER_POOL:
+    from analyzer_worker_pool import (
+        QueueCollector, get_worker_slices, update_worker_throughput)
+
+# @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+try:
+    ANALYZER_COST_AWARE_SHARDING = settings.ANALYZER_COST_AWARE_SHARDING
+except:
+    ANALYZER_COST_AWARE_SHARDING = False
+if ANALYZER_COST_AWARE_SHARDING:
+    from cost_aware_sharding import (
+        METRICS_ANALYSIS_COST_KEY, SPIN_PROCESS_RUNTIMES_KEY,
+        encode_metric_costs, decode_metric_costs, assign_metrics_by_cost,
+        shard_balance)
+
+# @added 20261018 - Feature #3930: ANALYZER_INCREMENTAL_STATS
+try:
+    ANALYZER_INCREMENTAL_STATS = settings.ANALYZER_INCREMENTAL_STATS
+except:
+    ANALYZER_INCREMENTAL_STATS = False
+try:
+    ANALYZER_INCREMENTAL_STATS_RECOMPUTE_PERIOD = int(settings.ANALYZER_INCREMENTAL_STATS_RECOMPUTE_PERIOD)
+except:
+    ANALYZER_INCREMENTAL_STATS_RECOMPUTE_PERIOD = 3600
+if ANALYZER_INCREMENTAL_STATS:
+    from algorithms_incremental import (
+        INCREMENTAL_STATS_KEY, run_incremental_algorithms,
+        pack_incremental_state, unpack_incremental_state)
+
 # @added 20190522 - Feature #2580: illuminance
 # Disabled for now as in concept phase.  This would work better if
 # the illuminance_datapoint was determined from the time series
@@ -403,6 +472,11 @@ class Analyzer(Thread):
         # @added 20190408 - Feature #2882: Mirage - periodic_check
         # self.mirage_periodic_check_metrics = Manager().list()
         # self.real_anomalous_metrics = Manager().list()
+        # @added 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+        # The persistent spin_process workers, keyed by worker number
+        self.analyzer_workers = {}
+        self.analyzer_worker_throughputs = {}
+        self.analyzer_worker_result_q = Queue()
 
     def check_if_parent_is_alive(self):
         """
@@ -450,7 +524,11 @@ class Analyzer(Thread):
 
         trigger_alert(alert, metric, context)
 
-    def spin_process(self, i, unique_metrics):
+    # @modified 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+    # Added assigned_metrics so that a worker in the ANALYZER_WORKER_POOL can
+    # be passed its slice of the unique_metrics
+    # def spin_process(self, i, unique_metrics):
+    def spin_process(self, i, unique_metrics, assigned_metrics=None):
         """
         Assign a bunch of metrics for a process to analyze.
 
@@ -537,19 +615,22 @@ class Analyzer(Thread):
                     snab_analyzer_load_test_start_time = default_snab_analyzer_load_test_start
             snab_analyzer_load_test_unique_metrics = list(unique_metrics)
 
-        # Discover assigned metrics
-        keys_per_processor = int(ceil(float(len(unique_metrics)) / float(settings.ANALYZER_PROCESSES)))
-        if i == settings.ANALYZER_PROCESSES:
-            assigned_max = len(unique_metrics)
-        else:
-            assigned_max = min(len(unique_metrics), i * keys_per_processor)
-        # Fix analyzer worker metric assignment #94
-        # https://github.com/etsy/skyline/pull/94 @languitar:worker-fix
-        assigned_min = (i - 1) * keys_per_processor
-        assigned_keys = range(assigned_min, assigned_max)
-
-        # Compile assigned metrics
-        assigned_metrics = [unique_metrics[index] for index in assigned_keys]
+        # @modified 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+        # Only discover the assigned metrics if they were not passed
+        if assigned_metrics is None:
+            # Discover assigned metrics
+            keys_per_processor = int(ceil(float(len(unique_metrics)) / float(settings.ANALYZER_PROCESSES)))
+            if i == settings.ANALYZER_PROCESSES:
+                assigned_max = len(unique_metrics)
+            else:
+                assigned_max = min(len(unique_metrics), i * keys_per_processor)
+            # Fix analyzer worker metric assignment #94
+            # https://github.com/etsy/skyline/pull/94 @languitar:worker-fix
+            assigned_min = (i - 1) * keys_per_processor
+            assigned_keys = range(assigned_min, assigned_max)
+
+            # Compile assigned metrics
+            assigned_metrics = [unique_metrics[index] for index in assigned_keys]
         if LOCAL_DEBUG:
             logger.info('debug :: Memory usage spin_process after assigned_metrics: %s (kb)' % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
 
@@ -575,6 +656,22 @@ class Analyzer(Thread):
         high_priority_assigned_metrics = []
         low_priority_assigned_metrics = []
 
+        # @added 20261018 - Feature #3902: MetricClassificationIndex
+        # Fetch all the Redis sets that classify metrics in a single Redis
+        # pipeline once per run and use the index for O(1) membership checks
+        # in the assigned_metrics loop, rather than checking membership of
+        # lists of all the members of each set for each metric.
+        metric_classifications = [
+            'mirage', 'ionosphere', 'derivative', 'non_derivative',
+            'smtp_alerter', 'non_smtp_alerter', 'inactive']
+        if IDENTIFY_AIRGAPS:
+            metric_classifications = metric_classifications + ['airgapped', 'airgapped_filled']
+        metric_classification_index_start = time()
+        metric_classification_index = MetricClassificationIndex(
+            skyline_app, self.redis_conn_decoded, metric_classifications)
+        logger.info('metric_classification_index built in %.6f seconds' % (
+            time() - metric_classification_index_start))
+
         # @added 20201212 - Feature #3884: ANALYZER_CHECK_LAST_TIMESTAMP
         # all_stale_metrics is required in ANALYZER_ANALYZE_LOW_PRIORITY_METRICS and
         # ANALYZER_CHECK_LAST_TIMESTAMP so set default
@@ -599,7 +696,9 @@ class Analyzer(Thread):
         if determine_low_priority_metrics:
             try:
                 try:
-                    smtp_alerter_metrics = list(self.redis_conn_decoded.smembers('aet.analyzer.smtp_alerter_metrics'))
+                    # @modified 20261018 - Feature #3902: MetricClassificationIndex
+                    # smtp_alerter_metrics = list(self.redis_conn_decoded.smembers('aet.analyzer.smtp_alerter_metrics'))
+                    smtp_alerter_metrics = list(metric_classification_index.members('smtp_alerter'))
                 except:
                     logger.error(traceback.format_exc())
                     logger.error('error :: failed to generate a list from aet.analyzer.smtp_alerter_metrics Redis set for priority based assigned_metrics')
@@ -618,6 +717,8 @@ class Analyzer(Thread):
                 del unique_smtp_alerter_metrics_set
 
                 high_priority_assigned_metrics = list(high_priority_assigned_metrics_set)
+                # @added 20261018 - Feature #3902: MetricClassificationIndex
+                metric_classification_index.set_members('high_priority', high_priority_assigned_metrics_set)
                 del high_priority_assigned_metrics_set
                 logger.info('discovered %s high_priority_assigned_metrics in assigned_metrics' % (
                     str(len(high_priority_assigned_metrics))))
@@ -822,9 +923,11 @@ class Analyzer(Thread):
             # @modified 20191014 - Bug #3266: py3 Redis binary objects not strings
             #                      Branch #3262: py3
             # mirage_unique_metrics = list(self.redis_conn.smembers('mirage.unique_metrics'))
-            mirage_unique_metrics = list(self.redis_conn_decoded.smembers('mirage.unique_metrics'))
+            # @modified 20261018 - Feature #3902: MetricClassificationIndex
+            # mirage_unique_metrics = list(self.redis_conn_decoded.smembers('mirage.unique_metrics'))
+            mirage_unique_metrics = metric_classification_index.members('mirage')
         except:
-            mirage_unique_metrics = []
+            mirage_unique_metrics = set()
 
         # @added 20190408 - Feature #2882: Mirage - periodic_check
         # Add Mirage periodic checks so that Mirage is analysing each metric at
@@ -948,9 +1051,11 @@ class Analyzer(Thread):
             # @modified 20191014 - Bug #3266: py3 Redis binary objects not strings
             #                      Branch #3262: py3
             # ionosphere_unique_metrics = list(self.redis_conn.smembers('ionosphere.unique_metrics'))
-            ionosphere_unique_metrics = list(self.redis_conn_decoded.smembers('ionosphere.unique_metrics'))
+            # @modified 20261018 - Feature #3902: MetricClassificationIndex
+            # ionosphere_unique_metrics = list(self.redis_conn_decoded.smembers('ionosphere.unique_metrics'))
+            ionosphere_unique_metrics = metric_classification_index.members('ionosphere')
         except:
-            ionosphere_unique_metrics = []
+            ionosphere_unique_metrics = set()
 
         # @added 20170602 - Feature #2034: analyse_derivatives
         # In order to convert monotonic, incrementing metrics to a deriative
@@ -959,16 +1064,20 @@ class Analyzer(Thread):
             # @modified 20191014 - Bug #3266: py3 Redis binary objects not strings
             #                      Branch #3262: py3
             # derivative_metrics = list(self.redis_conn.smembers('derivative_metrics'))
-            derivative_metrics = list(self.redis_conn_decoded.smembers('derivative_metrics'))
+            # @modified 20261018 - Feature #3902: MetricClassificationIndex
+            # derivative_metrics = list(self.redis_conn_decoded.smembers('derivative_metrics'))
+            derivative_metrics = metric_classification_index.members('derivative')
         except:
-            derivative_metrics = []
+            derivative_metrics = set()
         try:
             # @modified 20191014 - Bug #3266: py3 Redis binary objects not strings
             #                      Branch #3262: py3
             # non_derivative_metrics = list(self.redis_conn.smembers('non_derivative_metrics'))
-            non_derivative_metrics = list(self.redis_conn_decoded.smembers('non_derivative_metrics'))
+            # @modified 20261018 - Feature #3902: MetricClassificationIndex
+            # non_derivative_metrics = list(self.redis_conn_decoded.smembers('non_derivative_metrics'))
+            non_derivative_metrics = metric_classification_index.members('non_derivative')
         except:
-            non_derivative_metrics = []
+            non_derivative_metrics = set()
         # This is here to refresh the sets
         try:
             manage_derivative_metrics = self.redis_conn.get('analyzer.derivative_metrics_expiry')
@@ -1044,11 +1153,13 @@ class Analyzer(Thread):
             # @modified 20191014 - Bug #3266: py3 Redis binary objects not strings
             #                      Branch #3262: py3
             # non_smtp_alerter_metrics = list(self.redis_conn.smembers('analyzer.non_smtp_alerter_metrics'))
-            non_smtp_alerter_metrics = list(self.redis_conn_decoded.smembers('aet.analyzer.non_smtp_alerter_metrics'))
+            # @modified 20261018 - Feature #3902: MetricClassificationIndex
+            # non_smtp_alerter_metrics = list(self.redis_conn_decoded.smembers('aet.analyzer.non_smtp_alerter_metrics'))
+            non_smtp_alerter_metrics = metric_classification_index.members('non_smtp_alerter')
         except:
             logger.info(traceback.format_exc())
             logger.error('error :: failed to generate a list from aet.analyzer.non_smtp_alerter_metrics Redis set')
-            non_smtp_alerter_metrics = []
+            non_smtp_alerter_metrics = set()
 
         # @added 20200527 - Feature #3550: flux.uploaded_data_worker
         # If data has been uploaded ignoring submitted timestamps then the Redis
@@ -1112,7 +1223,9 @@ class Analyzer(Thread):
 
         if IDENTIFY_AIRGAPS:
             try:
-                airgapped_metrics = list(self.redis_conn_decoded.smembers('analyzer.airgapped_metrics'))
+                # @modified 20261018 - Feature #3902: MetricClassificationIndex
+                # airgapped_metrics = list(self.redis_conn_decoded.smembers('analyzer.airgapped_metrics'))
+                airgapped_metrics = list(metric_classification_index.members('airgapped'))
             except Exception as e:
                 logger.error('error :: could not query Redis for analyzer.airgapped_metrics - %s' % str(e))
                 airgapped_metrics = []
@@ -1122,7 +1235,9 @@ class Analyzer(Thread):
             # Handle airgaps filled so that once they have been submitted as filled
             # Analyzer will not identify them as airgapped again
             try:
-                airgapped_metrics_filled = list(self.redis_conn_decoded.smembers('analyzer.airgapped_metrics.filled'))
+                # @modified 20261018 - Feature #3902: MetricClassificationIndex
+                # airgapped_metrics_filled = list(self.redis_conn_decoded.smembers('analyzer.airgapped_metrics.filled'))
+                airgapped_metrics_filled = list(metric_classification_index.members('airgapped_filled'))
             except Exception as e:
                 logger.error('error :: could not remove item from analyzer.airgapped_metrics.filled Redis set - %s' % str(e))
 
@@ -1196,9 +1311,11 @@ class Analyzer(Thread):
         # as inactive
         inactive_after = settings.FULL_DURATION - 3600
         try:
-            inactive_metrics = list(self.redis_conn_decoded.smembers('analyzer.inactive_metrics'))
+            # @modified 20261018 - Feature #3902: MetricClassificationIndex
+            # inactive_metrics = list(self.redis_conn_decoded.smembers('analyzer.inactive_metrics'))
+            inactive_metrics = metric_classification_index.members('inactive')
         except:
-            inactive_metrics = []
+            inactive_metrics = set()
 
         # @added 20201017 - Feature #3818: ANALYZER_BATCH_PROCESSING_OVERFLOW_ENABLED
         low_priority_time_elasped = False
@@ -1273,10 +1390,58 @@ class Analyzer(Thread):
                     logger.error('error :: failed to get Redis key aet.analyzer.stale for ANALYZER_CHECK_LAST_TIMESTAMP')
                     all_stale_metrics = []
 
+        # @added 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+        # The time series and vectorized algorithm results for the current
+        # chunk of assigned_metrics, keyed by the assigned_metrics index
+        vectorized_chunk_timeseries = {}
+        vectorized_chunk_results = {}
+        vectorized_chunks_run_time = 0
+        vectorized_timeseries = None
+
+        # @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+        # Record the time each metric takes to analyse, the time from the
+        # start of one metric to the start of the next, with the time of any
+        # vectorized chunk shared between the metrics in the chunk
+        metric_costs = {}
+        metric_cost_metric = None
+        metric_cost_start = None
+        metric_cost_adjustment = 0
+        metric_cost_chunk_share = 0
+        # i is reused as the assigned_metrics index
+        spin_process_number = i
+
+        # @added 20261018 - Feature #3930: ANALYZER_INCREMENTAL_STATS
+        # Get the incremental statistics of the assigned_metrics from the
+        # previous run in a single request
+        incremental_states = {}
+        updated_incremental_states = {}
+        incremental_stats_recomputed = 0
+        incremental_stats_errors = 0
+        if ANALYZER_INCREMENTAL_STATS and assigned_metrics:
+            try:
+                packed_incremental_states = self.redis_conn.hmget(INCREMENTAL_STATS_KEY, assigned_metrics)
+                for metric_index, packed_incremental_state in enumerate(packed_incremental_states):
+                    if packed_incremental_state:
+                        incremental_states[assigned_metrics[metric_index]] = packed_incremental_state
+                del packed_incremental_states
+            except:
+                logger.error(traceback.format_exc())
+                logger.error('error :: failed to get the incremental stats from Redis hash %s' % (
+                    INCREMENTAL_STATS_KEY))
+
         # Distill timeseries strings into lists
         for i, metric_name in enumerate(assigned_metrics):
             self.check_if_parent_is_alive()
 
+            # @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+            if ANALYZER_COST_AWARE_SHARDING:
+                metric_cost_now = time()
+                if metric_cost_metric is not None:
+                    metric_costs[metric_cost_metric] = (metric_cost_now - metric_cost_start) + metric_cost_adjustment
+                metric_cost_metric = metric_name
+                metric_cost_start = metric_cost_now
+                metric_cost_adjustment = metric_cost_chunk_share
+
             # @added 20191016 - Branch #3262: py3
             if LOCAL_DEBUG:
                 logger.info('debug :: checking %s' % str(metric_name))
@@ -1285,7 +1450,9 @@ class Analyzer(Thread):
             #                   ANALYZER_BATCH_PROCESSING_OVERFLOW_ENABLED
             low_priority_metric = False
             if low_priority_assigned_metrics and ANALYZER_MANAGE_LOW_PRIORITY_METRICS:
-                if metric_name not in high_priority_assigned_metrics:
+                # @modified 20261018 - Feature #3902: MetricClassificationIndex
+                # if metric_name not in high_priority_assigned_metrics:
+                if not metric_classification_index.is_member('high_priority', metric_name):
                     low_priority_metric = True
                     if not logged_high_priority_run_time:
                         logged_high_priority_run_time = (time() - spin_start)
@@ -1329,22 +1496,69 @@ class Analyzer(Thread):
                                 logger.error('error :: batch processing - failed to add %s to %s Redis set' % (
                                     str(data), redis_set))
 
-            try:
-                raw_series = raw_assigned[i]
-                unpacker = Unpacker(use_list=False)
-                unpacker.feed(raw_series)
-                timeseries = list(unpacker)
-            except:
-                timeseries = []
-
-            # @added 20200506 - Feature #3532: Sort all time series
-            # To ensure that there are no unordered timestamps in the time
-            # series which are artefacts of the collector or carbon-relay, sort
-            # all time series by timestamp before analysis.
-            original_timeseries = timeseries
-            if original_timeseries:
-                timeseries = sort_timeseries(original_timeseries)
-                del original_timeseries
+            # @added 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+            # Decode, sort and run the vectorized algorithms on the next chunk
+            # of assigned_metrics
+            if ANALYZER_VECTORIZED_ALGORITHMS and i not in vectorized_chunk_timeseries:
+                vectorized_chunk_timeseries = {}
+                vectorized_chunk_results = {}
+                chunk_start = time()
+                chunk_indices = list(range(i, min(len(assigned_metrics), (i + ANALYZER_VECTORIZED_CHUNK_SIZE))))
+                # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+                # Decode the chunk directly into timestamp and value arrays
+                # and only materialise the list of tuples per metric
+                chunk_timeseries_arrays = []
+                for chunk_index in chunk_indices:
+                    try:
+                        chunk_timeseries_array = decode_timeseries(raw_assigned[chunk_index])
+                    except:
+                        chunk_timeseries_array = None
+                    chunk_timeseries_arrays.append(chunk_timeseries_array)
+                    vectorized_chunk_timeseries[chunk_index] = timeseries_array_to_list(chunk_timeseries_array)
+                try:
+                    chunk_results = run_vectorized_algorithms(
+                        chunk_timeseries_arrays,
+                        settings.ALGORITHMS, chunk_size=ANALYZER_VECTORIZED_CHUNK_SIZE)
+                    for chunk_index, chunk_result in zip(chunk_indices, chunk_results):
+                        vectorized_chunk_results[chunk_index] = chunk_result
+                except:
+                    logger.error(traceback.format_exc())
+                    logger.error('error :: run_vectorized_algorithms failed, algorithms will be run per metric')
+                vectorized_chunks_run_time += (time() - chunk_start)
+                # @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+                # Share the chunk time between the metrics in the chunk
+                if ANALYZER_COST_AWARE_SHARDING:
+                    vectorized_chunk_run_time = time() - chunk_start
+                    metric_cost_chunk_share = vectorized_chunk_run_time / len(chunk_indices)
+                    metric_cost_adjustment = metric_cost_chunk_share - vectorized_chunk_run_time
+
+            if ANALYZER_VECTORIZED_ALGORITHMS:
+                timeseries = vectorized_chunk_timeseries.pop(i, [])
+                vectorized_timeseries = timeseries
+            else:
+                # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+                # Decode the msgpack stream with decode_timeseries which only
+                # sorts the time series if it is not already sorted
+                # try:
+                #     raw_series = raw_assigned[i]
+                #     unpacker = Unpacker(use_list=False)
+                #     unpacker.feed(raw_series)
+                #     timeseries = list(unpacker)
+                # except:
+                #     timeseries = []
+                # @added 20200506 - Feature #3532: Sort all time series
+                # To ensure that there are no unordered timestamps in the time
+                # series which are artefacts of the collector or carbon-relay, sort
+                # all time series by timestamp before analysis.
+                # original_timeseries = timeseries
+                # if original_timeseries:
+                #     timeseries = sort_timeseries(original_timeseries)
+                #     del original_timeseries
+                try:
+                    raw_series = raw_assigned[i]
+                    timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
+                except:
+                    timeseries = []
 
             last_timeseries_timestamp = 0
 
@@ -1368,7 +1582,9 @@ class Analyzer(Thread):
                 # removed from the set, how does analyzer identify to not send
                 # again?  Set a key that expires one hour later?
                 # HOW does the metric become identified as active again?
-                inactive_metrics = list(self.redis_conn_decoded.smembers('analyzer.inactive_metrics'))
+                # @modified 20261018 - Feature #3902: MetricClassificationIndex
+                # inactive_metrics = list(self.redis_conn_decoded.smembers('analyzer.inactive_metrics'))
+                inactive_metrics = metric_classification_index.refresh('inactive')
 
             # @added 20170602 - Feature #2034: analyse_derivatives
             # In order to convert monotonic, incrementing metrics to a deriative
@@ -1576,7 +1792,9 @@ class Analyzer(Thread):
                         metric = (new_metric_name_key, (datapoint[0], datapoint[1]))
                         # self.redis_conn.append(str(new_metric_name_key), packb(metric[1]))
                         # metric_ts_data.append((datapoint[0], datapoint[1]))
-                        pipe.append(str(new_metric_name_key), packb(metric[1]))
+                        # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                        # pipe.append(str(new_metric_name_key), packb(metric[1]))
+                        pipe.append(str(new_metric_name_key), encode_horizon_datapoint(metric[1]))
                     # self.redis_conn.set(str(new_metric_name_key), packb(metric_ts_data))
                     pipe.execute()
                     # del metric_ts_data
@@ -1595,9 +1813,12 @@ class Analyzer(Thread):
                     logger.info('getting current Redis key %s data to compare with sorted and deduplicated data' % str(metric_name))
                     try:
                         test_raw_series = self.redis_conn.get(metric_name)
-                        unpacker = Unpacker(use_list=False)
-                        unpacker.feed(test_raw_series)
-                        test_timeseries = list(unpacker)
+                        # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                        # Decode with decode_timeseries which decodes either storage format
+                        # unpacker = Unpacker(use_list=False)
+                        # unpacker.feed(test_raw_series)
+                        # test_timeseries = list(unpacker)
+                        test_timeseries = timeseries_array_to_list(decode_timeseries(test_raw_series))
                     except:
                         logger.info(traceback.format_exc())
                         logger.error('error :: failed to get Redis key %s to test against sorted and deduplicated data' % str(metric_name))
@@ -1691,9 +1912,12 @@ class Analyzer(Thread):
                     logger.info('determining if any new data was added to the metric Redis key during the rename')
                     try:
                         test_raw_series = self.redis_conn.get(metric_key_to_delete)
-                        unpacker = Unpacker(use_list=False)
-                        unpacker.feed(test_raw_series)
-                        test_timeseries = list(unpacker)
+                        # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                        # Decode with decode_timeseries which decodes either storage format
+                        # unpacker = Unpacker(use_list=False)
+                        # unpacker.feed(test_raw_series)
+                        # test_timeseries = list(unpacker)
+                        test_timeseries = timeseries_array_to_list(decode_timeseries(test_raw_series))
                     except:
                         logger.info(traceback.format_exc())
                         logger.error('error :: failed to get Redis key %s to test against sorted and deduplicated data' % str(metric_key_to_delete))
@@ -1744,7 +1968,9 @@ class Analyzer(Thread):
                             try:
                                 for datapoint in new_datapoints:
                                     metric = (metric_name, (datapoint[0], datapoint[1]))
-                                    self.redis_conn.append(metric_name, packb(metric[1]))
+                                    # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                                    # self.redis_conn.append(metric_name, packb(metric[1]))
+                                    self.redis_conn.append(metric_name, encode_horizon_datapoint(metric[1]))
                                 # @added 20200501 - Feature #3532: Sort all time series
                                 get_updated_redis_timeseries = True
                             except:
@@ -1773,9 +1999,12 @@ class Analyzer(Thread):
                 updated_timeseries = []
                 try:
                     raw_series = self.redis_conn.get(metric_name)
-                    unpacker = Unpacker(use_list=False)
-                    unpacker.feed(raw_series)
-                    updated_timeseries = list(unpacker)
+                    # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                    # Decode with decode_timeseries which decodes either storage format
+                    # unpacker = Unpacker(use_list=False)
+                    # unpacker.feed(raw_series)
+                    # updated_timeseries = list(unpacker)
+                    updated_timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
                 except:
                     updated_timeseries = []
                 if updated_timeseries:
@@ -2414,8 +2643,45 @@ class Analyzer(Thread):
                 # anomalous, ensemble, datapoint, negatives_found = run_selected_algorithm(timeseries, metric_name, metric_airgaps, run_negatives_present)
                 # @modified 20200603 - Feature #3566: custom_algorithms
                 # Added algorithms_run
+                # @added 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+                # Only use the vectorized results if the time series has not
+                # been replaced since the results were calculated, e.g. sorted
+                # and deduplicated or converted to a derivative
+                precomputed_algorithm_results = None
+                if ANALYZER_VECTORIZED_ALGORITHMS and timeseries is vectorized_timeseries:
+                    precomputed_algorithm_results = vectorized_chunk_results.pop(i, None)
+
+                # @added 20261018 - Feature #3930: ANALYZER_INCREMENTAL_STATS
+                # Update the statistics with the new data points only and use
+                # the incremental algorithm results
+                if ANALYZER_INCREMENTAL_STATS and check_for_anomalous:
+                    try:
+                        incremental_results, incremental_state, incremental_recomputed = run_incremental_algorithms(
+                            timeseries, unpack_incremental_state(incremental_states.pop(metric_name, None)),
+                            settings.ALGORITHMS, now=time(),
+                            series_kind=int(bool(known_derivative_metric)),
+                            recompute_period=ANALYZER_INCREMENTAL_STATS_RECOMPUTE_PERIOD)
+                        if incremental_state:
+                            updated_incremental_states[metric_name] = pack_incremental_state(incremental_state)
+                        if incremental_recomputed:
+                            incremental_stats_recomputed += 1
+                        if incremental_results:
+                            if precomputed_algorithm_results:
+                                precomputed_algorithm_results = dict(precomputed_algorithm_results)
+                                precomputed_algorithm_results.update(incremental_results)
+                            else:
+                                precomputed_algorithm_results = incremental_results
+                    except:
+                        if not incremental_stats_errors:
+                            logger.error(traceback.format_exc())
+                            logger.error('error :: run_incremental_algorithms failed on %s, algorithms will be run on the full time series' % (
+                                metric_name))
+                        incremental_stats_errors += 1
+
                 if check_for_anomalous:
-                    anomalous, ensemble, datapoint, negatives_found, algorithms_run = run_selected_algorithm(timeseries, metric_name, metric_airgaps, metric_airgaps_filled, run_negatives_present, check_for_airgaps_only)
+                    # @modified 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+                    # Added precomputed_algorithm_results
+                    anomalous, ensemble, datapoint, negatives_found, algorithms_run = run_selected_algorithm(timeseries, metric_name, metric_airgaps, metric_airgaps_filled, run_negatives_present, check_for_airgaps_only, precomputed_algorithm_results)
                 else:
                     # Low priority metric not analysed
                     anomalous = False
@@ -2452,7 +2718,9 @@ class Analyzer(Thread):
 
                 # @added 20201017 - Feature #3818: ANALYZER_BATCH_PROCESSING_OVERFLOW_ENABLED
                 if ANALYZER_BATCH_PROCESSING_OVERFLOW_ENABLED:
-                    if metric_name not in high_priority_assigned_metrics:
+                    # @modified 20261018 - Feature #3902: MetricClassificationIndex
+                    # if metric_name not in high_priority_assigned_metrics:
+                    if not metric_classification_index.is_member('high_priority', metric_name):
                         last_metric_timestamp_key = 'last_timestamp.%s' % base_name
                         try:
                             int_metric_timestamp = int(timeseries[-1][0])
@@ -2939,6 +3207,17 @@ class Analyzer(Thread):
                                     if python_version == 3:
                                         os.chmod(anomaly_check_file, mode=0o644)
                                     logger.info('added mirage check :: %s,%s,%s' % (metric[1], metric[0], use_hours_to_resolve))
+                                    # @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+                                    # Add the check to the Mirage check queue
+                                    # in metric timestamp order with SNAB only
+                                    # checks deprioritised
+                                    if MIRAGE_CHECK_QUEUE:
+                                        mirage_check_priority = int(metric[2])
+                                        if snab_only_check:
+                                            mirage_check_priority += MIRAGE_CHECK_QUEUE_LOW_PRIORITY_OFFSET
+                                        add_to_mirage_check_queue(
+                                            skyline_app, self.redis_conn, anomaly_check_file,
+                                            mirage_check_priority)
                                     try:
                                         redis_set = 'analyzer.sent_to_mirage'
                                         data = str(metric[1])
@@ -3361,6 +3640,10 @@ class Analyzer(Thread):
                 exceptions['Other'] += 1
                 logger.info(traceback.format_exc())
 
+        # @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+        if ANALYZER_COST_AWARE_SHARDING and metric_cost_metric is not None:
+            metric_costs[metric_cost_metric] = (time() - metric_cost_start) + metric_cost_adjustment
+
         # @added 20200430 - Feature #3480: batch_processing
         # Tidy up and reduce logging, consolidate logging with counts
         if BATCH_PROCESSING:
@@ -3411,6 +3694,11 @@ class Analyzer(Thread):
 
         del low_priority_assigned_metrics
 
+        # @added 20261018 - Feature #3900: ANALYZER_VECTORIZED_ALGORITHMS
+        if ANALYZER_VECTORIZED_ALGORITHMS:
+            logger.info('ANALYZER_VECTORIZED_ALGORITHMS - decoding and running vectorized algorithms took %.2f seconds' % (
+                vectorized_chunks_run_time))
+
         # @added 20201212 - Feature #3884: ANALYZER_CHECK_LAST_TIMESTAMP
         if ANALYZER_CHECK_LAST_TIMESTAMP:
             try:
@@ -3532,9 +3820,12 @@ class Analyzer(Thread):
                             break
                         try:
                             raw_series = raw_assigned[i]
-                            unpacker = Unpacker(use_list=False)
-                            unpacker.feed(raw_series)
-                            timeseries = list(unpacker)
+                            # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                            # Decode with decode_timeseries which decodes either storage format
+                            # unpacker = Unpacker(use_list=False)
+                            # unpacker.feed(raw_series)
+                            # timeseries = list(unpacker)
+                            timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
                         except:
                             timeseries = []
                         anomalous = None
@@ -3559,8 +3850,219 @@ class Analyzer(Thread):
 
         spin_end = time() - spin_start
         logger.info('spin_process took %.2f seconds' % spin_end)
+
+        # @added 20261018 - Feature #3930: ANALYZER_INCREMENTAL_STATS
+        if ANALYZER_INCREMENTAL_STATS:
+            logger.info('ANALYZER_INCREMENTAL_STATS - updated the incremental stats of %s metrics, %s recomputed from the full time series, %s errors' % (
+                str(len(updated_incremental_states)), str(incremental_stats_recomputed),
+                str(incremental_stats_errors)))
+            if updated_incremental_states:
+                try:
+                    self.redis_conn.hset(INCREMENTAL_STATS_KEY, mapping=updated_incremental_states)
+                except:
+                    logger.error(traceback.format_exc())
+                    logger.error('error :: failed to record the incremental stats in Redis hash %s' % (
+                        INCREMENTAL_STATS_KEY))
+
+        # @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+        if ANALYZER_COST_AWARE_SHARDING:
+            try:
+                pipe = self.redis_conn.pipeline()
+                if metric_costs:
+                    pipe.hset(METRICS_ANALYSIS_COST_KEY, mapping=encode_metric_costs(metric_costs))
+                pipe.hset(SPIN_PROCESS_RUNTIMES_KEY, str(spin_process_number), spin_end)
+                pipe.execute()
+            except:
+                logger.error(traceback.format_exc())
+                logger.error('error :: failed to record the metric costs in Redis hash %s' % (
+                    METRICS_ANALYSIS_COST_KEY))
         return
 
+    # @added 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+    def analyzer_worker(self, i, task_q, result_q):
+        """
+        A persistent spin_process worker.  The worker waits for its slice of the
+        unique_metrics for each run on its task_q, runs spin_process on them and
+        returns the anomaly_breakdown and exceptions that spin_process collated
+        with its runtime on the result_q.  The worker keeps its Redis
+        connections and per process caches between runs and exits after
+        ANALYZER_WORKER_POOL_MAX_RUNS runs, so that any memory growth is
+        released, the parent starts a new worker in its place.
+
+        :param i: the worker number
+        :param task_q: the worker task queue
+        :param result_q: the pool result queue
+        :type i: int
+        :type task_q: multiprocessing.Queue
+        :type result_q: multiprocessing.Queue
+
+        """
+        logger.info('analyzer_worker %s started with pid %s' % (str(i), str(getpid())))
+        runs = 0
+        while runs < ANALYZER_WORKER_POOL_MAX_RUNS:
+            self.check_if_parent_is_alive()
+            try:
+                task = task_q.get(timeout=1)
+            except Empty:
+                continue
+            if task is None:
+                break
+            run_id, assigned_metrics = task
+            # Collect the spin_process anomaly_breakdown and exceptions to
+            # return them with the result
+            self.anomaly_breakdown_q = QueueCollector()
+            self.exceptions_q = QueueCollector()
+            worker_start = time()
+            try:
+                self.spin_process(i, assigned_metrics, assigned_metrics=assigned_metrics)
+            except:
+                logger.error(traceback.format_exc())
+                logger.error('error :: analyzer_worker %s :: spin_process failed' % str(i))
+            runs += 1
+            result_q.put((
+                run_id, i, len(assigned_metrics), (time() - worker_start),
+                self.anomaly_breakdown_q.items, self.exceptions_q.items))
+        logger.info('analyzer_worker %s exiting after %s runs' % (str(i), str(runs)))
+
+    # @added 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+    def run_analyzer_worker_pool(self, unique_metrics, run_id):
+        """
+        Assign the unique_metrics to the persistent analyzer workers, starting
+        any workers that are not running, and wait for the workers to complete
+        the run.  Any worker that does not complete the run within
+        MAX_ANALYZER_PROCESS_RUNTIME is terminated and replaced in the next
+        run.
+
+        :param unique_metrics: the metrics to analyse
+        :param run_id: the run identifier
+        :type unique_metrics: list
+        :type run_id: int
+        :return: (worker_pids, anomaly_breakdown_items, exceptions_items)
+        :rtype: tuple
+
+        """
+        for i in range(1, settings.ANALYZER_PROCESSES + 1):
+            worker = self.analyzer_workers.get(i)
+            if worker and worker['process'].is_alive():
+                continue
+            task_q = Queue()
+            p = Process(target=self.analyzer_worker, args=(i, task_q, self.analyzer_worker_result_q))
+            p.daemon = True
+            p.start()
+            logger.info('started analyzer_worker %s with pid %s' % (str(i), str(p.pid)))
+            self.analyzer_workers[i] = {'process': p, 'task_q': task_q}
+
+        worker_ids = sorted(self.analyzer_workers.keys())
+        # @modified 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+        # worker_slices = get_worker_slices(
+        #     unique_metrics, worker_ids, self.analyzer_worker_throughputs)
+        worker_slices = None
+        if ANALYZER_COST_AWARE_SHARDING:
+            # Weight the workers on their throughput relative to the mean
+            known_throughputs = [
+                throughput for throughput in self.analyzer_worker_throughputs.values() if throughput]
+            worker_speeds = {}
+            if known_throughputs:
+                mean_throughput = sum(known_throughputs) / len(known_throughputs)
+                for i in worker_ids:
+                    if self.analyzer_worker_throughputs.get(i):
+                        worker_speeds[i] = max(self.analyzer_worker_throughputs[i] / mean_throughput, 0.25)
+            worker_slices = self.cost_aware_assigned_metrics(unique_metrics, worker_ids, worker_speeds)
+        if worker_slices is None:
+            worker_slices = get_worker_slices(
+                unique_metrics, worker_ids, self.analyzer_worker_throughputs)
+        pending_workers = []
+        for i in worker_ids:
+            if not worker_slices[i]:
+                continue
+            self.analyzer_workers[i]['task_q'].put((run_id, worker_slices[i]))
+            pending_workers.append(i)
+            logger.info('assigned %s metrics to analyzer_worker %s' % (
+                str(len(worker_slices[i])), str(i)))
+
+        anomaly_breakdown_items = []
+        exceptions_items = []
+        worker_pids = [self.analyzer_workers[i]['process'].pid for i in pending_workers]
+        p_starts = time()
+        while pending_workers and (time() - p_starts) <= settings.MAX_ANALYZER_PROCESS_RUNTIME:
+            try:
+                result = self.analyzer_worker_result_q.get(timeout=0.1)
+            except Empty:
+                # A worker that died without returning a result is replaced
+                # in the next run
+                for i in list(pending_workers):
+                    if not self.analyzer_workers[i]['process'].is_alive():
+                        logger.error('error :: analyzer_worker %s died during the run' % str(i))
+                        pending_workers.remove(i)
+                continue
+            result_run_id, i, metrics_count, runtime, anomaly_breakdown_results, exceptions_results = result
+            if result_run_id != run_id:
+                logger.info('discarding analyzer_worker %s result from a previous run' % str(i))
+                continue
+            anomaly_breakdown_items += anomaly_breakdown_results
+            exceptions_items += exceptions_results
+            self.analyzer_worker_throughputs[i] = update_worker_throughput(
+                self.analyzer_worker_throughputs.get(i), metrics_count, runtime)
+            logger.info('analyzer_worker %s analysed %s metrics in %.2f seconds' % (
+                str(i), str(metrics_count), runtime))
+            if i in pending_workers:
+                pending_workers.remove(i)
+        if pending_workers:
+            logger.info('%s :: timed out, killing the analyzer_workers that did not complete - %s' % (
+                skyline_app, str(pending_workers)))
+            for i in pending_workers:
+                self.analyzer_workers[i]['process'].terminate()
+                self.analyzer_workers[i]['process'].join()
+                # Its slice ran slow
+                try:
+                    self.analyzer_worker_throughputs[i] = self.analyzer_worker_throughputs[i] / 2
+                except KeyError:
+                    pass
+        else:
+            logger.info('%s :: %s analyzer_workers completed in %.2f seconds' % (
+                skyline_app, str(len(worker_pids)), (time() - p_starts)))
+        return worker_pids, anomaly_breakdown_items, exceptions_items
+
+    # @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+    def cost_aware_assigned_metrics(self, unique_metrics, worker_ids, worker_speeds=None):
+        """
+        Assign the unique_metrics to the processes on the analysis cost of each
+        metric recorded in the analyzer.metrics.analysis_cost Redis hash.  The
+        costs of metrics that are no longer in the unique_metrics are removed
+        from the hash.
+
+        :param unique_metrics: the metrics to analyse
+        :param worker_ids: the process numbers
+        :param worker_speeds: a dictionary of process number and relative speed
+        :type unique_metrics: list
+        :type worker_ids: list
+        :type worker_speeds: dict
+        :return: a dictionary of process number and assigned metrics or None
+        :rtype: dict
+
+        """
+        try:
+            metric_costs = decode_metric_costs(
+                self.redis_conn_decoded.hgetall(METRICS_ANALYSIS_COST_KEY))
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: failed to get Redis hash %s' % METRICS_ANALYSIS_COST_KEY)
+            return None
+        unique_metrics_set = set(unique_metrics)
+        removed_metrics = [metric for metric in metric_costs if metric not in unique_metrics_set]
+        if removed_metrics:
+            try:
+                self.redis_conn.hdel(METRICS_ANALYSIS_COST_KEY, *removed_metrics)
+            except:
+                logger.error(traceback.format_exc())
+                logger.error('error :: failed to remove metrics from Redis hash %s' % METRICS_ANALYSIS_COST_KEY)
+        assigned, worker_costs = assign_metrics_by_cost(
+            unique_metrics, metric_costs, worker_ids, worker_speeds)
+        logger.info('cost aware sharding :: assigned %s metrics (%s with recorded costs) with a predicted balance of %s' % (
+            str(len(unique_metrics)), str(len(metric_costs) - len(removed_metrics)),
+            str(shard_balance([worker_costs[worker_id] for worker_id in worker_ids if assigned[worker_id]]))))
+        return assigned
+
     def run(self):
         """
         - Called when the process intializes.
@@ -3615,6 +4117,16 @@ class Analyzer(Thread):
         else:
             logger.info('bin/%s.d log management done' % skyline_app)
 
+        # @added 20261018 - Feature #3932: grubbs_table
+        # Populate the Grubbs table for the time series lengths of
+        # FULL_DURATION at 60 second resolution, the spin_process processes are
+        # forked from this process and inherit the table
+        try:
+            populate_grubbs_table(range(int(settings.FULL_DURATION / 60) + 2))
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: failed to populate the Grubbs table')
+
         # @added 20190417 - Feature #2950: Report defaulted settings to log
         # Added all the globally declared settings to enable reporting in the
         # log the state of each setting.
@@ -4296,13 +4808,58 @@ class Analyzer(Thread):
             pids = []
             spawned_pids = []
             pid_count = 0
+            # @added 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+            # Assign the unique_metrics to the persistent analyzer_workers
+            # rather than spawning new spin_process processes
+            worker_pool_anomaly_breakdown = []
+            worker_pool_exceptions = []
+            # @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+            cost_aware_assigned = None
+            if ANALYZER_COST_AWARE_SHARDING:
+                try:
+                    self.redis_conn.delete(SPIN_PROCESS_RUNTIMES_KEY)
+                except:
+                    pass
+                if not ANALYZER_WORKER_POOL:
+                    cost_aware_assigned = self.cost_aware_assigned_metrics(
+                        unique_metrics, list(range(1, settings.ANALYZER_PROCESSES + 1)))
+            # @added 20261018 - Feature #3930: ANALYZER_INCREMENTAL_STATS
+            # Remove the incremental stats of metrics that are no longer in
+            # the unique_metrics
+            if ANALYZER_INCREMENTAL_STATS:
+                try:
+                    unique_metrics_set = set(unique_metrics)
+                    removed_incremental_stats_metrics = [
+                        metric for metric in self.redis_conn_decoded.hkeys(INCREMENTAL_STATS_KEY)
+                        if metric not in unique_metrics_set]
+                    if removed_incremental_stats_metrics:
+                        self.redis_conn.hdel(INCREMENTAL_STATS_KEY, *removed_incremental_stats_metrics)
+                    del unique_metrics_set
+                except:
+                    logger.error(traceback.format_exc())
+                    logger.error('error :: failed to remove metrics from Redis hash %s' % INCREMENTAL_STATS_KEY)
+            if ANALYZER_WORKER_POOL:
+                try:
+                    spawned_pids, worker_pool_anomaly_breakdown, worker_pool_exceptions = self.run_analyzer_worker_pool(
+                        unique_metrics, int(time()))
+                except:
+                    logger.error(traceback.format_exc())
+                    logger.error('error :: run_analyzer_worker_pool failed')
             for i in range(1, settings.ANALYZER_PROCESSES + 1):
+                # @added 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+                if ANALYZER_WORKER_POOL:
+                    break
                 if i > len(unique_metrics):
                     logger.info('WARNING: skyline is set for more cores than needed.')
                     break
 
                 try:
-                    p = Process(target=self.spin_process, args=(i, unique_metrics))
+                    # @modified 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+                    # p = Process(target=self.spin_process, args=(i, unique_metrics))
+                    if cost_aware_assigned:
+                        p = Process(target=self.spin_process, args=(i, unique_metrics, cost_aware_assigned[i]))
+                    else:
+                        p = Process(target=self.spin_process, args=(i, unique_metrics))
                     pids.append(p)
                     pid_count += 1
                     logger.info('starting %s of %s spin_process/es' % (str(pid_count), str(settings.ANALYZER_PROCESSES)))
@@ -4426,6 +4983,18 @@ class Analyzer(Thread):
             # Grab data from the queue and populate dictionaries
             exceptions = dict()
             anomaly_breakdown = dict()
+            # @added 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+            # The analyzer_workers return their data with their results
+            for key, value in worker_pool_anomaly_breakdown:
+                if key not in anomaly_breakdown.keys():
+                    anomaly_breakdown[key] = value
+                else:
+                    anomaly_breakdown[key] += value
+            for key, value in worker_pool_exceptions:
+                if key not in exceptions.keys():
+                    exceptions[key] = value
+                else:
+                    exceptions[key] += value
             while 1:
                 try:
                     key, value = self.anomaly_breakdown_q.get_nowait()
@@ -5135,6 +5704,11 @@ class Analyzer(Thread):
                                                 'debug :: Memory usage in run after chmod mirage check file: %s (kb)' %
                                                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
                                         logger.info('added mirage check :: %s,%s,%s' % (metric[1], metric[0], alert[3]))
+                                        # @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+                                        if MIRAGE_CHECK_QUEUE:
+                                            add_to_mirage_check_queue(
+                                                skyline_app, self.redis_conn, anomaly_check_file,
+                                                int(metric[2]))
 
                                         # @added 20200904 - Feature #3734: waterfall alerts
                                         # added_to_waterfall_timestamp = int(time())
@@ -6123,6 +6697,21 @@ class Analyzer(Thread):
             send_metric_name = skyline_app_graphite_namespace + '.total_metrics'
             send_graphite_metric(skyline_app, send_metric_name, total_metrics)
 
+            # @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+            # The balance of the spin_process runtimes, the longest runtime
+            # divided by the mean runtime
+            if ANALYZER_COST_AWARE_SHARDING:
+                try:
+                    spin_process_runtimes = list(self.redis_conn_decoded.hgetall(SPIN_PROCESS_RUNTIMES_KEY).values())
+                    process_balance = shard_balance(spin_process_runtimes)
+                    if process_balance is not None:
+                        logger.info('process balance    :: %.3f' % process_balance)
+                        send_metric_name = skyline_app_graphite_namespace + '.process_balance'
+                        send_graphite_metric(skyline_app, send_metric_name, '%.3f' % process_balance)
+                except:
+                    logger.error(traceback.format_exc())
+                    logger.error('error :: failed to determine the process balance')
+
             # @added 20191021 - Bug #3288: Always send anomaly_breakdown and exception metrics
 
             for key, value in exceptions.items():
@@ -6259,9 +6848,12 @@ class Analyzer(Thread):
 
             if raw_series is not None:
                 try:
-                    unpacker = Unpacker(use_list=False)
-                    unpacker.feed(raw_series)
-                    timeseries = list(unpacker)
+                    # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                    # Decode with decode_timeseries which decodes either storage format
+                    # unpacker = Unpacker(use_list=False)
+                    # unpacker.feed(raw_series)
+                    # timeseries = list(unpacker)
+                    timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
 
                     # @added 20200506 - Feature #3532: Sort all time series
                     # To ensure that there are no unordered timestamps in the time
@@ -6571,7 +7163,10 @@ class Analyzer(Thread):
 
             unique_metrics = []
             raw_series = None
-            unpacker = None
+            # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+            # The time series are decoded by decode_timeseries, there is no
+            # unpacker
+            # unpacker = None
             # We del all variables that are floats as they become unique objects and
             # can result in what appears to be a memory leak, but it is not, it
             # is just the way that Python handles floats
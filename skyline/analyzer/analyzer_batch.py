@@ -12,7 +12,8 @@ from collections import defaultdict
 # processes
 # from multiprocessing import Process, Manager, Queue
 from multiprocessing import Process, Queue
-from msgpack import Unpacker
+# @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+# from msgpack import Unpacker
 import os
 from os import kill, getpid
 import traceback
@@ -33,12 +34,16 @@ from skyline_functions import (
     # charset='utf-8', decode_responses=True arguments required in py3
     get_redis_conn, get_redis_conn_decoded,
     # @added 20200506 - Feature #3532: Sort all time series
-    sort_timeseries)
+    # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+    # sort_timeseries,
+    decode_timeseries, timeseries_array_to_list)
 
 # @added 20200425 - Feature #3512: matched_or_regexed_in_list function
 #                   Feature #3508: ionosphere_untrainable_metrics
 #                   Feature #3486: analyzer_batch
 from matched_or_regexed_in_list import matched_or_regexed_in_list
+# @added 20261018 - Feature #3902: MetricClassificationIndex
+from metric_classification_index import MetricClassificationIndex
 
 # @modified 20200423 - Feature #3504: Handle airgaps in batch metrics
 #                      Feature #3480: batch_processing
@@ -235,27 +240,40 @@ class AnalyzerBatch(Thread):
         exceptions = defaultdict(int)
         anomaly_breakdown = defaultdict(int)
 
+        # @added 20261018 - Feature #3902: MetricClassificationIndex
+        # Fetch the Redis sets that classify metrics in a single Redis
+        # pipeline and use sets for O(1) membership checks per metric
+        metric_classification_index = MetricClassificationIndex(
+            skyline_app, self.redis_conn_decoded,
+            ['mirage', 'ionosphere', 'derivative', 'non_derivative'])
+
         # Determine the unique Mirage and Ionosphere metrics once, which are
         # used later to determine how Analyzer should handle/route anomalies
-        try:
-            mirage_unique_metrics = list(self.redis_conn_decoded.smembers('mirage.unique_metrics'))
-        except:
-            mirage_unique_metrics = []
-        try:
-            ionosphere_unique_metrics = list(self.redis_conn_decoded.smembers('ionosphere.unique_metrics'))
-        except:
-            ionosphere_unique_metrics = []
+        # @modified 20261018 - Feature #3902: MetricClassificationIndex
+        # try:
+        #     mirage_unique_metrics = list(self.redis_conn_decoded.smembers('mirage.unique_metrics'))
+        # except:
+        #     mirage_unique_metrics = []
+        # try:
+        #     ionosphere_unique_metrics = list(self.redis_conn_decoded.smembers('ionosphere.unique_metrics'))
+        # except:
+        #     ionosphere_unique_metrics = []
+        mirage_unique_metrics = metric_classification_index.members('mirage')
+        ionosphere_unique_metrics = metric_classification_index.members('ionosphere')
 
         # In order to convert monotonic, incrementing metrics to a deriative
         # metric
-        try:
-            derivative_metrics = list(self.redis_conn_decoded.smembers('derivative_metrics'))
-        except:
-            derivative_metrics = []
-        try:
-            non_derivative_metrics = list(self.redis_conn_decoded.smembers('non_derivative_metrics'))
-        except:
-            non_derivative_metrics = []
+        # @modified 20261018 - Feature #3902: MetricClassificationIndex
+        # try:
+        #     derivative_metrics = list(self.redis_conn_decoded.smembers('derivative_metrics'))
+        # except:
+        #     derivative_metrics = []
+        # try:
+        #     non_derivative_metrics = list(self.redis_conn_decoded.smembers('non_derivative_metrics'))
+        # except:
+        #     non_derivative_metrics = []
+        derivative_metrics = metric_classification_index.members('derivative')
+        non_derivative_metrics = metric_classification_index.members('non_derivative')
         try:
             # @modified 20200606 - Bug #3572: Apply list to settings import
             non_derivative_monotonic_metrics = list(settings.NON_DERIVATIVE_MONOTONIC_METRICS)
@@ -263,9 +281,11 @@ class AnalyzerBatch(Thread):
             non_derivative_monotonic_metrics = []
         non_smtp_alerter_metrics = []
         try:
-            non_smtp_alerter_metrics = list(self.redis_conn_decoded.smembers('analyzer.non_smtp_alerter_metrics'))
+            # @modified 20261018 - Feature #3902: MetricClassificationIndex
+            # Use a set for O(1) membership checks
+            non_smtp_alerter_metrics = set(self.redis_conn_decoded.smembers('analyzer.non_smtp_alerter_metrics'))
         except:
-            non_smtp_alerter_metrics = []
+            non_smtp_alerter_metrics = set()
 
         for item in metrics:
             metric_name = item[0]
@@ -342,22 +362,25 @@ class AnalyzerBatch(Thread):
                 else:
                     return
 
+            # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+            # decode_timeseries returns the time series sorted by timestamp
+            # and only sorts when the time series is not already sorted.
+            # try:
+            #     unpacker = Unpacker(use_list=False)
+            #     unpacker.feed(raw_series)
+            #     timeseries = list(unpacker)
+            # except:
+            #     timeseries = []
+            # @added 20200506 - Feature #3532: Sort all time series
+            # original_timeseries = timeseries
+            # if original_timeseries:
+            #     timeseries = sort_timeseries(original_timeseries)
+            #     del original_timeseries
             try:
-                unpacker = Unpacker(use_list=False)
-                unpacker.feed(raw_series)
-                timeseries = list(unpacker)
+                timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
             except:
                 timeseries = []
 
-            # @added 20200506 - Feature #3532: Sort all time series
-            # To ensure that there are no unordered timestamps in the time
-            # series which are artefacts of the collector or carbon-relay, sort
-            # all time series by timestamp before analysis.
-            original_timeseries = timeseries
-            if original_timeseries:
-                timeseries = sort_timeseries(original_timeseries)
-                del original_timeseries
-
             try:
                 del raw_series
             except:
@@ -506,23 +529,25 @@ class AnalyzerBatch(Thread):
                     else:
                         return
 
+                # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+                # decode_timeseries returns the time series sorted by timestamp
+                # and only sorts when the time series is not already sorted.
+                # try:
+                #     unpacker = Unpacker(use_list=False)
+                #     unpacker.feed(raw_series)
+                #     timeseries = list(unpacker)
+                #     ...
+                # @added 20200506 - Feature #3532: Sort all time series
+                # original_timeseries = timeseries
+                # if original_timeseries:
+                #     timeseries = sort_timeseries(original_timeseries)
+                #     del original_timeseries
                 try:
-                    unpacker = Unpacker(use_list=False)
-                    unpacker.feed(raw_series)
-                    timeseries = list(unpacker)
+                    timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
                     if roombaed:
                         logger.info('batch_processing :: after roomba %s has %s data points' % (key, str(len(timeseries))))
                 except:
                     timeseries = []
-
-                # @added 20200506 - Feature #3532: Sort all time series
-                # To ensure that there are no unordered timestamps in the time
-                # series which are artefacts of the collector or carbon-relay, sort
-                # all time series by timestamp before analysis.
-                original_timeseries = timeseries
-                if original_timeseries:
-                    timeseries = sort_timeseries(original_timeseries)
-                    del original_timeseries
                 try:
                     del raw_series
                 except:
@@ -0,0 +1,107 @@
+"""
+analyzer_worker_pool.py
+
+@added 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+
+Functions for the persistent Analyzer worker pool.  With ANALYZER_WORKER_POOL
+enabled Analyzer does not spawn ANALYZER_PROCESSES new spin_process processes
+every run, the spin_process workers are long lived and keep their Redis
+connections and per process caches across runs.  Each run every worker is
+passed its slice of the unique_metrics.  The slices are sized on the throughput
+(metrics analysed per second) that each worker achieved in the previous runs so
+that if a worker runs slow, its slice is reduced and the other workers are
+assigned more metrics.
+"""
+
+
+class QueueCollector(object):
+    """
+    Collects the items that spin_process puts to the anomaly_breakdown and
+    exceptions queues in a worker, so that they can be returned to the parent
+    with the worker result, in order, rather than via separate queues.
+    """
+
+    def __init__(self):
+        self.items = []
+
+    def put(self, item):
+        self.items.append(item)
+
+
+def update_worker_throughput(current_throughput, metrics_count, runtime, smoothing=0.5):
+    """
+    Update the throughput of a worker with the metrics per second of its last
+    run, as an exponentially weighted moving average.
+
+    :param current_throughput: the current throughput or None
+    :param metrics_count: the number of metrics the worker analysed
+    :param runtime: the seconds the worker took
+    :param smoothing: the weight given to the last run
+    :type current_throughput: float
+    :type metrics_count: int
+    :type runtime: float
+    :type smoothing: float
+    :return: throughput
+    :rtype: float
+
+    """
+    if not metrics_count:
+        return current_throughput
+    run_throughput = float(metrics_count) / max(float(runtime), 0.001)
+    if not current_throughput:
+        return run_throughput
+    return (smoothing * run_throughput) + ((1 - smoothing) * current_throughput)
+
+
+def get_worker_slices(unique_metrics, worker_ids, worker_throughputs=None, min_share=0.25):
+    """
+    Divide the unique_metrics between the workers in contiguous slices sized on
+    the throughput of each worker.  Workers without a throughput are weighted as
+    the mean throughput and no worker is weighted less than min_share of the
+    mean, so that a slow worker still analyses metrics and its throughput
+    continues to be measured.
+
+    :param unique_metrics: the metrics to analyse
+    :param worker_ids: the worker ids
+    :param worker_throughputs: a dictionary of worker id and throughput
+    :param min_share: the minimum weight of a worker relative to the mean
+    :type unique_metrics: list
+    :type worker_ids: list
+    :type worker_throughputs: dict
+    :type min_share: float
+    :return: a dictionary of worker id and assigned metrics
+    :rtype: dict
+
+    """
+    if not worker_ids:
+        return {}
+    if not worker_throughputs:
+        worker_throughputs = {}
+    known_throughputs = [
+        worker_throughputs[worker_id] for worker_id in worker_ids
+        if worker_throughputs.get(worker_id)]
+    if known_throughputs:
+        mean_throughput = sum(known_throughputs) / float(len(known_throughputs))
+    else:
+        mean_throughput = 1.0
+    weights = []
+    for worker_id in worker_ids:
+        weight = worker_throughputs.get(worker_id) or mean_throughput
+        weights.append(max(weight, mean_throughput * min_share))
+    total_weight = sum(weights)
+    metrics_count = len(unique_metrics)
+    counts = [int(metrics_count * weight / total_weight) for weight in weights]
+    # Assign the remainder to the workers with the largest fractional shares
+    remainders = sorted(
+        range(len(worker_ids)),
+        key=lambda index: (metrics_count * weights[index] / total_weight) - counts[index],
+        reverse=True)
+    for index in remainders[:metrics_count - sum(counts)]:
+        counts[index] += 1
+    worker_slices = {}
+    assigned_min = 0
+    for index, worker_id in enumerate(worker_ids):
+        assigned_max = assigned_min + counts[index]
+        worker_slices[worker_id] = unique_metrics[assigned_min:assigned_max]
+        assigned_min = assigned_max
+    return worker_slices
@@ -0,0 +1,126 @@
+"""
+cost_aware_sharding.py
+
+@added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+
+Functions to assign the unique_metrics to the Analyzer processes on the cost of
+analysing each metric, rather than in equal sized index ranges.  The time each
+metric takes to analyse varies with the length of its time series and whether
+it is a derivative metric, is airgap checked or has custom algorithms, so equal
+sized ranges often result in one process finishing well after the others.
+
+Each spin_process records the seconds it took to analyse each metric in the
+analyzer.metrics.analysis_cost Redis hash (as integer microseconds) and its
+runtime in the analyzer.spin_process.runtimes Redis hash.  The parent assigns
+the metrics to the processes using longest processing time first bin packing
+on the recorded costs and reports the achieved balance of the process
+runtimes.
+"""
+import heapq
+
+METRICS_ANALYSIS_COST_KEY = 'analyzer.metrics.analysis_cost'
+SPIN_PROCESS_RUNTIMES_KEY = 'analyzer.spin_process.runtimes'
+
+
+def encode_metric_costs(metric_costs):
+    """
+    Encode metric costs in seconds as integer microseconds for the Redis hash.
+
+    :param metric_costs: a dictionary of metric and seconds
+    :type metric_costs: dict
+    :return: a dictionary of metric and microseconds
+    :rtype: dict
+
+    """
+    return dict(
+        (metric, max(int(cost * 1000000), 1)) for metric, cost in metric_costs.items())
+
+
+def decode_metric_costs(raw_metric_costs):
+    """
+    Decode the Redis hash of integer microseconds into seconds.
+
+    :param raw_metric_costs: the Redis hash
+    :type raw_metric_costs: dict
+    :return: a dictionary of metric and seconds
+    :rtype: dict
+
+    """
+    metric_costs = {}
+    for metric, cost in raw_metric_costs.items():
+        try:
+            metric_costs[metric] = int(cost) / 1000000.0
+        except (TypeError, ValueError):
+            continue
+    return metric_costs
+
+
+def assign_metrics_by_cost(unique_metrics, metric_costs, worker_ids, worker_speeds=None):
+    """
+    Assign the metrics to the workers with longest processing time first bin
+    packing, each metric in descending cost order is assigned to the worker
+    that will finish first.  Metrics without a recorded cost are given the
+    median cost of the metrics with a cost.
+
+    :param unique_metrics: the metrics to assign
+    :param metric_costs: a dictionary of metric and cost in seconds
+    :param worker_ids: the worker ids
+    :param worker_speeds: a dictionary of worker id and relative speed, a
+        worker with a speed of 2 is assigned twice the cost of a worker with a
+        speed of 1
+    :type unique_metrics: list
+    :type metric_costs: dict
+    :type worker_ids: list
+    :type worker_speeds: dict
+    :return: (worker_assigned_metrics, worker_costs) dictionaries of worker id
+        and assigned metrics and of worker id and the assigned cost
+    :rtype: tuple
+
+    """
+    worker_assigned_metrics = dict((worker_id, []) for worker_id in worker_ids)
+    worker_costs = dict((worker_id, 0.0) for worker_id in worker_ids)
+    if not worker_ids:
+        return worker_assigned_metrics, worker_costs
+    if not worker_speeds:
+        worker_speeds = {}
+
+    known_costs = sorted([metric_costs[metric] for metric in unique_metrics if metric in metric_costs])
+    if known_costs:
+        default_cost = known_costs[int(len(known_costs) / 2)]
+    else:
+        default_cost = 1.0
+    costed_metrics = sorted(
+        [(metric_costs.get(metric, default_cost), index) for index, metric in enumerate(unique_metrics)],
+        reverse=True)
+
+    # A heap of (finish time, worker order, worker id)
+    worker_heap = [(0.0, order, worker_id) for order, worker_id in enumerate(worker_ids)]
+    heapq.heapify(worker_heap)
+    for cost, index in costed_metrics:
+        finish_time, order, worker_id = heapq.heappop(worker_heap)
+        worker_assigned_metrics[worker_id].append(unique_metrics[index])
+        worker_costs[worker_id] += cost
+        speed = worker_speeds.get(worker_id) or 1.0
+        heapq.heappush(worker_heap, (worker_costs[worker_id] / speed, order, worker_id))
+    return worker_assigned_metrics, worker_costs
+
+
+def shard_balance(worker_runtimes):
+    """
+    The balance of the worker runtimes, the longest runtime divided by the mean
+    runtime.  1.0 is perfectly balanced, 2.0 means the slowest worker took
+    twice as long as the average worker.
+
+    :param worker_runtimes: the runtimes of the workers
+    :type worker_runtimes: list
+    :return: balance
+    :rtype: float
+
+    """
+    worker_runtimes = [float(runtime) for runtime in worker_runtimes]
+    if not worker_runtimes:
+        return None
+    mean_runtime = sum(worker_runtimes) / len(worker_runtimes)
+    if not mean_runtime:
+        return 1.0
+    return max(worker_runtimes) / mean_runtime
@@ -12,11 +12,14 @@ from ast import literal_eval
 from timeit import default_timer as timer
 
 # @added 20201209 - Feature #3870: metrics_manager - check_data_sparsity
-from msgpack import Unpacker
+# @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+# from msgpack import Unpacker
 from collections import Counter
 
 # @added 20201213 - Feature #3890: metrics_manager - sync_cluster_files
-import requests
+# @modified 20261018 - Feature #3918: cluster_data fan out
+# The remote requests are made with cluster_data
+# import requests
 
 import settings
 from skyline_functions import (
@@ -24,8 +27,14 @@ from skyline_functions import (
     # Added send_graphite_metric
     get_redis_conn, get_redis_conn_decoded, send_graphite_metric,
     # @added 20201213 - Feature #3890: metrics_manager - sync_cluster_files
-    mkdir_p)
-from matched_or_regexed_in_list import matched_or_regexed_in_list
+    mkdir_p,
+    # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+    decode_timeseries, timeseries_array_to_list)
+# @added 20261018 - Feature #3918: cluster_data fan out
+from cluster_data import remote_request, fan_out_remote_requests
+# @modified 20261018 - Feature #3942: MatchList
+# from matched_or_regexed_in_list import matched_or_regexed_in_list
+from matched_or_regexed_in_list import MatchList
 
 skyline_app = 'analyzer'
 skyline_app_logger = '%sLog' % skyline_app
@@ -280,6 +289,11 @@ class Metrics_Manager(Thread):
                     logger.error('error :: metrics_manager :: failed to determine what shard %s is assigned to via modulo and HORIZON_SHARDS: %s' % (str(metric_name), e))
             return assigned_host
 
+        # @added 20261018 - Feature #3918: cluster_data fan out
+        # The responses of requests made concurrently to all the remote
+        # instances, keyed by (remote url, endpoint), consumed by get_remote_data
+        prefetched_responses = {}
+
         def get_remote_data(remote_skyline_instance, data_required, endpoint, save_file=False):
             try:
                 connect_timeout = int(settings.GRAPHITE_CONNECT_TIMEOUT)
@@ -290,24 +304,34 @@ class Metrics_Manager(Thread):
             use_timeout = (int(connect_timeout), int(read_timeout))
             data = []
             r = None
-            user = None
-            password = None
-            use_auth = False
-            try:
-                user = str(remote_skyline_instance[1])
-                password = str(remote_skyline_instance[2])
-                use_auth = True
-            except:
-                user = None
-                password = None
+            # @modified 20261018 - Feature #3918: cluster_data fan out
+            # The auth is set on the pooled session of the remote instance
+            # user = None
+            # password = None
+            # use_auth = False
+            # try:
+            #     user = str(remote_skyline_instance[1])
+            #     password = str(remote_skyline_instance[2])
+            #     use_auth = True
+            # except:
+            #     user = None
+            #     password = None
             logger.info('metrics_manager :: sync_cluster_files - querying %s for %s on %s' % (
                 str(remote_skyline_instance[0]), str(data_required), str(endpoint)))
             try:
                 url = '%s/%s' % (str(remote_skyline_instance[0]), endpoint)
-                if use_auth:
-                    r = requests.get(url, timeout=use_timeout, auth=(user, password))
+                # @modified 20261018 - Feature #3918: cluster_data fan out
+                # Use the pooled keep-alive session of the remote instance, a
+                # sync can fetch many files from the same remote instance, or
+                # the response prefetched with fan_out_remote_requests
+                # if use_auth:
+                #     r = requests.get(url, timeout=use_timeout, auth=(user, password))
+                # else:
+                #     r = requests.get(url, timeout=use_timeout)
+                if (str(remote_skyline_instance[0]), endpoint) in prefetched_responses:
+                    r = prefetched_responses.pop((str(remote_skyline_instance[0]), endpoint))
                 else:
-                    r = requests.get(url, timeout=use_timeout)
+                    r = remote_request(skyline_app, remote_skyline_instance, url, timeout=use_timeout)
             except:
                 logger.error(traceback.format_exc())
                 logger.error('error :: metrics_manager :: sync_cluster_files - failed to get %s from %s' % (
@@ -385,6 +409,22 @@ class Metrics_Manager(Thread):
         # populate itself
         max_training_data_to_fetch = 30
 
+        # @added 20261018 - Feature #3918: cluster_data fan out
+        # Request the training_data of all the remote instances concurrently
+        # rather than in turn
+        try:
+            training_data_requests = [
+                (remote_skyline_instance, '%s/api?training_data' % str(remote_skyline_instance[0]))
+                for remote_skyline_instance in REMOTE_SKYLINE_INSTANCES]
+            training_data_responses = fan_out_remote_requests(
+                skyline_app, training_data_requests)
+            for (remote_skyline_instance, url), r in zip(training_data_requests, training_data_responses):
+                if r is not None:
+                    prefetched_responses[(str(remote_skyline_instance[0]), 'api?training_data')] = r
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: metrics_manager :: sync_cluster_files - failed to fan out api?training_data requests')
+
         for remote_skyline_instance in REMOTE_SKYLINE_INSTANCES:
             if training_data_fetched >= max_training_data_to_fetch:
                 logger.warn('warning :: metrics_manager :: fetched training data has reached the limit of %s, not continuing to fetch more this run' % str(max_training_data_to_fetch))
@@ -945,15 +985,29 @@ class Metrics_Manager(Thread):
             mirage_metrics_expiration_times = []
             mirage_metrics_keys = []
             start_refresh = timer()
+            # @added 20261018 - Feature #3942: MatchList
+            # Compile the smtp alert patterns once and only iterate the alerts
+            # that match each base_name, rather than calling
+            # matched_or_regexed_in_list for every base_name and alert
+            smtp_alerts = [alert for alert in all_alerts if str(alert[1]) == 'smtp']
+            smtp_alerts_match_list = MatchList([str(alert[0]) for alert in smtp_alerts])
+            all_smtp_alerter_metrics_set = set()
             for base_name in unique_base_names:
-                if base_name not in all_smtp_alerter_metrics:
+                # @modified 20261018 - Feature #3942: MatchList
+                # if base_name not in all_smtp_alerter_metrics:
+                if base_name not in all_smtp_alerter_metrics_set:
                     # Use the all_alerts list which includes external alert configs
                     # for alert in settings.ALERTS:
-                    for alert in all_alerts:
+                    # @modified 20261018 - Feature #3942: MatchList
+                    # for alert in all_alerts:
+                    for alert_id in smtp_alerts_match_list.matched_ids(base_name):
+                        alert = smtp_alerts[alert_id]
                         pattern_match = False
                         if str(alert[1]) == 'smtp':
                             try:
-                                pattern_match, metric_matched_by = matched_or_regexed_in_list(skyline_app, base_name, [alert[0]])
+                                # @modified 20261018 - Feature #3942: MatchList
+                                # pattern_match, metric_matched_by = matched_or_regexed_in_list(skyline_app, base_name, [alert[0]])
+                                pattern_match, metric_matched_by = True, None
                                 if LOCAL_DEBUG and pattern_match:
                                     logger.debug('debug :: metrics_manager :: %s matched alert - %s' % (base_name, alert[0]))
                                 try:
@@ -962,6 +1016,8 @@ class Metrics_Manager(Thread):
                                     pass
                                 if pattern_match:
                                     all_smtp_alerter_metrics.append(base_name)
+                                    # @added 20261018 - Feature #3942: MatchList
+                                    all_smtp_alerter_metrics_set.add(base_name)
                                     # @added 20160922 - Branch #922: Ionosphere
                                     # Add a Redis set of mirage.unique_metrics
                                     if settings.ENABLE_MIRAGE:
@@ -1376,9 +1432,13 @@ class Metrics_Manager(Thread):
                 except:
                     logger.error(traceback.format_exc())
                     logger.error('error :: metrics_manager :: failed to delete analyzer.flux_zero_fill_metrics Redis set')
+                # @added 20261018 - Feature #3942: MatchList
+                flux_zero_fill_match_list = MatchList(FLUX_ZERO_FILL_NAMESPACES)
                 for i_base_name in unique_base_names:
                     flux_zero_fill_metric = False
-                    pattern_match, metric_matched_by = matched_or_regexed_in_list('analyzer', i_base_name, FLUX_ZERO_FILL_NAMESPACES)
+                    # @modified 20261018 - Feature #3942: MatchList
+                    # pattern_match, metric_matched_by = matched_or_regexed_in_list('analyzer', i_base_name, FLUX_ZERO_FILL_NAMESPACES)
+                    pattern_match, metric_matched_by = flux_zero_fill_match_list.match(i_base_name)
                     if pattern_match:
                         flux_zero_fill_metric = True
                     if flux_zero_fill_metric:
@@ -1540,6 +1600,8 @@ class Metrics_Manager(Thread):
                 logger.info('metrics_manager :: determing which metric to skip checking data sparsity on as SKIP_CHECK_DATA_SPARSITY_NAMESPACES has %s namespaces declared' % str(len(SKIP_CHECK_DATA_SPARSITY_NAMESPACES)))
                 check_metrics = []
                 skip_check_data_sparsity_error_logged = False
+                # @added 20261018 - Feature #3942: MatchList
+                skip_check_data_sparsity_match_list = MatchList(SKIP_CHECK_DATA_SPARSITY_NAMESPACES)
                 try:
                     for metric in unique_metrics:
                         try:
@@ -1550,7 +1612,9 @@ class Metrics_Manager(Thread):
                                 base_name = metric_name
                             pattern_match = None
                             try:
-                                pattern_match, metric_matched_by = matched_or_regexed_in_list(skyline_app, base_name, SKIP_CHECK_DATA_SPARSITY_NAMESPACES)
+                                # @modified 20261018 - Feature #3942: MatchList
+                                # pattern_match, metric_matched_by = matched_or_regexed_in_list(skyline_app, base_name, SKIP_CHECK_DATA_SPARSITY_NAMESPACES)
+                                pattern_match, metric_matched_by = skip_check_data_sparsity_match_list.match(base_name)
                             except Exception as e:
                                 if not skip_check_data_sparsity_error_logged:
                                     logger.error('error :: metrics_manager :: an error occurred while matched_or_regexed_in_list in SKIP_CHECK_DATA_SPARSITY_NAMESPACES - %s' % e)
@@ -1627,9 +1691,12 @@ class Metrics_Manager(Thread):
                 try:
                     try:
                         raw_series = raw_assigned[i]
-                        unpacker = Unpacker(use_list=False)
-                        unpacker.feed(raw_series)
-                        timeseries = list(unpacker)
+                        # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                        # Decode with decode_timeseries which decodes either storage format
+                        # unpacker = Unpacker(use_list=False)
+                        # unpacker.feed(raw_series)
+                        # timeseries = list(unpacker)
+                        timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
                     except:
                         timeseries = []
 
@@ -41,7 +41,9 @@ from skyline_functions import (
     # charset='utf-8', decode_responses=True arguments required in py3
     get_redis_conn, get_redis_conn_decoded,
     # @added 20200506 - Feature #3532: Sort all time series
-    sort_timeseries)
+    sort_timeseries,
+    # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+    decode_timeseries, timeseries_array_to_list)
 
 from boundary_alerters import trigger_alert
 from boundary_algorithms import run_selected_algorithm
@@ -247,9 +249,12 @@ class Boundary(Thread):
                 if ENABLE_BOUNDARY_DEBUG:
                     logger.debug('debug :: unpacking timeseries for %s - %s' % (metric_name, str(i)))
                 raw_series = raw_assigned[i]
-                unpacker = Unpacker(use_list=False)
-                unpacker.feed(raw_series)
-                timeseries = list(unpacker)
+                # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                # Decode with decode_timeseries which decodes either storage format
+                # unpacker = Unpacker(use_list=False)
+                # unpacker.feed(raw_series)
+                # timeseries = list(unpacker)
+                timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
             except Exception as e:
                 exceptions['Other'] += 1
                 logger.error('error :: redis data error: ' + traceback.format_exc())
@@ -387,9 +392,12 @@ class Boundary(Thread):
                     logger.debug('debug :: unpacking timeseries for %s - %s' % (metric_name, str(raw_assigned_id)))
 
                 raw_series = raw_assigned[metric_and_algo[0]]
-                unpacker = Unpacker(use_list=False)
-                unpacker.feed(raw_series)
-                timeseries = list(unpacker)
+                # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                # Decode with decode_timeseries which decodes either storage format
+                # unpacker = Unpacker(use_list=False)
+                # unpacker.feed(raw_series)
+                # timeseries = list(unpacker)
+                timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
 
                 # @added 20200507 - Feature #3532: Sort all time series
                 # To ensure that there are no unordered timestamps in the time
@@ -1502,9 +1510,12 @@ class Boundary(Thread):
             # Check canary metric
             raw_series = self.redis_conn.get(settings.FULL_NAMESPACE + settings.CANARY_METRIC)
             if raw_series is not None:
-                unpacker = Unpacker(use_list=False)
-                unpacker.feed(raw_series)
-                timeseries = list(unpacker)
+                # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                # Decode with decode_timeseries which decodes either storage format
+                # unpacker = Unpacker(use_list=False)
+                # unpacker.feed(raw_series)
+                # timeseries = list(unpacker)
+                timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
 
                 # @added 20200507 - Feature #3532: Sort all time series
                 # To ensure that there are no unordered timestamps in the time
@@ -0,0 +1,266 @@
+"""
+cluster_data.py
+
+@added 20261018 - Feature #3918: cluster_data fan out
+
+Concurrent requests to the REMOTE_SKYLINE_INSTANCES.  Rather than requesting
+each remote Skyline instance in turn with a new connection, the requests to
+all the remote instances are made concurrently, each in its own thread, using a
+pooled keep-alive requests.Session per remote instance.  The requests share a
+deadline so that a slow or unresponsive remote instance cannot stall the
+response for longer than the deadline, the responses of the instances that did
+respond are returned and the instances that did not are logged and returned as
+None (partial results).
+
+A short TTL cache of processed responses is provided for data that is
+requested repeatedly, e.g. the webapp /api?cluster_data=true endpoints.
+"""
+import logging
+import traceback
+from os import getpid
+from threading import Thread, Lock
+from time import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import settings
+
+try:
+    CLUSTER_DATA_DEADLINE = float(settings.CLUSTER_DATA_DEADLINE)
+except:
+    CLUSTER_DATA_DEADLINE = 15.0
+try:
+    CLUSTER_DATA_CACHE_TTL = int(settings.CLUSTER_DATA_CACHE_TTL)
+except:
+    CLUSTER_DATA_CACHE_TTL = 10
+
+# The keep-alive connections pooled per remote Skyline instance
+CLUSTER_DATA_POOL_MAXSIZE = 4
+
+# The sessions are per process, if the process forks (e.g. gunicorn workers)
+# the sessions of the parent are not used
+remote_sessions = {}
+remote_sessions_pid = None
+remote_sessions_lock = Lock()
+
+cluster_data_cache = {}
+cluster_data_cache_lock = Lock()
+
+
+def get_default_timeout():
+    """
+    The (connect, read) timeout for remote Skyline instance requests, as
+    get_cluster_data has always used.
+    """
+    try:
+        connect_timeout = int(settings.GRAPHITE_CONNECT_TIMEOUT)
+        read_timeout = int(settings.GRAPHITE_READ_TIMEOUT)
+    except:
+        connect_timeout = 5
+        read_timeout = 10
+    return (int(connect_timeout), int(read_timeout))
+
+
+def get_remote_session(remote_skyline_instance):
+    """
+    Get the pooled keep-alive requests.Session for a remote Skyline instance,
+    created with the instance auth on first use.
+
+    :param remote_skyline_instance: the REMOTE_SKYLINE_INSTANCES item
+    :type remote_skyline_instance: list
+    :return: session
+    :rtype: requests.Session
+
+    """
+    global remote_sessions_pid
+    remote_url = str(remote_skyline_instance[0])
+    try:
+        auth = (str(remote_skyline_instance[1]), str(remote_skyline_instance[2]))
+    except:
+        auth = None
+    session_key = (remote_url, auth)
+    with remote_sessions_lock:
+        if remote_sessions_pid != getpid():
+            remote_sessions.clear()
+            remote_sessions_pid = getpid()
+        session = remote_sessions.get(session_key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CLUSTER_DATA_POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            if auth:
+                session.auth = auth
+            remote_sessions[session_key] = session
+    return session
+
+
+def remote_request(
+        current_skyline_app, remote_skyline_instance, url, timeout=None,
+        verify=True, stream=False):
+    """
+    Make a GET request to a remote Skyline instance using its pooled session.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param remote_skyline_instance: the REMOTE_SKYLINE_INSTANCES item
+    :param url: the url
+    :param timeout: the requests timeout, :func:`get_default_timeout` if not
+        passed
+    :param verify: verify the SSL certificate
+    :param stream: do not read the response content until it is accessed,
+        to allow the response to be consumed incrementally
+    :type current_skyline_app: str
+    :type remote_skyline_instance: list
+    :type url: str
+    :type timeout: tuple
+    :type verify: boolean
+    :type stream: boolean
+    :return: the response or None if the request failed
+    :rtype: requests.Response
+
+    """
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+    if timeout is None:
+        timeout = get_default_timeout()
+    r = None
+    try:
+        session = get_remote_session(remote_skyline_instance)
+        # @modified 20261018 - Feature #3920: luminosity_remote_data stream
+        # Added stream
+        r = session.get(url, timeout=timeout, verify=verify, stream=stream)
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: remote_request :: failed to get %s from %s' % (
+            str(url), str(remote_skyline_instance[0])))
+        r = None
+    return r
+
+
+def fan_out_remote_requests(
+        current_skyline_app, remote_requests, timeout=None, verify=True,
+        deadline=None, response_handler=None):
+    """
+    Make GET requests to remote Skyline instances concurrently.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param remote_requests: a list of (remote_skyline_instance, url) items
+    :param timeout: the requests timeout of each request
+    :param verify: verify the SSL certificates
+    :param deadline: the seconds within which all the responses must be
+        received, settings.CLUSTER_DATA_DEADLINE if not passed.
+    :param response_handler: a function that is passed the
+        remote_skyline_instance and the response, it is called in the request
+        thread so that the response can be consumed incrementally as it
+        streams and its return value is returned rather than the response.
+        The responses are requested with stream=True if a response_handler is
+        passed.
+    :type current_skyline_app: str
+    :type remote_requests: list
+    :type timeout: tuple
+    :type verify: boolean
+    :type deadline: float
+    :type response_handler: function
+    :return: the responses (or the response_handler results) in the order of
+        remote_requests, None for any request that failed or did not complete
+        within the deadline
+    :rtype: list
+
+    """
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+    if deadline is None:
+        deadline = CLUSTER_DATA_DEADLINE
+    responses = [None] * len(remote_requests)
+    if not remote_requests:
+        return responses
+
+    def make_request(index, remote_skyline_instance, url):
+        # @modified 20261018 - Feature #3920: luminosity_remote_data stream
+        # Allow the response to be consumed incrementally in the request
+        # thread by a response_handler
+        r = remote_request(
+            current_skyline_app, remote_skyline_instance, url, timeout, verify,
+            stream=bool(response_handler))
+        if response_handler and r is not None:
+            try:
+                r = response_handler(remote_skyline_instance, r)
+            except:
+                current_logger.error(traceback.format_exc())
+                current_logger.error('error :: fan_out_remote_requests :: response_handler failed on the response from %s' % (
+                    str(remote_skyline_instance[0])))
+                r = None
+        responses[index] = r
+
+    threads = []
+    for index, (remote_skyline_instance, url) in enumerate(remote_requests):
+        thread = Thread(target=make_request, args=(index, remote_skyline_instance, url))
+        # A request that exceeds the deadline is left to complete or timeout
+        # in the background and must not block the process exiting
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    deadline_end = time() + deadline
+    completed = []
+    for index, thread in enumerate(threads):
+        thread.join(max(deadline_end - time(), 0))
+        if thread.is_alive():
+            completed.append(False)
+            current_logger.error('error :: fan_out_remote_requests :: %s did not respond within the deadline of %s seconds' % (
+                str(remote_requests[index][0][0]), str(deadline)))
+        else:
+            completed.append(True)
+    # Do not return the response of a request that completed after the
+    # deadline, only the responses that were received within the deadline
+    return [response if completed[index] else None for index, response in enumerate(responses)]
+
+
+def get_cluster_data_cache(cache_key):
+    """
+    Get processed cluster data from the cache if it has not expired.
+
+    :param cache_key: the cache key
+    :type cache_key: tuple
+    :return: the data or None
+    :rtype: object
+
+    """
+    if not CLUSTER_DATA_CACHE_TTL:
+        return None
+    with cluster_data_cache_lock:
+        cached = cluster_data_cache.get(cache_key)
+        if cached is None:
+            return None
+        cached_at, data = cached
+        if (time() - cached_at) > CLUSTER_DATA_CACHE_TTL:
+            del cluster_data_cache[cache_key]
+            return None
+    return data
+
+
+def set_cluster_data_cache(cache_key, data):
+    """
+    Cache processed cluster data for settings.CLUSTER_DATA_CACHE_TTL seconds.
+
+    :param cache_key: the cache key
+    :param data: the data
+    :type cache_key: tuple
+    :type data: object
+    :return: True
+    :rtype: boolean
+
+    """
+    if not CLUSTER_DATA_CACHE_TTL:
+        return False
+    now = time()
+    with cluster_data_cache_lock:
+        for expired_key in [
+                key for key, (cached_at, cached_data) in cluster_data_cache.items()
+                if (now - cached_at) > CLUSTER_DATA_CACHE_TTL]:
+            del cluster_data_cache[expired_key]
+        cluster_data_cache[cache_key] = (now, data)
+    return True
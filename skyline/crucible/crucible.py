@@ -68,6 +68,8 @@ from skyline_functions import (
     # @added 20201009 - Feature #3780: skyline_functions - sanitise_graphite_url
     #                   Bug #3778: Handle single encoded forward slash requests to Graphite
     sanitise_graphite_url)
+# @added 20261018 - Feature #3924: graphite_client
+from graphite_client import graphite_render
 
 from crucible_algorithms import run_algorithms
 
@@ -918,8 +920,11 @@ class Crucible(Thread):
                     sanitised, url = sanitise_graphite_url(skyline_app, url)
 
                     try:
-                        r = requests.get(url, timeout=use_timeout)
-                        js = r.json()
+                        # @modified 20261018 - Feature #3924: graphite_client
+                        # Use the pooled graphite_client session with retries
+                        # r = requests.get(url, timeout=use_timeout)
+                        # js = r.json()
+                        js = graphite_render(skyline_app, url, use_timeout)
                         datapoints = js[0]['datapoints']
                         if settings.ENABLE_CRUCIBLE_DEBUG:
                             logger.info('data retrieved OK')
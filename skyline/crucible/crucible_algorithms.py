@@ -37,6 +37,8 @@ if True:
         CONSENSUS,
     )
     from skyline_functions import write_data_to_file
+    # @added 20261018 - Feature #3932: grubbs_table
+    from grubbs_table import get_grubbs_score
 
 skyline_app = 'crucible'
 skyline_app_logger = '%sLog' % skyline_app
@@ -140,9 +142,13 @@ def grubbs(timeseries, end_timestamp, full_duration):
         tail_average = tail_avg(timeseries, end_timestamp, full_duration)
         z_score = (tail_average - mean) / stdDev
         len_series = len(series)
-        threshold = scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)
-        threshold_squared = threshold * threshold
-        grubbs_score = ((len_series - 1) / np.sqrt(len_series)) * np.sqrt(threshold_squared / (len_series - 2 + threshold_squared))
+        # @modified 20261018 - Feature #3932: grubbs_table
+        # The Grubbs score only depends on the length of the time series so
+        # it is looked up in the memoised table
+        # threshold = scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)
+        # threshold_squared = threshold * threshold
+        # grubbs_score = ((len_series - 1) / np.sqrt(len_series)) * np.sqrt(threshold_squared / (len_series - 2 + threshold_squared))
+        grubbs_score = get_grubbs_score(len_series)
 
         return z_score > grubbs_score
     except:
@@ -1,12 +1,102 @@
 # coding=utf-8
 import logging
 import traceback
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+import os
+from threading import Lock
+
 from sqlalchemy import (
     create_engine, Column, Table, Integer, String, MetaData, DateTime)
 from sqlalchemy.dialects.mysql import DOUBLE, FLOAT, TINYINT, VARCHAR, SMALLINT
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from sqlalchemy import event, exc
 
 import settings
 
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+try:
+    DATABASE_ENGINE_POOL = settings.DATABASE_ENGINE_POOL
+except:
+    DATABASE_ENGINE_POOL = False
+try:
+    DATABASE_POOL_SIZE = int(settings.DATABASE_POOL_SIZE)
+except:
+    DATABASE_POOL_SIZE = 5
+try:
+    DATABASE_POOL_RECYCLE = int(settings.DATABASE_POOL_RECYCLE)
+except:
+    DATABASE_POOL_RECYCLE = 3600
+
+# The DATABASE_ENGINE_POOL engine of each process, keyed by pid so that a
+# forked process creates its own engine rather than using the pooled
+# connections of its parent, and the reflected tables of the process by name
+process_engines = {}
+process_engines_lock = Lock()
+process_tables = {}
+
+# The tables that a parent process reflects before spawning its check
+# processes, see reflect_static_tables
+STATIC_TABLES = [
+    'ionosphere', 'metrics', 'anomalies', 'ionosphere_matched',
+    'ionosphere_layers', 'layers_algorithms', 'ionosphere_layers_matched',
+    'luminosity', 'snab']
+static_tables_reflected = False
+
+
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+def get_engine_url():
+    """
+    Return the MySQL database URL.
+    """
+    return 'mysql+mysqlconnector://%s:%s@%s:%s/%s' % (
+        settings.PANORAMA_DBUSER, settings.PANORAMA_DBUSERPASS,
+        settings.PANORAMA_DBHOST, str(settings.PANORAMA_DBPORT),
+        settings.PANORAMA_DATABASE)
+
+
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+def add_engine_pidguard(engine):
+    """
+    Invalidate any pooled connection that is checked out in a process other
+    than the one that made it, so that a connection is never shared between a
+    parent and a forked child process.  As per the SQLAlchemy Using Connection
+    Pools with Multiprocessing documentation.
+    """
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        connection_record.info['pid'] = os.getpid()
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        pid = os.getpid()
+        if connection_record.info['pid'] != pid:
+            connection_record.connection = connection_proxy.connection = None
+            raise exc.DisconnectionError(
+                'connection record belongs to pid %s, attempting to check out in pid %s' % (
+                    str(connection_record.info['pid']), str(pid)))
+
+
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+def get_process_engine():
+    """
+    Return the DATABASE_ENGINE_POOL engine of the process, creating it with a
+    pre-pinged and recycled connection pool on the first call in the process.
+    """
+    pid = os.getpid()
+    engine = process_engines.get(pid)
+    if engine is not None:
+        return engine
+    with process_engines_lock:
+        engine = process_engines.get(pid)
+        if engine is None:
+            engine = create_engine(
+                get_engine_url(), pool_size=DATABASE_POOL_SIZE,
+                max_overflow=DATABASE_POOL_SIZE, pool_pre_ping=True,
+                pool_recycle=DATABASE_POOL_RECYCLE)
+            add_engine_pidguard(engine)
+            process_engines[pid] = engine
+    return engine
+
 
 def get_engine(current_skyline_app):
     '''
@@ -17,6 +107,12 @@ def get_engine(current_skyline_app):
     # work
     '''
     try:
+        # @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # Return the pooled engine of the process
+        if DATABASE_ENGINE_POOL:
+            engine = get_process_engine()
+            return engine, 'got MySQL engine', 'none'
+
         engine = create_engine(
             'mysql+mysqlconnector://%s:%s@%s:%s/%s' % (
                 settings.PANORAMA_DBUSER, settings.PANORAMA_DBUSERPASS,
@@ -33,6 +129,99 @@ def get_engine(current_skyline_app):
         return None, fail_msg, trace
 
 
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+def dispose_engine(current_skyline_app, engine):
+    """
+    Dispose of an engine from :func:`get_engine`, the DATABASE_ENGINE_POOL
+    engine of the process is not disposed so that its pooled connections are
+    reused by the later database calls of the process.
+    """
+    if not engine:
+        return
+    if DATABASE_ENGINE_POOL and process_engines.get(os.getpid()) is engine:
+        return
+    try:
+        engine.dispose()
+    except:
+        current_skyline_app_logger = current_skyline_app + 'Log'
+        current_logger = logging.getLogger(current_skyline_app_logger)
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: calling engine.dispose()')
+    return
+
+
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+def get_cached_table_meta(table_name):
+    """
+    Return the table meta of the table that has been reflected or created in
+    the process, with DATABASE_ENGINE_POOL, or None.
+    """
+    if not DATABASE_ENGINE_POOL:
+        return None
+    return process_tables.get(table_name)
+
+
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+def cache_table_meta(table):
+    """
+    Cache the table meta of a table that has been reflected or created, e.g. a
+    z_fp_<metric_id> or z_ts_<metric_id> table, with DATABASE_ENGINE_POOL.
+    """
+    if DATABASE_ENGINE_POOL:
+        process_tables[table.name] = table
+
+
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+def reflect_table_meta(engine, table_name):
+    """
+    Reflect the table meta from the database, with DATABASE_ENGINE_POOL the
+    table is only reflected once per process.
+    """
+    table = get_cached_table_meta(table_name)
+    if table is None:
+        table = Table(table_name, MetaData(), autoload=True, autoload_with=engine)
+        cache_table_meta(table)
+    return table
+
+
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+def reflect_static_tables(current_skyline_app):
+    """
+    Reflect the table meta of the STATIC_TABLES in a parent process, with
+    DATABASE_ENGINE_POOL, before it spawns its check processes.  Each check
+    runs in a new process so a table reflected in a check process is only
+    cached for that check, the check processes inherit the table meta
+    reflected in the parent instead.  A reflected Table has no connection
+    bound so it is safe to use in a forked process and the engine used to
+    reflect the tables is disposed of, so no connections are inherited.  The
+    tables are only reflected on the first call in the process, if it fails
+    the check processes reflect the tables themselves.
+    """
+    global static_tables_reflected
+    if not DATABASE_ENGINE_POOL or static_tables_reflected:
+        return
+    static_tables_reflected = True
+    current_skyline_app_logger = current_skyline_app + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+    try:
+        engine = create_engine(get_engine_url())
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: could not create MySQL engine to reflect the static tables')
+        return
+    for table_name in STATIC_TABLES:
+        try:
+            reflect_table_meta(engine, table_name)
+        except:
+            current_logger.error(traceback.format_exc())
+            current_logger.error('error :: failed to reflect the %s table meta' % table_name)
+    try:
+        engine.dispose()
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: calling engine.dispose()')
+
+
 def ionosphere_table_meta(current_skyline_app, engine):
 
     current_skyline_app_logger = current_skyline_app + 'Log'
@@ -40,43 +229,46 @@ def ionosphere_table_meta(current_skyline_app, engine):
 
     # Create the ionosphere table MetaData
     try:
-        ionosphere_meta = MetaData()
-    # @modified 20161209 - Branch #922: ionosphere
-    #                      Task #1658: Patterning Skyline Ionosphere
-    # HOWEVER:
-    # Create the ionosphere table MetaData, however this the only table not
-    # currently being reflected from the database.  Due to the possibility of
-    # SQL update statements with updates, etc it is probably better to stick
-    # with a single source of truth schema in the skyline.sql rather than having
-    # to micro manage the schema in Python/SQLAlchemy code too and you cannot
-    # add COMMENTS with SQLAlchemy table creation.  However z_ts_<metric_id> and
-    # z_fp_<metric_id> tables ARE and WILL continue to ONLY be described in
-    # Python/SQLAlchemy in skyline/webapp/ionosphere_backend.py, otherwise
-    # Skyline would probably be running peewee like pydsn.  However peewee
-    # cannot create tables per se and I was tired of raw mysql.connector so...
-    # as of 20161209184400 - thank you SQLAlchemy, reflecting is the better
-    # option.  However it means if you are in here, see the skyline.sql for the
-    # source of truth
-    #    ionosphere_table = Table(
-    #        'ionosphere', ionosphere_meta,
-    #        Column('id', Integer, primary_key=True),
-    #        Column('metric_id', Integer, nullable=False, key='metric_id'),
-    #        Column('enabled', TINYINT(), nullable=True),
-    #        Column('tsfresh_version', VARCHAR(12), nullable=True),
-    #        Column('calc_time', FLOAT, nullable=True),
-    #        Column('features_count', Integer, nullable=True),
-    #        Column('features_sum', DOUBLE, nullable=True),
-    #        Column('deleted', Integer, nullable=True),
-    #        Column('matched_count', Integer, nullable=True),
-    #        Column('last_matched', Integer, nullable=True),
-    #        Column('created_timestamp', DateTime()),
-    #        mysql_charset='utf8',
-    #        mysql_key_block_size='255',
-    #        mysql_engine='MyISAM')
-    #    ionosphere_table.create(engine, checkfirst=True)
-    #    return ionosphere_table, 'ionosphere_table meta OK', 'none'
-        ionosphere_table = Table('ionosphere', ionosphere_meta, autoload=True, autoload_with=engine)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # ionosphere_table = Table('ionosphere', ionosphere_meta, autoload=True, autoload_with=engine)
+        ionosphere_table = reflect_table_meta(engine, 'ionosphere')
         return ionosphere_table, 'ionosphere_table meta reflected OK', 'none'
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # ionosphere_meta = MetaData()
+        # @modified 20161209 - Branch #922: ionosphere
+        #                      Task #1658: Patterning Skyline Ionosphere
+        # HOWEVER:
+        # Create the ionosphere table MetaData, however this the only table not
+        # currently being reflected from the database.  Due to the possibility of
+        # SQL update statements with updates, etc it is probably better to stick
+        # with a single source of truth schema in the skyline.sql rather than having
+        # to micro manage the schema in Python/SQLAlchemy code too and you cannot
+        # add COMMENTS with SQLAlchemy table creation.  However z_ts_<metric_id> and
+        # z_fp_<metric_id> tables ARE and WILL continue to ONLY be described in
+        # Python/SQLAlchemy in skyline/webapp/ionosphere_backend.py, otherwise
+        # Skyline would probably be running peewee like pydsn.  However peewee
+        # cannot create tables per se and I was tired of raw mysql.connector so...
+        # as of 20161209184400 - thank you SQLAlchemy, reflecting is the better
+        # option.  However it means if you are in here, see the skyline.sql for the
+        # source of truth
+        #    ionosphere_table = Table(
+        #        'ionosphere', ionosphere_meta,
+        #        Column('id', Integer, primary_key=True),
+        #        Column('metric_id', Integer, nullable=False, key='metric_id'),
+        #        Column('enabled', TINYINT(), nullable=True),
+        #        Column('tsfresh_version', VARCHAR(12), nullable=True),
+        #        Column('calc_time', FLOAT, nullable=True),
+        #        Column('features_count', Integer, nullable=True),
+        #        Column('features_sum', DOUBLE, nullable=True),
+        #        Column('deleted', Integer, nullable=True),
+        #        Column('matched_count', Integer, nullable=True),
+        #        Column('last_matched', Integer, nullable=True),
+        #        Column('created_timestamp', DateTime()),
+        #        mysql_charset='utf8',
+        #        mysql_key_block_size='255',
+        #        mysql_engine='MyISAM')
+        #    ionosphere_table.create(engine, checkfirst=True)
+        #    return ionosphere_table, 'ionosphere_table meta OK', 'none'
     except:
         trace = traceback.format_exc()
         current_logger.error('%s' % trace)
@@ -92,8 +284,10 @@ def metrics_table_meta(current_skyline_app, engine):
 
     # Create the metrics table MetaData
     try:
-        metrics_meta = MetaData()
-        metrics_table = Table('metrics', metrics_meta, autoload=True, autoload_with=engine)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # metrics_meta = MetaData()
+        # metrics_table = Table('metrics', metrics_meta, autoload=True, autoload_with=engine)
+        metrics_table = reflect_table_meta(engine, 'metrics')
         return metrics_table, 'metrics_table meta reflected OK', 'none'
     except:
         trace = traceback.format_exc()
@@ -110,8 +304,10 @@ def anomalies_table_meta(current_skyline_app, engine):
 
     # Create the anomalies table MetaData
     try:
-        anomalies_meta = MetaData()
-        anomalies_table = Table('anomalies', anomalies_meta, autoload=True, autoload_with=engine)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # anomalies_meta = MetaData()
+        # anomalies_table = Table('anomalies', anomalies_meta, autoload=True, autoload_with=engine)
+        anomalies_table = reflect_table_meta(engine, 'anomalies')
         return anomalies_table, 'anomalies_table meta reflected OK', 'none'
     except:
         trace = traceback.format_exc()
@@ -134,8 +330,10 @@ def ionosphere_matched_table_meta(current_skyline_app, engine):
 
     # Create the ionosphere_matched table MetaData
     try:
-        ionosphere_matched_meta = MetaData()
-        ionosphere_matched_table = Table('ionosphere_matched', ionosphere_matched_meta, autoload=True, autoload_with=engine)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # ionosphere_matched_meta = MetaData()
+        # ionosphere_matched_table = Table('ionosphere_matched', ionosphere_matched_meta, autoload=True, autoload_with=engine)
+        ionosphere_matched_table = reflect_table_meta(engine, 'ionosphere_matched')
         return ionosphere_matched_table, 'ionosphere_matched_table meta reflected OK', 'none'
     except:
         trace = traceback.format_exc()
@@ -153,8 +351,10 @@ def ionosphere_layers_table_meta(current_skyline_app, engine):
 
     # Create the ionosphere_layers table MetaData
     try:
-        ionosphere_layers_meta = MetaData()
-        ionosphere_layers_table = Table('ionosphere_layers', ionosphere_layers_meta, autoload=True, autoload_with=engine)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # ionosphere_layers_meta = MetaData()
+        # ionosphere_layers_table = Table('ionosphere_layers', ionosphere_layers_meta, autoload=True, autoload_with=engine)
+        ionosphere_layers_table = reflect_table_meta(engine, 'ionosphere_layers')
         return ionosphere_layers_table, 'ionosphere_layers_table meta reflected OK', 'none'
     except:
         trace = traceback.format_exc()
@@ -171,8 +371,10 @@ def layers_algorithms_table_meta(current_skyline_app, engine):
 
     # Create the layers_algorithms table MetaData
     try:
-        layers_algorithms_meta = MetaData()
-        layers_algorithms_table = Table('layers_algorithms', layers_algorithms_meta, autoload=True, autoload_with=engine)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # layers_algorithms_meta = MetaData()
+        # layers_algorithms_table = Table('layers_algorithms', layers_algorithms_meta, autoload=True, autoload_with=engine)
+        layers_algorithms_table = reflect_table_meta(engine, 'layers_algorithms')
         return layers_algorithms_table, 'layers_algorithms_table meta reflected OK', 'none'
     except:
         trace = traceback.format_exc()
@@ -189,8 +391,10 @@ def ionosphere_layers_matched_table_meta(current_skyline_app, engine):
 
     # Create the ionosphere_layers_matched table MetaData
     try:
-        ionosphere_layers_matched_meta = MetaData()
-        ionosphere_layers_matched_table = Table('ionosphere_layers_matched', ionosphere_layers_matched_meta, autoload=True, autoload_with=engine)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # ionosphere_layers_matched_meta = MetaData()
+        # ionosphere_layers_matched_table = Table('ionosphere_layers_matched', ionosphere_layers_matched_meta, autoload=True, autoload_with=engine)
+        ionosphere_layers_matched_table = reflect_table_meta(engine, 'ionosphere_layers_matched')
         return ionosphere_layers_matched_table, 'ionosphere_layers_matched_table meta reflected OK', 'none'
     except:
         trace = traceback.format_exc()
@@ -208,8 +412,10 @@ def luminosity_table_meta(current_skyline_app, engine):
 
     # Create the luminosity table MetaData
     try:
-        luminosity_meta = MetaData()
-        luminosity_table = Table('luminosity', luminosity_meta, autoload=True, autoload_with=engine)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # luminosity_meta = MetaData()
+        # luminosity_table = Table('luminosity', luminosity_meta, autoload=True, autoload_with=engine)
+        luminosity_table = reflect_table_meta(engine, 'luminosity')
         return luminosity_table, 'luminosity_table meta reflected OK', 'none'
     except:
         trace = traceback.format_exc()
@@ -228,8 +434,10 @@ def snab_table_meta(current_skyline_app, engine):
 
     # Create the snab table MetaData
     try:
-        snab_meta = MetaData()
-        snab_table = Table('snab', snab_meta, autoload=True, autoload_with=engine)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # snab_meta = MetaData()
+        # snab_table = Table('snab', snab_meta, autoload=True, autoload_with=engine)
+        snab_table = reflect_table_meta(engine, 'snab')
         return snab_table, 'snab_table meta reflected OK', 'none'
     except:
         trace = traceback.format_exc()
@@ -10,11 +10,14 @@ import traceback
 # import json
 from timeit import default_timer as timer
 # import numpy as np
-import pandas as pd
-
-from tsfresh.feature_extraction import (
-    extract_features, ReasonableFeatureExtractionSettings)
-from tsfresh import __version__ as tsfresh_version
+# @modified 20261018 - Feature #3934: Lazy imports
+# pandas and tsfresh are only imported when a features profile is calculated
+# so that the webapp and ionosphere processes that import this module do not
+# pay the tsfresh import cost at startup
+# import pandas as pd
+# from tsfresh.feature_extraction import (
+#     extract_features, ReasonableFeatureExtractionSettings)
+# from tsfresh import __version__ as tsfresh_version
 
 import settings
 import skyline_version
@@ -80,6 +83,12 @@ def calculate_features_profile(current_skyline_app, timestamp, metric, context):
     :rtype: (str, boolean, str, str, str)
     """
 
+    # @added 20261018 - Feature #3934: Lazy imports
+    import pandas as pd
+    from tsfresh.feature_extraction import (
+        extract_features, ReasonableFeatureExtractionSettings)
+    from tsfresh import __version__ as tsfresh_version
+
     current_skyline_app_logger = current_skyline_app + 'Log'
     current_logger = logging.getLogger(current_skyline_app_logger)
 
@@ -0,0 +1,328 @@
+"""
+carbon_pickle_sender
+"""
+import sys
+import os.path
+from collections import deque
+from time import sleep, time
+import traceback
+
+# bandit [B403:blacklist] Consider possible security implications associated
+# with pickle module.  These have been considered.
+import pickle  # nosec
+import select
+import socket
+import struct
+
+from logger import set_up_logging
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+
+if True:
+    import settings
+
+logger = set_up_logging(None)
+
+# @added 20261018 - Feature #3904: flux - CarbonPickleSender
+try:
+    FLUX_CARBON_PICKLE_POOL_SIZE = int(settings.FLUX_CARBON_PICKLE_POOL_SIZE)
+except:
+    FLUX_CARBON_PICKLE_POOL_SIZE = 2
+try:
+    FLUX_CARBON_PICKLE_BATCH_SIZE = int(settings.FLUX_CARBON_PICKLE_BATCH_SIZE)
+except:
+    FLUX_CARBON_PICKLE_BATCH_SIZE = 1000
+try:
+    FLUX_CARBON_PICKLE_FLUSH_INTERVAL = float(settings.FLUX_CARBON_PICKLE_FLUSH_INTERVAL)
+except:
+    FLUX_CARBON_PICKLE_FLUSH_INTERVAL = 1.0
+try:
+    FLUX_CARBON_PICKLE_MAX_BUFFER = int(settings.FLUX_CARBON_PICKLE_MAX_BUFFER)
+except:
+    FLUX_CARBON_PICKLE_MAX_BUFFER = 500000
+
+CARBON_PICKLE_CONNECT_TIMEOUT = 5
+CARBON_PICKLE_MIN_BACKOFF = 0.1
+CARBON_PICKLE_MAX_BACKOFF = 30
+
+
+def pickle_message(data):
+    """
+    Serialise a list of (metric, (timestamp, value)) tuples into a carbon
+    pickle protocol message, a 4 byte length header followed by the pickle.
+
+    :param data: a list of (metric, (timestamp, value)) tuples
+    :type data: list
+    :return: message
+    :rtype: bytes
+
+    """
+    payload = pickle.dumps(data, protocol=2)
+    header = struct.pack("!L", len(payload))
+    return header + payload
+
+
+class CarbonPickleSender(object):
+    """
+    Send data points to the Graphite carbon PICKLE_RECEIVER_PORT over a pool
+    of persistent TCP connections.
+
+    Data points are added to a bounded in memory buffer and are sent in
+    batches of batch_size when the buffer reaches batch_size or when
+    flush_interval seconds have elapsed since the last flush.  Connections are
+    only opened once and reused, a connection that errors is closed and
+    reconnected with exponential backoff and the unsent data points remain in
+    the buffer.  If the buffer reaches max_buffer the oldest data points are
+    dropped and counted.
+
+    Usage::
+
+        carbon_sender = CarbonPickleSender('worker')
+        carbon_sender.add(metric, timestamp, value)
+        if carbon_sender.should_flush():
+            carbon_sender.flush()
+
+    """
+
+    def __init__(
+            self, log_prefix, host=None, port=None,
+            pool_size=FLUX_CARBON_PICKLE_POOL_SIZE,
+            batch_size=FLUX_CARBON_PICKLE_BATCH_SIZE,
+            flush_interval=FLUX_CARBON_PICKLE_FLUSH_INTERVAL,
+            max_buffer=FLUX_CARBON_PICKLE_MAX_BUFFER):
+        """
+        :param log_prefix: the flux process name to prefix log lines with
+        :param host: the carbon host, settings.FLUX_CARBON_HOST by default
+        :param port: the carbon pickle port, settings.FLUX_CARBON_PICKLE_PORT
+            by default
+        :param pool_size: the number of persistent connections
+        :param batch_size: the maximum number of data points per pickle
+        :param flush_interval: the maximum number of seconds data points are
+            buffered before should_flush is True
+        :param max_buffer: the maximum number of buffered data points
+        :type log_prefix: str
+        :type host: str
+        :type port: int
+        :type pool_size: int
+        :type batch_size: int
+        :type flush_interval: float
+        :type max_buffer: int
+
+        """
+        self.log_prefix = log_prefix
+        if host is None:
+            host = settings.FLUX_CARBON_HOST
+        if port is None:
+            port = settings.FLUX_CARBON_PICKLE_PORT
+        self.host = host
+        self.port = int(port)
+        self.pool_size = max(1, int(pool_size))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.max_buffer = max(self.batch_size, int(max_buffer))
+        self.buffer = deque()
+        self.connections = [None] * self.pool_size
+        self.next_connection = 0
+        self.backoff = 0
+        self.next_connect_attempt = 0
+        self.last_flush = time()
+        self.counters = {
+            'datapoints_sent': 0,
+            'batches_sent': 0,
+            'bytes_sent': 0,
+            'connects': 0,
+            'send_errors': 0,
+            'dropped': 0,
+        }
+        self.counters_reset = time()
+
+    def add(self, metric, timestamp, value):
+        """
+        Add a data point to the buffer.
+
+        :param metric: the metric name
+        :param timestamp: the data point timestamp
+        :param value: the data point value
+        :type metric: str
+        :type timestamp: int
+        :type value: float
+        :return: None
+
+        """
+        if len(self.buffer) >= self.max_buffer:
+            self.buffer.popleft()
+            self.counters['dropped'] += 1
+        self.buffer.append((metric, (int(timestamp), float(value))))
+
+    def add_tuples(self, tuples):
+        """
+        Add a list of (metric, (timestamp, value)) tuples to the buffer.
+
+        :param tuples: the data points
+        :type tuples: list
+        :return: None
+
+        """
+        for metric, (timestamp, value) in tuples:
+            self.add(metric, timestamp, value)
+
+    def buffered(self):
+        return len(self.buffer)
+
+    def should_flush(self):
+        """
+        Whether the buffer has reached batch_size or flush_interval has
+        elapsed since the last flush.
+
+        :return: should_flush
+        :rtype: boolean
+
+        """
+        if not self.buffer:
+            return False
+        if len(self.buffer) >= self.batch_size:
+            return True
+        return (time() - self.last_flush) >= self.flush_interval
+
+    def _close_connection(self, index):
+        sock = self.connections[index]
+        self.connections[index] = None
+        if sock:
+            try:
+                sock.close()
+            except:
+                pass
+
+    def _get_connection(self):
+        """
+        Return the next connection in the pool, connecting if the connection
+        is not open.  Returns None if a connection could not be made or if
+        still in the backoff period after a failed connection.
+        """
+        index = self.next_connection
+        self.next_connection = (self.next_connection + 1) % self.pool_size
+        if self.connections[index]:
+            # Carbon does not send data on the pickle port so a readable
+            # connection has been closed by the other end or has errored
+            try:
+                readable, _, _ = select.select([self.connections[index]], [], [], 0)
+            except Exception:
+                readable = True
+            if not readable:
+                return index
+            self._close_connection(index)
+        if time() < self.next_connect_attempt:
+            return None
+        try:
+            sock = socket.create_connection(
+                (self.host, self.port), timeout=CARBON_PICKLE_CONNECT_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections[index] = sock
+            self.counters['connects'] += 1
+            self.backoff = 0
+            self.next_connect_attempt = 0
+            return index
+        except Exception as e:
+            self._failed(index, 'connect', e)
+            return None
+
+    def _failed(self, index, action, e):
+        self._close_connection(index)
+        self.counters['send_errors'] += 1
+        if self.backoff:
+            self.backoff = min((self.backoff * 2), CARBON_PICKLE_MAX_BACKOFF)
+        else:
+            self.backoff = CARBON_PICKLE_MIN_BACKOFF
+        self.next_connect_attempt = time() + self.backoff
+        logger.error('error :: %s :: CarbonPickleSender failed to %s to %s:%s, backing off for %s seconds - %s' % (
+            self.log_prefix, action, str(self.host), str(self.port),
+            str(self.backoff), str(e)))
+
+    def flush(self, force=True):
+        """
+        Send the buffered data points in batches of batch_size.  If a batch
+        fails to send, the batch and the remaining data points are retained in
+        the buffer for the next flush.
+
+        :param force: send the buffer even if should_flush is False
+        :type force: boolean
+        :return: whether the buffer was emptied
+        :rtype: boolean
+
+        """
+        if not force and not self.should_flush():
+            return not self.buffer
+        self.last_flush = time()
+        while self.buffer:
+            batch_length = min(self.batch_size, len(self.buffer))
+            batch = [self.buffer[i] for i in range(batch_length)]
+            try:
+                message = pickle_message(batch)
+            except:
+                logger.error(traceback.format_exc())
+                logger.error('error :: %s :: CarbonPickleSender failed to pickle %s data points, dropping them' % (
+                    self.log_prefix, str(batch_length)))
+                for i in range(batch_length):
+                    self.buffer.popleft()
+                self.counters['dropped'] += batch_length
+                continue
+            index = self._get_connection()
+            if index is None:
+                return False
+            try:
+                self.connections[index].sendall(message)
+            except Exception as e:
+                self._failed(index, 'send', e)
+                return False
+            for i in range(batch_length):
+                self.buffer.popleft()
+            self.counters['datapoints_sent'] += batch_length
+            self.counters['batches_sent'] += 1
+            self.counters['bytes_sent'] += len(message)
+        return True
+
+    def send(self, tuples, max_wait=CARBON_PICKLE_MAX_BACKOFF * 2):
+        """
+        Add a list of (metric, (timestamp, value)) tuples and flush until they
+        are sent, retrying with backoff for up to max_wait seconds.  For
+        workers that must know the data was submitted.
+
+        :param tuples: the data points
+        :param max_wait: the maximum number of seconds to retry for
+        :type tuples: list
+        :type max_wait: int
+        :return: whether all the data points were sent
+        :rtype: boolean
+
+        """
+        self.add_tuples(tuples)
+        give_up_at = time() + max_wait
+        while not self.flush():
+            if time() >= give_up_at:
+                return False
+            sleep(max(0.01, min((self.next_connect_attempt - time()), (give_up_at - time()))))
+        return True
+
+    def stats(self, reset=False):
+        """
+        The throughput counters.
+
+        :param reset: reset the counters
+        :type reset: boolean
+        :return: the counters with buffered, connections and elapsed seconds
+        :rtype: dict
+
+        """
+        counters = dict(self.counters)
+        counters['buffered'] = len(self.buffer)
+        counters['connections'] = len([sock for sock in self.connections if sock])
+        counters['seconds'] = time() - self.counters_reset
+        if reset:
+            for counter in self.counters:
+                self.counters[counter] = 0
+            self.counters_reset = time()
+        return counters
+
+    def close(self):
+        for index in range(self.pool_size):
+            self._close_connection(index)
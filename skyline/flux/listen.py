@@ -582,6 +582,9 @@ class MetricDataPost(object):
                     logger.error(traceback.format_exc())
                     logger.error('error :: listen :: could not report number of entries submitted in POST mulitple metric data')
 
+            # @added 20261018 - Feature #3906: flux - batched ingest
+            metrics_batch = []
+
             for metric_data in metrics:
                 # Add metric to add to queue
                 metric = None
@@ -663,23 +666,53 @@ class MetricDataPost(object):
                 if metric_namespace_prefix:
                     metric = '%s.%s' % (str(metric_namespace_prefix), metric)
 
-                # Queue the metric
+                # @modified 20261018 - Feature #3906: flux - batched ingest
+                # All the metrics in the POST are validated before any are
+                # queued and they are queued as a single batch, so that a
+                # POST of n metrics is one queue put and one Redis call
+                # rather than n of each.
+                # # Queue the metric
+                # try:
+                #     metric_data = [metric, value, timestamp, backfill]
+                #     # @added 20201018 - Feature #3798: FLUX_PERSIST_QUEUE
+                #     # Add to data to the flux.queue Redis set
+                #     if FLUX_PERSIST_QUEUE and metric_data:
+                #         try:
+                #             redis_conn.sadd('flux.queue', str(metric_data))
+                #         except:
+                #             pass
+                #     flux.httpMetricDataQueue.put(metric_data, block=False)
+                #     # modified 20201016 - Feature #3788: snab_flux_load_test
+                #     if FLUX_VERBOSE_LOGGING:
+                #         logger.info('listen :: POST mulitple metric data added to flux.httpMetricDataQueue - %s' % str(metric_data))
+                # except:
+                #     logger.error(traceback.format_exc())
+                #     logger.error('error :: listen :: adding POST metric_data to the flux.httpMetricDataQueue queue - %s' % str(metric_data))
+                #     resp.status = falcon.HTTP_500
+                #     return
+                metrics_batch.append([metric, value, timestamp, backfill])
+
+            # @added 20261018 - Feature #3906: flux - batched ingest
+            # Queue the metrics
+            if metrics_batch:
                 try:
-                    metric_data = [metric, value, timestamp, backfill]
-                    # @added 20201018 - Feature #3798: FLUX_PERSIST_QUEUE
-                    # Add to data to the flux.queue Redis set
-                    if FLUX_PERSIST_QUEUE and metric_data:
+                    # Add to data to the flux.queue Redis set with a single
+                    # pipelined call, each metric_data is added as an
+                    # individual member as the worker removes each
+                    # metric_data individually once it has been submitted
+                    if FLUX_PERSIST_QUEUE:
                         try:
-                            redis_conn.sadd('flux.queue', str(metric_data))
+                            pipe = redis_conn.pipeline(transaction=False)
+                            pipe.sadd('flux.queue', *[str(metric_data) for metric_data in metrics_batch])
+                            pipe.execute()
                         except:
                             pass
-                    flux.httpMetricDataQueue.put(metric_data, block=False)
-                    # modified 20201016 - Feature #3788: snab_flux_load_test
+                    flux.httpMetricDataQueue.put(metrics_batch, block=False)
                     if FLUX_VERBOSE_LOGGING:
-                        logger.info('listen :: POST mulitple metric data added to flux.httpMetricDataQueue - %s' % str(metric_data))
+                        logger.info('listen :: POST mulitple metric data added %s metrics to flux.httpMetricDataQueue as a batch' % str(len(metrics_batch)))
                 except:
                     logger.error(traceback.format_exc())
-                    logger.error('error :: listen :: adding POST metric_data to the flux.httpMetricDataQueue queue - %s' % str(metric_data))
+                    logger.error('error :: listen :: adding POST metrics_batch of %s metrics to the flux.httpMetricDataQueue queue' % str(len(metrics_batch)))
                     resp.status = falcon.HTTP_500
                     return
 
@@ -14,14 +14,17 @@ from time import sleep, time
 from ast import literal_eval
 import re
 import datetime
-import socket
+# @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+# import socket
 
 # @modified 20200808 - Task #3608: Update Skyline to Python 3.8.3 and deps
 # bandit [B403:blacklist] Consider possible security implications associated
 # with pickle module.  These have been considered.
-import pickle  # nosec
+# @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+# Pickling and sending is done in carbon_pickle_sender
+# import pickle  # nosec
 
-import struct
+# import struct
 
 # @added 20200107 - Task #3376: Enable vista and flux to deal with lower frequency data
 from collections import Counter
@@ -35,6 +38,8 @@ import graphyte
 import pandas as pd
 
 from logger import set_up_logging
+# @added 20261018 - Feature #3904: flux - CarbonPickleSender
+from carbon_pickle_sender import CarbonPickleSender
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
 sys.path.insert(0, os.path.dirname(__file__))
 
@@ -139,31 +144,35 @@ class PopulateMetricWorker(Process):
         Called when the process intializes.
         """
 
+        # @added 20261018 - Feature #3904: flux - CarbonPickleSender
+        # Send pickle data over persistent pooled connections with
+        # reconnect and backoff rather than opening a new connection for
+        # every batch
+        carbon_sender = CarbonPickleSender('populate_metric_worker')
+
         def pickle_data_to_graphite(data):
 
-            message = None
+            # @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+            # message = None
+            # try:
+            #     payload = pickle.dumps(data, protocol=2)
+            #     header = struct.pack("!L", len(payload))
+            #     message = header + payload
+            # ...
+            #         sock = socket.socket()
+            #         sock.connect((CARBON_HOST, FLUX_CARBON_PICKLE_PORT))
+            #         sock.sendall(message)
+            #         sock.close()
             try:
-                payload = pickle.dumps(data, protocol=2)
-                header = struct.pack("!L", len(payload))
-                message = header + payload
+                pickle_data_sent = carbon_sender.send(data)
             except:
                 logger.error(traceback.format_exc())
-                logger.error('error :: populate_metric_worker :: failed to pickle to send to Graphite')
-                return False
-            if message:
-                try:
-                    sock = socket.socket()
-                    sock.connect((CARBON_HOST, FLUX_CARBON_PICKLE_PORT))
-                    sock.sendall(message)
-                    sock.close()
-                except:
-                    logger.error(traceback.format_exc())
-                    logger.error('error :: populate_metric_worker :: failed to send pickle data to Graphite')
-                    return False
-            else:
-                logger.error('error :: populate_metric_worker :: failed to pickle metric data into message')
+                logger.error('error :: populate_metric_worker :: failed to send pickle data to Graphite')
                 return False
-            return True
+            if not pickle_data_sent:
+                logger.error('error :: populate_metric_worker :: failed to send pickle data to Graphite, carbon_sender stats: %s' % (
+                    str(carbon_sender.stats())))
+            return pickle_data_sent
 
         logger.info('populate_metric_worker :: starting worker')
 
@@ -8,14 +8,17 @@ from time import time
 import datetime
 from time import sleep
 from ast import literal_eval
-import socket
+# @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+# import socket
 
 # @modified 20200808 - Task #3608: Update Skyline to Python 3.8.3 and deps
 # bandit [B403:blacklist] Consider possible security implications associated
 # with pickle module.  These have been considered.
-import pickle  # nosec
+# @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+# Pickling and sending is done in carbon_pickle_sender
+# import pickle  # nosec
 
-import struct
+# import struct
 import shutil
 import glob
 import gzip
@@ -27,6 +30,8 @@ import pytz
 from timeit import default_timer as timer
 
 from logger import set_up_logging
+# @added 20261018 - Feature #3904: flux - CarbonPickleSender
+from carbon_pickle_sender import CarbonPickleSender
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
 sys.path.insert(0, os.path.dirname(__file__))
 
@@ -108,31 +113,35 @@ class UploadedDataWorker(Process):
         Called when the process intializes.
         """
 
+        # @added 20261018 - Feature #3904: flux - CarbonPickleSender
+        # Send pickle data over persistent pooled connections with
+        # reconnect and backoff rather than opening a new connection for
+        # every batch
+        carbon_sender = CarbonPickleSender('uploaded_data_worker')
+
         def pickle_data_to_graphite(data):
 
-            message = None
+            # @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+            # message = None
+            # try:
+            #     payload = pickle.dumps(data, protocol=2)
+            #     header = struct.pack("!L", len(payload))
+            #     message = header + payload
+            # ...
+            #         sock = socket.socket()
+            #         sock.connect((CARBON_HOST, FLUX_CARBON_PICKLE_PORT))
+            #         sock.sendall(message)
+            #         sock.close()
             try:
-                payload = pickle.dumps(data, protocol=2)
-                header = struct.pack("!L", len(payload))
-                message = header + payload
+                pickle_data_sent = carbon_sender.send(data)
             except:
                 logger.error(traceback.format_exc())
-                logger.error('error :: uploaded_data_worker :: failed to pickle to send to Graphite')
-                return False
-            if message:
-                try:
-                    sock = socket.socket()
-                    sock.connect((CARBON_HOST, FLUX_CARBON_PICKLE_PORT))
-                    sock.sendall(message)
-                    sock.close()
-                except:
-                    logger.error(traceback.format_exc())
-                    logger.error('error :: uploaded_data_worker :: failed to send pickle data to Graphite')
-                    return False
-            else:
-                logger.error('error :: uploaded_data_worker :: failed to pickle metric data into message')
+                logger.error('error :: uploaded_data_worker :: failed to send pickle data to Graphite')
                 return False
-            return True
+            if not pickle_data_sent:
+                logger.error('error :: uploaded_data_worker :: failed to send pickle data to Graphite, carbon_sender stats: %s' % (
+                    str(carbon_sender.stats())))
+            return pickle_data_sent
 
         def remove_redis_set_item(data):
             try:
@@ -1238,7 +1247,8 @@ class UploadedDataWorker(Process):
                                 # @added 20200617 - Feature #3550: flux.uploaded_data_worker
                                 # Reduce the speed of submissions to Graphite
                                 # if there are lots of data points
-                                number_of_datapoints = len(listOfMetricTuples)
+                                # @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+                                # number_of_datapoints = len(listOfMetricTuples)
 
                                 for data in listOfMetricTuples:
                                     smallListOfMetricTuples.append(data)
@@ -1252,8 +1262,11 @@ class UploadedDataWorker(Process):
                                             # @added 20200617 - Feature #3550: flux.uploaded_data_worker
                                             # Reduce the speed of submissions to Graphite
                                             # if there are lots of data points
-                                            if number_of_datapoints > 4000:
-                                                sleep(0.3)
+                                            # @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+                                            # The carbon_sender uses persistent
+                                            # connections and backs off on errors
+                                            # if number_of_datapoints > 4000:
+                                            #     sleep(0.3)
                                         if pickle_data_sent:
                                             data_points_sent += tuples_added
                                             logger.info('uploaded_data_worker :: sent %s/%s of %s data points to Graphite via pickle for %s' % (
@@ -13,19 +13,25 @@ except ImportError:
     from queue import Empty  # Python 3
 from time import sleep, time
 from ast import literal_eval
+# @added 20261018 - Feature #3906: flux - batched ingest
+from collections import deque
 
 # @added 20201019 - Feature #3790: flux - pickle to Graphite
 # bandit [B403:blacklist] Consider possible security implications associated
 # with pickle module.  These have been considered.
-import pickle  # nosec
-import socket
-import struct
+# @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+# Pickling and sending is done in carbon_pickle_sender
+# import pickle  # nosec
+# import socket
+# import struct
 
 # from redis import StrictRedis
 import graphyte
 import statsd
 
 from logger import set_up_logging
+# @added 20261018 - Feature #3904: flux - CarbonPickleSender
+from carbon_pickle_sender import CarbonPickleSender
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
 sys.path.insert(0, os.path.dirname(__file__))
 
@@ -87,6 +93,12 @@ try:
 except:
     IDENTIFY_AIRGAPS = False
 
+# @added 20261018 - Feature #3906: flux - batched ingest
+try:
+    FLUX_WORKER_QUEUE_DRAIN_SIZE = int(settings.FLUX_WORKER_QUEUE_DRAIN_SIZE)
+except:
+    FLUX_WORKER_QUEUE_DRAIN_SIZE = 100
+
 parent_skyline_app = 'flux'
 
 # @added 20191010 - Feature #3250: Allow Skyline to send metrics to another Carbon host
@@ -124,6 +136,25 @@ if settings.FLUX_SEND_TO_STATSD:
             str(STATSD_HOST), str(STATSD_PORT)))
 
 
+# @added 20261018 - Feature #3906: flux - batched ingest
+def is_metrics_batch(queue_item):
+    """
+    Whether an item from the flux.httpMetricDataQueue is a batch of
+    metric_data lists queued by listen from a POST of multiple metrics, or a
+    single metric_data list e.g. [metric, value, timestamp, backfill]
+
+    :param queue_item: the item from the queue
+    :type queue_item: list
+    :return: is_metrics_batch
+    :rtype: boolean
+
+    """
+    try:
+        return isinstance(queue_item[0], (list, tuple))
+    except (IndexError, KeyError, TypeError):
+        return False
+
+
 class Worker(Process):
     """
     The worker processes metric from the queue and sends them to Graphite.
@@ -163,96 +194,38 @@ class Worker(Process):
         Called when the process intializes.
         """
 
-        def pickle_data_to_graphite(data):
+        # @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+        # pickle_data_to_graphite opened a new socket for every batch, the
+        # data is now sent via the CarbonPickleSender
+        # def pickle_data_to_graphite(data):
 
-            message = None
-            try:
-                payload = pickle.dumps(data, protocol=2)
-                header = struct.pack("!L", len(payload))
-                message = header + payload
-            except:
-                logger.error(traceback.format_exc())
-                logger.error('error :: worker :: failed to pickle to send to Graphite')
-                return False
-            if message:
-                try:
-                    sock = socket.socket()
-                    sock.connect((CARBON_HOST, settings.FLUX_CARBON_PICKLE_PORT))
-                    sock.sendall(message)
-                    sock.close()
-                except:
-                    logger.error(traceback.format_exc())
-                    logger.error('error :: worker :: failed to send pickle data to Graphite')
-                    return False
-            else:
-                logger.error(traceback.format_exc())
-                logger.error('error :: worker :: failed to pickle metric data into message')
-                return False
-            return True
+        # @added 20261018 - Feature #3904: flux - CarbonPickleSender
+        # Send pickle data over persistent pooled connections with a bounded
+        # buffer and size/time based flushing rather than opening a new
+        # connection for every batch and sleeping between batches
+        carbon_sender = CarbonPickleSender('worker')
 
         def submit_pickle_data_to_graphite(pickle_data):
-
-            # @modified 20201207 - Task #3864: flux - try except everything
+            """
+            Add the pickle_data to the carbon_sender buffer and flush it.  If
+            the flush fails the data points remain in the carbon_sender
+            buffer and are sent on the next flush, so the pickle_data has
+            always been handled.
+            """
             try:
                 number_of_datapoints = len(pickle_data)
+                if pickle_data:
+                    carbon_sender.add_tuples(pickle_data)
+                pickle_data_sent = carbon_sender.flush()
+                if pickle_data_sent:
+                    logger.info('worker :: sent %s data points to Graphite via pickle' % (
+                        str(number_of_datapoints)))
+                else:
+                    logger.error('error :: worker :: failed to send data points to Graphite via pickle, %s data points buffered' % (
+                        str(carbon_sender.buffered())))
             except Exception as e:
-                logger.error('error :: worker :: could not determine number_of_datapoints from len(pickle_data) - %s' % str(e))
+                logger.error('error :: worker :: submit_pickle_data_to_graphite carbon_sender error - %s' % str(e))
                 return False
-
-            data_points_sent = 0
-            smallListOfMetricTuples = []
-            tuples_added = 0
-
-            for data in pickle_data:
-                # @modified 20201207 - Task #3864: flux - try except everything
-                try:
-                    smallListOfMetricTuples.append(data)
-                    tuples_added += 1
-                    if tuples_added >= 480:
-                        # @modified 20201207 - Task #3864: flux - try except everything
-                        try:
-                            pickle_data_sent = pickle_data_to_graphite(smallListOfMetricTuples)
-                        except Exception as e:
-                            logger.error('error :: worker :: pickle_data_to_graphite error - %s' % str(e))
-                            pickle_data_sent = False
-
-                        # Reduce the speed of submissions to Graphite
-                        # if there are lots of data points
-                        if number_of_datapoints > 4000:
-                            sleep(0.3)
-                        if pickle_data_sent:
-                            data_points_sent += tuples_added
-                            logger.info('worker :: sent %s/%s of %s data points to Graphite via pickle' % (
-                                str(tuples_added), str(data_points_sent),
-                                str(number_of_datapoints)))
-                            smallListOfMetricTuples = []
-                            tuples_added = 0
-                        else:
-                            logger.error('error :: worker :: failed to send %s data points to Graphite via pickle' % (
-                                str(tuples_added)))
-                            return False
-                except Exception as e:
-                    logger.error('error :: worker :: error handling data in pickle_data - %s' % str(e))
-                    return False
-
-            if smallListOfMetricTuples:
-                # @modified 20201207 - Task #3864: flux - try except everything
-                try:
-                    tuples_to_send = len(smallListOfMetricTuples)
-                    pickle_data_sent = pickle_data_to_graphite(smallListOfMetricTuples)
-                    if pickle_data_sent:
-                        data_points_sent += tuples_to_send
-                        logger.info('worker :: sent the last %s/%s of %s data points to Graphite via pickle' % (
-                            str(tuples_to_send), str(data_points_sent),
-                            str(number_of_datapoints)))
-                    else:
-                        logger.error('error :: failed to send the last %s data points to Graphite via pickle' % (
-                            str(tuples_to_send)))
-                        return False
-                except Exception as e:
-                    logger.error('error :: worker :: error in smallListOfMetricTuples pickle_data_to_graphite - %s' % str(e))
-                    return False
-
             return True
 
         logger.info('worker :: starting worker')
@@ -266,6 +239,10 @@ class Worker(Process):
 
         remove_from_flux_queue_redis_set = []
 
+        # @added 20261018 - Feature #3906: flux - batched ingest
+        metric_data_batch = deque()
+        queue_items_drained = 0
+
         # @added 20201019 - Feature #3790: flux - pickle to Graphite
         pickle_data = []
         # send_to_reciever = 'line'
@@ -338,10 +315,34 @@ class Worker(Process):
                 # Get a metric from the queue with a 1 second timeout, each
                 # metric item on the queue is a list e.g.
                 # metric_data = [metricName, metricValue, metricTimestamp]
-                metric_data = self.q.get(True, 1)
+                # @modified 20261018 - Feature #3906: flux - batched ingest
+                # listen queues the metrics of a POST as a single batch (a
+                # list of metric_data lists).  When the local metric_data_batch
+                # is consumed, block for the next queue item then drain up to
+                # FLUX_WORKER_QUEUE_DRAIN_SIZE further items without blocking
+                # and work through them from the local buffer.
+                # metric_data = self.q.get(True, 1)
+                if not metric_data_batch:
+                    queue_items = [self.q.get(True, 1)]
+                    while len(queue_items) < FLUX_WORKER_QUEUE_DRAIN_SIZE:
+                        try:
+                            queue_items.append(self.q.get_nowait())
+                        except Empty:
+                            break
+                    for queue_item in queue_items:
+                        if is_metrics_batch(queue_item):
+                            metric_data_batch.extend(queue_item)
+                        else:
+                            metric_data_batch.append(queue_item)
+                    queue_items_drained += len(queue_items)
+                if metric_data_batch:
+                    metric_data = metric_data_batch.popleft()
 
             except Empty:
-                if pickle_data:
+                # @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+                # Also flush any data points buffered in the carbon_sender
+                # if pickle_data:
+                if pickle_data or carbon_sender.buffered():
                     # @modified 20201207 - Task #3864: flux - try except everything
                     try:
                         pickle_data_submitted = submit_pickle_data_to_graphite(pickle_data)
@@ -658,14 +659,21 @@ class Worker(Process):
                 submit_pickle_data = False
                 if pickle_data:
                     number_of_datapoints = len(pickle_data)
-                    if number_of_datapoints >= 1000:
+                    # @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+                    # Submit on the carbon_sender size and time based flush
+                    # if number_of_datapoints >= 1000:
+                    if number_of_datapoints >= carbon_sender.batch_size:
+                        submit_pickle_data = True
+                    elif (time() - carbon_sender.last_flush) >= carbon_sender.flush_interval:
                         submit_pickle_data = True
                     else:
                         try:
                             metric_data_queue_size = self.q.qsize()
                         except:
                             metric_data_queue_size = 0
-                        if metric_data_queue_size == 0:
+                        # @modified 20261018 - Feature #3906: flux - batched ingest
+                        # if metric_data_queue_size == 0:
+                        if metric_data_queue_size == 0 and not metric_data_batch:
                             submit_pickle_data = True
                 if submit_pickle_data:
                     # @modified 20201207 - Task #3864: flux - try except everything
@@ -712,7 +720,9 @@ class Worker(Process):
                     metrics_sent = []
 
             if (time_now - last_sent_to_graphite) >= 60:
-                if pickle_data:
+                # @modified 20261018 - Feature #3904: flux - CarbonPickleSender
+                # if pickle_data:
+                if pickle_data or carbon_sender.buffered():
                     # @modified 20201207 - Task #3864: flux - try except everything
                     try:
                         pickle_data_submitted = submit_pickle_data_to_graphite(pickle_data)
@@ -734,6 +744,40 @@ class Worker(Process):
                     logger.error(traceback.format_exc())
                     logger.error('error :: worker :: failed to send_graphite_metric %s with %s' % (
                         skyline_metric, str(metrics_sent_to_graphite)))
+
+                # @added 20261018 - Feature #3904: flux - CarbonPickleSender
+                # Report the carbon_sender throughput counters
+                carbon_sender_stats = carbon_sender.stats(reset=True)
+                logger.info('worker :: carbon_sender sent %s data points in %s batches (%s bytes) in the last %.2f seconds, connects: %s, send_errors: %s, dropped: %s, buffered: %s' % (
+                    str(carbon_sender_stats['datapoints_sent']),
+                    str(carbon_sender_stats['batches_sent']),
+                    str(carbon_sender_stats['bytes_sent']),
+                    carbon_sender_stats['seconds'],
+                    str(carbon_sender_stats['connects']),
+                    str(carbon_sender_stats['send_errors']),
+                    str(carbon_sender_stats['dropped']),
+                    str(carbon_sender_stats['buffered'])))
+                for carbon_sender_stat in ['datapoints_sent', 'send_errors', 'dropped', 'buffered']:
+                    skyline_metric = '%s.carbon_pickle.%s' % (skyline_app_graphite_namespace, carbon_sender_stat)
+                    try:
+                        send_graphite_metric(skyline_app, skyline_metric, carbon_sender_stats[carbon_sender_stat])
+                    except:
+                        logger.error(traceback.format_exc())
+                        logger.error('error :: worker :: failed to send_graphite_metric %s with %s' % (
+                            skyline_metric, str(carbon_sender_stats[carbon_sender_stat])))
+
+                # @added 20261018 - Feature #3906: flux - batched ingest
+                logger.info('worker :: drained %s items from flux.httpMetricDataQueue in the last 60 seconds, %s metrics buffered in metric_data_batch' % (
+                    str(queue_items_drained), str(len(metric_data_batch))))
+                skyline_metric = '%s.queue_items_drained' % skyline_app_graphite_namespace
+                try:
+                    send_graphite_metric(skyline_app, skyline_metric, queue_items_drained)
+                except:
+                    logger.error(traceback.format_exc())
+                    logger.error('error :: worker :: failed to send_graphite_metric %s with %s' % (
+                        skyline_metric, str(queue_items_drained)))
+                queue_items_drained = 0
+
                 metric_data_queue_size = 0
                 try:
                     metric_data_queue_size = self.q.qsize()
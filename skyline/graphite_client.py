@@ -0,0 +1,359 @@
+"""
+graphite_client.py
+
+@added 20261018 - Feature #3924: graphite_client
+
+A shared Graphite render client.  Rather than each Graphite data request being
+made with a new connection via requests.get, the requests are made with a per
+process pooled keep-alive requests.Session which has the Graphite timeouts and
+retries on connection errors and 5xx responses.  Multiple metrics can be
+requested in batched, multi-target render requests which are made concurrently
+and the datapoints are returned as numpy arrays in memory, rather than being
+written to a json file to be read straight back.  An optional on disk cache of
+the fetched arrays, keyed by metric, from and until, can be enabled with
+settings.GRAPHITE_CLIENT_CACHE_DIR.
+"""
+import logging
+import traceback
+import os
+from os import getpid
+from threading import Thread, Lock, BoundedSemaphore
+from time import time
+import datetime
+import hashlib
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import settings
+from skyline_functions import (
+    encode_graphite_metric_name, sanitise_graphite_url,
+    get_graphite_custom_headers, mkdir_p)
+
+try:
+    GRAPHITE_CLIENT_POOL_MAXSIZE = int(settings.GRAPHITE_CLIENT_POOL_MAXSIZE)
+except:
+    GRAPHITE_CLIENT_POOL_MAXSIZE = 10
+try:
+    GRAPHITE_CLIENT_RETRIES = int(settings.GRAPHITE_CLIENT_RETRIES)
+except:
+    GRAPHITE_CLIENT_RETRIES = 2
+try:
+    GRAPHITE_CLIENT_BATCH_SIZE = int(settings.GRAPHITE_CLIENT_BATCH_SIZE)
+except:
+    GRAPHITE_CLIENT_BATCH_SIZE = 20
+try:
+    GRAPHITE_CLIENT_CACHE_DIR = settings.GRAPHITE_CLIENT_CACHE_DIR
+except:
+    GRAPHITE_CLIENT_CACHE_DIR = False
+try:
+    GRAPHITE_CLIENT_CACHE_TTL = int(settings.GRAPHITE_CLIENT_CACHE_TTL)
+except:
+    GRAPHITE_CLIENT_CACHE_TTL = 3600
+
+# The session is per process, if the process forks (e.g. spin_process) the
+# session of the parent is not used
+graphite_session = None
+graphite_session_pid = None
+graphite_session_lock = Lock()
+
+
+def get_graphite_timeout():
+    """
+    The (connect, read) timeout for Graphite requests.
+    """
+    try:
+        connect_timeout = int(settings.GRAPHITE_CONNECT_TIMEOUT)
+        read_timeout = int(settings.GRAPHITE_READ_TIMEOUT)
+    except:
+        connect_timeout = 5
+        read_timeout = 10
+    return (connect_timeout, read_timeout)
+
+
+def get_graphite_session():
+    """
+    Get the pooled keep-alive requests.Session for Graphite requests, created
+    on first use in the process.
+
+    :return: session
+    :rtype: requests.Session
+
+    """
+    global graphite_session
+    global graphite_session_pid
+    with graphite_session_lock:
+        if graphite_session is None or graphite_session_pid != getpid():
+            session = requests.Session()
+            retries = Retry(
+                total=GRAPHITE_CLIENT_RETRIES, backoff_factor=0.3,
+                status_forcelist=(500, 502, 503, 504))
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=GRAPHITE_CLIENT_POOL_MAXSIZE,
+                max_retries=retries)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            try:
+                graphite_custom_headers = get_graphite_custom_headers('graphite_client')
+                if graphite_custom_headers:
+                    session.headers.update(graphite_custom_headers)
+            except:
+                pass
+            graphite_session = session
+            graphite_session_pid = getpid()
+    return graphite_session
+
+
+def graphite_render_url(targets, from_timestamp, until_timestamp):
+    """
+    The Graphite json render url for one or more targets, the from and until
+    are passed as absolute times in the %H:%M_%Y%m%d format, as all the Skyline
+    Graphite data requests have used.
+
+    :param targets: the Graphite targets, metric names or functions
+    :param from_timestamp: unix timestamp
+    :param until_timestamp: unix timestamp
+    :type targets: list
+    :type from_timestamp: int
+    :type until_timestamp: int
+    :return: url
+    :rtype: str
+
+    """
+    graphite_from = datetime.datetime.fromtimestamp(int(from_timestamp)).strftime('%H:%M_%Y%m%d')
+    graphite_until = datetime.datetime.fromtimestamp(int(until_timestamp)).strftime('%H:%M_%Y%m%d')
+    if settings.GRAPHITE_PORT != '':
+        graphite_host = '%s:%s' % (settings.GRAPHITE_HOST, str(settings.GRAPHITE_PORT))
+    else:
+        graphite_host = settings.GRAPHITE_HOST
+    target_parameters = '&'.join([
+        'target=%s' % encode_graphite_metric_name('graphite_client', target)
+        for target in targets])
+    url = '%s://%s/%s/?from=%s&until=%s&%s&format=json' % (
+        settings.GRAPHITE_PROTOCOL, graphite_host, settings.GRAPHITE_RENDER_URI,
+        graphite_from, graphite_until, target_parameters)
+    return url
+
+
+def datapoints_to_array(datapoints):
+    """
+    Convert Graphite [value, timestamp] datapoints into a [timestamp, value]
+    numpy array, dropping the datapoints with no value.
+
+    :param datapoints: the Graphite datapoints
+    :type datapoints: list
+    :return: timeseries array
+    :rtype: numpy.ndarray
+
+    """
+    if not datapoints:
+        return np.empty((0, 2), dtype=np.float64)
+    # None values are converted to nan
+    datapoints_array = np.array(datapoints, dtype=np.float64)
+    timeseries_array = datapoints_array[:, ::-1]
+    return np.ascontiguousarray(timeseries_array[~np.isnan(timeseries_array).any(axis=1)])
+
+
+def graphite_render(current_skyline_app, url, timeout=None):
+    """
+    Make a Graphite render request with the pooled session and return the
+    json.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param url: the Graphite render url
+    :param timeout: the requests timeout, :func:`get_graphite_timeout` if not
+        passed
+    :type current_skyline_app: str
+    :type url: str
+    :type timeout: tuple
+    :return: the json or None if the request failed
+    :rtype: list
+
+    """
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+    if timeout is None:
+        timeout = get_graphite_timeout()
+    sanitised, url = sanitise_graphite_url(current_skyline_app, url)
+    try:
+        r = get_graphite_session().get(url, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: graphite_render :: failed to get data from Graphite - %s' % str(url))
+    return None
+
+
+def graphite_cache_file(metric, from_timestamp, until_timestamp):
+    """
+    The on disk cache file for a metric, from and until.
+    """
+    metric_hash = hashlib.md5(str(metric).encode('utf-8')).hexdigest()
+    return '%s/%s/%s.%s.%s.npy' % (
+        GRAPHITE_CLIENT_CACHE_DIR, metric_hash[:2], metric_hash,
+        str(int(from_timestamp)), str(int(until_timestamp)))
+
+
+def get_graphite_cache(metric, from_timestamp, until_timestamp):
+    """
+    Get a timeseries array from the on disk cache if the cache is enabled and
+    the array was cached within settings.GRAPHITE_CLIENT_CACHE_TTL seconds.
+    """
+    if not GRAPHITE_CLIENT_CACHE_DIR:
+        return None
+    cache_file = graphite_cache_file(metric, from_timestamp, until_timestamp)
+    try:
+        if (time() - os.path.getmtime(cache_file)) > GRAPHITE_CLIENT_CACHE_TTL:
+            os.remove(cache_file)
+            return None
+        return np.load(cache_file, allow_pickle=False)
+    except:
+        return None
+
+
+def set_graphite_cache(metric, from_timestamp, until_timestamp, timeseries_array):
+    """
+    Save a timeseries array in the on disk cache if the cache is enabled.
+    """
+    if not GRAPHITE_CLIENT_CACHE_DIR:
+        return False
+    cache_file = graphite_cache_file(metric, from_timestamp, until_timestamp)
+    try:
+        mkdir_p(os.path.dirname(cache_file))
+        # Write and rename so that a partially written file is never loaded
+        tmp_cache_file = '%s.%s.tmp' % (cache_file, str(getpid()))
+        with open(tmp_cache_file, 'wb') as f:
+            np.save(f, timeseries_array, allow_pickle=False)
+        os.rename(tmp_cache_file, cache_file)
+    except:
+        return False
+    return True
+
+
+def fetch_graphite_metrics(
+        current_skyline_app, metrics, from_timestamp, until_timestamp,
+        timeout=None, batch_size=None, use_cache=True):
+    """
+    Fetch the timeseries of one or more metrics (or Graphite targets) from
+    Graphite.  The metrics are requested in batches of multi-target render
+    requests which are made concurrently.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param metrics: the metric names or Graphite targets
+    :param from_timestamp: unix timestamp
+    :param until_timestamp: unix timestamp
+    :param timeout: the requests timeout of each request
+    :param batch_size: the number of targets per render request,
+        settings.GRAPHITE_CLIENT_BATCH_SIZE if not passed
+    :param use_cache: use the on disk cache if it is enabled
+    :type current_skyline_app: str
+    :type metrics: list
+    :type from_timestamp: int
+    :type until_timestamp: int
+    :type timeout: tuple
+    :type batch_size: int
+    :type use_cache: boolean
+    :return: a dictionary of metric and [timestamp, value] numpy array, the
+        array is empty if Graphite has no data for the metric and None if the
+        request failed
+    :rtype: dict
+
+    """
+    timeseries_arrays = {}
+    fetch_metrics = []
+    for metric in metrics:
+        if metric in timeseries_arrays or metric in fetch_metrics:
+            continue
+        timeseries_array = None
+        if use_cache:
+            timeseries_array = get_graphite_cache(metric, from_timestamp, until_timestamp)
+        if timeseries_array is not None:
+            timeseries_arrays[metric] = timeseries_array
+        else:
+            fetch_metrics.append(metric)
+    if not fetch_metrics:
+        return timeseries_arrays
+
+    if not batch_size:
+        batch_size = GRAPHITE_CLIENT_BATCH_SIZE
+    batches = [fetch_metrics[i:i + batch_size] for i in range(0, len(fetch_metrics), batch_size)]
+    # Do not make more concurrent requests than there are pooled connections
+    request_semaphore = BoundedSemaphore(GRAPHITE_CLIENT_POOL_MAXSIZE)
+
+    def fetch_batch(batch):
+        with request_semaphore:
+            url = graphite_render_url(batch, from_timestamp, until_timestamp)
+            js = graphite_render(current_skyline_app, url, timeout)
+        if js is None:
+            for metric in batch:
+                timeseries_arrays[metric] = None
+            return
+        series_by_target = {}
+        for series in js:
+            series_by_target[series.get('target')] = series
+            try:
+                series_by_target[series['tags']['name']] = series
+            except:
+                pass
+        for index, metric in enumerate(batch):
+            series = series_by_target.get(metric)
+            # Graphite may return the target in a different form than it was
+            # requested, if all the targets are returned they are in order
+            if series is None and len(js) == len(batch):
+                series = js[index]
+            if series is None:
+                timeseries_arrays[metric] = datapoints_to_array([])
+                continue
+            timeseries_arrays[metric] = datapoints_to_array(series['datapoints'])
+
+    if len(batches) == 1:
+        fetch_batch(batches[0])
+    else:
+        threads = []
+        for batch in batches:
+            thread = Thread(target=fetch_batch, args=(batch,))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+    if use_cache:
+        for metric in fetch_metrics:
+            if timeseries_arrays.get(metric) is not None:
+                set_graphite_cache(metric, from_timestamp, until_timestamp, timeseries_arrays[metric])
+    return timeseries_arrays
+
+
+def fetch_graphite_metric(
+        current_skyline_app, metric, from_timestamp, until_timestamp,
+        timeout=None, use_cache=True):
+    """
+    Fetch the timeseries of a metric (or Graphite target) from Graphite.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param metric: the metric name or Graphite target
+    :param from_timestamp: unix timestamp
+    :param until_timestamp: unix timestamp
+    :param timeout: the requests timeout
+    :param use_cache: use the on disk cache if it is enabled
+    :type current_skyline_app: str
+    :type metric: str
+    :type from_timestamp: int
+    :type until_timestamp: int
+    :type timeout: tuple
+    :type use_cache: boolean
+    :return: the [timestamp, value] numpy array or None if the request failed
+    :rtype: numpy.ndarray
+
+    """
+    timeseries_arrays = fetch_graphite_metrics(
+        current_skyline_app, [metric], from_timestamp, until_timestamp,
+        timeout=timeout, use_cache=use_cache)
+    return timeseries_arrays.get(metric)
@@ -0,0 +1,165 @@
+"""
+grubbs_table.py
+
+@added 20261018 - Feature #3932: grubbs_table
+
+A shared, memoised table of the Grubbs critical values and scores keyed by the
+time series length.  The grubbs algorithm calculates
+``scipy.stats.t.isf(.05 / (2 * n), n - 2)`` and the Grubbs score from it for
+every metric on every run, however the score only depends on the length of the
+time series and the lengths take only a small set of recurring values.  Rather
+than calling the scipy t distribution for every metric, the scores are
+calculated in vectorized blocks of lengths the first time a length is seen in a
+process and looked up thereafter.  scipy.stats is only imported when a block is
+calculated.  Processes forked after the table has been populated inherit it.
+"""
+from __future__ import division
+
+import numpy as np
+
+# The number of lengths calculated in one block
+GRUBBS_TABLE_BLOCK_SIZE = 512
+
+# Dictionaries keyed by the time series length
+grubbs_critical_values_table = {}
+grubbs_scores_table = {}
+
+
+def calculate_grubbs_scores(lengths):
+    """
+    Calculate the Grubbs critical values and scores for the lengths.  NaN is
+    returned for lengths less than 3, which is not greater than any z score, as
+    per the grubbs algorithm.
+
+    :param lengths: the time series lengths
+    :type lengths: list or numpy.array
+    :return: (critical_values, scores)
+    :rtype: tuple
+
+    """
+    # Only import the scipy stats distributions when the scores need to be
+    # calculated
+    import scipy.stats
+
+    len_series = np.asarray(lengths, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        threshold = scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)
+        threshold_squared = threshold * threshold
+        grubbs_score = ((len_series - 1) / np.sqrt(len_series)) * np.sqrt(threshold_squared / (len_series - 2 + threshold_squared))
+    return threshold, grubbs_score
+
+
+def populate_grubbs_table(lengths):
+    """
+    Add the blocks of lengths that contain the lengths to the table, if they are
+    not in the table.
+
+    :param lengths: the time series lengths
+    :type lengths: list
+    :return: None
+
+    """
+    blocks = set()
+    for length in lengths:
+        length = int(length)
+        if length not in grubbs_scores_table:
+            blocks.add(length // GRUBBS_TABLE_BLOCK_SIZE)
+    for block in blocks:
+        block_lengths = np.arange(
+            block * GRUBBS_TABLE_BLOCK_SIZE, (block + 1) * GRUBBS_TABLE_BLOCK_SIZE)
+        critical_values, scores = calculate_grubbs_scores(block_lengths)
+        for index, length in enumerate(block_lengths.tolist()):
+            grubbs_critical_values_table[length] = critical_values[index]
+            grubbs_scores_table[length] = scores[index]
+
+
+def get_grubbs_critical_value(len_series):
+    """
+    The t distribution critical value used by the grubbs algorithm for the time
+    series length, ``scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)``
+
+    :param len_series: the time series length
+    :type len_series: int
+    :return: critical value
+    :rtype: float
+
+    """
+    len_series = int(len_series)
+    try:
+        return grubbs_critical_values_table[len_series]
+    except KeyError:
+        populate_grubbs_table([len_series])
+        return grubbs_critical_values_table[len_series]
+
+
+def get_grubbs_score(len_series):
+    """
+    The Grubbs score for the time series length that the z score of the tail
+    average is compared with.
+
+    :param len_series: the time series length
+    :type len_series: int
+    :return: Grubbs score
+    :rtype: float
+
+    """
+    len_series = int(len_series)
+    try:
+        return grubbs_scores_table[len_series]
+    except KeyError:
+        populate_grubbs_table([len_series])
+        return grubbs_scores_table[len_series]
+
+
+def get_grubbs_scores(lengths):
+    """
+    The Grubbs scores for many time series lengths at once.
+
+    :param lengths: the time series lengths
+    :type lengths: list or numpy.array
+    :return: Grubbs scores
+    :rtype: numpy.array
+
+    """
+    lengths = [int(length) for length in lengths]
+    populate_grubbs_table(lengths)
+    return np.array([grubbs_scores_table[length] for length in lengths], dtype=np.float64)
+
+
+def grubbs_batch(timeseries_list):
+    """
+    Run the grubbs algorithm on many time series at once, with the Grubbs scores
+    of all the time series lengths looked up in one batch.  A time series is
+    anomalous if the z score of the average of its last three values, using the
+    sample standard deviation, is greater than the Grubbs score.
+
+    :param timeseries_list: a list of time series
+    :type timeseries_list: list
+    :return: a list of the grubbs results, None if the time series could not be
+        scored
+    :rtype: list
+
+    """
+    lengths = [len(timeseries) for timeseries in timeseries_list]
+    scores = get_grubbs_scores(lengths)
+    results = []
+    for index, timeseries in enumerate(timeseries_list):
+        try:
+            values = np.array([item[1] for item in timeseries], dtype=np.float64)
+            if len(values) < 2:
+                results.append(False)
+                continue
+            std_dev = values.std(ddof=1)
+            if std_dev == 0:
+                results.append(False)
+                continue
+            if len(values) >= 3:
+                tail_average = (values[-1] + values[-2] + values[-3]) / 3
+            else:
+                tail_average = values[-1]
+            with np.errstate(invalid='ignore'):
+                z_score = (tail_average - values.mean()) / std_dev
+                results.append(bool(z_score > scores[index]))
+        except (TypeError, ValueError, IndexError):
+            results.append(None)
+    return results
@@ -22,6 +22,8 @@ if True:
     from listen import Listen
     from roomba import Roomba
     from worker import Worker
+    # @added 20261018 - Feature #3936: METRICS_SNAPSHOT
+    from snapshot import Snapshot
 
 skyline_app = 'horizon'
 skyline_app_logger = '%sLog' % skyline_app
@@ -33,6 +35,12 @@ skyline_app_loglock = '%s.lock' % skyline_app_logfile
 skyline_app_logwait = '%s.wait' % skyline_app_logfile
 logfile = '%s/%s.log' % (settings.LOG_PATH, skyline_app)
 
+# @added 20261018 - Feature #3936: METRICS_SNAPSHOT
+try:
+    METRICS_SNAPSHOT = settings.METRICS_SNAPSHOT
+except:
+    METRICS_SNAPSHOT = False
+
 # @added 20201122 - Feature #3820: HORIZON_SHARDS
 # Add an additional listen process on a different port for the shard
 try:
@@ -115,6 +123,12 @@ class Horizon():
         logger.info('%s :: starting Roomba' % skyline_app)
         Roomba(pid, skip_mini).start()
 
+        # @added 20261018 - Feature #3936: METRICS_SNAPSHOT
+        # Start the metrics snapshot
+        if METRICS_SNAPSHOT:
+            logger.info('%s :: starting Snapshot' % skyline_app)
+            Snapshot(pid).start()
+
         # Warn the Mac users
         try:
             listen_queue.qsize()
@@ -1,4 +1,6 @@
 import socket
+# @added 20261018 - Feature #3938: HORIZON_LISTEN_SELECTORS
+import errno
 from os import kill, getpid
 try:
     from Queue import Full
@@ -8,6 +10,13 @@ from multiprocessing import Process
 from struct import Struct, unpack
 from msgpack import unpackb
 import sys
+# @added 20261018 - Feature #3938: HORIZON_LISTEN_SELECTORS
+from collections import deque
+try:
+    import selectors
+except ImportError:
+    # Python 2 has no selectors, the blocking listener is used
+    selectors = None
 from time import time, sleep
 import traceback
 
@@ -38,6 +47,22 @@ skyline_app_graphite_namespace = 'skyline.%s%s.%s' % (
 
 python_version = int(sys.version_info[0])
 
+# @added 20261018 - Feature #3938: HORIZON_LISTEN_SELECTORS
+try:
+    HORIZON_LISTEN_SELECTORS = settings.HORIZON_LISTEN_SELECTORS
+except:
+    HORIZON_LISTEN_SELECTORS = False
+try:
+    HORIZON_LISTEN_QUEUE_FULL_TIMEOUT = float(settings.HORIZON_LISTEN_QUEUE_FULL_TIMEOUT)
+except:
+    HORIZON_LISTEN_QUEUE_FULL_TIMEOUT = 5.0
+# The pickle frame header, the length of the pickle as an unsigned int
+PICKLE_FRAME_HEADER = Struct('!I')
+# Frames larger than this are not a carbon-relay pickle and the connection is
+# closed rather than buffering it
+PICKLE_MAX_FRAME_SIZE = 64 * 1024 * 1024
+RECV_BUFFER_SIZE = 64 * 1024
+
 # SafeUnpickler taken from Carbon: https://github.com/graphite-project/carbon/blob/master/lib/carbon/util.py
 if python_version == 2:
     try:
@@ -134,6 +159,38 @@ else:
 # //SafeUnpickler
 
 
+# @added 20261018 - Feature #3938: HORIZON_LISTEN_SELECTORS
+def unpack_pickle_frames(data_buffer, max_frame_size=PICKLE_MAX_FRAME_SIZE):
+    """
+    Return the complete length prefixed pickle frames in the buffer and the
+    number of bytes of the buffer that they consume, an incomplete frame at the
+    end of the buffer is left for the next read.
+
+    :param data_buffer: the data read from the connection
+    :param max_frame_size: the maximum pickle length
+    :type data_buffer: bytearray
+    :type max_frame_size: int
+    :return: (frames, consumed)
+    :rtype: tuple
+
+    """
+    frames = []
+    offset = 0
+    buffer_length = len(data_buffer)
+    header_size = PICKLE_FRAME_HEADER.size
+    while buffer_length - offset >= header_size:
+        length = PICKLE_FRAME_HEADER.unpack_from(data_buffer, offset)[0]
+        if length > max_frame_size:
+            raise ValueError('pickle frame of %s bytes exceeds the maximum of %s bytes' % (
+                str(length), str(max_frame_size)))
+        if buffer_length - offset - header_size < length:
+            break
+        frame_start = offset + header_size
+        frames.append(bytes(data_buffer[frame_start:(frame_start + length)]))
+        offset = frame_start + length
+    return frames, offset
+
+
 class Listen(Process):
     """
     The listener is responsible for listening on a port.
@@ -154,6 +211,8 @@ class Listen(Process):
 
         # Use the safe unpickler that comes with carbon rather than standard python pickle/cpickle
         self.unpickler = SafeUnpickler
+        # @added 20261018 - Feature #3938: HORIZON_LISTEN_SELECTORS
+        self.selectors = HORIZON_LISTEN_SELECTORS
 
     def gen_unpickle(self, infile):
         """
@@ -303,6 +362,118 @@ class Listen(Process):
                 logger.info('%s :: can not connect to socket: %s' % (skyline_app, str(e)))
                 break
 
+    # @added 20261018 - Feature #3938: HORIZON_LISTEN_SELECTORS
+    def listen_pickle_selectors(self):
+        """
+        Listen for pickles over tcp from many connections with a selector.
+        Each connection is read into a reusable buffer and the complete pickle
+        frames are unpickled and chunked onto the queue.  When the queue is full
+        no connections are read until the chunk is queued, so that the
+        carbon-relays are slowed by TCP rather than datapoints being dropped,
+        unless the queue stays full for HORIZON_LISTEN_QUEUE_FULL_TIMEOUT
+        seconds.
+        """
+        selector = selectors.DefaultSelector()
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((self.ip, self.port))
+        s.listen(128)
+        s.setblocking(0)
+        selector.register(s, selectors.EVENT_READ, None)
+        logger.info('%s :: listening over tcp for pickles on %s with %s' % (
+            skyline_app, str(self.port), selector.__class__.__name__))
+
+        recv_buffer = bytearray(RECV_BUFFER_SIZE)
+        recv_view = memoryview(recv_buffer)
+        chunk = []
+        chunks_to_queue = deque()
+        queue_full_at = None
+        last_parent_check = 0
+
+        def close_connection(conn, reason):
+            try:
+                address = conn.getpeername()[0]
+            except:
+                address = 'unknown'
+            logger.info('%s :: pickle connection from %s on %s closed - %s' % (
+                skyline_app, str(address), str(self.port), reason))
+            selector.unregister(conn)
+            conn.close()
+
+        while 1:
+            now = time()
+            if now - last_parent_check >= 1:
+                self.check_if_parent_is_alive()
+                last_parent_check = now
+
+            # Queue the chunks before reading any more data
+            if chunks_to_queue:
+                try:
+                    self.q.put(chunks_to_queue[0], True, 0.1)
+                    chunks_to_queue.popleft()
+                    queue_full_at = None
+                except Full:
+                    if queue_full_at is None:
+                        queue_full_at = now
+                    if now - queue_full_at >= HORIZON_LISTEN_QUEUE_FULL_TIMEOUT:
+                        chunks_dropped = str(len(chunks_to_queue.popleft()))
+                        queue_full_at = None
+                        logger.info(
+                            '%s :: pickle queue is full, dropping %s datapoints'
+                            % (skyline_app, chunks_dropped))
+                        send_metric_name = '%s.pickle_chunks_dropped' % skyline_app_graphite_namespace
+                        send_graphite_metric(skyline_app, send_metric_name, chunks_dropped)
+                continue
+
+            events = selector.select(1)
+            if not events:
+                # Queue the partial chunk when there is nothing to read
+                if chunk:
+                    chunks_to_queue.append(chunk)
+                    chunk = []
+                continue
+
+            for key, mask in events:
+                if key.data is None:
+                    # Accept all the pending connections
+                    while 1:
+                        try:
+                            conn, address = s.accept()
+                        except socket.error:
+                            break
+                        conn.setblocking(0)
+                        selector.register(conn, selectors.EVENT_READ, bytearray())
+                        logger.info('%s :: connection from %s on %s' % (
+                            skyline_app, str(address[0]), str(self.port)))
+                    continue
+
+                conn = key.fileobj
+                conn_buffer = key.data
+                try:
+                    bytes_read = conn.recv_into(recv_buffer)
+                except socket.error as e:
+                    if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                        continue
+                    close_connection(conn, str(e))
+                    continue
+                if not bytes_read:
+                    close_connection(conn, 'connection closed by the client')
+                    continue
+                conn_buffer += recv_view[:bytes_read]
+                try:
+                    frames, consumed = unpack_pickle_frames(conn_buffer)
+                    del conn_buffer[:consumed]
+                    for frame in frames:
+                        # Chunk the datapoints, as listen_pickle does
+                        for bunch in self.gen_unpickle(frame):
+                            chunk.extend(bunch)
+                            while len(chunk) > settings.CHUNK_SIZE:
+                                chunks_to_queue.append(chunk[:(settings.CHUNK_SIZE + 1)])
+                                del chunk[:(settings.CHUNK_SIZE + 1)]
+                except Exception as e:
+                    logger.info(e)
+                    close_connection(conn, 'invalid pickle')
+
     def listen_udp(self):
         """
         Listen over udp for MessagePack strings
@@ -390,7 +561,14 @@ class Listen(Process):
         logger.info('%s :: started listener' % skyline_app)
 
         if self.type == 'pickle':
-            self.listen_pickle()
+            # @modified 20261018 - Feature #3938: HORIZON_LISTEN_SELECTORS
+            # self.listen_pickle()
+            if self.selectors and selectors:
+                self.listen_pickle_selectors()
+            else:
+                if self.selectors:
+                    logger.info('%s :: selectors is not available, using the blocking pickle listener' % skyline_app)
+                self.listen_pickle()
         elif self.type == 'udp':
             self.listen_udp()
         else:
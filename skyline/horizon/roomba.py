@@ -7,12 +7,18 @@ from redis import StrictRedis, WatchError
 from multiprocessing import Process
 from threading import Thread
 from msgpack import Unpacker, packb
-try:
-    from types import TupleType
-except ImportError:
-    eliminated_in_python3 = True
+# @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+# TupleType is no longer used, decode_timeseries returns a timeseries array
+# try:
+#     from types import TupleType
+# except ImportError:
+#     eliminated_in_python3 = True
 from time import time, sleep
 from math import ceil
+# @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+import numpy as np
+# @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+import hashlib
 # import traceback
 import logging
 
@@ -31,6 +37,15 @@ if True:
     # Added a single functions to deal with Redis connection and the
     # charset='utf-8', decode_responses=True arguments required in py3
     from skyline_functions import get_redis_conn, get_redis_conn_decoded
+    # @added 20261018 - Feature #3900: Zero copy msgpack time series decode
+    from skyline_functions import decode_timeseries, timeseries_array_to_list
+    # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+    from skyline_functions import (
+        horizon_storage_format, encode_columnar_timeseries,
+        HORIZON_COLUMNAR_RECORD_DTYPE, HORIZON_COLUMNAR_RECORD_SIZE)
+    # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+    from skyline_functions import (
+        send_graphite_metric, HORIZON_OLDEST_TIMESTAMPS_KEY)
 
 parent_skyline_app = 'horizon'
 child_skyline_app = 'roomba'
@@ -64,6 +79,68 @@ except:
     BATCH_PROCESSING_DEBUG = None
 
 
+# @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+try:
+    HORIZON_STORAGE_FORMAT = str(settings.HORIZON_STORAGE_FORMAT)
+except:
+    HORIZON_STORAGE_FORMAT = 'msgpack'
+
+# @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+try:
+    ROOMBA_INCREMENTAL = settings.ROOMBA_INCREMENTAL
+except:
+    # @modified 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+    # Opt-in
+    # ROOMBA_INCREMENTAL = True
+    ROOMBA_INCREMENTAL = False
+
+try:
+    SERVER_METRIC_PATH = '.%s' % settings.SERVER_METRICS_NAME
+    if SERVER_METRIC_PATH == '.':
+        SERVER_METRIC_PATH = ''
+except:
+    SERVER_METRIC_PATH = ''
+skyline_app_graphite_namespace = 'skyline.%s%s.%s' % (
+    parent_skyline_app, SERVER_METRIC_PATH, child_skyline_app)
+
+# The Redis hash that the vacuum processes of each namespace increment their
+# counts in, for the main process to send to Graphite
+ROOMBA_VACUUM_STATS_KEY = 'horizon.roomba.vacuum_stats.%s'
+ROOMBA_VACUUM_STATS = ['keys_processed', 'keys_skipped', 'keys_trimmed', 'keys_euthanized']
+
+# Trim the first ARGV[1] bytes of a columnar key.  The key is only trimmed if it
+# has not been shortened since it was read (ARGV[2] is the length read) and the
+# SHA1 of the bytes to be trimmed (ARGV[3]) still matches, otherwise -1 is
+# returned.  The trim is run outside the WATCH so the key may have been
+# deleted, recreated or rewritten in between, the SHA1 ensures that only the
+# old records that were read are ever trimmed.  Returns the length of the
+# trimmed key.
+# @modified 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+# If the oldest timestamps index is passed (KEYS[2]) the oldest timestamp of
+# the key (ARGV[4]) is set in the index if nothing has been appended to the key
+# since it was read, otherwise the key is removed from the index as the data
+# points appended may be older, e.g. backfilled, and the key is fully vacuumed
+# on the next run.
+HORIZON_COLUMNAR_TRIM_SCRIPT = """
+local length = redis.call('STRLEN', KEYS[1])
+if length < tonumber(ARGV[2]) then
+    return -1
+end
+if redis.sha1hex(redis.call('GETRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)) ~= ARGV[3] then
+    return -1
+end
+redis.call('SET', KEYS[1], redis.call('GETRANGE', KEYS[1], ARGV[1], -1))
+if KEYS[2] then
+    if length == tonumber(ARGV[2]) then
+        redis.call('ZADD', KEYS[2], ARGV[4], KEYS[1])
+    else
+        redis.call('ZREM', KEYS[2], KEYS[1])
+    end
+end
+return length - tonumber(ARGV[1])
+"""
+
+
 class Roomba(Thread):
     """
     The Roomba is responsible for deleting keys older than DURATION.
@@ -116,6 +193,36 @@ class Roomba(Thread):
         # unique_metrics = list(self.redis_conn.smembers(namespace_unique_metrics))
         unique_metrics = list(self.redis_conn_decoded.smembers(namespace_unique_metrics))
 
+        # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+        # The oldest retained timestamp of each key.  Keys with an oldest
+        # timestamp that is not older than the duration have nothing to trim
+        # and are skipped without being fetched.  Keys that are not in the
+        # index are vacuumed and added to it.
+        oldest_timestamps_key = HORIZON_OLDEST_TIMESTAMPS_KEY % str(namespace)
+        oldest_timestamps = {}
+        if ROOMBA_INCREMENTAL:
+            try:
+                oldest_timestamps = dict(self.redis_conn_decoded.zrange(
+                    oldest_timestamps_key, 0, -1, withscores=True))
+            except Exception as e:
+                logger.error('error :: %s :: vacuum failed to get %s Redis sorted set, vacuuming all keys - %s' % (
+                    skyline_app, oldest_timestamps_key, str(e)))
+                oldest_timestamps = {}
+            # Remove keys that no longer exist from the index, done by the
+            # first process only
+            if i == 1 and oldest_timestamps:
+                removed_keys = list(set(oldest_timestamps.keys()).difference(set(unique_metrics)))
+                if removed_keys:
+                    try:
+                        self.redis_conn.zrem(oldest_timestamps_key, *removed_keys)
+                        logger.info('%s :: vacuum removed %s keys from %s that are not in %s' % (
+                            skyline_app, str(len(removed_keys)), oldest_timestamps_key,
+                            namespace_unique_metrics))
+                    except Exception as e:
+                        logger.error('error :: %s :: vacuum failed to remove keys from %s - %s' % (
+                            skyline_app, oldest_timestamps_key, str(e)))
+                del removed_keys
+
         # @added 20200727 - Feature #3650: ROOMBA_DO_NOT_PROCESS_BATCH_METRICS
         #                   Feature #3480: batch_processing
         #                   Feature #3486: analyzer_batch
@@ -162,6 +269,17 @@ class Roomba(Thread):
         trimmed_keys = 0
         active_keys = 0
 
+        # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+        skipped_keys = 0
+        keys_trimmed = 0
+        trim_before = time() - duration
+
+        # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+        offset_trimmed_keys = 0
+        columnar_trim_script = None
+        if HORIZON_STORAGE_FORMAT == 'columnar':
+            columnar_trim_script = self.redis_conn.register_script(HORIZON_COLUMNAR_TRIM_SCRIPT)
+
         # @modified 20191016 - Task #3280: Handle py2 xange and py3 range
         #                      Branch #3262: py3
         # for i in xrange(len(assigned_metrics)):
@@ -175,6 +293,15 @@ class Roomba(Thread):
         for i in range_list:
             self.check_if_parent_is_alive()
 
+            # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+            try:
+                oldest_timestamp = oldest_timestamps[assigned_metrics[i]]
+            except KeyError:
+                oldest_timestamp = None
+            if oldest_timestamp is not None and oldest_timestamp > trim_before:
+                skipped_keys += 1
+                continue
+
             pipe = self.redis_conn.pipeline()
             now = time()
             key = assigned_metrics[i]
@@ -187,70 +314,184 @@ class Roomba(Thread):
                 # comes in. If your data has a very small resolution (<.1s),
                 # this technique may not suit you.
                 raw_series = pipe.get(key)
-                unpacker = Unpacker(use_list=False)
-                unpacker.feed(raw_series)
-                timeseries = sorted([unpacked for unpacked in unpacker])
+
+                # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                # A columnar key that is sorted and has no duplicate
+                # timestamps only has old data points at the start of the key
+                # so it is trimmed by byte offset without being decoded and
+                # re-encoded.  Columnar keys that are not sorted and keys
+                # that are not in the HORIZON_STORAGE_FORMAT are decoded,
+                # trimmed and rewritten in the HORIZON_STORAGE_FORMAT below.
+                if columnar_trim_script and horizon_storage_format(raw_series) == 'columnar':
+                    timestamps = np.frombuffer(raw_series, dtype=HORIZON_COLUMNAR_RECORD_DTYPE)['timestamp']
+                    if np.all(timestamps[1:] > timestamps[:-1]):
+                        if timestamps[-1] < now - duration:
+                            pipe.multi()
+                            pipe.delete(key)
+                            pipe.srem(namespace_unique_metrics, key)
+                            # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                            if ROOMBA_INCREMENTAL:
+                                pipe.zrem(oldest_timestamps_key, key)
+                            pipe.execute()
+                            euthanized += 1
+                            continue
+                        old_records = int(np.searchsorted(timestamps, (now - duration), side='right'))
+                        active_keys += 1
+                        if not old_records:
+                            # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                            # @modified 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                            # Set in the WATCHed transaction so that the oldest
+                            # timestamp is not set if a data point has been
+                            # appended since the key was read
+                            if ROOMBA_INCREMENTAL:
+                                # self.redis_conn.zadd(oldest_timestamps_key, {key: float(timestamps[0])})
+                                pipe.multi()
+                                pipe.zadd(oldest_timestamps_key, {key: float(timestamps[0])})
+                                pipe.execute()
+                            continue
+                        # @modified 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                        # The trim script sets the oldest timestamp
+                        # trimmed_length = columnar_trim_script(
+                        #     keys=[key],
+                        #     args=[(old_records * HORIZON_COLUMNAR_RECORD_SIZE), len(raw_series)])
+                        # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                        # Pass the SHA1 of the records to be trimmed so that
+                        # the script does not trim a key that has been
+                        # rewritten since it was read
+                        trim_offset = old_records * HORIZON_COLUMNAR_RECORD_SIZE
+                        trim_sha1 = hashlib.sha1(raw_series[:trim_offset]).hexdigest()
+                        if ROOMBA_INCREMENTAL:
+                            # trimmed_length = columnar_trim_script(
+                            #     keys=[key, oldest_timestamps_key],
+                            #     args=[(old_records * HORIZON_COLUMNAR_RECORD_SIZE), len(raw_series),
+                            #           float(timestamps[old_records])])
+                            trimmed_length = columnar_trim_script(
+                                keys=[key, oldest_timestamps_key],
+                                args=[trim_offset, len(raw_series), trim_sha1,
+                                      float(timestamps[old_records])])
+                        else:
+                            # trimmed_length = columnar_trim_script(
+                            #     keys=[key],
+                            #     args=[(old_records * HORIZON_COLUMNAR_RECORD_SIZE), len(raw_series)])
+                            trimmed_length = columnar_trim_script(
+                                keys=[key],
+                                args=[trim_offset, len(raw_series), trim_sha1])
+                        if trimmed_length == -1:
+                            active_keys -= 1
+                            blocked += 1
+                            assigned_metrics.append(key)
+                            continue
+                        trimmed_keys += 1
+                        offset_trimmed_keys += 1
+                        # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                        keys_trimmed += 1
+                        # @modified 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                        # Set by the trim script
+                        # if ROOMBA_INCREMENTAL:
+                        #     self.redis_conn.zadd(oldest_timestamps_key, {key: float(timestamps[old_records])})
+                        continue
+                # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+                # Decode, sort and deduplicate the time series with
+                # decode_timeseries which only sorts and deduplicates if the
+                # time series is not already strictly increasing
+                # unpacker = Unpacker(use_list=False)
+                # unpacker.feed(raw_series)
+                # timeseries = sorted([unpacked for unpacked in unpacker])
+                single_value = None
+                try:
+                    timeseries_array = decode_timeseries(raw_series, deduplicate=True)
+                except TypeError:
+                    # There's one value, it is not a (timestamp, value) tuple
+                    timeseries_array = None
+                    unpacker = Unpacker(use_list=False)
+                    unpacker.feed(raw_series)
+                    single_value = [unpacked for unpacked in unpacker]
 
                 # Put pipe back in multi mode
                 pipe.multi()
 
                 # There's one value. Purge if it's too old
                 try:
-                    if python_version == 2:
-                        if not isinstance(timeseries[0], TupleType):
-                            if timeseries[0] < now - duration:
-                                pipe.delete(key)
-                                pipe.srem(namespace_unique_metrics, key)
-                                pipe.execute()
-                                euthanized += 1
-                            continue
-                    if python_version == 3:
-                        if not isinstance(timeseries[0], tuple):
-                            if timeseries[0] < now - duration:
-                                pipe.delete(key)
-                                pipe.srem(namespace_unique_metrics, key)
-                                pipe.execute()
-                                euthanized += 1
-                            continue
+                    # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+                    # if python_version == 2:
+                    #     if not isinstance(timeseries[0], TupleType):
+                    # ...
+                    if timeseries_array is None:
+                        if single_value[0] < now - duration:
+                            pipe.delete(key)
+                            pipe.srem(namespace_unique_metrics, key)
+                            # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                            if ROOMBA_INCREMENTAL:
+                                pipe.zrem(oldest_timestamps_key, key)
+                            pipe.execute()
+                            euthanized += 1
+                        continue
+                    if not len(timeseries_array):
+                        raise IndexError('no data points')
                 except IndexError:
                     continue
 
                 # Check if the last value is too old and purge
-                if timeseries[-1][0] < now - duration:
+                # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+                # if timeseries[-1][0] < now - duration:
+                if timeseries_array['timestamp'][-1] < now - duration:
                     pipe.delete(key)
                     pipe.srem(namespace_unique_metrics, key)
+                    # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                    if ROOMBA_INCREMENTAL:
+                        pipe.zrem(oldest_timestamps_key, key)
                     pipe.execute()
                     euthanized += 1
                     continue
 
                 # Remove old datapoints and duplicates from timeseries
-                temp = set()
-                temp_add = temp.add
+                # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+                # Duplicates are removed by decode_timeseries so only the old
+                # datapoints need to be trimmed
+                # temp = set()
+                # temp_add = temp.add
+                # delta = now - duration
+                # trimmed = [
+                #     tuple for tuple in timeseries
+                #     if tuple[0] > delta and
+                #     tuple[0] not in temp and not
+                #     temp_add(tuple[0])
+                # ]
                 delta = now - duration
-                trimmed = [
-                    tuple for tuple in timeseries
-                    if tuple[0] > delta and
-                    tuple[0] not in temp and not
-                    temp_add(tuple[0])
-                ]
+                trimmed = timeseries_array_to_list(
+                    timeseries_array[timeseries_array['timestamp'] > delta])
 
                 # Purge if everything was deleted, set key otherwise
                 if len(trimmed) > 0:
-                    # Serialize and turn key back into not-an-array
-                    btrimmed = packb(trimmed)
-                    if len(trimmed) <= 15:
-                        value = btrimmed[1:]
-                    elif len(trimmed) <= 65535:
-                        value = btrimmed[3:]
+                    # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                    # Write the key in the HORIZON_STORAGE_FORMAT
+                    if HORIZON_STORAGE_FORMAT == 'columnar':
+                        value = encode_columnar_timeseries(trimmed)
                         trimmed_keys += 1
                     else:
-                        value = btrimmed[5:]
-                        trimmed_keys += 1
+                        # Serialize and turn key back into not-an-array
+                        btrimmed = packb(trimmed)
+                        if len(trimmed) <= 15:
+                            value = btrimmed[1:]
+                        elif len(trimmed) <= 65535:
+                            value = btrimmed[3:]
+                            trimmed_keys += 1
+                        else:
+                            value = btrimmed[5:]
+                            trimmed_keys += 1
                     pipe.set(key, value)
                     active_keys += 1
+                    # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                    if len(trimmed) < len(timeseries_array):
+                        keys_trimmed += 1
+                    if ROOMBA_INCREMENTAL:
+                        pipe.zadd(oldest_timestamps_key, {key: float(trimmed[0][0])})
                 else:
                     pipe.delete(key)
                     pipe.srem(namespace_unique_metrics, key)
+                    # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                    if ROOMBA_INCREMENTAL:
+                        pipe.zrem(oldest_timestamps_key, key)
                     euthanized += 1
 
                 pipe.execute()
@@ -262,6 +503,9 @@ class Roomba(Thread):
                 # If something bad happens, zap the key and hope it goes away
                 pipe.delete(key)
                 pipe.srem(namespace_unique_metrics, key)
+                # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                if ROOMBA_INCREMENTAL:
+                    pipe.zrem(oldest_timestamps_key, key)
                 pipe.execute()
                 euthanized += 1
                 logger.info(e)
@@ -277,6 +521,24 @@ class Roomba(Thread):
         logger.info('%s :: vacuum euthanized %d geriatric keys' % (skyline_app, euthanized))
         logger.info('%s :: vacuum processed %d active keys' % (skyline_app, active_keys))
         logger.info('%s :: vacuum potentially trimmed %d keys' % (skyline_app, trimmed_keys))
+        # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+        if columnar_trim_script:
+            logger.info('%s :: vacuum trimmed %d columnar keys by offset' % (skyline_app, offset_trimmed_keys))
+        # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+        logger.info('%s :: vacuum skipped %d keys with no data points older than %d seconds' % (
+            skyline_app, skipped_keys, duration))
+        logger.info('%s :: vacuum trimmed %d keys' % (skyline_app, keys_trimmed))
+        try:
+            vacuum_stats_key = ROOMBA_VACUUM_STATS_KEY % str(namespace)
+            pipe = self.redis_conn.pipeline()
+            pipe.hincrby(vacuum_stats_key, 'keys_processed', (len(assigned_metrics) - skipped_keys))
+            pipe.hincrby(vacuum_stats_key, 'keys_skipped', skipped_keys)
+            pipe.hincrby(vacuum_stats_key, 'keys_trimmed', keys_trimmed)
+            pipe.hincrby(vacuum_stats_key, 'keys_euthanized', euthanized)
+            pipe.execute()
+        except Exception as e:
+            logger.error('error :: %s :: vacuum failed to increment %s - %s' % (
+                skyline_app, vacuum_stats_key, str(e)))
 
         # sleeping in the main process is more CPU efficient than sleeping
         # in the vacuum def
@@ -389,6 +651,34 @@ class Roomba(Thread):
                     p.terminate()
                     p.join()
 
+            # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+            # Send the counts of the vacuum processes to Graphite
+            vacuum_namespaces = [('full', settings.FULL_NAMESPACE)]
+            if not self.skip_mini:
+                vacuum_namespaces.append(('mini', settings.MINI_NAMESPACE))
+            for namespace_name, namespace in vacuum_namespaces:
+                vacuum_stats_key = ROOMBA_VACUUM_STATS_KEY % str(namespace)
+                try:
+                    pipe = self.redis_conn_decoded.pipeline()
+                    pipe.hgetall(vacuum_stats_key)
+                    pipe.delete(vacuum_stats_key)
+                    vacuum_stats = pipe.execute()[0]
+                except Exception as e:
+                    logger.error('error :: %s :: failed to get %s - %s' % (
+                        skyline_app, vacuum_stats_key, str(e)))
+                    vacuum_stats = {}
+                for vacuum_stat in ROOMBA_VACUUM_STATS:
+                    value = int(vacuum_stats.get(vacuum_stat, 0))
+                    send_metric_name = '%s.%s.%s' % (
+                        skyline_app_graphite_namespace, namespace_name, vacuum_stat)
+                    try:
+                        send_graphite_metric(skyline_app, send_metric_name, value)
+                    except Exception as e:
+                        logger.error('error :: %s :: failed to send_graphite_metric %s - %s' % (
+                            skyline_app, send_metric_name, str(e)))
+                logger.info('%s :: vacuum %s namespace stats - %s' % (
+                    skyline_app, namespace_name, str(vacuum_stats)))
+
             # sleeping in the main process is more CPU efficient than sleeping
             # in the vacuum def also roomba is quite CPU intensive so we only
             # what to run roomba once every minute
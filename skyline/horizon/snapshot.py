@@ -0,0 +1,120 @@
+"""
+snapshot.py
+
+@added 20261018 - Feature #3936: METRICS_SNAPSHOT
+
+The Horizon snapshot thread, every METRICS_SNAPSHOT_INTERVAL seconds it spawns
+a process that materialises all the FULL_NAMESPACE metric time series into the
+memory mapped metrics snapshot at METRICS_SNAPSHOT_PATH.
+"""
+from __future__ import division
+from os import kill
+from multiprocessing import Process, Queue
+from threading import Thread
+from time import time, sleep
+import logging
+import traceback
+
+import sys
+import os.path
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+
+# This prevents flake8 E402 - module level import not at top of file
+if True:
+    import settings
+    from skyline_functions import (
+        get_redis_conn, get_redis_conn_decoded, send_graphite_metric)
+    from metrics_snapshot import create_metrics_snapshot, METRICS_SNAPSHOT_PATH
+
+parent_skyline_app = 'horizon'
+child_skyline_app = 'snapshot'
+skyline_app_logger = '%sLog' % parent_skyline_app
+logger = logging.getLogger(skyline_app_logger)
+skyline_app = '%s.%s' % (parent_skyline_app, child_skyline_app)
+
+try:
+    METRICS_SNAPSHOT_INTERVAL = int(settings.METRICS_SNAPSHOT_INTERVAL)
+except:
+    METRICS_SNAPSHOT_INTERVAL = 60
+
+try:
+    SERVER_METRIC_PATH = '.%s' % settings.SERVER_METRICS_NAME
+    if SERVER_METRIC_PATH == '.':
+        SERVER_METRIC_PATH = ''
+except:
+    SERVER_METRIC_PATH = ''
+skyline_app_graphite_namespace = 'skyline.%s%s.%s' % (
+    parent_skyline_app, SERVER_METRIC_PATH, child_skyline_app)
+
+
+class Snapshot(Thread):
+    """
+    The Snapshot thread creates the metrics snapshot.
+    """
+    def __init__(self, parent_pid):
+        super(Snapshot, self).__init__()
+        self.daemon = True
+        self.parent_pid = parent_pid
+
+    def check_if_parent_is_alive(self):
+        """
+        Self explanatory.
+        """
+        try:
+            kill(self.parent_pid, 0)
+        except:
+            logger.warn('warning :: parent process is dead')
+            exit(0)
+
+    def create_snapshot(self, result_queue):
+        """
+        Create the metrics snapshot in a process, so that the memory used to
+        read the time series is released when it exits.
+        """
+        try:
+            redis_conn = get_redis_conn(skyline_app)
+            redis_conn_decoded = get_redis_conn_decoded(skyline_app)
+            metrics_count, datapoints_count = create_metrics_snapshot(
+                skyline_app, redis_conn, redis_conn_decoded, METRICS_SNAPSHOT_PATH)
+            result_queue.put((metrics_count, datapoints_count))
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: %s :: failed to create the metrics snapshot' % skyline_app)
+
+    def run(self):
+        """
+        Called when the thread starts.
+        """
+        logger.info('%s :: started snapshot, creating %s every %s seconds' % (
+            skyline_app, METRICS_SNAPSHOT_PATH, str(METRICS_SNAPSHOT_INTERVAL)))
+        while 1:
+            now = time()
+            self.check_if_parent_is_alive()
+
+            result_queue = Queue()
+            p = Process(target=self.create_snapshot, args=(result_queue,))
+            p.start()
+            p.join(max(METRICS_SNAPSHOT_INTERVAL * 2, 60))
+            if p.is_alive():
+                logger.error('error :: %s :: timed out creating the metrics snapshot, terminating' % skyline_app)
+                p.terminate()
+                p.join()
+            snapshot_seconds = time() - now
+            try:
+                metrics_count, datapoints_count = result_queue.get(True, 1)
+            except:
+                metrics_count, datapoints_count = 0, 0
+            logger.info('%s :: created the metrics snapshot of %s metrics and %s data points in %.2f seconds' % (
+                skyline_app, str(metrics_count), str(datapoints_count), snapshot_seconds))
+            for metric, value in [('metrics', metrics_count), ('seconds', '%.3f' % snapshot_seconds)]:
+                send_metric_name = '%s.%s' % (skyline_app_graphite_namespace, metric)
+                try:
+                    send_graphite_metric(skyline_app, send_metric_name, value)
+                except Exception as e:
+                    logger.error('error :: %s :: failed to send_graphite_metric %s - %s' % (
+                        skyline_app, send_metric_name, str(e)))
+
+            process_runtime = time() - now
+            if process_runtime < METRICS_SNAPSHOT_INTERVAL:
+                sleep(METRICS_SNAPSHOT_INTERVAL - process_runtime)
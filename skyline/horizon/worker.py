@@ -7,7 +7,8 @@ try:
     from Queue import Empty
 except ImportError:
     from queue import Empty
-from msgpack import packb
+# @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+# from msgpack import packb
 from time import time, sleep
 
 import traceback
@@ -24,6 +25,13 @@ from sys import version_info
 
 import settings
 from skyline_functions import send_graphite_metric
+# @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+from skyline_functions import encode_horizon_datapoint
+# @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+from skyline_functions import HORIZON_OLDEST_TIMESTAMPS_KEY
+# @added 20261018 - Feature #3940: NamespaceMatcher
+from collections import OrderedDict
+from namespace_matcher import NamespaceMatcher
 
 parent_skyline_app = 'horizon'
 child_skyline_app = 'worker'
@@ -75,6 +83,43 @@ if HORIZON_SHARDS:
 #                   Branch #3262: py3
 python_version = int(version_info[0])
 
+# @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+try:
+    HORIZON_STORAGE_FORMAT = str(settings.HORIZON_STORAGE_FORMAT)
+except:
+    HORIZON_STORAGE_FORMAT = 'msgpack'
+
+# @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+try:
+    ROOMBA_INCREMENTAL = settings.ROOMBA_INCREMENTAL
+except:
+    # @modified 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+    # Opt-in
+    # ROOMBA_INCREMENTAL = True
+    ROOMBA_INCREMENTAL = False
+
+# @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+# Lower the oldest timestamp of a key (ARGV[1]) in the oldest timestamps index
+# (KEYS[1]) to the timestamp of a data point (ARGV[2]) that is older, e.g. a
+# backfilled data point.  A key that is not in the index is not added, roomba
+# adds a key with the oldest timestamp of its data when it vacuums the key.
+HORIZON_LOWER_OLDEST_TIMESTAMP_SCRIPT = """
+local oldest_timestamp = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if oldest_timestamp and tonumber(ARGV[2]) < tonumber(oldest_timestamp) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# @added 20261018 - Feature #3940: NamespaceMatcher
+# The SKIP_LIST and DO_NOT_SKIP_LIST are compiled once and the skip and shard
+# decision of each metric is cached, the metric names are mostly the same from
+# one chunk to the next.
+skip_list_matcher = NamespaceMatcher(settings.SKIP_LIST)
+do_not_skip_list_matcher = NamespaceMatcher(DO_NOT_SKIP_LIST)
+METRIC_DECISIONS_CACHE_SIZE = 100000
+
 
 class Worker(Process):
     """
@@ -104,6 +149,9 @@ class Worker(Process):
         #                   Feature #3680: horizon.worker.datapoints_sent_to_redis
         # Added worker_number
         self.worker_number = worker_number
+        # @added 20261018 - Feature #3940: NamespaceMatcher
+        # An LRU of the (skip, in_shard) decision of each metric
+        self.metric_decisions = OrderedDict()
 
     def check_if_parent_is_alive(self):
         """
@@ -117,6 +165,41 @@ class Worker(Process):
             logger.warn('warning :: parent process is dead')
             exit(0)
 
+    # @added 20261018 - Feature #3940: NamespaceMatcher
+    def metric_decision(self, metric_name):
+        """
+        Return the (skip, in_shard) decision of the metric from the LRU or
+        determine it with the compiled SKIP_LIST and DO_NOT_SKIP_LIST matchers
+        and the HORIZON_SHARDS adler32 modulo.
+        """
+        try:
+            decision = self.metric_decisions.pop(metric_name)
+            self.metric_decisions[metric_name] = decision
+            return decision
+        except KeyError:
+            pass
+
+        if python_version == 3:
+            str_metric_name = str(metric_name)
+        else:
+            str_metric_name = metric_name
+        skip = False
+        if skip_list_matcher.match(str_metric_name):
+            skip = not do_not_skip_list_matcher.match(str_metric_name)
+
+        in_shard = True
+        if HORIZON_SHARDS:
+            metric_as_bytes = str(metric_name).encode()
+            value = zlib.adler32(metric_as_bytes)
+            modulo_result = value % number_of_horizon_shards
+            in_shard = modulo_result == HORIZON_SHARD
+
+        decision = (skip, in_shard)
+        self.metric_decisions[metric_name] = decision
+        if len(self.metric_decisions) > METRIC_DECISIONS_CACHE_SIZE:
+            self.metric_decisions.popitem(last=False)
+        return decision
+
     def in_skip_list(self, metric_name):
         """
         Check if the metric is in SKIP_LIST.
@@ -134,42 +217,41 @@ class Worker(Process):
         #        return True
         # return False
 
-        # @added 20190130 - Task #2690: Test Skyline on Python-3.6.7
-        #                   Branch #3262: py3
-        #                   Bug #3266: py3 Redis binary objects not strings
-        if python_version == 3:
-            str_metric_name = str(metric_name)
-            metric_name = str_metric_name
-
-        metric_namespace_elements = metric_name.split('.')
-        process_metric = True
-
-        for to_skip in settings.SKIP_LIST:
-            if to_skip in metric_name:
-                process_metric = False
-                break
-            to_skip_namespace_elements = to_skip.split('.')
-            elements_matched = set(metric_namespace_elements) & set(to_skip_namespace_elements)
-            if len(elements_matched) == len(to_skip_namespace_elements):
-                process_metric = False
-                break
-
-        if not process_metric:
-            for do_not_skip in DO_NOT_SKIP_LIST:
-                if do_not_skip in metric_name:
-                    process_metric = True
-                    break
-                do_not_skip_namespace_elements = do_not_skip.split('.')
-                elements_matched = set(metric_namespace_elements) & set(do_not_skip_namespace_elements)
-                if len(elements_matched) == len(do_not_skip_namespace_elements):
-                    process_metric = True
-                    break
-
-        if not process_metric:
-            # skip
-            return True
-
-        return False
+        # @modified 20261018 - Feature #3940: NamespaceMatcher
+        # Use the compiled matchers and the metric decisions LRU rather than
+        # splitting the metric name and every SKIP_LIST entry for each metric
+        # # @added 20190130 - Task #2690: Test Skyline on Python-3.6.7
+        # #                   Branch #3262: py3
+        # #                   Bug #3266: py3 Redis binary objects not strings
+        # if python_version == 3:
+        #     str_metric_name = str(metric_name)
+        #     metric_name = str_metric_name
+        # metric_namespace_elements = metric_name.split('.')
+        # process_metric = True
+        # for to_skip in settings.SKIP_LIST:
+        #     if to_skip in metric_name:
+        #         process_metric = False
+        #         break
+        #     to_skip_namespace_elements = to_skip.split('.')
+        #     elements_matched = set(metric_namespace_elements) & set(to_skip_namespace_elements)
+        #     if len(elements_matched) == len(to_skip_namespace_elements):
+        #         process_metric = False
+        #         break
+        # if not process_metric:
+        #     for do_not_skip in DO_NOT_SKIP_LIST:
+        #         if do_not_skip in metric_name:
+        #             process_metric = True
+        #             break
+        #         do_not_skip_namespace_elements = do_not_skip.split('.')
+        #         elements_matched = set(metric_namespace_elements) & set(do_not_skip_namespace_elements)
+        #         if len(elements_matched) == len(do_not_skip_namespace_elements):
+        #             process_metric = True
+        #             break
+        # if not process_metric:
+        #     # skip
+        #     return True
+        # return False
+        return self.metric_decision(metric_name)[0]
 
 # @added 20201103 - Feature #3820: HORIZON_SHARDS
     def in_shard(self, metric_name):
@@ -178,14 +260,15 @@ class Worker(Process):
         """
         if not HORIZON_SHARDS:
             return True
-        metric_as_bytes = str(metric_name).encode()
-        value = zlib.adler32(metric_as_bytes)
-        modulo_result = value % number_of_horizon_shards
-        if modulo_result == HORIZON_SHARD:
-            return True
-        else:
-            return False
-        return True
+        # @modified 20261018 - Feature #3940: NamespaceMatcher
+        # metric_as_bytes = str(metric_name).encode()
+        # value = zlib.adler32(metric_as_bytes)
+        # modulo_result = value % number_of_horizon_shards
+        # if modulo_result == HORIZON_SHARD:
+        #     return True
+        # else:
+        #     return False
+        return self.metric_decision(metric_name)[1]
 
     def run(self):
         """
@@ -241,6 +324,25 @@ class Worker(Process):
         mini_uniques = '%sunique_metrics' % MINI_NAMESPACE
         pipe = self.redis_conn.pipeline()
 
+        # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+        # @modified 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+        # The worker no longer adds keys to the oldest timestamps index with
+        # the timestamp of the data point it is appending, a key can already
+        # hold older data (after an upgrade, a restart or after roomba has
+        # removed it from the index).  roomba adds each key with the oldest
+        # timestamp of its data.  The worker only lowers the oldest timestamp
+        # of an indexed key when it appends a data point that is older than
+        # any this worker has appended to the key, which covers backfilled
+        # and out of order data points.  The oldest timestamp appended to each
+        # key is recorded so that the script is sent about once per key and
+        # the record is cleared hourly.
+        full_oldest_timestamps = HORIZON_OLDEST_TIMESTAMPS_KEY % FULL_NAMESPACE
+        mini_oldest_timestamps = HORIZON_OLDEST_TIMESTAMPS_KEY % MINI_NAMESPACE
+        # oldest_timestamp_indexed_keys = set()
+        oldest_appended_timestamps = {}
+        last_oldest_timestamp_indexed_keys_reset = int(time())
+        lower_oldest_timestamp_script = self.redis_conn.register_script(HORIZON_LOWER_OLDEST_TIMESTAMP_SCRIPT)
+
         last_send_to_graphite = time()
         queue_sizes = []
 
@@ -333,8 +435,17 @@ class Worker(Process):
                     #                      Bug #3266: py3 Redis binary objects not strings
                     # pipe.append(key, packb(metric[1]))
                     # pipe.sadd(full_uniques, key)
+                    # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                    # Encode the data point in the HORIZON_STORAGE_FORMAT once
+                    # for the full and mini namespaces
                     try:
-                        pipe.append(str(key), packb(metric[1]))
+                        datapoint = encode_horizon_datapoint(metric[1], HORIZON_STORAGE_FORMAT)
+                    except Exception as e:
+                        logger.error('%s :: error encoding data point for %s: %s' % (skyline_app, str(key), str(e)))
+                        continue
+                    try:
+                        # pipe.append(str(key), packb(metric[1]))
+                        pipe.append(str(key), datapoint)
                         # @added 20200815 - Feature #3680: horizon.worker.datapoints_sent_to_redis
                         datapoints_sent_to_redis += 1
                     except Exception as e:
@@ -345,6 +456,31 @@ class Worker(Process):
                     except Exception as e:
                         logger.error('%s :: error on pipe.sadd: %s' % (skyline_app, str(e)))
 
+                    # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                    # @modified 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                    # Only lower the oldest timestamp of an indexed key
+                    # add_to_oldest_timestamps = False
+                    # if ROOMBA_INCREMENTAL and key not in oldest_timestamp_indexed_keys:
+                    #     add_to_oldest_timestamps = True
+                    #     try:
+                    #         pipe.zadd(full_oldest_timestamps, {str(key): float(metric[1][0])}, nx=True)
+                    #         oldest_timestamp_indexed_keys.add(key)
+                    #     except Exception as e:
+                    #         logger.error('%s :: error on pipe.zadd: %s' % (skyline_app, str(e)))
+                    lower_oldest_timestamp = False
+                    if ROOMBA_INCREMENTAL:
+                        try:
+                            datapoint_timestamp = float(metric[1][0])
+                            oldest_appended_timestamp = oldest_appended_timestamps.get(key)
+                            if oldest_appended_timestamp is None or datapoint_timestamp < oldest_appended_timestamp:
+                                lower_oldest_timestamp = True
+                                lower_oldest_timestamp_script(
+                                    keys=[full_oldest_timestamps],
+                                    args=[str(key), datapoint_timestamp], client=pipe)
+                                oldest_appended_timestamps[key] = datapoint_timestamp
+                        except Exception as e:
+                            logger.error('%s :: error on lower_oldest_timestamp_script: %s' % (skyline_app, str(e)))
+
                     if not self.skip_mini:
                         # Append to mini namespace
                         # @modified 20190130 - Task #2690: Test Skyline on Python-3.6.7
@@ -352,8 +488,17 @@ class Worker(Process):
                         #                      Bug #3266: py3 Redis binary objects not strings
                         # mini_key = ''.join((MINI_NAMESPACE, metric[0]))
                         mini_key = ''.join((MINI_NAMESPACE, str(metric[0])))
-                        pipe.append(mini_key, packb(metric[1]))
+                        # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                        # pipe.append(mini_key, packb(metric[1]))
+                        pipe.append(mini_key, datapoint)
                         pipe.sadd(mini_uniques, mini_key)
+                        # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+                        # if add_to_oldest_timestamps:
+                        #     pipe.zadd(mini_oldest_timestamps, {mini_key: float(metric[1][0])}, nx=True)
+                        if lower_oldest_timestamp:
+                            lower_oldest_timestamp_script(
+                                keys=[mini_oldest_timestamps],
+                                args=[mini_key, datapoint_timestamp], client=pipe)
 
                     # @modified 20190130 - Task #2690: Test Skyline on Python-3.6.7
                     #                      Branch #3262: py3
@@ -408,6 +553,12 @@ class Worker(Process):
             #                      Feature #3680: horizon.worker.datapoints_sent_to_redis
             # Send for each worker
             last_datapoints_count_to_redis = now - last_datapoints_to_redis
+
+            # @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+            if (now - last_oldest_timestamp_indexed_keys_reset) >= 3600:
+                # oldest_timestamp_indexed_keys = set()
+                oldest_appended_timestamps = {}
+                last_oldest_timestamp_indexed_keys_reset = now
             if last_datapoints_count_to_redis >= 60:
                 logger.info('%s :: datapoints_sent_to_redis in last 60 seconds - %s' % (skyline_app, str(datapoints_sent_to_redis)))
                 if self.canary:
@@ -18,6 +18,8 @@ import settings
 from skyline_functions import get_memcache_metric_object
 from database import (
     get_engine, metrics_table_meta)
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine
 
 skyline_app = 'ionosphere'
 skyline_app_logger = '%sLog' % skyline_app
@@ -69,7 +71,9 @@ def get_metrics_db_object(base_name):
     def engine_disposal(engine):
         if engine:
             try:
-                engine.dispose()
+                # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                # engine.dispose()
+                dispose_engine(skyline_app, engine)
             except:
                 logger.error(traceback.format_exc())
                 logger.error('error :: calling engine.dispose()')
@@ -0,0 +1,302 @@
+"""
+features_profile_matrix.py
+
+@added 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+
+A compiled features profile matrix per metric, the feature values of all the
+features profiles of a metric as a NumPy array of fp_ids x Skyline tsfresh
+feature ids (NaN where a features profile does not have a feature).  The
+matrix is stored in Redis as a binary blob so that it can be loaded with a
+single GET and np.frombuffer rather than a z_fp_<metric_id> query or a
+memcache literal_eval per features profile.
+
+Features profile feature values do not change once a features profile is
+created, so the matrix only needs to change when features profiles are
+created, disabled or deleted.  :func:`get_features_profile_matrix` is passed
+the fp_ids to be checked, any fp_ids that are not in the stored matrix are
+loaded from the z_fp_<metric_id> table in one query and the matrix is rebuilt
+with just the requested fp_ids and stored again.
+
+:func:`compare_features_profiles` then determines the common features sums
+and the percent_different of all the features profiles against the calculated
+features in one vectorized computation, the same values that
+Ionosphere.spin_process calculates per features profile.
+"""
+from __future__ import division
+import logging
+import struct
+import traceback
+
+import numpy as np
+
+from tsfresh_feature_names import TSFRESH_FEATURES
+
+# The Redis key of the features profile matrix of a metric by metric id
+FEATURES_PROFILE_MATRIX_KEY = 'ionosphere.features_profile_matrix.%s'
+# The matrix data does not change so the key only expires to clean up the
+# matrices of metrics that are no longer checked
+FEATURES_PROFILE_MATRIX_TTL = 86400 * 7
+
+# The blob header, a magic number, the number of fp_ids and the number of
+# feature ids, followed by the fp_ids and feature ids as little endian int64
+# and the values matrix as little endian float64
+FEATURES_PROFILE_MATRIX_MAGIC = b'FPM1'
+_features_profile_matrix_header = struct.Struct('<4sII')
+
+TSFRESH_FEATURE_IDS = dict((name, int(feature_id)) for feature_id, name in TSFRESH_FEATURES)
+
+
+def encode_features_profile_matrix(fp_ids, feature_ids, values):
+    """
+    Encode a features profile matrix as a binary blob.
+
+    :param fp_ids: the fp_ids of the rows
+    :param feature_ids: the Skyline tsfresh feature ids of the columns
+    :param values: the feature values, a 2D array of len(fp_ids) x
+        len(feature_ids) with NaN where a features profile does not have a
+        feature
+    :type fp_ids: numpy.ndarray
+    :type feature_ids: numpy.ndarray
+    :type values: numpy.ndarray
+    :return: blob
+    :rtype: bytes
+
+    """
+    header = _features_profile_matrix_header.pack(
+        FEATURES_PROFILE_MATRIX_MAGIC, len(fp_ids), len(feature_ids))
+    return b''.join([
+        header,
+        np.asarray(fp_ids, dtype='<i8').tobytes(),
+        np.asarray(feature_ids, dtype='<i8').tobytes(),
+        np.asarray(values, dtype='<f8').tobytes()])
+
+
+def decode_features_profile_matrix(blob):
+    """
+    Decode a features profile matrix blob created by
+    :func:`encode_features_profile_matrix`.
+
+    :param blob: the blob
+    :type blob: bytes
+    :return: (fp_ids, feature_ids, values) or None if the blob is not valid
+    :rtype: tuple
+
+    """
+    if not blob or len(blob) < _features_profile_matrix_header.size:
+        return None
+    magic, fp_count, feature_count = _features_profile_matrix_header.unpack_from(blob)
+    if magic != FEATURES_PROFILE_MATRIX_MAGIC:
+        return None
+    offset = _features_profile_matrix_header.size
+    expected_length = offset + (8 * fp_count) + (8 * feature_count) + (8 * fp_count * feature_count)
+    if len(blob) != expected_length:
+        return None
+    fp_ids = np.frombuffer(blob, dtype='<i8', count=fp_count, offset=offset).astype(np.int64)
+    offset += 8 * fp_count
+    feature_ids = np.frombuffer(blob, dtype='<i8', count=feature_count, offset=offset).astype(np.int64)
+    offset += 8 * feature_count
+    values = np.frombuffer(
+        blob, dtype='<f8', count=(fp_count * feature_count),
+        offset=offset).astype(np.float64).reshape((fp_count, feature_count))
+    return fp_ids, feature_ids, values
+
+
+def build_features_profile_matrix(fp_feature_rows, fp_ids=None):
+    """
+    Build a features profile matrix from (fp_id, feature_id, value) rows, as
+    in the z_fp_<metric_id> table.
+
+    :param fp_feature_rows: the (fp_id, feature_id, value) rows
+    :param fp_ids: the fp_ids in the order of the matrix rows, the sorted
+        fp_ids of the rows if not passed.  fp_ids without rows are not
+        included.
+    :type fp_feature_rows: list
+    :type fp_ids: list
+    :return: (fp_ids, feature_ids, values)
+    :rtype: tuple
+
+    """
+    fp_feature_rows = list(fp_feature_rows)
+    if fp_feature_rows:
+        rows = np.array(fp_feature_rows, dtype=np.float64)
+        row_fp_ids = rows[:, 0].astype(np.int64)
+        row_feature_ids = rows[:, 1].astype(np.int64)
+        row_values = rows[:, 2]
+    else:
+        row_fp_ids = np.empty(0, dtype=np.int64)
+        row_feature_ids = np.empty(0, dtype=np.int64)
+        row_values = np.empty(0, dtype=np.float64)
+    present_fp_ids = set(row_fp_ids.tolist())
+    if fp_ids is None:
+        fp_ids = sorted(present_fp_ids)
+    fp_ids = np.array([int(fp_id) for fp_id in fp_ids if int(fp_id) in present_fp_ids], dtype=np.int64)
+    feature_ids = np.unique(row_feature_ids)
+    values = np.full((len(fp_ids), len(feature_ids)), np.nan)
+    if len(fp_ids):
+        fp_index = dict((fp_id, index) for index, fp_id in enumerate(fp_ids.tolist()))
+        rows_index = np.array([fp_index.get(fp_id, -1) for fp_id in row_fp_ids.tolist()], dtype=np.int64)
+        in_matrix = rows_index >= 0
+        columns_index = np.searchsorted(feature_ids, row_feature_ids)
+        values[rows_index[in_matrix], columns_index[in_matrix]] = row_values[in_matrix]
+    return fp_ids, feature_ids, values
+
+
+def merge_features_profile_matrices(matrix, other_matrix, fp_ids):
+    """
+    Merge two features profile matrices into one matrix with the rows of
+    fp_ids, in the order of fp_ids.  Where an fp_id is in both matrices the
+    row of matrix is used.
+    """
+    all_feature_ids = np.union1d(matrix[1], other_matrix[1]).astype(np.int64)
+    rows = []
+    row_fp_ids = []
+    matrix_rows = dict((fp_id, index) for index, fp_id in enumerate(matrix[0].tolist()))
+    other_matrix_rows = dict((fp_id, index) for index, fp_id in enumerate(other_matrix[0].tolist()))
+    for fp_id in fp_ids:
+        fp_id = int(fp_id)
+        if fp_id in matrix_rows:
+            source, index = matrix, matrix_rows[fp_id]
+        elif fp_id in other_matrix_rows:
+            source, index = other_matrix, other_matrix_rows[fp_id]
+        else:
+            continue
+        row = np.full(len(all_feature_ids), np.nan)
+        row[np.searchsorted(all_feature_ids, source[1])] = source[2][index]
+        rows.append(row)
+        row_fp_ids.append(fp_id)
+    if rows:
+        values = np.vstack(rows)
+    else:
+        values = np.full((0, len(all_feature_ids)), np.nan)
+    return np.array(row_fp_ids, dtype=np.int64), all_feature_ids, values
+
+
+def get_features_profile_matrix(current_skyline_app, redis_conn, engine, metric_id, fp_ids):
+    """
+    Get the features profile matrix of a metric for fp_ids from Redis, loading
+    any fp_ids that are not in the stored matrix from the z_fp_<metric_id>
+    table and storing the rebuilt matrix in Redis.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param redis_conn: a Redis connection that is not decoded
+    :param engine: a SQLAlchemy engine
+    :param metric_id: the metric id
+    :param fp_ids: the fp_ids to be checked
+    :type current_skyline_app: str
+    :type redis_conn: object
+    :type engine: object
+    :type metric_id: int
+    :type fp_ids: list
+    :return: (fp_ids, feature_ids, values), the rows in the order of the
+        passed fp_ids, an fp_id that has no features is not included
+    :rtype: tuple
+
+    """
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+
+    fp_ids = [int(fp_id) for fp_id in fp_ids]
+    matrix_key = FEATURES_PROFILE_MATRIX_KEY % str(metric_id)
+    stored_matrix = None
+    try:
+        stored_matrix = decode_features_profile_matrix(redis_conn.get(matrix_key))
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: get_features_profile_matrix :: failed to get %s from Redis' % matrix_key)
+    if stored_matrix is None:
+        stored_matrix = (
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+            np.full((0, 0), np.nan))
+
+    stored_fp_ids = set(stored_matrix[0].tolist())
+    missing_fp_ids = [fp_id for fp_id in fp_ids if fp_id not in stored_fp_ids]
+    if not missing_fp_ids and len(stored_fp_ids) == len(set(fp_ids)):
+        return merge_features_profile_matrices(stored_matrix, stored_matrix, fp_ids)
+
+    fp_feature_rows = []
+    if missing_fp_ids:
+        metric_fp_table = 'z_fp_%s' % str(int(metric_id))
+        # Added nosec to exclude from bandit tests, all the interpolated values
+        # are ints
+        stmt = 'SELECT fp_id, feature_id, value FROM %s WHERE fp_id IN (%s)' % (  # nosec
+            metric_fp_table, ', '.join([str(fp_id) for fp_id in missing_fp_ids]))
+        connection = engine.connect()
+        try:
+            for row in connection.execute(stmt):
+                fp_feature_rows.append((int(row['fp_id']), int(row['feature_id']), float(row['value'])))
+        finally:
+            connection.close()
+        current_logger.info('get_features_profile_matrix :: loaded %s features for %s fp_ids from %s' % (
+            str(len(fp_feature_rows)), str(len(missing_fp_ids)), metric_fp_table))
+    loaded_matrix = build_features_profile_matrix(fp_feature_rows, missing_fp_ids)
+    matrix = merge_features_profile_matrices(stored_matrix, loaded_matrix, fp_ids)
+    try:
+        redis_conn.setex(
+            matrix_key, FEATURES_PROFILE_MATRIX_TTL,
+            encode_features_profile_matrix(*matrix))
+        current_logger.info('get_features_profile_matrix :: stored the features profile matrix of %s fp_ids x %s features in %s' % (
+            str(len(matrix[0])), str(len(matrix[1])), matrix_key))
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: get_features_profile_matrix :: failed to set %s in Redis' % matrix_key)
+    return matrix
+
+
+def compare_features_profiles(matrix, calculated_features):
+    """
+    Compare the calculated features with all the features profiles in the
+    matrix, as Ionosphere.spin_process does per features profile, the sums of
+    the values of the features common to the calculated features and each
+    features profile and the percent_different between the sums.
+
+    :param matrix: (fp_ids, feature_ids, values) as returned by
+        :func:`get_features_profile_matrix`
+    :param calculated_features: the (feature_name, calc_value) items as
+        returned by get_calculated_features
+    :type matrix: tuple
+    :type calculated_features: list
+    :return: a dictionary of fp_id: results dict with the keys
+        ``common_features_count``, ``sum_fp_values``, ``sum_calc_values``,
+        ``percent_different`` and ``almost_equal``
+    :rtype: dict
+
+    """
+    fp_ids, feature_ids, values = matrix
+    results = {}
+    if not len(fp_ids) or not len(feature_ids):
+        return results
+
+    # The count and sum of the calculated values of each feature id, if a
+    # feature is calculated more than once each is compared, as per the
+    # nested loops in spin_process
+    calc_counts = np.zeros(len(feature_ids))
+    calc_sums = np.zeros(len(feature_ids))
+    for feature_name, calc_value in calculated_features:
+        feature_id = TSFRESH_FEATURE_IDS.get(feature_name)
+        if feature_id is None:
+            continue
+        column = np.searchsorted(feature_ids, feature_id)
+        if column < len(feature_ids) and feature_ids[column] == feature_id:
+            calc_counts[column] += 1
+            calc_sums[column] += float(calc_value)
+
+    present = ~np.isnan(values)
+    fp_values = np.where(present, values, 0.0)
+    common_features_counts = present.astype(np.float64).dot(calc_counts)
+    sum_fp_values = fp_values.dot(calc_counts)
+    sum_calc_values = present.astype(np.float64).dot(calc_sums)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_different = (sum_calc_values - sum_fp_values) / sum_fp_values * 100.
+    # As np.testing.assert_array_almost_equal with the default decimal of 6
+    almost_equal = (np.abs(sum_fp_values - sum_calc_values) < 1.5 * 10 ** -6) | (sum_fp_values == sum_calc_values)
+
+    for index, fp_id in enumerate(fp_ids.tolist()):
+        results[fp_id] = {
+            'common_features_count': int(common_features_counts[index]),
+            'sum_fp_values': float(sum_fp_values[index]),
+            'sum_calc_values': float(sum_calc_values[index]),
+            'percent_different': float(percent_different[index]),
+            'almost_equal': bool(almost_equal[index]),
+        }
+    return results
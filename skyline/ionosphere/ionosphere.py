@@ -90,6 +90,8 @@ from database import (
     # Readded metrics_table to set ionosphere_enabled to 0 if a metric has no
     # fps enabled and has been willy nillied
     metrics_table_meta)
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine, reflect_static_tables
 
 from tsfresh_feature_names import TSFRESH_FEATURES
 
@@ -107,6 +109,9 @@ from common_functions import (
     get_metrics_db_object, get_calculated_features)
 # @added 20190327 - Feature #2484
 from echo import ionosphere_echo
+# @added 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+from features_profile_matrix import (
+    get_features_profile_matrix, compare_features_profiles)
 
 skyline_app = 'ionosphere'
 skyline_app_logger = '%sLog' % skyline_app
@@ -198,6 +203,12 @@ try:
 except:
     IONOSPHERE_CUSTOM_KEEP_TRAINING_TIMESERIES_FOR = []
 
+# @added 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+try:
+    IONOSPHERE_FEATURES_PROFILE_MATRIX = settings.IONOSPHERE_FEATURES_PROFILE_MATRIX
+except:
+    IONOSPHERE_FEATURES_PROFILE_MATRIX = False
+
 skyline_app_graphite_namespace = 'skyline.%s%s' % (skyline_app, SERVER_METRIC_PATH)
 
 max_age_seconds = settings.IONOSPHERE_CHECK_MAX_AGE
@@ -861,7 +872,9 @@ class Ionosphere(Thread):
 
         if engine:
             try:
-                engine.dispose()
+                # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                # engine.dispose()
+                dispose_engine(skyline_app, engine)
             except:
                 logger.error(traceback.format_exc())
                 logger.error('error :: calling engine.dispose()')
@@ -1144,7 +1157,9 @@ class Ionosphere(Thread):
         def engine_disposal(engine):
             if engine:
                 try:
-                    engine.dispose()
+                    # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                    # engine.dispose()
+                    dispose_engine(skyline_app, engine)
                 except:
                     logger.error(traceback.format_exc())
                     logger.error('error :: calling engine.dispose()')
@@ -2450,6 +2465,35 @@ class Ionosphere(Thread):
                 logger.error(traceback.format_exc())
                 logger.error('error :: failed to process echo')
 
+        # @added 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+        # Compare the calculated features with all the features profiles in a
+        # single vectorized computation on the metric features profile matrix
+        # and use the results for each fp_id in the fp_ids loop below, rather
+        # than getting and comparing the features of each features profile
+        fp_matrix_results = {}
+        if IONOSPHERE_FEATURES_PROFILE_MATRIX and calculated_feature_file_found and metrics_id and fp_ids:
+            if not engine:
+                try:
+                    engine, log_msg, trace = get_an_engine()
+                except:
+                    logger.error(traceback.format_exc())
+                    logger.error('error :: could not get a MySQL engine for the features profile matrix')
+            try:
+                start_fp_matrix = time()
+                features_profile_matrix = get_features_profile_matrix(
+                    skyline_app, self.redis_conn, engine, metrics_id, fp_ids)
+                fp_matrix_results['ionosphere'] = compare_features_profiles(
+                    features_profile_matrix, calculated_features)
+                if echo_check and echo_calculated_features:
+                    fp_matrix_results['ionosphere_echo_check'] = compare_features_profiles(
+                        features_profile_matrix, echo_calculated_features)
+                logger.info('compared the calculated features with %s features profiles from the features profile matrix in %.6f seconds' % (
+                    str(len(features_profile_matrix[0])), (time() - start_fp_matrix)))
+            except:
+                logger.error(traceback.format_exc())
+                logger.error('error :: failed to compare the calculated features with the features profile matrix, comparing per features profile')
+                fp_matrix_results = {}
+
         # Compare calculated features to feature values for each fp id
         not_anomalous = False
         if calculated_feature_file_found:
@@ -2505,6 +2549,15 @@ class Ionosphere(Thread):
                 # features profile is the same full_duration
                 metric_fp_table = 'z_fp_%s' % str(metrics_id)
 
+                # @added 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+                # If the features profile was compared in the features profile
+                # matrix, the features are not fetched and compared again
+                fp_matrix_result = None
+                try:
+                    fp_matrix_result = fp_matrix_results[check_type][int(fp_id)]
+                except KeyError:
+                    fp_matrix_result = None
+
                 # @added 20170804 - Bug #2130: MySQL - Aborted_clients
                 # Set a conditional here to only get_an_engine if no engine, this
                 # is probably responsible for the Aborted_clients, as it would have
@@ -2524,7 +2577,9 @@ class Ionosphere(Thread):
                 # First check to determine if the fp_id has data in memcache
                 # before querying the database
                 fp_id_feature_values = None
-                if settings.MEMCACHE_ENABLED:
+                # @modified 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+                # if settings.MEMCACHE_ENABLED:
+                if settings.MEMCACHE_ENABLED and not fp_matrix_result:
                     fp_id_feature_values_key = 'fp.id.%s.feature.values' % str(fp_id)
                     try:
                         # @modified 20191029 - Task #3304: py3 - handle pymemcache bytes not str
@@ -2552,7 +2607,9 @@ class Ionosphere(Thread):
                         fp_features = literal_eval(fp_id_feature_values)
                         logger.info('using memcache %s key data' % fp_id_feature_values_key)
 
-                if not fp_features:
+                # @modified 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+                # if not fp_features:
+                if not fp_features and not fp_matrix_result:
                     try:
                         # @modified 20170913 - Task #2160: Test skyline with bandit
                         # Added nosec to exclude from bandit tests
@@ -2604,21 +2661,26 @@ class Ionosphere(Thread):
                 all_calc_features_sum = sum(all_calc_features_sum_list)
 
                 # Convert feature names in calculated_features to their id
-                logger.info('converting tsfresh feature names to Skyline feature ids')
+                # @modified 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+                # Not required if the features profile was compared in the
+                # features profile matrix
                 calc_features_by_id = []
-                # @modified 20190327 - Feature #2484: FULL_DURATION feature profiles
-                # Bifurcate for ionosphere_echo_check
-                # for feature_name, calc_value in calculated_features:
-                for feature_name, calc_value in use_calculated_features:
-                    for skyline_feature_id, name in TSFRESH_FEATURES:
-                        if feature_name == name:
-                            calc_features_by_id.append([skyline_feature_id, float(calc_value)])
+                if not fp_matrix_result:
+                    logger.info('converting tsfresh feature names to Skyline feature ids')
+                    # @modified 20190327 - Feature #2484: FULL_DURATION feature profiles
+                    # Bifurcate for ionosphere_echo_check
+                    # for feature_name, calc_value in calculated_features:
+                    for feature_name, calc_value in use_calculated_features:
+                        for skyline_feature_id, name in TSFRESH_FEATURES:
+                            if feature_name == name:
+                                calc_features_by_id.append([skyline_feature_id, float(calc_value)])
 
                 # Determine what features each data has, extract only values for
                 # common features.
-                logger.info('determining common features')
                 relevant_fp_feature_values = []
                 relevant_calc_feature_values = []
+                if not fp_matrix_result:
+                    logger.info('determining common features')
                 for skyline_feature_id, calc_value in calc_features_by_id:
                     for fp_feature_id, fp_value in fp_features:
                         if skyline_feature_id == fp_feature_id:
@@ -2628,6 +2690,11 @@ class Ionosphere(Thread):
                 # Determine the sum of each set
                 relevant_fp_feature_values_count = len(relevant_fp_feature_values)
                 relevant_calc_feature_values_count = len(relevant_calc_feature_values)
+                # @added 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+                if fp_matrix_result:
+                    logger.info('using the features profile matrix common features of fp_id %s' % str(fp_id))
+                    relevant_fp_feature_values_count = fp_matrix_result['common_features_count']
+                    relevant_calc_feature_values_count = fp_matrix_result['common_features_count']
                 if relevant_fp_feature_values_count != relevant_calc_feature_values_count:
                     logger.error('error :: mismatch in number of common features')
                     logger.error('error :: relevant_fp_feature_values_count - %s' % str(relevant_fp_feature_values_count))
@@ -2643,6 +2710,10 @@ class Ionosphere(Thread):
                 # Determine the sum of each set
                 sum_fp_values = sum(relevant_fp_feature_values)
                 sum_calc_values = sum(relevant_calc_feature_values)
+                # @added 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+                if fp_matrix_result:
+                    sum_fp_values = fp_matrix_result['sum_fp_values']
+                    sum_calc_values = fp_matrix_result['sum_calc_values']
                 logger.info(
                     'sum of the values of the %s common features in features profile - %s' % (
                         str(relevant_fp_feature_values_count), str(sum_fp_values)))
@@ -2662,21 +2733,32 @@ class Ionosphere(Thread):
 
                 percent_different = 100
                 sums_array = np.array([sum_fp_values, sum_calc_values], dtype=float)
-                try:
-                    calc_percent_different = np.diff(sums_array) / sums_array[:-1] * 100.
-                    percent_different = calc_percent_different[0]
+                # @modified 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+                # Use the percent_different calculated in the features profile
+                # matrix comparison
+                # try:
+                if not fp_matrix_result:
+                    try:
+                        calc_percent_different = np.diff(sums_array) / sums_array[:-1] * 100.
+                        percent_different = calc_percent_different[0]
+                        logger.info('percent_different between common features sums - %s' % str(percent_different))
+                    except:
+                        logger.error(traceback.format_exc())
+                        logger.error('error :: failed to calculate percent_different')
+                        continue
+                else:
+                    percent_different = fp_matrix_result['percent_different']
                     logger.info('percent_different between common features sums - %s' % str(percent_different))
-                except:
-                    logger.error(traceback.format_exc())
-                    logger.error('error :: failed to calculate percent_different')
-                    continue
 
                 almost_equal = None
-                try:
-                    np.testing.assert_array_almost_equal(fp_sum_array, calc_sum_array)
-                    almost_equal = True
-                except:
-                    almost_equal = False
+                if not fp_matrix_result:
+                    try:
+                        np.testing.assert_array_almost_equal(fp_sum_array, calc_sum_array)
+                        almost_equal = True
+                    except:
+                        almost_equal = False
+                else:
+                    almost_equal = fp_matrix_result['almost_equal']
 
                 if almost_equal:
                     not_anomalous = True
@@ -3858,6 +3940,12 @@ class Ionosphere(Thread):
         # @added 20190524 - Bug #3050: Ionosphere - Skyline and Graphite feedback
         logger.info('SKYLINE_FEEDBACK_NAMESPACES is set to %s' % str(SKYLINE_FEEDBACK_NAMESPACES))
 
+        # @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # Reflect the tables before any check processes are spawned so that
+        # every check process inherits the table meta rather than reflecting
+        # the tables for each check
+        reflect_static_tables(skyline_app)
+
         while True:
             now = time()
 
@@ -25,6 +25,8 @@ import settings
 from database import (
     get_engine, ionosphere_layers_table_meta, layers_algorithms_table_meta,
     ionosphere_layers_matched_table_meta)
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine
 
 skyline_app = 'ionosphere'
 skyline_app_logger = '%sLog' % skyline_app
@@ -96,7 +98,9 @@ def run_layer_algorithms(base_name, layers_id, timeseries, layers_count, layers_
         try:
             if engine:
                 try:
-                    engine.dispose()
+                    # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                    # engine.dispose()
+                    dispose_engine(skyline_app, engine)
                     logger.info('layers :: MySQL engine disposed of')
                     return True
                 except:
@@ -36,6 +36,8 @@ from features_profile import calculate_features_profile
 
 from database import (
     get_engine, ionosphere_table_meta, metrics_table_meta)
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine
 
 # @added 2017014 - Feature #1854: Ionosphere learn
 from ionosphere_functions import create_features_profile
@@ -448,7 +450,9 @@ def ionosphere_learn(timestamp):
         try:
             if engine:
                 try:
-                    engine.dispose()
+                    # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                    # engine.dispose()
+                    dispose_engine(skyline_app, engine)
                     logger.info('learn :: MySQL engine disposed of')
                     return True
                 except:
@@ -26,7 +26,11 @@ from sqlalchemy.dialects.mysql import DOUBLE
 
 from sqlalchemy.sql import select
 # import json
-from tsfresh import __version__ as tsfresh_version
+# @modified 20261018 - Feature #3934: Lazy imports
+# tsfresh is only imported when a features profile is created so that the apps
+# that import this module, e.g. panorama and the webapp, do not pay the tsfresh
+# import cost at startup
+# from tsfresh import __version__ as tsfresh_version
 
 import settings
 import skyline_version
@@ -44,6 +48,8 @@ from database import (
     # @added 20190501 - Branch #2646: slack
     anomalies_table_meta,
 )
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine, get_cached_table_meta, cache_table_meta
 # @added 20190502 - Branch #2646: slack
 from slack_functions import slack_post_message, slack_post_reaction
 
@@ -104,7 +110,9 @@ def fp_create_engine_disposal(current_skyline_app, engine):
     if engine:
         current_logger.error('fp_create_engine_disposal :: calling engine.dispose()')
         try:
-            engine.dispose()
+            # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+            # engine.dispose()
+            dispose_engine(current_skyline_app, engine)
         except:
             current_logger.error(traceback.format_exc())
             current_logger.error('error :: fp_create_engine_disposal :: calling engine.dispose()')
@@ -365,6 +373,9 @@ def create_features_profile(current_skyline_app, requested_timestamp, data_for_m
     :rtype: str, boolean, boolean, str, str
 
     """
+    # @added 20261018 - Feature #3934: Lazy imports
+    from tsfresh import __version__ as tsfresh_version
+
     try:
         python_version
     except:
@@ -936,7 +947,12 @@ def create_features_profile(current_skyline_app, requested_timestamp, data_for_m
             # Removed as under MySQL 5.7 breaks
             # mysql_key_block_size='255',
             mysql_engine='InnoDB')
-        fp_metric_table.create(engine, checkfirst=True)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # Only check for and create the table once per process
+        # fp_metric_table.create(engine, checkfirst=True)
+        if get_cached_table_meta(fp_table_name) is None:
+            fp_metric_table.create(engine, checkfirst=True)
+            cache_table_meta(fp_metric_table)
         fp_table_created = True
     except:
         trace = traceback.format_exc()
@@ -1033,7 +1049,12 @@ def create_features_profile(current_skyline_app, requested_timestamp, data_for_m
             # Removed as under MySQL 5.7 breaks
             # mysql_key_block_size='255',
             mysql_engine='InnoDB')
-        ts_metric_table.create(engine, checkfirst=True)
+        # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # Only check for and create the table once per process
+        # ts_metric_table.create(engine, checkfirst=True)
+        if get_cached_table_meta(ts_table_name) is None:
+            ts_metric_table.create(engine, checkfirst=True)
+            cache_table_meta(ts_metric_table)
         # ts_table_created = True
         current_logger.info('create_features_profile :: metric ts table created OK - %s' % (ts_table_name))
     except:
@@ -0,0 +1,471 @@
+"""
+correlations_vectorized.py
+
+@added 20261018 - Feature #3912: LUMINOSITY_VECTORIZED_CORRELATIONS
+
+A vectorized version of the luminol cross correlation that
+:func:`luminosity.process_correlations.get_correlations` runs per metric.
+Rather than creating a luminol Correlator per metric per anomaly, the
+correlation window of every candidate metric is cropped from its time series
+with a binary search, the candidate windows are aligned with the anomalous
+window into a single resampled NumPy matrix per metric resolution and the
+luminol cross correlation coefficient, shift and shifted coefficient are
+calculated for all the candidates at once.
+
+The alignment and cross correlation replicate luminol's
+``TimeSeries.align`` and ``CrossCorrelator`` so that the results are the same
+as the luminol Correlator to within floating point summation differences,
+see ``utils/luminosity_correlations_benchmark.py`` for the accuracy benchmark.
+
+Candidate windows that cannot be correlated are pre-filtered before the
+matrices are built, windows with less than 2 data points (luminol
+NotEnoughDataPoints) and all the windows of a metric resolution that has no
+anomalies in its anomaly window or less than 2 data points in the anomalous
+window.
+"""
+from __future__ import division
+import logging
+from timeit import default_timer as timer
+
+import numpy as np
+
+from skyline_functions import decode_timeseries
+
+skyline_app = 'luminosity'
+skyline_app_logger = '%sLog' % skyline_app
+logger = logging.getLogger(skyline_app_logger)
+
+# The luminol CrossCorrelator defaults, these are the values used by the
+# luminol Correlator that Luminosity runs
+LUMINOL_DEFAULT_ALLOWED_SHIFT_SECONDS = 60
+LUMINOL_DEFAULT_SHIFT_IMPACT = 0.05
+
+CORRELATION_STAGES = ['decode', 'prefilter', 'align', 'correlate', 'results']
+
+
+def determine_resolution_array(timestamps):
+    """
+    Determine the resolution of a timestamps array, the same as
+    :func:`luminosity.process_correlations.determine_resolution`.
+
+    :param timestamps: the timestamps
+    :type timestamps: numpy.ndarray
+    :return: resolution
+    :rtype: int
+
+    """
+    resolution = 60
+    try:
+        ts_resolution = int(timestamps[-1]) - int(timestamps[-2])
+        if ts_resolution != 60:
+            resolution = ts_resolution
+        if ts_resolution > 3601:
+            ts_resolution = int(timestamps[-3]) - int(timestamps[-4])
+        if ts_resolution != 60:
+            resolution = ts_resolution
+    except:
+        pass
+    return resolution
+
+
+def timeseries_to_arrays(timeseries):
+    """
+    Convert a time series into int64 timestamps and float64 values arrays
+    sorted by timestamp.  The timestamps are truncated to ints as Luminosity
+    does with int(ts).
+
+    :param timeseries: a Redis msgpack or columnar time series, a timestamp
+        and value structured array as returned by
+        :func:`skyline_functions.decode_timeseries` or a list of
+        (timestamp, value) items
+    :type timeseries: bytes or numpy.ndarray or list
+    :return: (timestamps, values)
+    :rtype: tuple
+
+    """
+    if isinstance(timeseries, (bytes, bytearray)):
+        timeseries = decode_timeseries(timeseries)
+    if isinstance(timeseries, np.ndarray) and timeseries.dtype.names:
+        # decode_timeseries arrays are already sorted
+        return (timeseries['timestamp'].astype(np.int64, copy=False),
+                timeseries['value'].astype(np.float64, copy=False))
+    if not len(timeseries):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    timestamps = np.array([item[0] for item in timeseries], dtype=np.float64).astype(np.int64)
+    values = np.array([item[1] for item in timeseries], dtype=np.float64)
+    if len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind='mergesort')
+        timestamps = timestamps[order]
+        values = values[order]
+    return timestamps, values
+
+
+def non_negative_derivative_arrays(timestamps, values):
+    """
+    The vectorized equivalent of :func:`skyline_functions.nonNegativeDerivative`,
+    the first data point and any data point that trends down are dropped.
+
+    :param timestamps: the sorted timestamps
+    :param values: the values
+    :type timestamps: numpy.ndarray
+    :type values: numpy.ndarray
+    :return: (timestamps, values)
+    :rtype: tuple
+
+    """
+    if len(values) < 2:
+        return timestamps[:0], values[:0]
+    diffs = np.diff(values)
+    with np.errstate(invalid='ignore'):
+        keep = diffs >= 0
+    return timestamps[1:][keep], diffs[keep]
+
+
+def crop_window(timestamps, values, start, end):
+    """
+    Crop the data points with start <= timestamp <= end from sorted arrays,
+    where a timestamp occurs more than once the last data point is kept, as
+    it is when the data points are converted to a dict.
+
+    :return: (timestamps, values)
+    :rtype: tuple
+
+    """
+    start_index = np.searchsorted(timestamps, start, side='left')
+    end_index = np.searchsorted(timestamps, end, side='right')
+    window_timestamps = timestamps[start_index:end_index]
+    window_values = values[start_index:end_index]
+    if len(window_timestamps) > 1:
+        last = np.append(window_timestamps[1:] != window_timestamps[:-1], True)
+        if not last.all():
+            window_timestamps = window_timestamps[last]
+            window_values = window_values[last]
+    return window_timestamps, window_values
+
+
+def luminol_allowed_shift(residual_timestamps, max_shift):
+    """
+    The number of shift steps allowed by the luminol CrossCorrelator, this
+    replicates the ``_find_allowed_shift`` binary search exactly, including
+    when the window is longer than the maximum shift.
+    """
+    lower_bound = 0
+    upper_bound = len(residual_timestamps)
+    pos = 0
+    while lower_bound < upper_bound:
+        pos = int(lower_bound + (upper_bound - lower_bound) / 2)
+        if residual_timestamps[pos] > max_shift:
+            upper_bound = pos
+        else:
+            lower_bound = pos + 1
+    return pos
+
+
+def align_windows(anomaly_timestamps, anomaly_values, timestamps, values, lengths):
+    """
+    Align the anomalous window with each candidate window on the union of
+    their timestamps as luminol ``TimeSeries.align`` does, a series is
+    resampled at a timestamp with its first value at or after the timestamp
+    or with its last value after its last timestamp.
+
+    :param anomaly_timestamps: the anomalous window timestamps
+    :param anomaly_values: the anomalous window values
+    :param timestamps: the candidate window timestamps, a 2D array padded with
+        the int64 maximum after each row length
+    :param values: the candidate window values, a 2D array
+    :param lengths: the number of data points in each candidate window
+    :type anomaly_timestamps: numpy.ndarray
+    :type anomaly_values: numpy.ndarray
+    :type timestamps: numpy.ndarray
+    :type values: numpy.ndarray
+    :type lengths: numpy.ndarray
+    :return: (union_timestamps, aligned_anomaly, aligned_candidates,
+        union_lengths), 2D arrays padded after each union length
+    :rtype: tuple
+
+    """
+    rows = timestamps.shape[0]
+    pad = np.iinfo(np.int64).max
+    anomaly_length = len(anomaly_timestamps)
+
+    # The sorted union of the timestamps of each row with the duplicates
+    # moved to the end as padding
+    union = np.concatenate(
+        (np.broadcast_to(anomaly_timestamps, (rows, anomaly_length)), timestamps), axis=1)
+    union.sort(axis=1)
+    duplicates = np.zeros(union.shape, dtype=bool)
+    duplicates[:, 1:] = union[:, 1:] == union[:, :-1]
+    union[duplicates] = pad
+    union.sort(axis=1)
+    union_lengths = (union != pad).sum(axis=1)
+    union = union[:, :int(union_lengths.max())]
+
+    # The index of the first timestamp at or after each union timestamp
+    anomaly_index = (anomaly_timestamps[np.newaxis, np.newaxis, :] < union[:, :, np.newaxis]).sum(axis=2)
+    anomaly_index = np.minimum(anomaly_index, anomaly_length - 1)
+    aligned_anomaly = anomaly_values[anomaly_index]
+
+    candidate_index = (timestamps[:, np.newaxis, :] < union[:, :, np.newaxis]).sum(axis=2)
+    candidate_index = np.minimum(candidate_index, (lengths - 1)[:, np.newaxis])
+    aligned_candidates = np.take_along_axis(values, candidate_index, axis=1)
+
+    valid = np.arange(union.shape[1])[np.newaxis, :] < union_lengths[:, np.newaxis]
+    aligned_anomaly = np.where(valid, aligned_anomaly, 0.0)
+    aligned_candidates = np.where(valid, aligned_candidates, 0.0)
+    return union, aligned_anomaly, aligned_candidates, union_lengths
+
+
+def cross_correlate(
+        union_timestamps, aligned_a, aligned_b, lengths,
+        max_shift_seconds=LUMINOL_DEFAULT_ALLOWED_SHIFT_SECONDS,
+        shift_impact=LUMINOL_DEFAULT_SHIFT_IMPACT):
+    """
+    Calculate the luminol CrossCorrelator correlation result for each row of
+    aligned series.
+
+    :param union_timestamps: the aligned timestamps, a 2D array
+    :param aligned_a: the aligned normalised anomalous series, a 2D array
+        zero padded after each row length
+    :param aligned_b: the aligned normalised candidate series, a 2D array
+        zero padded after each row length
+    :param lengths: the length of each row
+    :param max_shift_seconds: the luminol max_shift_seconds
+    :param shift_impact: the luminol shift_impact
+    :type union_timestamps: numpy.ndarray
+    :type aligned_a: numpy.ndarray
+    :type aligned_b: numpy.ndarray
+    :type lengths: numpy.ndarray
+    :type max_shift_seconds: int
+    :type shift_impact: float
+    :return: (coefficients, shifts, shifted_coefficients)
+    :rtype: tuple
+
+    """
+    rows, columns = aligned_a.shape
+    valid = np.arange(columns)[np.newaxis, :] < lengths[:, np.newaxis]
+    n = lengths.astype(np.float64)
+    a_avg = aligned_a.sum(axis=1) / n
+    b_avg = aligned_b.sum(axis=1) / n
+    a_centred = np.where(valid, aligned_a - a_avg[:, np.newaxis], 0.0)
+    b_centred = np.where(valid, aligned_b - b_avg[:, np.newaxis], 0.0)
+    a_stdev = np.sqrt((a_centred ** 2).sum(axis=1) / n)
+    b_stdev = np.sqrt((b_centred ** 2).sum(axis=1) / n)
+    denom = a_stdev * b_stdev * n
+    safe_denom = np.where(denom != 0, denom, 1.0)
+
+    # luminol uses milliseconds for the max shift against the timestamps
+    max_shift_milliseconds = max_shift_seconds * 1000
+    residuals = union_timestamps - union_timestamps[:, :1]
+    allowed_shifts = lengths - 1
+    span = residuals[np.arange(rows), lengths - 1]
+    for row in np.flatnonzero(span > max_shift_milliseconds):
+        allowed_shifts[row] = luminol_allowed_shift(
+            residuals[row, :lengths[row]].tolist(), max_shift_milliseconds)
+    lower_bounds = np.where(allowed_shifts > 0, -allowed_shifts, 0)
+    upper_bounds = np.where(allowed_shifts > 0, allowed_shifts, 1)
+
+    delays = np.arange(int(lower_bounds.min()), int(upper_bounds.max()))
+    correlations = np.full((rows, len(delays)), -np.inf)
+    shifted_correlations = np.full((rows, len(delays)), -np.inf)
+    delays_in_seconds = np.zeros((rows, len(delays)), dtype=np.int64)
+    for column, delay in enumerate(delays):
+        if delay >= 0:
+            s = (a_centred[:, :columns - delay] * b_centred[:, delay:]).sum(axis=1)
+        else:
+            s = (a_centred[:, -delay:] * b_centred[:, :columns + delay]).sum(axis=1)
+        r = np.where(denom != 0, s / safe_denom, s)
+        delay_in_seconds = residuals[:, min(abs(delay), columns - 1)]
+        if delay < 0:
+            delay_in_seconds = -delay_in_seconds
+        in_bounds = (lower_bounds <= delay) & (delay < upper_bounds)
+        correlations[:, column] = np.where(in_bounds, r, -np.inf)
+        shifted = r * (1 + delay_in_seconds.astype(np.float64) / max_shift_milliseconds * shift_impact)
+        shifted_correlations[:, column] = np.where(in_bounds, shifted, -np.inf)
+        delays_in_seconds[:, column] = delay_in_seconds
+
+    # The first maximum, as max() returns in luminol
+    best = np.argmax(correlations, axis=1)
+    coefficients = correlations[np.arange(rows), best]
+    shifts = delays_in_seconds[np.arange(rows), best]
+    shifted_coefficients = shifted_correlations.max(axis=1)
+    return coefficients, shifts, shifted_coefficients
+
+
+def normalise(values):
+    """
+    Normalise the values of each row by the row maximum as luminol
+    ``TimeSeries.normalize`` does, rows with a maximum of 0 are not changed.
+
+    :param values: a 1D array or a 2D array padded with NaN
+    :type values: numpy.ndarray
+    :return: normalised values
+    :rtype: numpy.ndarray
+
+    """
+    maximum = np.nanmax(values, axis=-1)
+    maximum = np.where(maximum != 0, maximum, 1.0)
+    if values.ndim == 1:
+        return values / maximum
+    return values / maximum[:, np.newaxis]
+
+
+def vectorized_correlations(
+        base_name, anomaly_timestamp, anomalous_ts, candidates, anomalies,
+        from_timestamp, cross_correlation_threshold=0.9):
+    """
+    Correlate the anomalous time series with all the candidate metrics.
+
+    :param base_name: the anomalous metric base_name
+    :param anomaly_timestamp: the anomaly timestamp
+    :param anomalous_ts: the anomalous time series sample, a list of
+        (timestamp, value) items as returned by
+        :func:`luminosity.process_correlations.get_anomalous_ts`
+    :param candidates: a list of (metric_base_name, timeseries, derivative)
+        items, the timeseries in any form accepted by
+        :func:`timeseries_to_arrays` and derivative being whether the
+        nonNegativeDerivative of the time series is to be correlated
+    :param anomalies: the luminol anomalies of the anomalous time series
+    :param from_timestamp: the timestamp from which to sample the candidate
+        time series
+    :param cross_correlation_threshold: the coefficient at or above which a
+        metric is correlated, settings.LUMINOL_CROSS_CORRELATION_THRESHOLD
+    :type base_name: str
+    :type anomaly_timestamp: int
+    :type anomalous_ts: list
+    :type candidates: list
+    :type anomalies: list
+    :type from_timestamp: int
+    :type cross_correlation_threshold: float
+    :return: (correlated_metrics, correlations, metrics_checked_for_correlation,
+        metrics_sampled, timings), correlations being a list of
+        [metric_base_name, coefficient, shift, shifted_coefficient] for each
+        anomaly in the anomaly window, the same as
+        :func:`luminosity.process_correlations.get_correlations`, and timings a
+        dict of the seconds taken in each stage
+    :rtype: tuple
+
+    """
+    timings = dict((stage, 0.0) for stage in CORRELATION_STAGES)
+    correlated_metrics = []
+    correlations = []
+    metrics_checked_for_correlation = 0
+    metrics_sampled = 0
+
+    anomaly_timestamp = int(anomaly_timestamp)
+    anomaly_timestamps, anomaly_values = timeseries_to_arrays(anomalous_ts)
+    anomaly_exact_timestamps = []
+    for anomaly in anomalies:
+        try:
+            anomaly_exact_timestamps.append(int(anomaly.exact_timestamp))
+        except:
+            continue
+    anomaly_exact_timestamps = np.array(anomaly_exact_timestamps, dtype=np.int64)
+
+    # Decode the candidates and sample the correlation window of each
+    start = timer()
+    metric_names = []
+    resolutions = []
+    windows = []
+    for metric_base_name, timeseries, derivative in candidates:
+        if str(metric_base_name) == str(base_name):
+            continue
+        try:
+            timestamps, values = timeseries_to_arrays(timeseries)
+        except:
+            continue
+        if derivative:
+            timestamps, values = non_negative_derivative_arrays(timestamps, values)
+        if not len(timestamps):
+            continue
+        resolution = determine_resolution_array(timestamps)
+        window_start = max(int(from_timestamp), anomaly_timestamp - (resolution * 2))
+        start_index = np.searchsorted(timestamps, from_timestamp, side='left')
+        if start_index == len(timestamps) or timestamps[start_index] > anomaly_timestamp:
+            continue
+        metrics_sampled += 1
+        window_timestamps, window_values = crop_window(
+            timestamps, values, window_start, anomaly_timestamp)
+        metric_names.append(metric_base_name)
+        resolutions.append(resolution)
+        windows.append((window_timestamps, window_values))
+    timings['decode'] = timer() - start
+
+    # Pre-filter the windows that cannot be correlated and group the windows
+    # by resolution, as the anomaly window is determined by the resolution
+    start = timer()
+    groups = {}
+    for index, resolution in enumerate(resolutions):
+        if resolution not in groups:
+            time_period = (anomaly_timestamp - (resolution * 2), anomaly_timestamp + (resolution * 2))
+            anomaly_count = 0
+            if len(anomaly_exact_timestamps):
+                anomaly_count = int((
+                    (anomaly_exact_timestamps >= time_period[0]) &
+                    (anomaly_exact_timestamps <= time_period[1])).sum())
+            group_timestamps, group_values = crop_window(
+                anomaly_timestamps, anomaly_values, time_period[0], time_period[1])
+            if len(group_timestamps) < 2 or not np.all(np.isfinite(group_values)):
+                anomaly_count = 0
+            groups[resolution] = {
+                'anomaly_count': anomaly_count,
+                'anomaly_timestamps': group_timestamps,
+                'anomaly_values': normalise(group_values) if anomaly_count else group_values,
+                'rows': [],
+            }
+        group = groups[resolution]
+        if not group['anomaly_count']:
+            continue
+        if len(windows[index][0]) < 2:
+            continue
+        group['rows'].append(index)
+        metrics_checked_for_correlation += group['anomaly_count']
+    timings['prefilter'] = timer() - start
+
+    coefficients = {}
+    for resolution, group in groups.items():
+        rows = group['rows']
+        if not rows:
+            continue
+
+        # Align the candidate windows with the anomaly window into one
+        # resampled matrix
+        start = timer()
+        lengths = np.array([len(windows[index][0]) for index in rows], dtype=np.int64)
+        longest = int(lengths.max())
+        timestamps = np.full((len(rows), longest), np.iinfo(np.int64).max, dtype=np.int64)
+        values = np.full((len(rows), longest), np.nan)
+        for row, index in enumerate(rows):
+            timestamps[row, :lengths[row]] = windows[index][0]
+            values[row, :lengths[row]] = windows[index][1]
+        values = normalise(values)
+        union_timestamps, aligned_a, aligned_b, union_lengths = align_windows(
+            group['anomaly_timestamps'], group['anomaly_values'],
+            timestamps, values, lengths)
+        timings['align'] += timer() - start
+
+        start = timer()
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            group_coefficients, group_shifts, group_shifted = cross_correlate(
+                union_timestamps, aligned_a, aligned_b, union_lengths)
+        for row, index in enumerate(rows):
+            coefficients[index] = (
+                float(group_coefficients[row]), int(group_shifts[row]),
+                float(group_shifted[row]), group['anomaly_count'])
+        timings['correlate'] += timer() - start
+
+    start = timer()
+    for index, metric_base_name in enumerate(metric_names):
+        if index not in coefficients:
+            continue
+        coefficient, shift, shifted_coefficient, anomaly_count = coefficients[index]
+        # NaN coefficients, from windows with non finite values, are never
+        # correlated
+        if not coefficient >= cross_correlation_threshold:
+            continue
+        for anomaly in range(anomaly_count):
+            correlations.append([metric_base_name, coefficient, shift, shifted_coefficient])
+        correlated_metrics.append(metric_base_name)
+    timings['results'] = timer() - start
+
+    return (correlated_metrics, correlations, metrics_checked_for_correlation,
+            metrics_sampled, timings)
@@ -32,6 +32,8 @@ from skyline_functions import (
     get_redis_conn, get_redis_conn_decoded)
 
 from database import get_engine
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine, reflect_static_tables
 # from process_correlations import *
 
 skyline_app = 'luminosity'
@@ -273,7 +275,9 @@ class Luminosity(Thread):
         def engine_disposal(engine):
             if engine:
                 try:
-                    engine.dispose()
+                    # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                    # engine.dispose()
+                    dispose_engine(skyline_app, engine)
                 except:
                     logger.error(traceback.format_exc())
                     logger.error('error :: calling engine.dispose()')
@@ -497,6 +501,12 @@ class Luminosity(Thread):
             LUMINOSITY_PROCESSES = 1
             logger.info('warning :: cannot determine LUMINOSITY_PROCESSES from settings.py, defaults to %s' % str(LUMINOSITY_PROCESSES))
 
+        # @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # Reflect the tables before any check processes are spawned so that
+        # every check process inherits the table meta rather than reflecting
+        # the tables for each check
+        reflect_static_tables(skyline_app)
+
         while 1:
             now = time()
 
@@ -1,7 +1,10 @@
 import logging
 from redis import StrictRedis
-from msgpack import Unpacker
+# @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+# from msgpack import Unpacker
 import traceback
+# @added 20261018 - Feature #3920: luminosity_remote_data stream
+import json
 # @modified 20191115 - Branch #3262: py3
 # from math import ceil
 
@@ -10,7 +13,9 @@ from luminol.correlator import Correlator
 from timeit import default_timer as timer
 # @added 20180720 - Feature #2464: luminosity_remote_data
 # Added requests and ast
-import requests
+# @modified 20261018 - Feature #3918: cluster_data fan out
+# The remote requests are made with cluster_data.fan_out_remote_requests
+# import requests
 from ast import literal_eval
 
 # @added 20200428 - Feature #3510: Enable Luminosity to handle correlating namespaces only
@@ -27,9 +32,15 @@ from skyline_functions import (
     # charset='utf-8', decode_responses=True arguments required in py3
     get_redis_conn, get_redis_conn_decoded,
     # @added 20200506 - Feature #3532: Sort all time series
-    sort_timeseries,
+    # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+    # sort_timeseries,
+    decode_timeseries, timeseries_array_to_list,
     # @added 20201207 - Feature #3858: skyline_functions - correlate_or_relate_with
-    correlate_or_relate_with)
+    correlate_or_relate_with,
+    # @added 20261018 - Feature #3914: get_derivative_metric_statuses
+    get_derivative_metric_statuses)
+# @added 20261018 - Feature #3936: METRICS_SNAPSHOT
+from metrics_snapshot import mget_timeseries
 
 # @added 20200428 - Feature #3510: Enable Luminosity to handle correlating namespaces only
 #                   Feature #3512: matched_or_regexed_in_list function
@@ -46,6 +57,24 @@ try:
 except:
     LUMINOSITY_CORRELATION_MAPS = {}
 
+# @added 20261018 - Feature #3912: LUMINOSITY_VECTORIZED_CORRELATIONS
+try:
+    LUMINOSITY_VECTORIZED_CORRELATIONS = settings.LUMINOSITY_VECTORIZED_CORRELATIONS
+except:
+    LUMINOSITY_VECTORIZED_CORRELATIONS = False
+if LUMINOSITY_VECTORIZED_CORRELATIONS:
+    from correlations_vectorized import (
+        vectorized_correlations, CORRELATION_STAGES)
+
+# @added 20261018 - Feature #3918: cluster_data fan out
+from cluster_data import fan_out_remote_requests
+# The luminosity_remote_data responses can be multiple megabytes, allow the
+# remote instances longer than the cluster_data default deadline to respond
+try:
+    REMOTE_ASSIGNED_DEADLINE = max(float(settings.CLUSTER_DATA_DEADLINE), 60.0)
+except:
+    REMOTE_ASSIGNED_DEADLINE = 60.0
+
 # Database configuration
 config = {'user': settings.PANORAMA_DBUSER,
           'password': settings.PANORAMA_DBUSERPASS,
@@ -244,23 +273,27 @@ def get_anomalous_ts(base_name, anomaly_timestamp):
         return []
 
     for i, metric_name in enumerate(assigned_metrics):
+        # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+        # decode_timeseries returns the time series sorted by timestamp and
+        # only sorts when the time series is not already sorted.
+        # try:
+        #     raw_series = raw_assigned[i]
+        #     unpacker = Unpacker(use_list=False)
+        #     unpacker.feed(raw_series)
+        #     timeseries = list(unpacker)
+        # except:
+        #     timeseries = []
+        # @added 20200507 - Feature #3532: Sort all time series
+        # original_timeseries = timeseries
+        # if original_timeseries:
+        #     timeseries = sort_timeseries(original_timeseries)
+        #     del original_timeseries
         try:
             raw_series = raw_assigned[i]
-            unpacker = Unpacker(use_list=False)
-            unpacker.feed(raw_series)
-            timeseries = list(unpacker)
+            timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
         except:
             timeseries = []
 
-        # @added 20200507 - Feature #3532: Sort all time series
-        # To ensure that there are no unordered timestamps in the time
-        # series which are artefacts of the collector or carbon-relay, sort
-        # all time series by timestamp before analysis.
-        original_timeseries = timeseries
-        if original_timeseries:
-            timeseries = sort_timeseries(original_timeseries)
-            del original_timeseries
-
     # Convert the time series if this is a known_derivative_metric
     known_derivative_metric = is_derivative_metric(skyline_app, base_name)
     if known_derivative_metric:
@@ -430,15 +463,98 @@ def get_assigned_metrics(i, base_name):
     return assigned_metrics
 
 
+# @added 20261018 - Feature #3920: luminosity_remote_data stream
+def read_luminosity_remote_data(remote_skyline_instance, r):
+    """
+    Consume a luminosity_remote_data response.  A streamed response is read
+    line by line as it is received, each line being a JSON
+    [metric_name, timeseries] item and the last line a
+    {"complete": true} item.  A response from a remote Skyline instance that
+    does not stream luminosity_remote_data is evaluated as a whole, as it
+    always has been.
+
+    :param remote_skyline_instance: the REMOTE_SKYLINE_INSTANCES item
+    :param r: the response, requested with stream=True
+    :type remote_skyline_instance: list
+    :type r: requests.Response
+    :return: (status_code, ts_data), ts_data being None if the response is
+        not valid
+    :rtype: tuple
+
+    """
+    if int(r.status_code) != 200:
+        r.close()
+        return r.status_code, None
+    ts_data = []
+    if r.headers.get('Content-Type', '').startswith('application/x-ndjson'):
+        complete = False
+        for line in r.iter_lines():
+            if not line:
+                continue
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            item = json.loads(line)
+            if isinstance(item, dict):
+                complete = item.get('complete', False)
+                continue
+            ts_data.append(item)
+        if not complete:
+            logger.warn('warning :: get_remote_assigned :: the luminosity_remote_data stream from %s was truncated, using the %s metrics received' % (
+                str(remote_skyline_instance[0]), str(len(ts_data))))
+    else:
+        ts_data = literal_eval(r.text)['results']
+    return r.status_code, ts_data
+
+
 # @added 20180720 - Feature #2464: luminosity_remote_data
 # @modified 20201203 - Feature #3860: luminosity - handle low frequency data
 # Added the metric resolution
 # def get_remote_assigned(anomaly_timestamp):
 def get_remote_assigned(anomaly_timestamp, resolution):
     remote_assigned = []
+
+    # @added 20190519 - Branch #3002: docker
+    # Handle self signed certificate on Docker
+    # @modified 20261018 - Feature #3918: cluster_data fan out
+    # Determined once rather than per remote instance
+    verify_ssl = True
+    try:
+        running_on_docker = settings.DOCKER
+    except:
+        running_on_docker = False
+    if running_on_docker:
+        verify_ssl = False
+
+    # @added 20261018 - Feature #3918: cluster_data fan out
+    # Request the luminosity_remote_data from all the remote Skyline instances
+    # concurrently with their pooled sessions rather than in turn
+    remote_requests = []
+    for remote_skyline_instance in settings.REMOTE_SKYLINE_INSTANCES:
+        remote_url = remote_skyline_instance[0]
+        # @modified 20261018 - Feature #3920: luminosity_remote_data stream
+        # Request the streamed response
+        # url = '%s/api?luminosity_remote_data&anomaly_timestamp=%s&resolution=%s' % (remote_url, str(anomaly_timestamp), str(resolution))
+        url = '%s/api?luminosity_remote_data&anomaly_timestamp=%s&resolution=%s&stream=true' % (remote_url, str(anomaly_timestamp), str(resolution))
+        remote_requests.append((remote_skyline_instance, url))
+    # @modified 20261018 - Feature #3920: luminosity_remote_data stream
+    # Consume the responses incrementally as they stream
+    remote_responses = fan_out_remote_requests(
+        skyline_app, remote_requests, timeout=15, verify=verify_ssl,
+        deadline=REMOTE_ASSIGNED_DEADLINE,
+        response_handler=read_luminosity_remote_data)
+
     # @modified 20201215 - Feature #3890: metrics_manager - sync_cluster_files
     # for remote_url, remote_user, remote_password in settings.REMOTE_SKYLINE_INSTANCES:
-    for remote_url, remote_user, remote_password, hostname in settings.REMOTE_SKYLINE_INSTANCES:
+    # @modified 20261018 - Feature #3918: cluster_data fan out
+    # for remote_url, remote_user, remote_password, hostname in settings.REMOTE_SKYLINE_INSTANCES:
+    for (remote_skyline_instance, url), r in zip(remote_requests, remote_responses):
+        remote_url = remote_skyline_instance[0]
+        # @added 20261018 - Feature #3920: luminosity_remote_data stream
+        # The response has been consumed by read_luminosity_remote_data
+        status_code = None
+        ts_data = None
+        if r is not None:
+            status_code, ts_data = r
         # @modified 20180722 - Feature #2464: luminosity_remote_data
         # Use a gzipped response - deprecated the raw unprocessed time series
         # method
@@ -470,29 +586,25 @@ def get_remote_assigned(anomaly_timestamp, resolution):
         # @modified 20201203 - Feature #3860: luminosity - handle low frequency data
         # Added the metric resolution
         # url = '%s/api?luminosity_remote_data&anomaly_timestamp=%s' % (remote_url, str(anomaly_timestamp))
-        url = '%s/api?luminosity_remote_data&anomaly_timestamp=%s&resolution=%s' % (remote_url, str(anomaly_timestamp), str(resolution))
+        # url = '%s/api?luminosity_remote_data&anomaly_timestamp=%s&resolution=%s' % (remote_url, str(anomaly_timestamp), str(resolution))
 
         response_ok = False
 
-        # @added 20190519 - Branch #3002: docker
-        # Handle self signed certificate on Docker
-        verify_ssl = True
-        try:
-            running_on_docker = settings.DOCKER
-        except:
-            running_on_docker = False
-        if running_on_docker:
-            verify_ssl = False
-
         try:
             # @modified 20190519 - Branch #3002: docker
             # r = requests.get(url, timeout=15, auth=(remote_user, remote_password))
-            r = requests.get(url, timeout=15, auth=(remote_user, remote_password), verify=verify_ssl)
-            if int(r.status_code) == 200:
+            # @modified 20261018 - Feature #3918: cluster_data fan out
+            # The request has been made in fan_out_remote_requests
+            # r = requests.get(url, timeout=15, auth=(remote_user, remote_password), verify=verify_ssl)
+            if r is None:
+                logger.error('error :: get_remote_assigned :: no response from %s' % str(url))
+            # @modified 20261018 - Feature #3920: luminosity_remote_data stream
+            # elif int(r.status_code) == 200:
+            elif int(status_code) == 200 and ts_data is not None:
                 logger.info('get_remote_assigned :: time series data retrieved from %s' % remote_url)
                 response_ok = True
             else:
-                logger.error('get_remote_assigned :: time series data not retrieved from %s, status code %s returned' % (remote_url, str(r.status_code)))
+                logger.error('get_remote_assigned :: time series data not retrieved from %s, status code %s returned' % (remote_url, str(status_code)))
         except:
             logger.error(traceback.format_exc())
             logger.error('error :: get_remote_assigned :: failed to get time series data from %s' % str(url))
@@ -516,7 +628,10 @@ def get_remote_assigned(anomaly_timestamp, resolution):
                 #                      Feature #3820: HORIZON_SHARDS
                 # decompressed_data = (r.content)
                 # data = literal_eval(decompressed_data)
-                data = literal_eval(r.text)
+                # @modified 20261018 - Feature #3920: luminosity_remote_data stream
+                # The response has been consumed by read_luminosity_remote_data
+                # data = literal_eval(r.text)
+                data = {'results': ts_data}
                 logger.info('get_remote_assigned :: response data decompressed with native requests gzip decoding')
             except:
                 logger.error(traceback.format_exc())
@@ -538,6 +653,106 @@ def get_remote_assigned(anomaly_timestamp, resolution):
     return remote_assigned
 
 
+# @added 20261018 - Feature #3912: LUMINOSITY_VECTORIZED_CORRELATIONS
+def get_vectorized_correlations(
+    base_name, anomaly_timestamp, anomalous_ts, assigned_metrics, raw_assigned,
+        remote_assigned, anomalies, from_timestamp):
+    """
+    Correlate the local and remote metrics with the anomaly using
+    :func:`correlations_vectorized.vectorized_correlations` rather than a
+    luminol Correlator per metric.  The local metrics are converted to their
+    nonNegativeDerivative if they are known derivative metrics and the remote
+    metrics are filtered with correlate_or_relate_with, as in get_correlations.
+    Returns the same as get_correlations.
+    """
+    logger = logging.getLogger(skyline_app_logger)
+    start = timer()
+
+    try:
+        cross_correlation_threshold = settings.LUMINOL_CROSS_CORRELATION_THRESHOLD
+    except:
+        cross_correlation_threshold = 0.9
+
+    start_candidates = timer()
+    local_candidates = []
+    for i, metric_name in enumerate(assigned_metrics):
+        if metric_name.startswith(settings.FULL_NAMESPACE):
+            metric_base_name = metric_name.replace(settings.FULL_NAMESPACE, '', 1)
+        else:
+            metric_base_name = metric_name
+        if str(metric_base_name) == str(base_name):
+            continue
+        try:
+            raw_series = raw_assigned[i]
+        except:
+            raw_series = None
+        # @modified 20261018 - Feature #3936: METRICS_SNAPSHOT
+        # raw_series may be a timeseries array from the metrics snapshot
+        # if not raw_series:
+        if raw_series is None or not len(raw_series):
+            continue
+        # @modified 20261018 - Feature #3914: get_derivative_metric_statuses
+        # The derivative statuses of all the metrics are determined in bulk
+        # below rather than per metric
+        # known_derivative_metric = is_derivative_metric(skyline_app, metric_base_name)
+        # local_candidates.append((metric_base_name, raw_series, known_derivative_metric))
+        local_candidates.append((metric_base_name, raw_series, False))
+    # @added 20261018 - Feature #3914: get_derivative_metric_statuses
+    derivative_metric_statuses = get_derivative_metric_statuses(
+        skyline_app, [candidate[0] for candidate in local_candidates])
+    local_candidates = [
+        (metric_base_name, raw_series, derivative_metric_statuses.get(str(metric_base_name), False))
+        for metric_base_name, raw_series, known_derivative_metric in local_candidates]
+
+    do_not_correlate_with = []
+    remote_candidates = []
+    for ts_data in remote_assigned:
+        metric_name = str(ts_data[0])
+        if metric_name.startswith(settings.FULL_NAMESPACE):
+            metric_base_name = metric_name.replace(settings.FULL_NAMESPACE, '', 1)
+        else:
+            metric_base_name = metric_name
+        if str(metric_base_name) == str(base_name):
+            continue
+        try:
+            correlate_or_relate = correlate_or_relate_with(skyline_app, base_name, metric_base_name)
+            if not correlate_or_relate:
+                do_not_correlate_with.append(metric_base_name)
+                continue
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: get_vectorized_correlations :: failed to evaluate correlate_or_relate_with')
+        try:
+            timeseries = ts_data[1]
+        except:
+            timeseries = []
+        if not timeseries:
+            continue
+        remote_candidates.append((metric_base_name, timeseries, False))
+    if len(do_not_correlate_with) > 0:
+        logger.info('get_vectorized_correlations :: discarded %s remote assigned metrics as not in a correlation group with %s' % (
+            str(len(do_not_correlate_with)), base_name))
+    candidates_time = timer() - start_candidates
+
+    correlated_metrics, correlations, metrics_checked_for_correlation, metrics_sampled, timings = vectorized_correlations(
+        base_name, anomaly_timestamp, anomalous_ts,
+        (local_candidates + remote_candidates), anomalies, from_timestamp,
+        cross_correlation_threshold)
+
+    end = timer()
+    logger.info('get_vectorized_correlations :: sampled %s of %s local and %s remote metrics, checked %s correlations' % (
+        str(metrics_sampled), str(len(local_candidates)),
+        str(len(remote_candidates)), str(metrics_checked_for_correlation)))
+    logger.info('get_vectorized_correlations :: stage timings - candidates: %.6f, %s' % (
+        candidates_time, ', '.join([
+            '%s: %.6f' % (stage, timings[stage]) for stage in CORRELATION_STAGES])))
+    logger.info('get_vectorized_correlations :: checked a total of %s metrics and correlated %s metrics to %s anomaly, processed in %.6f seconds' % (
+        str(metrics_checked_for_correlation), str(len(correlated_metrics)),
+        base_name, (end - start)))
+    runtime = '%.6f' % (end - start)
+    return (correlated_metrics, correlations, metrics_checked_for_correlation, runtime)
+
+
 # @modified 20180720 - Feature #2464: luminosity_remote_data
 # def get_correlations(base_name, anomaly_timestamp, anomalous_ts, assigned_metrics, raw_assigned, anomalies):
 def get_correlations(
@@ -589,6 +804,16 @@ def get_correlations(
         logger.info('get_correlations :: the anomaly_timestamp is too old not correlating')
         return (correlated_metrics, correlations)
 
+    # @added 20261018 - Feature #3912: LUMINOSITY_VECTORIZED_CORRELATIONS
+    if LUMINOSITY_VECTORIZED_CORRELATIONS:
+        try:
+            return get_vectorized_correlations(
+                base_name, anomaly_timestamp, anomalous_ts, assigned_metrics,
+                raw_assigned, remote_assigned, anomalies, from_timestamp)
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: get_correlations :: get_vectorized_correlations failed, correlating with luminol Correlator')
+
     start_local_correlations = timer()
 
     local_redis_metrics_checked_count = 0
@@ -599,6 +824,17 @@ def get_correlations(
     # @added 20200428 - Feature #3510: Enable Luminosity to handle correlating namespaces only
     # Removed here and handled in get_assigned_metrics
 
+    # @added 20261018 - Feature #3914: get_derivative_metric_statuses
+    # Determine the derivative status of all the metrics with a single Redis
+    # pipeline rather than a is_derivative_metric call per metric
+    assigned_base_names = []
+    for metric_name in assigned_metrics:
+        if metric_name.startswith(settings.FULL_NAMESPACE):
+            assigned_base_names.append(metric_name.replace(settings.FULL_NAMESPACE, '', 1))
+        else:
+            assigned_base_names.append(metric_name)
+    derivative_metric_statuses = get_derivative_metric_statuses(skyline_app, assigned_base_names)
+
     for i, metric_name in enumerate(assigned_metrics):
         count += 1
         # print(metric_name)
@@ -616,11 +852,19 @@ def get_correlations(
 
         if str(metric_base_name) == str(base_name):
             continue
+        # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+        # decode_timeseries returns the time series sorted by timestamp and
+        # only sorts when the time series is not already sorted.
+        # try:
+        #     raw_series = raw_assigned[i]
+        #     unpacker = Unpacker(use_list=False)
+        #     unpacker.feed(raw_series)
+        #     timeseries = list(unpacker)
+        # except:
+        #     timeseries = []
         try:
             raw_series = raw_assigned[i]
-            unpacker = Unpacker(use_list=False)
-            unpacker.feed(raw_series)
-            timeseries = list(unpacker)
+            timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
         except:
             timeseries = []
         if not timeseries:
@@ -628,16 +872,17 @@ def get_correlations(
             continue
 
         # @added 20200507 - Feature #3532: Sort all time series
-        # To ensure that there are no unordered timestamps in the time
-        # series which are artefacts of the collector or carbon-relay, sort
-        # all time series by timestamp before analysis.
-        original_timeseries = timeseries
-        if original_timeseries:
-            timeseries = sort_timeseries(original_timeseries)
-            del original_timeseries
+        # @modified 20261018 - Feature #3900: Zero copy msgpack time series decode
+        # Sorted by decode_timeseries
+        # original_timeseries = timeseries
+        # if original_timeseries:
+        #     timeseries = sort_timeseries(original_timeseries)
+        #     del original_timeseries
 
         # Convert the time series if this is a known_derivative_metric
-        known_derivative_metric = is_derivative_metric(skyline_app, metric_base_name)
+        # @modified 20261018 - Feature #3914: get_derivative_metric_statuses
+        # known_derivative_metric = is_derivative_metric(skyline_app, metric_base_name)
+        known_derivative_metric = derivative_metric_statuses.get(str(metric_base_name), False)
         if known_derivative_metric:
             try:
                 derivative_timeseries = nonNegativeDerivative(timeseries)
@@ -905,7 +1150,13 @@ def process_correlations(i, anomaly_id):
     # Determine data resolution
     resolution = determine_resolution(anomalous_ts)
 
-    raw_assigned = redis_conn.mget(assigned_metrics)
+    # @modified 20261018 - Feature #3936: METRICS_SNAPSHOT
+    # Read the time series from the metrics snapshot if it was created after
+    # the correlation window, otherwise from Redis
+    # raw_assigned = redis_conn.mget(assigned_metrics)
+    raw_assigned = mget_timeseries(
+        skyline_app, redis_conn, assigned_metrics,
+        min_created_at=(int(anomaly_timestamp) + resolution + 1))
     # @added 20180720 - Feature #2464: luminosity_remote_data
     remote_assigned = []
     if settings.REMOTE_SKYLINE_INSTANCES:
@@ -5,6 +5,9 @@ import logging
 import traceback
 import re
 
+# @added 20261018 - Feature #3942: MatchList
+from namespace_matcher import NamespaceMatcher
+
 
 # @added 20200423 - Feature #3512: matched_or_regexed_in_list function
 #                   Feature #3508: ionosphere_untrainable_metrics
@@ -151,3 +154,175 @@ def matched_or_regexed_in_list(current_skyline_app, base_name, match_list, debug
         current_logger.error('error :: %s :: matched_or_regexed_in_list errored' % current_skyline_app)
 
     return (matched, matched_by)
+
+
+# @added 20261018 - Feature #3942: MatchList
+class MatchList(object):
+    """
+    A match list precompiled into the
+    :class:`namespace_matcher.NamespaceMatcher` substring pattern, which also
+    finds the absolute matches, and dotted element index and a combined regex,
+    for matching many base_names against
+    the same match list.  :meth:`match` returns the same (matched, matched_by)
+    as :func:`matched_or_regexed_in_list` without splitting, building sets and
+    compiling regexes for every entry on every call.
+
+    :param match_list: the list of items to try and match the base_names in
+    :type match_list: list
+
+    """
+
+    def __init__(self, match_list):
+        self.match_list = list(match_list)
+        self.namespace_matcher = NamespaceMatcher(self.match_list)
+
+        # The regexes without groups or flags are combined into one regex of
+        # named alternatives, which are tried in list order so the first that
+        # matches is the lowest match_id.  Any others are matched separately
+        # and invalid regexes never match.
+        self.regexes = []
+        combined_patterns = []
+        self.combined_regex_ids = {}
+        self.uncombined_regex_ids = []
+        default_flags = re.compile('').flags
+        for match_id, match_namespace in enumerate(self.match_list):
+            try:
+                namespace_match_pattern = re.compile(match_namespace)
+            except:
+                self.regexes.append(None)
+                continue
+            self.regexes.append(namespace_match_pattern)
+            if namespace_match_pattern.groups == 0 and namespace_match_pattern.flags == default_flags:
+                group_name = 'm%s' % str(match_id)
+                combined_patterns.append('(?P<%s>%s)' % (group_name, match_namespace))
+                self.combined_regex_ids[group_name] = match_id
+            else:
+                self.uncombined_regex_ids.append(match_id)
+        self.combined_regex = None
+        if combined_patterns:
+            try:
+                self.combined_regex = re.compile('|'.join(combined_patterns))
+            except:
+                # Match them all separately
+                self.uncombined_regex_ids = [
+                    match_id for match_id, regex in enumerate(self.regexes) if regex]
+                self.combined_regex_ids = {}
+
+    def namespace_ids(self, base_name, base_name_namespace_elements):
+        """
+        Return the set of match_ids of the entries that are in the base_name or
+        whose dotted elements are all elements of the base_name.
+        """
+        match_ids = set(self.namespace_matcher.elements_matched_ids(base_name_namespace_elements))
+        if self.namespace_matcher.substring_match(base_name):
+            for match_id, match_namespace in enumerate(self.match_list):
+                if match_namespace in base_name:
+                    match_ids.add(match_id)
+        return match_ids
+
+    def first_regex_id(self, base_name, before=None):
+        """
+        Return the lowest match_id, below before if passed, of the entries that
+        match the base_name as a regex, or None.
+        """
+        first_id = None
+        if self.combined_regex is not None:
+            pattern_match = self.combined_regex.match(base_name)
+            if pattern_match:
+                first_id = self.combined_regex_ids[pattern_match.lastgroup]
+        for match_id in self.uncombined_regex_ids:
+            if first_id is not None and match_id > first_id:
+                break
+            if self.regexes[match_id].match(base_name):
+                first_id = match_id
+                break
+        if first_id is not None and before is not None and first_id >= before:
+            return None
+        return first_id
+
+    def match(self, base_name):
+        """
+        Determine if the base_name is matched by the match list, as
+        :func:`matched_or_regexed_in_list` does.
+
+        :param base_name: the base_name
+        :type base_name: str
+        :return: (matched, matched_by)
+        :rtype:  (boolean, dict)
+
+        """
+        base_name_namespace_elements = base_name.split('.')
+        match_ids = self.namespace_ids(base_name, base_name_namespace_elements)
+        # matched_or_regexed_in_list breaks on the first entry that matches
+        # absolutely, in the namespace or by elements and only tries the regex
+        # of the entries before it until one matches
+        break_id = min(match_ids) if match_ids else None
+        regex_id = self.first_regex_id(base_name, before=break_id)
+
+        matched = break_id is not None or regex_id is not None
+        absolute_match = False
+        matched_in_namespace = False
+        matched_in_elements = False
+        matched_in_namespace_elements = None
+        matched_namespace = None
+        if break_id is not None:
+            break_namespace = self.match_list[break_id]
+            if base_name == break_namespace:
+                absolute_match = True
+            elif break_namespace in base_name:
+                matched_in_namespace = True
+            else:
+                matched_in_elements = True
+                matched_in_namespace_elements = set(break_namespace.split('.'))
+            matched_namespace = break_namespace
+        elif matched:
+            # The loop completed so the last entry is reported
+            matched_namespace = self.match_list[-1]
+
+        matched_by = {
+            'absolute_match': absolute_match,
+            'matched_in_namespace': matched_in_namespace,
+            'matched_namespace': matched_namespace,
+            'matched_in_elements': matched_in_elements,
+            'matched_in_namespace_elements': matched_in_namespace_elements,
+            'matched_by_regex': regex_id is not None,
+            'matched_regex': self.match_list[regex_id] if regex_id is not None else None,
+        }
+        return (matched, matched_by)
+
+    def match_many(self, base_names):
+        """
+        Match many base_names.
+
+        :param base_names: the base_names
+        :type base_names: list
+        :return: a list of (matched, matched_by) in the order of the base_names
+        :rtype: list
+
+        """
+        return [self.match(base_name) for base_name in base_names]
+
+    def matched_ids(self, base_name):
+        """
+        Yield, in list order, the match_id of each entry that matches the
+        base_name on its own, that is the entries for which
+        matched_or_regexed_in_list(app, base_name, [entry]) is matched, e.g.
+        each alert tuple pattern.
+
+        :param base_name: the base_name
+        :type base_name: str
+        :return: match_ids
+        :rtype: generator
+
+        """
+        match_ids = self.namespace_ids(base_name, base_name.split('.'))
+        regex_id = self.first_regex_id(base_name)
+        if regex_id is not None:
+            match_ids.add(regex_id)
+        if not match_ids:
+            return
+        for match_id in range(min(match_ids), len(self.match_list)):
+            if match_id in match_ids:
+                yield match_id
+            elif regex_id is not None and match_id > regex_id and self.regexes[match_id] is not None and self.regexes[match_id].match(base_name):
+                yield match_id
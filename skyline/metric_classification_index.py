@@ -0,0 +1,173 @@
+"""
+metric_classification_index
+"""
+import logging
+import traceback
+
+# @added 20261018 - Feature #3902: MetricClassificationIndex
+# The Redis sets that classify metrics, these are the sets that Analyzer,
+# analyzer_batch and Mirage check metric membership of per metric.
+METRIC_CLASSIFICATION_REDIS_SETS = {
+    'mirage': 'mirage.unique_metrics',
+    'ionosphere': 'ionosphere.unique_metrics',
+    'derivative': 'derivative_metrics',
+    'non_derivative': 'non_derivative_metrics',
+    'smtp_alerter': 'aet.analyzer.smtp_alerter_metrics',
+    'non_smtp_alerter': 'aet.analyzer.non_smtp_alerter_metrics',
+    'airgapped': 'analyzer.airgapped_metrics',
+    'airgapped_filled': 'analyzer.airgapped_metrics.filled',
+    'inactive': 'analyzer.inactive_metrics',
+}
+
+
+class MetricClassificationIndex(object):
+    """
+    A per run index of the Redis sets that classify metrics.  All the sets are
+    fetched in a single Redis pipeline and held as Python sets so that the
+    classification of a metric is determined in O(1) rather than by searching
+    a list of all the members of each set for each metric.
+
+    Classifications that are determined by the app itself and not from Redis,
+    e.g. high_priority, can be added to the index with :meth:`set_members`.
+
+    Usage::
+
+        metric_classification_index = MetricClassificationIndex(
+            skyline_app, self.redis_conn_decoded, ['mirage', 'ionosphere'])
+        if metric_classification_index.is_member('mirage', metric_name):
+            ...
+
+    """
+
+    def __init__(self, current_skyline_app, redis_conn_decoded, classifications=None):
+        """
+        Build the index from Redis.
+
+        :param current_skyline_app: the app calling the index so the index
+            knows which log to write too.
+        :param redis_conn_decoded: a decoded Redis connection
+        :param classifications: the classifications to load, all the
+            classifications in METRIC_CLASSIFICATION_REDIS_SETS by default
+        :type current_skyline_app: str
+        :type redis_conn_decoded: object
+        :type classifications: list
+
+        """
+        self.current_skyline_app = current_skyline_app
+        self.redis_conn_decoded = redis_conn_decoded
+        if classifications is None:
+            classifications = list(METRIC_CLASSIFICATION_REDIS_SETS.keys())
+        self.classifications = list(classifications)
+        self.index = {}
+        self.errors = []
+        self.load()
+
+    def load(self, classifications=None):
+        """
+        Fetch the members of the Redis sets for the classifications with one
+        Redis pipeline.  If the pipeline fails the classifications are empty
+        and the error is logged, the same as a failed smembers in the apps.
+
+        :param classifications: the classifications to load, all the
+            classifications of the index by default
+        :type classifications: list
+        :return: the number of classifications loaded
+        :rtype: int
+
+        """
+        if classifications is None:
+            classifications = self.classifications
+        redis_classifications = [
+            classification for classification in classifications
+            if classification in METRIC_CLASSIFICATION_REDIS_SETS]
+        for classification in redis_classifications:
+            self.index[classification] = set()
+        if not redis_classifications:
+            return 0
+        try:
+            pipe = self.redis_conn_decoded.pipeline(transaction=False)
+            for classification in redis_classifications:
+                pipe.smembers(METRIC_CLASSIFICATION_REDIS_SETS[classification])
+            results = pipe.execute()
+        except:
+            current_skyline_app_logger = str(self.current_skyline_app) + 'Log'
+            current_logger = logging.getLogger(current_skyline_app_logger)
+            current_logger.error(traceback.format_exc())
+            current_logger.error('error :: MetricClassificationIndex :: failed to get Redis sets for %s' % str(redis_classifications))
+            self.errors.append(redis_classifications)
+            return 0
+        for classification, members in zip(redis_classifications, results):
+            if members:
+                self.index[classification] = set(members)
+        return len(redis_classifications)
+
+    def refresh(self, classification):
+        """
+        Reload a single classification from Redis.
+
+        :param classification: the classification to reload
+        :type classification: str
+        :return: the members of the classification
+        :rtype: set
+
+        """
+        self.load([classification])
+        return self.members(classification)
+
+    def set_members(self, classification, members):
+        """
+        Add or replace a classification that is determined by the app.
+
+        :param classification: the classification
+        :param members: the metrics in the classification
+        :type classification: str
+        :type members: iterable
+        :return: None
+
+        """
+        self.index[classification] = set(members)
+        if classification not in self.classifications:
+            self.classifications.append(classification)
+
+    def members(self, classification):
+        """
+        The members of a classification.
+
+        :param classification: the classification
+        :type classification: str
+        :return: the metrics in the classification
+        :rtype: set
+
+        """
+        return self.index.get(classification, set())
+
+    def is_member(self, classification, metric_name):
+        """
+        Whether a metric is in a classification.
+
+        :param classification: the classification
+        :param metric_name: the metric name as it is in the Redis set
+        :type classification: str
+        :type metric_name: str
+        :return: is_member
+        :rtype: boolean
+
+        """
+        try:
+            return metric_name in self.index[classification]
+        except KeyError:
+            return False
+
+    def flags(self, metric_name):
+        """
+        All the classifications of a metric.
+
+        :param metric_name: the metric name as it is in the Redis sets
+        :type metric_name: str
+        :return: a dictionary of classification: boolean
+        :rtype: dict
+
+        """
+        return {
+            classification: metric_name in members
+            for classification, members in self.index.items()}
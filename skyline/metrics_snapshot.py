@@ -0,0 +1,345 @@
+"""
+metrics_snapshot.py
+
+@added 20261018 - Feature #3936: METRICS_SNAPSHOT
+
+A memory mapped, columnar snapshot of all the FULL_NAMESPACE metric time series
+in Redis.  Luminosity and the webapp luminosity_remote_data endpoints mget the
+same FULL_NAMESPACE keys from Redis independently and decode them, with
+METRICS_SNAPSHOT enabled Horizon periodically materialises all the metric time
+series into a single file which the local consumers memory map and read the
+time series from without a Redis round trip or msgpack decoding them, falling
+back to Redis if the snapshot is not fresh enough or does not contain the
+metric.  get_timeseries_columns returns read only views of the mapped
+timestamps and values, get_timeseries_array and mget_timeseries copy them into
+the structured array that decode_timeseries returns.
+
+The snapshot file layout is:
+
+- a 64 byte header, the magic, the created at timestamp, the number of metrics,
+  the number of data points and the offset and length of the metric names
+- the float64 timestamps of all the metrics
+- the float64 values of all the metrics
+- the int64 offsets of each metric into the timestamps and values, metrics
+  count + 1 offsets
+- the newline separated utf-8 metric names, the Redis key names
+
+The snapshot is written to a temporary file in the same directory which is
+then renamed over the snapshot, so readers only ever see a complete snapshot
+and readers that have the previous snapshot mapped are unaffected.
+"""
+import logging
+import mmap
+import os
+import shutil
+import struct
+import traceback
+from time import time
+
+import numpy as np
+
+import settings
+from skyline_functions import decode_timeseries
+
+METRICS_SNAPSHOT_MAGIC = b'SKYSNAP1'
+# magic, created_at, metrics count, data points count, names offset, names length
+METRICS_SNAPSHOT_HEADER = struct.Struct('<8sdqqqq')
+METRICS_SNAPSHOT_HEADER_SIZE = 64
+
+try:
+    METRICS_SNAPSHOT = settings.METRICS_SNAPSHOT
+except:
+    METRICS_SNAPSHOT = False
+try:
+    METRICS_SNAPSHOT_PATH = settings.METRICS_SNAPSHOT_PATH
+except:
+    METRICS_SNAPSHOT_PATH = '/opt/skyline/snapshot/metrics.snapshot'
+try:
+    METRICS_SNAPSHOT_MAX_AGE = int(settings.METRICS_SNAPSHOT_MAX_AGE)
+except:
+    METRICS_SNAPSHOT_MAX_AGE = 120
+
+# The snapshot opened by this process, replaced when the file is replaced
+metrics_snapshot_cache = {}
+
+
+def write_metrics_snapshot(snapshot_path, metrics_timeseries, created_at=None):
+    """
+    Write a snapshot of the time series.
+
+    :param snapshot_path: the snapshot file path
+    :param metrics_timeseries: an iterable of (metric, timeseries_array) with
+        the timeseries_array as returned by decode_timeseries
+    :param created_at: the timestamp the time series were read at, time() if
+        not passed
+    :type snapshot_path: str
+    :type metrics_timeseries: iterable
+    :type created_at: float
+    :return: (metrics_count, datapoints_count)
+    :rtype: tuple
+
+    """
+    if created_at is None:
+        created_at = time()
+    snapshot_dir = os.path.dirname(snapshot_path)
+    if snapshot_dir and not os.path.isdir(snapshot_dir):
+        os.makedirs(snapshot_dir)
+    tmp_snapshot_path = '%s.%s.tmp' % (snapshot_path, str(os.getpid()))
+    tmp_values_path = '%s.values' % tmp_snapshot_path
+    offsets = [0]
+    metric_names = []
+    try:
+        # The timestamps are written to the snapshot and the values to a
+        # temporary file which is appended, so that only one time series is
+        # held in memory at a time
+        with open(tmp_snapshot_path, 'wb') as snapshot_file:
+            with open(tmp_values_path, 'w+b') as values_file:
+                snapshot_file.write(b'\x00' * METRICS_SNAPSHOT_HEADER_SIZE)
+                for metric, timeseries_array in metrics_timeseries:
+                    if timeseries_array is None:
+                        continue
+                    snapshot_file.write(
+                        np.ascontiguousarray(timeseries_array['timestamp'], dtype=np.float64).tobytes())
+                    values_file.write(
+                        np.ascontiguousarray(timeseries_array['value'], dtype=np.float64).tobytes())
+                    offsets.append(offsets[-1] + len(timeseries_array))
+                    metric_names.append(str(metric))
+                values_file.seek(0)
+                shutil.copyfileobj(values_file, snapshot_file)
+            snapshot_file.write(np.array(offsets, dtype=np.int64).tobytes())
+            names = '\n'.join(metric_names).encode('utf-8')
+            names_offset = snapshot_file.tell()
+            snapshot_file.write(names)
+            snapshot_file.seek(0)
+            snapshot_file.write(METRICS_SNAPSHOT_HEADER.pack(
+                METRICS_SNAPSHOT_MAGIC, float(created_at), len(metric_names),
+                offsets[-1], names_offset, len(names)))
+        os.rename(tmp_snapshot_path, snapshot_path)
+    finally:
+        for tmp_path in [tmp_values_path, tmp_snapshot_path]:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+    return len(metric_names), offsets[-1]
+
+
+def create_metrics_snapshot(current_skyline_app, redis_conn, redis_conn_decoded, snapshot_path, chunk_size=1000):
+    """
+    Read all the FULL_NAMESPACE unique_metrics time series from Redis, in
+    chunks, and write them to the snapshot.
+
+    :param current_skyline_app: the app calling the function
+    :param redis_conn: a binary Redis connection
+    :param redis_conn_decoded: a decoded Redis connection
+    :param snapshot_path: the snapshot file path
+    :param chunk_size: the number of metrics to mget at a time
+    :type current_skyline_app: str
+    :type snapshot_path: str
+    :type chunk_size: int
+    :return: (metrics_count, datapoints_count)
+    :rtype: tuple
+
+    """
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+
+    unique_metrics = sorted(redis_conn_decoded.smembers(settings.FULL_NAMESPACE + 'unique_metrics'))
+    created_at = time()
+
+    def metrics_timeseries():
+        for chunk_start in range(0, len(unique_metrics), chunk_size):
+            chunk_metrics = unique_metrics[chunk_start:(chunk_start + chunk_size)]
+            raw_chunk = redis_conn.mget(chunk_metrics)
+            for metric, raw_series in zip(chunk_metrics, raw_chunk):
+                if not raw_series:
+                    continue
+                try:
+                    yield metric, decode_timeseries(raw_series)
+                except:
+                    current_logger.error(traceback.format_exc())
+                    current_logger.error('error :: create_metrics_snapshot :: failed to decode %s' % str(metric))
+
+    return write_metrics_snapshot(snapshot_path, metrics_timeseries(), created_at)
+
+
+class MetricsSnapshot(object):
+    """
+    A memory mapped metrics snapshot.  The timestamps and values of each metric
+    are numpy views into the memory mapped file.
+    """
+
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        with open(snapshot_path, 'rb') as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self.inode = stat.st_ino
+            self.mtime = stat.st_mtime
+            self.mm = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.created_at, self.metrics_count, self.datapoints_count, names_offset, names_length = METRICS_SNAPSHOT_HEADER.unpack_from(self.mm, 0)
+        if magic != METRICS_SNAPSHOT_MAGIC:
+            raise ValueError('%s is not a metrics snapshot' % snapshot_path)
+        offset = METRICS_SNAPSHOT_HEADER_SIZE
+        self.timestamps = np.frombuffer(self.mm, dtype=np.float64, count=self.datapoints_count, offset=offset)
+        offset += self.datapoints_count * 8
+        self.values = np.frombuffer(self.mm, dtype=np.float64, count=self.datapoints_count, offset=offset)
+        offset += self.datapoints_count * 8
+        self.offsets = np.frombuffer(self.mm, dtype=np.int64, count=self.metrics_count + 1, offset=offset)
+        self.names_offset = names_offset
+        self.names_length = names_length
+        self._index = None
+
+    @property
+    def index(self):
+        """
+        A dictionary of metric and index, built on first use.
+        """
+        if self._index is None:
+            names = self.mm[self.names_offset:(self.names_offset + self.names_length)]
+            metric_names = names.decode('utf-8').split('\n') if names else []
+            self._index = dict((metric, i) for i, metric in enumerate(metric_names))
+        return self._index
+
+    def age(self, now=None):
+        if now is None:
+            now = time()
+        return now - self.created_at
+
+    def is_fresh(self, max_age=None, min_created_at=None):
+        """
+        Whether the snapshot was created within max_age seconds and at or after
+        min_created_at.
+        """
+        if max_age is not None and self.age() > max_age:
+            return False
+        if min_created_at is not None and self.created_at < min_created_at:
+            return False
+        return True
+
+    def __contains__(self, metric):
+        return str(metric) in self.index
+
+    def get_timeseries_columns(self, metric):
+        """
+        The timestamps and values of the metric as zero copy numpy views.
+
+        :param metric: the Redis key name of the metric
+        :type metric: str
+        :return: (timestamps, values) or (None, None) if the metric is not in the
+            snapshot
+        :rtype: tuple
+
+        """
+        i = self.index.get(str(metric))
+        if i is None:
+            return None, None
+        start = self.offsets[i]
+        end = self.offsets[i + 1]
+        return self.timestamps[start:end], self.values[start:end]
+
+    def get_timeseries_array(self, metric):
+        """
+        The time series of the metric as the structured array that
+        decode_timeseries returns, with int64 timestamps if the timestamps are
+        all whole numbers.  The timestamps and values are copied into a new
+        array, use :meth:`get_timeseries_columns` for views of the snapshot.
+
+        :param metric: the Redis key name of the metric
+        :type metric: str
+        :return: timeseries_array or None if the metric is not in the snapshot
+        :rtype: numpy.ndarray
+
+        """
+        timestamps, values = self.get_timeseries_columns(metric)
+        if timestamps is None:
+            return None
+        if np.all(np.isfinite(timestamps)) and np.all(np.floor(timestamps) == timestamps):
+            timestamp_dtype = np.int64
+        else:
+            timestamp_dtype = np.float64
+        timeseries_array = np.empty(len(timestamps), dtype=[
+            ('timestamp', timestamp_dtype), ('value', np.float64)])
+        timeseries_array['timestamp'] = timestamps
+        timeseries_array['value'] = values
+        return timeseries_array
+
+
+def get_metrics_snapshot(snapshot_path=None, max_age=None, min_created_at=None):
+    """
+    Get the metrics snapshot, the snapshot is opened once per process and
+    reopened when the snapshot file is replaced.
+
+    :param snapshot_path: the snapshot file path, METRICS_SNAPSHOT_PATH if not
+        passed
+    :param max_age: the maximum age of the snapshot in seconds,
+        METRICS_SNAPSHOT_MAX_AGE if not passed
+    :param min_created_at: the minimum timestamp the snapshot must have been
+        created at, e.g. the timestamp of the data point being correlated
+    :type snapshot_path: str
+    :type max_age: int
+    :type min_created_at: float
+    :return: the MetricsSnapshot or None if there is no fresh snapshot
+    :rtype: MetricsSnapshot
+
+    """
+    if not snapshot_path:
+        snapshot_path = METRICS_SNAPSHOT_PATH
+    if max_age is None:
+        max_age = METRICS_SNAPSHOT_MAX_AGE
+    try:
+        stat = os.stat(snapshot_path)
+    except OSError:
+        return None
+    snapshot = metrics_snapshot_cache.get(snapshot_path)
+    if not snapshot or snapshot.inode != stat.st_ino or snapshot.mtime != stat.st_mtime:
+        # The previous snapshot mmap is not closed as views of it may still be
+        # in use, it is released when they are
+        snapshot = MetricsSnapshot(snapshot_path)
+        metrics_snapshot_cache[snapshot_path] = snapshot
+    if not snapshot.is_fresh(max_age, min_created_at):
+        return None
+    return snapshot
+
+
+def mget_timeseries(current_skyline_app, redis_conn, metrics, max_age=None, min_created_at=None):
+    """
+    A drop in replacement for redis_conn.mget(metrics) on FULL_NAMESPACE keys.
+    The time series of the metrics in a fresh snapshot are returned as
+    timeseries arrays, copied from the snapshot by
+    :meth:`MetricsSnapshot.get_timeseries_array`, which decode_timeseries
+    returns as is, any metrics not in
+    the snapshot, or all the metrics if there is no fresh snapshot, are
+    returned as the raw Redis data from a single mget.
+
+    :param current_skyline_app: the app calling the function
+    :param redis_conn: a binary Redis connection
+    :param metrics: the Redis key names of the metrics
+    :param max_age: the maximum age of the snapshot in seconds
+    :param min_created_at: the minimum timestamp the snapshot must have been
+        created at
+    :type current_skyline_app: str
+    :type metrics: list
+    :type max_age: int
+    :type min_created_at: float
+    :return: a list of timeseries arrays and raw Redis data in the order of the
+        metrics
+    :rtype: list
+
+    """
+    snapshot = None
+    if METRICS_SNAPSHOT:
+        try:
+            snapshot = get_metrics_snapshot(max_age=max_age, min_created_at=min_created_at)
+        except:
+            current_skyline_app_logger = str(current_skyline_app) + 'Log'
+            current_logger = logging.getLogger(current_skyline_app_logger)
+            current_logger.error(traceback.format_exc())
+            current_logger.error('error :: mget_timeseries :: failed to open the metrics snapshot, using Redis')
+            snapshot = None
+    if not snapshot:
+        return redis_conn.mget(metrics)
+    results = [snapshot.get_timeseries_array(metric) for metric in metrics]
+    missing_indices = [i for i, result in enumerate(results) if result is None]
+    if missing_indices:
+        raw_missing = redis_conn.mget([metrics[i] for i in missing_indices])
+        for i, raw_series in zip(missing_indices, raw_missing):
+            results[i] = raw_series
+    return results
@@ -18,21 +18,24 @@ import traceback
 import re
 # imports required for surfacing graphite JSON formatted timeseries for use in
 # Mirage
-import json
+# @modified 20261018 - Feature #3924: graphite_client
+# The Graphite timeseries are surfaced by graphite_client
+# import json
 import sys
-import requests
-try:
-    import urlparse
-except ImportError:
-    # @modified 20191113 - Branch #3262: py3
-    # import urllib.parse
-    import urllib.parse as urlparse
+# import requests
+# try:
+#     import urlparse
+# except ImportError:
+#     # @modified 20191113 - Branch #3262: py3
+#     # import urllib.parse
+#     import urllib.parse as urlparse
 
 import os
 # import errno
 # import imp
 from os import listdir
-import datetime
+# @modified 20261018 - Feature #3924: graphite_client
+# import datetime
 
 import os.path
 import resource
@@ -56,12 +59,20 @@ from skyline_functions import (
     #                   Bug #3778: Handle single encoded forward slash requests to Graphite
     sanitise_graphite_url,
     # @added 20201013 - Feature #3780: skyline_functions - sanitise_graphite_url
-    encode_graphite_metric_name)
+    # @modified 20261018 - Feature #3924: graphite_client
+    # encode_graphite_metric_name,
+    # @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+    get_mirage_check_queue, remove_from_mirage_check_queue,
+    wait_for_mirage_check)
 
 # @added 20200425 - Feature #3512: matched_or_regexed_in_list function
 #                   Feature #3508: ionosphere.untrainable_metrics
 #                   Feature #3486: analyzer_batch
 from matched_or_regexed_in_list import matched_or_regexed_in_list
+# @added 20261018 - Feature #3902: MetricClassificationIndex
+from metric_classification_index import MetricClassificationIndex
+# @added 20261018 - Feature #3924: graphite_client
+from graphite_client import fetch_graphite_metric
 
 from mirage_alerters import trigger_alert
 from negaters import trigger_negater
@@ -197,6 +208,12 @@ except:
     except:
         SKYLINE_FEEDBACK_NAMESPACES = [this_host]
 
+# @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+try:
+    MIRAGE_CHECK_QUEUE = settings.MIRAGE_CHECK_QUEUE
+except:
+    MIRAGE_CHECK_QUEUE = False
+
 skyline_app_graphite_namespace = 'skyline.%s%s' % (skyline_app, SERVER_METRIC_PATH)
 failed_checks_dir = '%s_failed' % settings.MIRAGE_CHECK_PATH
 # @added 20191107 - Branch #3262: py3
@@ -278,79 +295,56 @@ class Mirage(Thread):
 
         trigger_alert(alert, metric, second_order_resolution_seconds, context)
 
-    def surface_graphite_metric_data(self, metric_name, graphite_from, graphite_until):
+    # @modified 20261018 - Feature #3924: graphite_client
+    # Surface the data with the pooled graphite_client and return the
+    # timeseries in memory, rather than writing a json file to the
+    # MIRAGE_DATA_FOLDER which was then read straight back in
+    # def surface_graphite_metric_data(self, metric_name, graphite_from, graphite_until):
+    def surface_graphite_metric_data(self, metric_name, from_timestamp, until_timestamp):
+        """
+        Surface the metric timeseries from Graphite.
+
+        :param metric_name: the metric name
+        :param from_timestamp: unix timestamp
+        :param until_timestamp: unix timestamp
+        :type metric_name: str
+        :type from_timestamp: int
+        :type until_timestamp: int
+        :return: the timeseries or None if the data could not be retrieved
+        :rtype: list
 
+        """
         # @added 20160803 - Unescaped Graphite target - https://github.com/earthgecko/skyline/issues/20
         #                   bug1546: Unescaped Graphite target
-        # @modified 20191107 - Branch #3263: py3
-        # Commented out colon
-        # new_metric_namespace = metric_name.replace(':', '\:')
-        # metric_namespace = new_metric_namespace.replace('(', '\(')
-        metric_namespace = metric_name.replace('(', '\(')
-        metric_name = metric_namespace.replace(')', '\)')
-
-        # @added 20201013 - Feature #3780: skyline_functions - sanitise_graphite_url
-        encoded_graphite_metric_name = encode_graphite_metric_name(skyline_app, metric_name)
-
-        try:
-            # We use absolute time so that if there is a lag in mirage the correct
-            # timeseries data is still surfaced relevant to the anomalous datapoint
-            # timestamp
-            if settings.GRAPHITE_PORT != '':
-                # @modified 20190520 - Branch #3002: docker
-                # Use GRAPHITE_RENDER_URI
-                # url = '%s://%s:%s/render/?from=%s&until=%s&target=%s&format=json' % (
-                #     settings.GRAPHITE_PROTOCOL, settings.GRAPHITE_HOST,
-                #     str(settings.GRAPHITE_PORT), graphite_from, graphite_until,
-                #     metric_name)
-                url = '%s://%s:%s/%s/?from=%s&until=%s&target=%s&format=json' % (
-                    settings.GRAPHITE_PROTOCOL, settings.GRAPHITE_HOST,
-                    str(settings.GRAPHITE_PORT), settings.GRAPHITE_RENDER_URI,
-                    # @modified 20201013 - Feature #3780: skyline_functions - sanitise_graphite_url
-                    # graphite_from, graphite_until, metric_name)
-                    graphite_from, graphite_until, encoded_graphite_metric_name)
-            else:
-                # @modified 20190520 - Branch #3002: docker
-                # Use GRAPHITE_RENDER_URI
-                # url = '%s://%s/render/?from=%s&until=%s&target=%s&format=json' % (
-                #     settings.GRAPHITE_PROTOCOL, settings.GRAPHITE_HOST,
-                #     graphite_from, graphite_until, metric_name)
-                url = '%s://%s/%s/?from=%s&until=%s&target=%s&format=json' % (
-                    settings.GRAPHITE_PROTOCOL, settings.GRAPHITE_HOST,
-                    settings.GRAPHITE_RENDER_URI, graphite_from, graphite_until,
-                    # @modified 20201013 - Feature #3780: skyline_functions - sanitise_graphite_url
-                    # metric_name)
-                    encoded_graphite_metric_name)
-
-            r = requests.get(url)
-            js = r.json()
-            datapoints = js[0]['datapoints']
-        except:
-            logger.error(traceback.format_exc())
+        metric_namespace = metric_name.replace('(', '\\(')
+        target = metric_namespace.replace(')', '\\)')
+        timeseries_array = fetch_graphite_metric(
+            skyline_app, target, from_timestamp, until_timestamp)
+        if timeseries_array is None:
             logger.error('error :: surface_graphite_metric_data :: failed to get data from Graphite')
-            return False
-
-        converted = []
-        for datapoint in datapoints:
-            try:
-                new_datapoint = [float(datapoint[1]), float(datapoint[0])]
-                converted.append(new_datapoint)
-            # @modified 20170913 - Task #2160: Test skyline with bandit
-            # Added nosec to exclude from bandit tests
-            except:  # nosec
-                continue
+            return None
+        return timeseries_array.tolist()
 
-        parsed = urlparse.urlparse(url)
-        target = urlparse.parse_qs(parsed.query)['target'][0]
+    # @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+    def get_metric_check_files(self):
+        """
+        Determine the check files to process.  If MIRAGE_CHECK_QUEUE is enabled
+        and there are checks in the Mirage check queue, the queued check files
+        are returned in priority order, otherwise the check files in the
+        MIRAGE_CHECK_PATH are returned, so that check files that were not
+        queued are still processed.
 
-        metric_data_folder = str(settings.MIRAGE_DATA_FOLDER) + "/" + target
-        mkdir_p(metric_data_folder)
-        with open(metric_data_folder + "/" + target + '.json', 'w') as f:
-            f.write(json.dumps(converted))
-            f.close()
-            return True
+        :return: (metric_var_files, queued)
+        :rtype: tuple
 
-        return False
+        """
+        if MIRAGE_CHECK_QUEUE:
+            queued_metric_var_files = get_mirage_check_queue(
+                skyline_app, self.redis_conn, settings.MIRAGE_CHECK_PATH)
+            if queued_metric_var_files:
+                return queued_metric_var_files, True
+        metric_var_files = [f for f in listdir(settings.MIRAGE_CHECK_PATH) if isfile(join(settings.MIRAGE_CHECK_PATH, f))]
+        return metric_var_files, False
 
     # @added 20170127 - Feature #1886: Ionosphere learn - child like parent with evolutionary maturity
     #                   Bug #1460: panorama check file fails
@@ -568,25 +562,32 @@ class Mirage(Thread):
         time_now = int(time())
         time_from = int(time_now - settings.FULL_DURATION)
         # Calculate graphite from and until parameters from the metric timestamp
-        graphite_until = datetime.datetime.fromtimestamp(int(float(time_now))).strftime('%H:%M_%Y%m%d')
-        graphite_from = datetime.datetime.fromtimestamp(int(time_from)).strftime('%H:%M_%Y%m%d')
-        # Remove any old json file related to the metric
-        metric_data_folder = '%s/%s' % (settings.MIRAGE_DATA_FOLDER, metric)
-        metric_json_file = '%s/%s.json' % (metric_data_folder, str(metric))
-        try:
-            os.remove(metric_json_file)
-        except OSError:
-            pass
+        # @modified 20261018 - Feature #3924: graphite_client
+        # graphite_client is passed the time_from and time_now timestamps
+        # graphite_until = datetime.datetime.fromtimestamp(int(float(time_now))).strftime('%H:%M_%Y%m%d')
+        # graphite_from = datetime.datetime.fromtimestamp(int(time_from)).strftime('%H:%M_%Y%m%d')
+        # @modified 20261018 - Feature #3924: graphite_client
+        # The timeseries is surfaced in memory, there is no json file
+        # # Remove any old json file related to the metric
+        # metric_data_folder = '%s/%s' % (settings.MIRAGE_DATA_FOLDER, metric)
+        # metric_json_file = '%s/%s.json' % (metric_data_folder, str(metric))
+        # try:
+        #     os.remove(metric_json_file)
+        # except OSError:
+        #     pass
         # Get data from graphite
         logger.info('populate_redis :: surfacing %s time series from Graphite' % (metric))
+        timeseries = None
         try:
-            self.surface_graphite_metric_data(metric, graphite_from, graphite_until)
+            # self.surface_graphite_metric_data(metric, graphite_from, graphite_until)
+            timeseries = self.surface_graphite_metric_data(metric, time_from, time_now)
         except:
             logger.error(traceback.format_exc())
             logger.error('error :: populate_redis :: failed to surface_graphite_metric_data to populate %s' % (
-                str(metric_json_file)))
+                str(metric)))
         # Check there is a json timeseries file to use
-        if not os.path.isfile(metric_json_file):
+        # if not os.path.isfile(metric_json_file):
+        if timeseries is None:
             logger.error(
                 'error :: populate_redis :: retrieve failed - failed to surface %s time series from graphite' % (
                     metric))
@@ -607,14 +608,15 @@ class Mirage(Thread):
             logger.info('populate_redis :: retrieved data :: for %s' % (
                 metric))
         self.check_if_parent_is_alive()
-        timeseries = []
-        try:
-            with open((metric_json_file), 'r') as f:
-                timeseries = json.loads(f.read())
-        except:
-            logger.error(traceback.format_exc())
-            logger.error('error :: populate_redis :: failed to get timeseries from json - %s' % metric_json_file)
-            timeseries = []
+        # @modified 20261018 - Feature #3924: graphite_client
+        # timeseries = []
+        # try:
+        #     with open((metric_json_file), 'r') as f:
+        #         timeseries = json.loads(f.read())
+        # except:
+        #     logger.error(traceback.format_exc())
+        #     logger.error('error :: populate_redis :: failed to get timeseries from json - %s' % metric_json_file)
+        #     timeseries = []
         if not timeseries:
             logger.info('populate_redis :: no timeseries data for %s, setting redis_populated_key and removing from mirage.populate_redis' % metric)
             try:
@@ -630,10 +632,11 @@ class Mirage(Thread):
                 logger.error(traceback.format_exc())
                 logger.error('error :: populate_redis :: failed to remove item %s from Redis set mirage.populate_redis' % metric)
             return
-        try:
-            os.remove(metric_json_file)
-        except OSError:
-            pass
+        # @modified 20261018 - Feature #3924: graphite_client
+        # try:
+        #     os.remove(metric_json_file)
+        # except OSError:
+        #     pass
         FULL_NAMESPACE = settings.FULL_NAMESPACE
         pipe = None
         logger.info('populate_redis :: time series data for %s, populating Redis with %s data points' % (
@@ -1012,17 +1015,22 @@ class Mirage(Thread):
         second_order_resolution_seconds = int(hours_to_resolve) * 3600
 
         # Calculate graphite from and until parameters from the metric timestamp
-        graphite_until = datetime.datetime.fromtimestamp(int(float(metric_timestamp))).strftime('%H:%M_%Y%m%d')
+        # @modified 20261018 - Feature #3924: graphite_client
+        # graphite_client is passed the second_resolution_timestamp and
+        # metric_timestamp
+        # graphite_until = datetime.datetime.fromtimestamp(int(float(metric_timestamp))).strftime('%H:%M_%Y%m%d')
         int_second_order_resolution_seconds = int(float(second_order_resolution_seconds))
         second_resolution_timestamp = int_metric_timestamp - int_second_order_resolution_seconds
-        graphite_from = datetime.datetime.fromtimestamp(int(second_resolution_timestamp)).strftime('%H:%M_%Y%m%d')
+        # graphite_from = datetime.datetime.fromtimestamp(int(second_resolution_timestamp)).strftime('%H:%M_%Y%m%d')
 
-        # Remove any old json file related to the metric
-        metric_json_file = '%s/%s.json' % (metric_data_dir, str(metric))
-        try:
-            os.remove(metric_json_file)
-        except OSError:
-            pass
+        # @modified 20261018 - Feature #3924: graphite_client
+        # The timeseries is surfaced in memory, there is no json file
+        # # Remove any old json file related to the metric
+        # metric_json_file = '%s/%s.json' % (metric_data_dir, str(metric))
+        # try:
+        #     os.remove(metric_json_file)
+        # except OSError:
+        #     pass
 
         # Get data from graphite
         logger.info(
@@ -1031,15 +1039,21 @@ class Mirage(Thread):
 
         # @modified 20191113 - Branch #3262: py3
         # Wrapped in try
+        timeseries = None
         try:
-            self.surface_graphite_metric_data(metric, graphite_from, graphite_until)
+            # @modified 20261018 - Feature #3924: graphite_client
+            # self.surface_graphite_metric_data(metric, graphite_from, graphite_until)
+            timeseries = self.surface_graphite_metric_data(
+                metric, second_resolution_timestamp, int_metric_timestamp)
         except:
             logger.error(traceback.format_exc())
             logger.error('error :: failed to surface_graphite_metric_data to populate %s' % (
-                str(metric_json_file)))
+                str(metric)))
 
         # Check there is a json timeseries file to test
-        if not os.path.isfile(metric_json_file):
+        # @modified 20261018 - Feature #3924: graphite_client
+        # if not os.path.isfile(metric_json_file):
+        if timeseries is None:
             logger.error(
                 'error :: retrieve failed - failed to surface %s time series from graphite' % (
                     metric))
@@ -1093,9 +1107,11 @@ class Mirage(Thread):
 
         self.check_if_parent_is_alive()
 
-        with open((metric_json_file), 'r') as f:
-            timeseries = json.loads(f.read())
-            logger.info('data points surfaced :: %s' % (str(len(timeseries))))
+        # @modified 20261018 - Feature #3924: graphite_client
+        # with open((metric_json_file), 'r') as f:
+        #     timeseries = json.loads(f.read())
+        #     logger.info('data points surfaced :: %s' % (str(len(timeseries))))
+        logger.info('data points surfaced :: %s' % (str(len(timeseries))))
 
         # @added 20170212 - Feature #1886: Ionosphere learn
         # Only process if the metric has sufficient data
@@ -1115,13 +1131,20 @@ class Mirage(Thread):
         # Convert the values of metrics strictly increasing monotonically
         # to their deriative products
         known_derivative_metric = False
+        # @added 20261018 - Feature #3902: MetricClassificationIndex
+        # Fetch the derivative_metrics and ionosphere.unique_metrics Redis sets
+        # for the check in a single Redis pipeline
+        metric_classification_index = MetricClassificationIndex(
+            skyline_app, self.redis_conn_decoded, ['derivative', 'ionosphere'])
         try:
             # @modified 20191022 - Bug #3266: py3 Redis binary objects not strings
             #                      Branch #3262: py3
             # derivative_metrics = list(self.redis_conn.smembers('derivative_metrics'))
-            derivative_metrics = list(self.redis_conn_decoded.smembers('derivative_metrics'))
+            # @modified 20261018 - Feature #3902: MetricClassificationIndex
+            # derivative_metrics = list(self.redis_conn_decoded.smembers('derivative_metrics'))
+            derivative_metrics = metric_classification_index.members('derivative')
         except:
-            derivative_metrics = []
+            derivative_metrics = set()
         redis_metric_name = '%s%s' % (settings.FULL_NAMESPACE, str(metric))
         if redis_metric_name in derivative_metrics:
             known_derivative_metric = True
@@ -1617,9 +1640,11 @@ class Mirage(Thread):
                 # @modified 20191022 - Bug #3266: py3 Redis binary objects not strings
                 #                      Branch #3262: py3
                 # ionosphere_unique_metrics = list(self.redis_conn.smembers('ionosphere.unique_metrics'))
-                ionosphere_unique_metrics = list(self.redis_conn_decoded.smembers('ionosphere.unique_metrics'))
+                # @modified 20261018 - Feature #3902: MetricClassificationIndex
+                # ionosphere_unique_metrics = list(self.redis_conn_decoded.smembers('ionosphere.unique_metrics'))
+                ionosphere_unique_metrics = metric_classification_index.members('ionosphere')
             except:
-                ionosphere_unique_metrics = []
+                ionosphere_unique_metrics = set()
 
             added_at = str(int(time()))
             # If Panorama is enabled - create a Panorama check
@@ -2187,7 +2212,9 @@ class Mirage(Thread):
                 ionosphere_alerts = None
                 ionosphere_alerts_returned = False
 
-                metric_var_files = [f for f in listdir(settings.MIRAGE_CHECK_PATH) if isfile(join(settings.MIRAGE_CHECK_PATH, f))]
+                # @modified 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+                # metric_var_files = [f for f in listdir(settings.MIRAGE_CHECK_PATH) if isfile(join(settings.MIRAGE_CHECK_PATH, f))]
+                metric_var_files, metric_var_files_queued = self.get_metric_check_files()
                 # @modified 20190408 - Bug #2904: Initial Ionosphere echo load and Ionosphere feedback
                 #                      Feature #2484: FULL_DURATION feature profiles
                 # Do not pospone the Ionosphere alerts check on based on whether
@@ -2275,7 +2302,15 @@ class Mirage(Thread):
                             logger.info('sleeping no metrics...')
                             # @modified 20200903 - Task #3730: Validate Mirage running multiple processes
                             # sleep(10)
-                            sleep(sleep_for)
+                            # @modified 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+                            # Wake as soon as a check is queued rather than
+                            # sleeping until the next poll
+                            # sleep(sleep_for)
+                            if MIRAGE_CHECK_QUEUE:
+                                if wait_for_mirage_check(skyline_app, self.redis_conn, sleep_for):
+                                    logger.info('woken by a check added to the Mirage check queue')
+                            else:
+                                sleep(sleep_for)
                         else:
                             logger.info('no checks or alerts, continuing to process populate_redis metrics')
                 # @modified 20200903 - Task #3730: Validate Mirage running multiple processes
@@ -2456,7 +2491,9 @@ class Mirage(Thread):
                 if ionosphere_alerts_returned:
                     break
 
-                metric_var_files = [f for f in listdir(settings.MIRAGE_CHECK_PATH) if isfile(join(settings.MIRAGE_CHECK_PATH, f))]
+                # @modified 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+                # metric_var_files = [f for f in listdir(settings.MIRAGE_CHECK_PATH) if isfile(join(settings.MIRAGE_CHECK_PATH, f))]
+                metric_var_files, metric_var_files_queued = self.get_metric_check_files()
                 if len(metric_var_files) > 0:
                     break
 
@@ -2465,7 +2502,13 @@ class Mirage(Thread):
             # @modified 20161228 - Feature #1830: Ionosphere alerts
             # Only spawn process if this is not an Ionosphere alert
             if not ionosphere_alerts_returned:
-                metric_var_files_sorted = sorted(metric_var_files)
+                # @modified 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+                # Queued checks are already in priority order
+                # metric_var_files_sorted = sorted(metric_var_files)
+                if metric_var_files_queued:
+                    metric_var_files_sorted = list(metric_var_files)
+                else:
+                    metric_var_files_sorted = sorted(metric_var_files)
                 # metric_check_file = settings.MIRAGE_CHECK_PATH + "/" + metric_var_files_sorted[0]
                 if metric_var_files_sorted:
                     process_metric_check_files = True
@@ -2537,6 +2580,14 @@ class Mirage(Thread):
                     spawned_pids.append([p.pid, i])
                     logger.info('started spin_process %s with pid %s' % (str(pid_count), str(p.pid)))
 
+                # @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+                # Remove the checks that have been assigned to the spin_process
+                # processes from the queue
+                if MIRAGE_CHECK_QUEUE:
+                    remove_from_mirage_check_queue(
+                        skyline_app, self.redis_conn,
+                        metric_var_files_sorted[:MIRAGE_PROCESSES])
+
                 # Send wait signal to zombie processes
                 # for p in pids:
                 #     p.join()
@@ -2772,7 +2823,13 @@ class Mirage(Thread):
                         # @modified 20191022 - Bug #3266: py3 Redis binary objects not strings
                         #                      Branch #3262: py3
                         # ionosphere_unique_metrics = list(self.redis_conn.smembers('ionosphere.unique_metrics'))
-                        ionosphere_unique_metrics = list(self.redis_conn_decoded.smembers('ionosphere.unique_metrics'))
+                        # @modified 20261018 - Feature #3902: MetricClassificationIndex
+                        # Use the index for O(1) membership checks in the
+                        # alerts loop
+                        # ionosphere_unique_metrics = list(self.redis_conn_decoded.smembers('ionosphere.unique_metrics'))
+                        ionosphere_unique_metrics = MetricClassificationIndex(
+                            skyline_app, self.redis_conn_decoded,
+                            ['ionosphere']).members('ionosphere')
                     except:
                         logger.error(traceback.format_exc())
                         logger.error('error :: failed to get ionosphere.unique_metrics from Redis')
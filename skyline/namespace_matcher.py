@@ -0,0 +1,112 @@
+"""
+namespace_matcher.py
+
+@added 20261018 - Feature #3940: NamespaceMatcher
+
+A namespace list, such as SKIP_LIST, is matched against a metric name by
+substring, an entry that is in the metric name, and by dotted elements, an entry
+all of whose dotted elements are elements of the metric name.  Matching each
+entry in turn re-splits the entry and builds sets for every metric, the
+NamespaceMatcher compiles the list once into a single substring pattern and an
+index of the entries by their least common element, so that a metric name is
+matched with one regex search and one dict lookup per element of the metric
+name, only the entries indexed by those elements are checked.
+"""
+import re
+
+
+class NamespaceMatcher(object):
+    """
+    Match metric names against a list of namespaces by substring or dotted
+    elements, the same as::
+
+        for namespace in namespaces:
+            if namespace in metric_name:
+                return True
+            namespace_elements = namespace.split('.')
+            elements_matched = set(metric_name.split('.')) & set(namespace_elements)
+            if len(elements_matched) == len(namespace_elements):
+                return True
+        return False
+
+    """
+
+    def __init__(self, namespaces):
+        self.namespaces = [str(namespace) for namespace in namespaces]
+        self.substring_pattern = None
+        if self.namespaces:
+            self.substring_pattern = re.compile('|'.join(
+                re.escape(namespace) for namespace in sorted(set(self.namespaces))))
+        # Each namespace is indexed by its least common element with the set
+        # of its elements, which must all be in the metric name elements.  A
+        # namespace with a duplicated element never matches by elements, the
+        # set intersection can not be as long as its elements, so it is not
+        # indexed.
+        namespaces_elements = {}
+        element_counts = {}
+        for namespace_id, namespace in enumerate(self.namespaces):
+            namespace_elements = namespace.split('.')
+            if len(set(namespace_elements)) != len(namespace_elements):
+                continue
+            namespaces_elements[namespace_id] = namespace_elements
+            for element in namespace_elements:
+                element_counts[element] = element_counts.get(element, 0) + 1
+        self.element_index = {}
+        for namespace_id in sorted(namespaces_elements):
+            namespace_elements = namespaces_elements[namespace_id]
+            index_element = min(namespace_elements, key=lambda element: element_counts[element])
+            self.element_index.setdefault(index_element, []).append(
+                (namespace_id, frozenset(namespace_elements)))
+
+    def substring_match(self, metric_name):
+        """
+        Return True if any namespace is in the metric name.
+        """
+        if self.substring_pattern is None:
+            return False
+        return self.substring_pattern.search(metric_name) is not None
+
+    def elements_matched_ids(self, metric_name_elements):
+        """
+        Return the ids, the list indices, of the namespaces all of whose dotted
+        elements are in the metric name elements, in list order.
+
+        :param metric_name_elements: the metric name split on dots
+        :type metric_name_elements: list
+        :return: namespace ids
+        :rtype: list
+
+        """
+        metric_name_elements = set(metric_name_elements)
+        namespace_ids = []
+        for element in metric_name_elements:
+            for namespace_id, namespace_elements in self.element_index.get(element, ()):
+                if namespace_elements <= metric_name_elements:
+                    namespace_ids.append(namespace_id)
+        return sorted(namespace_ids)
+
+    def elements_match(self, metric_name):
+        """
+        Return True if all the dotted elements of any namespace are elements of
+        the metric name.
+        """
+        if not self.element_index:
+            return False
+        metric_name_elements = set(metric_name.split('.'))
+        for element in metric_name_elements:
+            for namespace_id, namespace_elements in self.element_index.get(element, ()):
+                if namespace_elements <= metric_name_elements:
+                    return True
+        return False
+
+    def match(self, metric_name):
+        """
+        Return True if the metric name is matched by any namespace.
+
+        :param metric_name: the metric name
+        :type metric_name: str
+        :return: matched
+        :rtype: boolean
+
+        """
+        return self.substring_match(metric_name) or self.elements_match(metric_name)
@@ -0,0 +1,142 @@
+"""
+batch_inserts.py
+
+@added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+
+Functions used by the Panorama spin_batch_process to resolve the ids of a batch
+of anomalies from an in-memory ids cache and to match the ids of a multi-row
+anomalies insert to the anomalies inserted.
+
+The spin_batch_process records the check files it is processing in the
+panorama.batch.processing_checks Redis set, the check being processed or the
+checks of the sub-batch being inserted, so that if the spin_batch_process
+times out Panorama fails those checks rather than processing them again.
+"""
+import logging
+import traceback
+
+skyline_app = 'panorama'
+skyline_app_logger = '%sLog' % skyline_app
+logger = logging.getLogger(skyline_app_logger)
+
+BATCH_PROCESSING_CHECKS_KEY = 'panorama.batch.processing_checks'
+
+# The tables of the ids that are preloaded into the batch ids cache
+BATCH_KNOWN_IDS_TABLES = [
+    ('hosts', 'host'), ('apps', 'app'), ('sources', 'source'),
+    ('algorithms', 'algorithm')]
+
+
+def batch_known_ids(mysql_select, metrics):
+    """
+    Determine the known ids of the hosts, apps, sources, algorithms and of
+    the metrics passed with a select per table, to populate the batch ids
+    cache.
+
+    :param mysql_select: the Panorama mysql_select method
+    :param metrics: the base_names of the metrics in the batch
+    :type mysql_select: function
+    :type metrics: list
+    :return: a dict of the ids keyed by (table, key, value)
+    :rtype: dict
+
+    """
+    known_ids = {}
+    queries = []
+    for table, key in BATCH_KNOWN_IDS_TABLES:
+        queries.append((table, key, 'select id, %s FROM %s' % (key, table)))  # nosec
+    # Only metric names that need no escaping are selected, any others
+    # are determined by determine_id
+    metrics = sorted(set([
+        metric for metric in metrics if '\'' not in metric and '\\' not in metric]))
+    if metrics:
+        queries.append(('metrics', 'metric', 'select id, metric FROM metrics WHERE metric IN (%s)' % (
+            ', '.join(['\'%s\'' % metric for metric in metrics]))))  # nosec
+    for table, key, query in queries:
+        results = None
+        try:
+            results = mysql_select(query)
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: failed to determine results from - %s' % (table))
+        if not results:
+            continue
+        for result in results:
+            try:
+                known_ids[(table, key, str(result[1]))] = int(result[0])
+            except:
+                continue
+    return known_ids
+
+
+def batch_determine_id(ids, determine_id):
+    """
+    Wrap the spin_process determine_id function so that ids are resolved from
+    the batch ids cache and any id that determine_id determines is added to
+    it.  An id that is not known, e.g. 0 or False, is not cached.
+
+    :param ids: the batch ids cache keyed by (table, key, value)
+    :param determine_id: the spin_process determine_id function
+    :type ids: dict
+    :type determine_id: function
+    :return: the wrapped determine_id function
+    :rtype: function
+
+    """
+    def cached_determine_id(table, key, value):
+        id_key = (table, key, value)
+        if not ids.get(id_key):
+            ids[id_key] = determine_id(table, key, value)
+        return ids[id_key]
+
+    return cached_determine_id
+
+
+def inserted_anomalies_query(first_id, anomalies):
+    """
+    The query to select the anomalies inserted by a multi-row insert, from the
+    id of the first row inserted.
+
+    :param first_id: the lastrowid of the multi-row insert, which is the id of
+        the first row inserted
+    :param anomalies: the batch anomalies dicts
+    :type first_id: int
+    :type anomalies: list
+    :return: the select query
+    :rtype: str
+
+    """
+    metric_ids = sorted(set([int(anomaly['metric_id']) for anomaly in anomalies]))
+    return 'select id, metric_id, anomaly_timestamp FROM anomalies WHERE id >= %s AND metric_id IN (%s) ORDER BY id' % (
+        str(first_id), ', '.join([str(metric_id) for metric_id in metric_ids]))  # nosec
+
+
+def match_anomaly_ids(anomalies, results):
+    """
+    Match the ids of the inserted anomalies to the anomalies.  The ids of a
+    multi-row insert are not assumed to be consecutive, as they are not with
+    an auto_increment_increment other than 1, the ids are assigned by
+    metric_id and anomaly_timestamp in id order, which is the order of the
+    rows inserted.
+
+    :param anomalies: the batch anomalies dicts
+    :param results: the id, metric_id, anomaly_timestamp rows of the
+        :func:`inserted_anomalies_query` ordered by id
+    :type anomalies: list
+    :type results: list
+    :return: the anomaly ids in the order of the anomalies, None for an
+        anomaly that has no id
+    :rtype: list
+
+    """
+    inserted_ids = {}
+    for anomaly_id, metric_id, anomaly_timestamp in results:
+        inserted_ids.setdefault((int(metric_id), int(anomaly_timestamp)), []).append(int(anomaly_id))
+    anomaly_ids = []
+    for anomaly in anomalies:
+        anomaly_ids_list = inserted_ids.get((int(anomaly['metric_id']), int(anomaly['metric_timestamp'])))
+        if anomaly_ids_list:
+            anomaly_ids.append(anomaly_ids_list.pop(0))
+        else:
+            anomaly_ids.append(None)
+    return anomaly_ids
@@ -36,7 +36,9 @@ from skyline_functions import (
     get_redis_conn, get_redis_conn_decoded,
     # @added 20200413 - Feature #3486: analyzer_batch
     #                   Feature #3480: batch_processing
-    is_batch_metric)
+    is_batch_metric,
+    # @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+    send_graphite_metric)
 
 # @added 20170115 - Feature #1854: Ionosphere learn - generations
 # Added determination of the learn related variables so that any new metrics
@@ -52,6 +54,13 @@ from database import (
     # @added 20200928 - Task #3748: POC SNAB
     #                   Branch #3068: SNAB
     snab_table_meta)
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine, reflect_static_tables
+
+# @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+from batch_inserts import (
+    BATCH_PROCESSING_CHECKS_KEY, batch_known_ids, batch_determine_id,
+    inserted_anomalies_query, match_anomaly_ids)
 
 skyline_app = 'panorama'
 skyline_app_logger = '%sLog' % skyline_app
@@ -116,6 +125,27 @@ try:
 except:
     PANORAMA_INSERT_METRICS_IMMEDIATELY = False
 
+# @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+try:
+    PANORAMA_BATCH_INSERTS = settings.PANORAMA_BATCH_INSERTS
+except:
+    PANORAMA_BATCH_INSERTS = False
+try:
+    PANORAMA_BATCH_SIZE = int(settings.PANORAMA_BATCH_SIZE)
+except:
+    PANORAMA_BATCH_SIZE = 500
+# The seconds a spin_batch_process is allowed to run before it is terminated,
+# the checks that were not processed remain in the check dir for the next batch
+# and the checks that were being processed are failed
+try:
+    PANORAMA_BATCH_TIMEOUT = int(settings.PANORAMA_BATCH_TIMEOUT)
+except:
+    PANORAMA_BATCH_TIMEOUT = 120
+try:
+    PANORAMA_BATCH_INSERT_SIZE = int(settings.PANORAMA_BATCH_INSERT_SIZE)
+except:
+    PANORAMA_BATCH_INSERT_SIZE = 50
+
 # @added 20200413 - Feature #3486: analyzer_batch
 #                   Feature #3480: batch_processing
 try:
@@ -331,6 +361,56 @@ class Panorama(Thread):
 
         return False
 
+    # @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+    def mysql_insert_anomalies(self, columns, anomalies):
+        """
+        Insert the anomalies into the anomalies table with a single multi-row
+        insert in one transaction and determine the id of each anomaly.
+
+        :param columns: the anomalies columns string
+        :param anomalies: the batch anomalies dicts
+        :type columns: str
+        :type anomalies: list
+        :return: the anomaly ids in the order of the anomalies
+        :rtype: list
+
+        .. note::
+            - The ids of a multi-row insert are not assumed to be consecutive,
+              the ids inserted are selected in the same transaction and are
+              matched to the anomalies with :func:`match_anomaly_ids`.
+            - If the insert fails the transaction is rolled back and the
+              mysql.connector.Error is raised.
+
+        """
+        values = ', '.join([anomaly['anomaly_values'] for anomaly in anomalies])
+        insert = 'insert into anomalies (%s) VALUES %s' % (columns, values)  # nosec
+
+        cnx = mysql.connector.connect(**config)
+        try:
+            cursor = cnx.cursor()
+            cursor.execute(insert)
+            first_id = int(cursor.lastrowid)
+            query = inserted_anomalies_query(first_id, anomalies)
+            cursor.execute(query)
+            results = cursor.fetchall()
+            cnx.commit()
+        except mysql.connector.Error as err:
+            logger.error('error :: mysql error - %s' % str(err))
+            logger.error('error :: failed to insert batch of %s anomalies' % str(len(anomalies)))
+            try:
+                cnx.rollback()
+                cnx.close()
+            except:
+                pass
+            raise
+        try:
+            cursor.close()
+            cnx.close()
+        except:
+            pass
+
+        return match_anomaly_ids(anomalies, results)
+
     # @added 20200204 - Feature #3442: Panorama - add metric to metrics table immediately
     def insert_new_metric(self, metric_name):
         """
@@ -531,7 +611,9 @@ class Panorama(Thread):
         def engine_disposal(engine):
             if engine:
                 try:
-                    engine.dispose()
+                    # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                    # engine.dispose()
+                    dispose_engine(skyline_app, engine)
                 except:
                     logger.error(traceback.format_exc())
                     logger.error('error :: update_slack_thread_ts :: calling engine.dispose()')
@@ -720,7 +802,9 @@ class Panorama(Thread):
         def engine_disposal(engine):
             if engine:
                 try:
-                    engine.dispose()
+                    # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                    # engine.dispose()
+                    dispose_engine(skyline_app, engine)
                 except:
                     logger.error(traceback.format_exc())
                     logger.error('error :: update_anomaly_end_timestamp :: calling engine.dispose()')
@@ -796,7 +880,9 @@ class Panorama(Thread):
         def engine_disposal(engine):
             if engine:
                 try:
-                    engine.dispose()
+                    # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                    # engine.dispose()
+                    dispose_engine(skyline_app, engine)
                 except:
                     logger.error(traceback.format_exc())
                     logger.error('error :: update_alert_ts :: calling engine.dispose()')
@@ -1012,7 +1098,9 @@ class Panorama(Thread):
         def engine_disposal(engine):
             if engine:
                 try:
-                    engine.dispose()
+                    # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+                    # engine.dispose()
+                    dispose_engine(skyline_app, engine)
                 except:
                     logger.error(traceback.format_exc())
                     logger.error('error :: update_alert_ts :: calling engine.dispose()')
@@ -1204,12 +1292,20 @@ class Panorama(Thread):
             engine_disposal(engine)
         return
 
-    def spin_process(self, i, metric_check_file):
+    # @modified 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+    # Added batch
+    # def spin_process(self, i, metric_check_file):
+    def spin_process(self, i, metric_check_file, batch=None):
         """
         Assign a metric anomaly to process.
 
         :param i: python process id
         :param metric_check_file: full path to the metric check file
+        :param batch: the batch dict of spin_batch_process, if passed the ids
+            are resolved through the batch ids cache and the anomaly is added
+            to the batch anomalies to be inserted by spin_batch_process rather
+            than being inserted
+        :type batch: dict
 
         :return: returns True
 
@@ -1515,6 +1611,12 @@ class Panorama(Thread):
                     skyline_app, app, metric, e))
             last_check = None
 
+        # @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+        # The last_check key of an anomaly earlier in the batch is only set
+        # once the batch is inserted
+        if batch is not None and not last_check:
+            last_check = batch['last_checks'].get(cache_key)
+
         # @modified 20200420 - Feature #3500: webapp - crucible_process_metrics
         #                      Feature #1448: Crucible web UI
         #                      Branch #868: crucible
@@ -1789,6 +1891,12 @@ class Panorama(Thread):
             logger.error('error :: failed to determine the inserted id for %s' % value)
             return False
 
+        # @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+        # In a batch the ids are resolved from the batch ids cache and any id
+        # determined is added to it
+        if batch is not None:
+            determine_id = batch_determine_id(batch['ids'], determine_id)
+
         try:
             added_by_host_id = determine_id('hosts', 'host', added_by)
         except:
@@ -1892,11 +2000,19 @@ class Panorama(Thread):
             if not user_id:
                 # User the Skyline user id
                 user_id = 1
-            query_string = '(%s) VALUES (%d, %d, %d, %d, %s, %.6f, %d, \'%s\', \'%s\', \'%s\', %d)' % (
-                columns, metric_id, added_by_host_id, app_id, source_id,
+            # @modified 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+            # The anomaly_values are the batch insert row
+            # query_string = '(%s) VALUES (%d, %d, %d, %d, %s, %.6f, %d, \'%s\', \'%s\', \'%s\', %d)' % (
+            #     columns, metric_id, added_by_host_id, app_id, source_id,
+            #     metric_timestamp, anomalous_datapoint, full_duration,
+            #     algorithms_ids_csv, triggered_algorithms_ids_csv, str(label),
+            #     int(user_id))
+            anomaly_values = '(%d, %d, %d, %d, %s, %.6f, %d, \'%s\', \'%s\', \'%s\', %d)' % (
+                metric_id, added_by_host_id, app_id, source_id,
                 metric_timestamp, anomalous_datapoint, full_duration,
                 algorithms_ids_csv, triggered_algorithms_ids_csv, str(label),
                 int(user_id))
+            query_string = '(%s) VALUES %s' % (columns, anomaly_values)
             query = 'insert into anomalies %s' % query_string  # nosec
         except:
             logger.error('error :: failed to construct insert query')
@@ -1907,6 +2023,25 @@ class Panorama(Thread):
         if settings.ENABLE_PANORAMA_DEBUG:
             logger.info('debug :: anomaly insert - %s' % str(query))
 
+        # @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+        # In a batch the anomaly is inserted with the other anomalies in the
+        # batch by spin_batch_process, which also sets the Redis keys and
+        # removes the check file
+        if batch is not None:
+            batch['columns'] = columns
+            batch['anomalies'].append({
+                'metric': metric, 'metric_id': metric_id,
+                'metric_timestamp': int(metric_timestamp),
+                'anomaly_values': anomaly_values,
+                'cache_key': cache_key, 'batch_metric': batch_metric,
+                'set_anomaly_key': set_anomaly_key,
+                'add_to_current_anomalies': add_to_current_anomalies,
+                'metric_check_file': str(metric_check_file),
+                'metric_failed_check_dir': metric_failed_check_dir})
+            if set_anomaly_key:
+                batch['last_checks'][cache_key] = int(metric_timestamp)
+            return True
+
         anomaly_id = None
         try:
             anomaly_id = self.mysql_insert(query)
@@ -1990,6 +2125,183 @@ class Panorama(Thread):
 
         return anomaly_id
 
+    # @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+    def set_batch_processing_checks(self, metric_check_files):
+        """
+        Record the check files that spin_batch_process is processing in the
+        BATCH_PROCESSING_CHECKS_KEY Redis set, so that the checks are failed
+        rather than processed again if the spin_batch_process times out.
+
+        :param metric_check_files: full paths to the metric check files
+        :type metric_check_files: list
+
+        """
+        try:
+            pipe = self.redis_conn.pipeline()
+            pipe.delete(BATCH_PROCESSING_CHECKS_KEY)
+            if metric_check_files:
+                pipe.sadd(BATCH_PROCESSING_CHECKS_KEY, *metric_check_files)
+            pipe.execute()
+        except Exception as e:
+            logger.error('error :: could not set Redis set %s - %s' % (
+                BATCH_PROCESSING_CHECKS_KEY, e))
+
+    # @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+    def insert_batch_anomalies(self, columns, anomalies):
+        """
+        Insert a sub-batch of anomalies with a single multi-row insert, if the
+        insert fails each anomaly is inserted individually.  The check files of
+        the anomalies inserted are removed as soon as the insert is committed
+        and before the Redis keys are set, so that an anomaly is not inserted
+        again if the spin_batch_process is terminated.  The checks of any
+        anomalies that were not inserted are failed.
+
+        :param columns: the anomalies columns string
+        :param anomalies: the sub-batch anomalies dicts
+        :type columns: str
+        :type anomalies: list
+        :return: the number of anomalies inserted
+        :rtype: int
+
+        """
+        self.set_batch_processing_checks(
+            [anomaly['metric_check_file'] for anomaly in anomalies])
+
+        def remove_check_file(anomaly):
+            if os.path.isfile(anomaly['metric_check_file']):
+                try:
+                    os.remove(anomaly['metric_check_file'])
+                except OSError:
+                    pass
+
+        anomaly_ids = []
+        try:
+            anomaly_ids = self.mysql_insert_anomalies(columns, anomalies)
+            logger.info('inserted batch of %s anomalies' % str(len(anomalies)))
+            for anomaly, anomaly_id in zip(anomalies, anomaly_ids):
+                if anomaly_id:
+                    remove_check_file(anomaly)
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: failed to insert batch of %s anomalies, inserting each anomaly' % str(len(anomalies)))
+            anomaly_ids = []
+            for anomaly in anomalies:
+                anomaly_id = None
+                query = 'insert into anomalies (%s) VALUES %s' % (
+                    columns, anomaly['anomaly_values'])  # nosec
+                try:
+                    anomaly_id = self.mysql_insert(query)
+                except:
+                    logger.error('error :: failed to insert anomaly %s at %s' % (
+                        anomaly['metric'], str(anomaly['metric_timestamp'])))
+                if anomaly_id:
+                    remove_check_file(anomaly)
+                anomaly_ids.append(anomaly_id)
+
+        # Set the Redis keys that spin_process sets for each anomaly in a
+        # single pipeline
+        inserted = 0
+        pipe = self.redis_conn.pipeline()
+        for anomaly, anomaly_id in zip(anomalies, anomaly_ids):
+            if not anomaly_id:
+                logger.error('error :: failed to determine anomaly id for %s at %s' % (
+                    anomaly['metric'], str(anomaly['metric_timestamp'])))
+                fail_check(skyline_app, anomaly['metric_failed_check_dir'], anomaly['metric_check_file'])
+                continue
+            inserted += 1
+            logger.info('anomaly id - %d - created for %s at %s' % (
+                anomaly_id, anomaly['metric'], str(anomaly['metric_timestamp'])))
+            anomaly_id_redis_key = 'panorama.anomaly_id.%s.%s' % (
+                str(anomaly['metric_timestamp']), anomaly['metric'])
+            pipe.setex(anomaly_id_redis_key, 86400, int(anomaly_id))
+            if anomaly['set_anomaly_key']:
+                pipe.setex(
+                    anomaly['cache_key'], settings.PANORAMA_EXPIRY_TIME,
+                    anomaly['metric_timestamp'])
+            if anomaly['add_to_current_anomalies']:
+                data = [anomaly['metric'], anomaly['metric_timestamp'], anomaly_id, None]
+                pipe.sadd('current.anomalies', str(data))
+        if inserted:
+            try:
+                pipe.execute()
+                logger.info('set Redis keys for %s anomalies' % str(inserted))
+            except Exception as e:
+                logger.error('error :: could not set Redis keys for batch anomalies - %s' % e)
+        return inserted
+
+    # @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+    def spin_batch_process(self, i, metric_check_files, backlog):
+        """
+        Process a batch of metric anomaly checks.  The checks are processed by
+        spin_process with the batch, which resolves the ids through an
+        in-memory ids cache populated by :func:`batch_known_ids` and collects
+        the anomalies, which are inserted by :meth:`insert_batch_anomalies` in
+        sub-batches of PANORAMA_BATCH_INSERT_SIZE anomalies as the batch
+        progresses.  The check being processed, or the checks of the sub-batch
+        being inserted, are recorded with :meth:`set_batch_processing_checks`
+        so that they are failed if the spin_batch_process times out.
+
+        :param i: python process id
+        :param metric_check_files: full paths to the metric check files
+        :param backlog: the number of check files in the check dir
+        :type metric_check_files: list
+        :type backlog: int
+
+        :return: returns the number of anomalies inserted
+        :rtype: int
+
+        """
+        batch_start = time()
+        batch = {'ids': {}, 'last_checks': {}, 'anomalies': [], 'columns': None}
+
+        check_file_metrics = []
+        for metric_check_file in metric_check_files:
+            try:
+                check_file_metricname_txt = os.path.basename(metric_check_file).split('.', 1)[1]
+                check_file_metrics.append(check_file_metricname_txt.replace('.txt', ''))
+            except:
+                continue
+        try:
+            batch['ids'] = batch_known_ids(self.mysql_select, check_file_metrics)
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: failed to determine batch_known_ids')
+        logger.info('batch ids cache populated with %s known ids' % str(len(batch['ids'])))
+
+        inserted = 0
+        for metric_check_file in metric_check_files:
+            self.set_batch_processing_checks([metric_check_file])
+            try:
+                self.spin_process(i, metric_check_file, batch=batch)
+            except:
+                logger.error(traceback.format_exc())
+                logger.error('error :: spin_process failed on batch check - %s' % str(metric_check_file))
+            if len(batch['anomalies']) >= PANORAMA_BATCH_INSERT_SIZE:
+                inserted += self.insert_batch_anomalies(batch['columns'], batch['anomalies'])
+                batch['anomalies'] = []
+        if batch['anomalies']:
+            inserted += self.insert_batch_anomalies(batch['columns'], batch['anomalies'])
+            batch['anomalies'] = []
+        self.set_batch_processing_checks([])
+
+        batch_time = time() - batch_start
+        try:
+            insert_rate = inserted / batch_time
+        except ZeroDivisionError:
+            insert_rate = 0
+        logger.info('batch of %s checks processed, %s anomalies inserted in %.2f seconds, %.2f anomalies per second, backlog of %s checks' % (
+            str(len(metric_check_files)), str(inserted), batch_time,
+            insert_rate, str(max(0, backlog - len(metric_check_files)))))
+
+        # Add to the totals reported by run
+        try:
+            self.redis_conn.incrby('panorama.batch.anomalies_inserted', inserted)
+            self.redis_conn.incrbyfloat('panorama.batch.insert_time', batch_time)
+        except Exception as e:
+            logger.error('error :: could not update the panorama.batch Redis keys - %s' % e)
+
+        return inserted
+
     def run(self):
         """
         Called when the process intializes.
@@ -2039,6 +2351,12 @@ class Panorama(Thread):
         # What are the known algorithms?
         #   - if returned make a dictionary
 
+        # @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+        # Reflect the tables before any check processes are spawned so that
+        # every check process inherits the table meta rather than reflecting
+        # the tables for each check
+        reflect_static_tables(skyline_app)
+
         while 1:
             now = time()
 
@@ -2592,6 +2910,101 @@ class Panorama(Thread):
                                     p.terminate()
 
             metric_var_files_sorted = sorted(metric_var_files)
+
+            # @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+            # Drain up to PANORAMA_BATCH_SIZE checks per run in a single
+            # spin_batch_process rather than one check per run
+            if PANORAMA_BATCH_INSERTS:
+                backlog = len(metric_var_files_sorted)
+
+                # Send the backlog and insert rate to Graphite every minute
+                cache_key = '%s.sent_graphite_metrics' % skyline_app
+                redis_sent_graphite_metrics = False
+                try:
+                    redis_sent_graphite_metrics = self.redis_conn.get(cache_key)
+                except Exception as e:
+                    logger.error('error :: could not query Redis for key %s: %s' % (cache_key, e))
+                if not redis_sent_graphite_metrics:
+                    anomalies_inserted = 0
+                    insert_time = 0
+                    try:
+                        anomalies_inserted = int(self.redis_conn_decoded.getset('panorama.batch.anomalies_inserted', 0) or 0)
+                        insert_time = float(self.redis_conn_decoded.getset('panorama.batch.insert_time', 0) or 0)
+                    except Exception as e:
+                        logger.error('error :: could not get the panorama.batch Redis keys - %s' % e)
+                    insert_rate = 0
+                    if insert_time:
+                        insert_rate = round((anomalies_inserted / insert_time), 2)
+                    logger.info('checks.backlog            :: %s' % str(backlog))
+                    logger.info('anomalies.inserted        :: %s' % str(anomalies_inserted))
+                    logger.info('anomalies.insert_rate     :: %s' % str(insert_rate))
+                    send_metric_name = '%s.checks.backlog' % skyline_app_graphite_namespace
+                    send_graphite_metric(skyline_app, send_metric_name, str(backlog))
+                    send_metric_name = '%s.anomalies.inserted' % skyline_app_graphite_namespace
+                    send_graphite_metric(skyline_app, send_metric_name, str(anomalies_inserted))
+                    send_metric_name = '%s.anomalies.insert_rate' % skyline_app_graphite_namespace
+                    send_graphite_metric(skyline_app, send_metric_name, str(insert_rate))
+                    try:
+                        self.redis_conn.setex(cache_key, 59, int(time()))
+                    except Exception as e:
+                        logger.error('error :: could not set Redis key %s: %s' % (cache_key, e))
+
+                batch_check_files = [
+                    '%s/%s' % (settings.PANORAMA_CHECK_PATH, str(metric_var_file))
+                    for metric_var_file in metric_var_files_sorted[:PANORAMA_BATCH_SIZE]]
+                logger.info('assigning %s of %s anomalies for batch insertion' % (
+                    str(len(batch_check_files)), str(backlog)))
+                try:
+                    self.redis_conn.delete(BATCH_PROCESSING_CHECKS_KEY)
+                except Exception as e:
+                    logger.error('error :: could not delete Redis set %s - %s' % (
+                        BATCH_PROCESSING_CHECKS_KEY, e))
+                try:
+                    p = Process(target=self.spin_batch_process, args=(1, batch_check_files, backlog))
+                    p.start()
+                except:
+                    logger.error('error :: to start spin_batch_process')
+                    logger.info(traceback.format_exc())
+                    sleep(PANORAMA_CHECK_INTERVAL)
+                    continue
+                p_starts = time()
+                while time() - p_starts <= PANORAMA_BATCH_TIMEOUT:
+                    if p.is_alive():
+                        sleep(.1)
+                    else:
+                        logger.info(
+                            '%s :: spin_batch_process completed in %.2f seconds' % (
+                                skyline_app, (time() - p_starts)))
+                        break
+                else:
+                    # The checks not processed are left for the next batch and
+                    # the checks that were being processed are failed, so that
+                    # a check that causes the batch to time out does not block
+                    # every subsequent batch and a sub-batch that may have been
+                    # inserted is not inserted again
+                    logger.info('%s :: timed out, killing spin_batch_process' % (skyline_app))
+                    p.terminate()
+                    p.join()
+                    processing_checks = []
+                    try:
+                        processing_checks = list(self.redis_conn_decoded.smembers(BATCH_PROCESSING_CHECKS_KEY))
+                        self.redis_conn.delete(BATCH_PROCESSING_CHECKS_KEY)
+                    except Exception as e:
+                        logger.error('error :: could not get Redis set %s - %s' % (
+                            BATCH_PROCESSING_CHECKS_KEY, e))
+                    for metric_check_file in processing_checks:
+                        if not os.path.isfile(metric_check_file):
+                            continue
+                        check_file_name = os.path.basename(metric_check_file)
+                        check_file_timestamp = check_file_name.split('.', 1)[0]
+                        check_file_metricname = check_file_name.split('.', 1)[1].replace('.txt', '')
+                        check_file_metricname_dir = check_file_metricname.replace('.', '/')
+                        metric_failed_check_dir = '%s/%s/%s' % (failed_checks_dir, check_file_metricname_dir, check_file_timestamp)
+                        logger.info('failing check that was being processed when spin_batch_process timed out - %s' % metric_check_file)
+                        fail_check(skyline_app, metric_failed_check_dir, metric_check_file)
+                p.join()
+                continue
+
             metric_check_file = '%s/%s' % (settings.PANORAMA_CHECK_PATH, str(metric_var_files_sorted[0]))
 
             logger.info('assigning anomaly for insertion - %s' % str(metric_var_files_sorted[0]))
@@ -182,6 +182,49 @@ GRAPHITE_RENDER_URI = 'render'
 :vartype GRAPHITE_RENDER_URI: str
 """
 
+# @added 20261018 - Feature #3924: graphite_client
+GRAPHITE_CLIENT_POOL_MAXSIZE = 10
+"""
+:var GRAPHITE_CLIENT_POOL_MAXSIZE: The number of keep-alive connections to
+    Graphite that are pooled per process by the graphite_client and the maximum
+    number of concurrent Graphite render requests a process makes.
+:vartype GRAPHITE_CLIENT_POOL_MAXSIZE: int
+"""
+
+GRAPHITE_CLIENT_RETRIES = 2
+"""
+:var GRAPHITE_CLIENT_RETRIES: The number of times the graphite_client retries
+    a Graphite request that fails with a connection error or a 500, 502, 503 or
+    504 response.
+:vartype GRAPHITE_CLIENT_RETRIES: int
+"""
+
+GRAPHITE_CLIENT_BATCH_SIZE = 20
+"""
+:var GRAPHITE_CLIENT_BATCH_SIZE: The maximum number of targets that the
+    graphite_client requests in a single multi-target Graphite render request
+    when multiple metrics are fetched.
+:vartype GRAPHITE_CLIENT_BATCH_SIZE: int
+"""
+
+GRAPHITE_CLIENT_CACHE_DIR = False
+"""
+:var GRAPHITE_CLIENT_CACHE_DIR: EXPERIMENTAL.  A directory in which the
+    graphite_client caches the fetched timeseries as numpy files, keyed by
+    metric, from and until, so that repeated requests for the same data are not
+    made to Graphite.  Set to False to disable the cache, e.g.
+    '/opt/skyline/graphite_client_cache'
+:vartype GRAPHITE_CLIENT_CACHE_DIR: str
+"""
+
+GRAPHITE_CLIENT_CACHE_TTL = 3600
+"""
+:var GRAPHITE_CLIENT_CACHE_TTL: The number of seconds the graphite_client
+    cached timeseries are used for if :mod:`settings.GRAPHITE_CLIENT_CACHE_DIR`
+    is set.
+:vartype GRAPHITE_CLIENT_CACHE_TTL: int
+"""
+
 GRAPH_URL = GRAPHITE_PROTOCOL + '://' + GRAPHITE_HOST + ':' + GRAPHITE_PORT + '/' + GRAPHITE_RENDER_URI + '?width=1400&from=-' + TARGET_HOURS + 'hour&target='
 """
 :var GRAPH_URL: The graphite URL for alert graphs will be appended with the
@@ -887,6 +930,101 @@ RUN_OPTIMIZED_WORKFLOW = True
   you may want this to be False
 """
 
+ANALYZER_VECTORIZED_ALGORITHMS = False
+"""
+:var ANALYZER_VECTORIZED_ALGORITHMS: EXPERIMENTAL.  Calculate the three-sigma
+    :mod:`settings.ALGORITHMS` for chunks of metrics in vectorized NumPy arrays
+    rather than per metric.
+:vartype ANALYZER_VECTORIZED_ALGORITHMS: boolean
+
+- If set to ``True``, each Analyzer process decodes its assigned metrics in
+  chunks of :mod:`settings.ANALYZER_VECTORIZED_CHUNK_SIZE` metrics into padded
+  NumPy arrays and calculates the vectorized algorithms for all the metrics in
+  the chunk at once.  The results are used in the normal ensemble, so
+  :mod:`settings.CONSENSUS`, :mod:`settings.RUN_OPTIMIZED_WORKFLOW` and
+  custom_algorithms are applied exactly as before.  Algorithms that do not have
+  a vectorized version (``ks_test``) and metrics whose time series are modified
+  before analysis (e.g. derivative metrics) are run per metric as normal.
+"""
+
+ANALYZER_VECTORIZED_CHUNK_SIZE = 500
+"""
+:var ANALYZER_VECTORIZED_CHUNK_SIZE: The number of metrics to decode and analyse
+    in a single vectorized array when :mod:`settings.ANALYZER_VECTORIZED_ALGORITHMS`
+    is enabled.
+:vartype ANALYZER_VECTORIZED_CHUNK_SIZE: int
+
+- The memory used per chunk is roughly the chunk size x the length of the
+  longest time series x 8 bytes x a handful of arrays, so 500 metrics of 8640
+  data points is in the region of 200MB.
+"""
+
+# @added 20261018 - Feature #3926: ANALYZER_WORKER_POOL
+ANALYZER_WORKER_POOL = False
+"""
+:var ANALYZER_WORKER_POOL: EXPERIMENTAL.  Rather than spawning
+    :mod:`settings.ANALYZER_PROCESSES` new spin_process processes every run,
+    Analyzer runs :mod:`settings.ANALYZER_PROCESSES` persistent workers that
+    keep their Redis connections and per process caches between runs.  Each run
+    every worker is assigned a slice of the unique_metrics, sized on the number
+    of metrics per second the worker has analysed in previous runs, so that a
+    worker that runs slow is assigned fewer metrics in the next run.  A worker
+    that does not complete within :mod:`settings.MAX_ANALYZER_PROCESS_RUNTIME`
+    is terminated and replaced.
+:vartype ANALYZER_WORKER_POOL: boolean
+"""
+
+ANALYZER_WORKER_POOL_MAX_RUNS = 100
+"""
+:var ANALYZER_WORKER_POOL_MAX_RUNS: The number of runs after which a
+    :mod:`settings.ANALYZER_WORKER_POOL` worker exits and is replaced with a
+    new worker, so that any memory the worker has accumulated is released.
+:vartype ANALYZER_WORKER_POOL_MAX_RUNS: int
+"""
+
+# @added 20261018 - Feature #3928: ANALYZER_COST_AWARE_SHARDING
+ANALYZER_COST_AWARE_SHARDING = False
+"""
+:var ANALYZER_COST_AWARE_SHARDING: EXPERIMENTAL.  Each spin_process records the
+    time it takes to analyse each metric in the analyzer.metrics.analysis_cost
+    Redis hash and Analyzer assigns the metrics to the processes on those costs,
+    with longest processing time first bin packing, rather than in equal sized
+    ranges of the unique_metrics.  Metrics that vary greatly in the number of
+    data points or that are derivative, airgap checked or have custom
+    algorithms are then spread between the processes so that no one process
+    holds up the run.  The achieved balance, the longest spin_process runtime
+    divided by the mean runtime, is sent to Graphite as
+    skyline.analyzer.<hostname>.process_balance
+:vartype ANALYZER_COST_AWARE_SHARDING: boolean
+"""
+
+# @added 20261018 - Feature #3930: ANALYZER_INCREMENTAL_STATS
+ANALYZER_INCREMENTAL_STATS = False
+"""
+:var ANALYZER_INCREMENTAL_STATS: EXPERIMENTAL.  Keep the mean, standard
+    deviation, exponentially weighted moving average and least squares
+    statistics of each metric time series in the analyzer.incremental_stats
+    Redis hash and only add the data points that are new since the last run,
+    rather than calculating them over the full time series every run.  The
+    grubbs, first_hour_average, stddev_from_average,
+    stddev_from_moving_average, mean_subtraction_cumulation and least_squares
+    results are determined from these statistics.  The statistics are
+    recalculated from the full time series when roomba trims the time series
+    or data points are added before the last analysed data point.
+    median_absolute_deviation, histogram_bins and ks_test are always run on the
+    full time series.
+:vartype ANALYZER_INCREMENTAL_STATS: boolean
+"""
+
+ANALYZER_INCREMENTAL_STATS_RECOMPUTE_PERIOD = 3600
+"""
+:var ANALYZER_INCREMENTAL_STATS_RECOMPUTE_PERIOD: The number of seconds after
+    which the :mod:`settings.ANALYZER_INCREMENTAL_STATS` statistics of a metric
+    are recalculated from the full time series, to correct any floating point
+    drift.
+:vartype ANALYZER_INCREMENTAL_STATS_RECOMPUTE_PERIOD: int
+"""
+
 ENABLE_ALGORITHM_RUN_METRICS = True
 """
 :var ENABLE_ALGORITHM_RUN_METRICS: This enables algorithm timing metrics to
@@ -1092,6 +1230,19 @@ elements.
 
 """
 
+DERIVATIVE_METRIC_STATUS_CACHE_TTL = 60
+"""
+:var DERIVATIVE_METRIC_STATUS_CACHE_TTL: The number of seconds that each Skyline
+    process caches the derivative status of metrics that are determined in bulk.
+:vartype DERIVATIVE_METRIC_STATUS_CACHE_TTL: int
+
+- Luminosity and the webapp determine whether all the metrics being correlated
+  or processed are derivative metrics with a single Redis pipeline and cache
+  the results in the process for this many seconds.  Setting a metric as a
+  derivative metric invalidates its cached status in the process that sets it,
+  other processes see the change when the TTL expires.
+"""
+
 # Each alert module requires additional information.
 SMTP_OPTS = {
     # This specifies the sender of email alerts.
@@ -1317,6 +1468,27 @@ Try increasing :mod:`settings.CHUNK_SIZE` and decreasing
 :mod:`settings.ANALYZER_PROCESSES` or decreasing :mod:`settings.ROOMBA_PROCESSES`
 """
 
+# @added 20261018 - Feature #3938: HORIZON_LISTEN_SELECTORS
+HORIZON_LISTEN_SELECTORS = False
+"""
+:var HORIZON_LISTEN_SELECTORS: EXPERIMENTAL.  The Horizon pickle listener
+    serves all the carbon-relay connections to :mod:`settings.PICKLE_PORT`
+    (and :mod:`settings.HORIZON_SHARD_PICKLE_PORT`) concurrently with a
+    selector, rather than serving one connection at a time.  When the queue is
+    full the listener stops reading until the chunk is queued, so the relays
+    are slowed down by TCP rather than datapoints being dropped.  Requires
+    Python 3.
+:vartype HORIZON_LISTEN_SELECTORS: boolean
+"""
+
+HORIZON_LISTEN_QUEUE_FULL_TIMEOUT = 5
+"""
+:var HORIZON_LISTEN_QUEUE_FULL_TIMEOUT: With
+    :mod:`settings.HORIZON_LISTEN_SELECTORS` the number of seconds the listener
+    waits for the full queue to accept a chunk before the chunk is dropped.
+:vartype HORIZON_LISTEN_QUEUE_FULL_TIMEOUT: int
+"""
+
 ROOMBA_PROCESSES = 1
 """
 :var ROOMBA_PROCESSES: This is the number of Roomba processes that will be
@@ -1338,6 +1510,26 @@ setting Roomba will clean up evertyhing that is older than
 :mod:`settings.FULL_DURATION` + :mod:`settings.ROOMBA_GRACE_TIME`
 """
 
+HORIZON_STORAGE_FORMAT = 'msgpack'
+"""
+:var HORIZON_STORAGE_FORMAT: ADVANCED FEATURE.  The format of the data points
+    that Horizon appends to the Redis time series keys, msgpack or columnar.
+:vartype HORIZON_STORAGE_FORMAT: str
+
+- msgpack is the default, each data point is a msgpack (timestamp, value)
+  array.  Roomba trims a key by decoding, trimming and re-encoding it.
+- columnar stores each data point as a fixed width binary record (a marker
+  byte, a float64 timestamp and a float64 value).  Roomba trims the old data
+  points from the start of a key by byte offset without decoding and
+  re-encoding it and keys that do not need trimming are not written.  Keys in
+  the other format are converted to columnar by Roomba as it processes them.
+
+The apps read both formats with :func:`skyline_functions.decode_timeseries`
+so the format can be changed on a running Skyline, however all Skyline nodes
+and any other application that reads the Horizon Redis keys directly must
+decode both formats before columnar is enabled.
+"""
+
 ROOMBA_TIMEOUT = 100
 """
 :var ROOMBA_TIMEOUT: Timeout in seconds
@@ -1351,6 +1543,60 @@ stall, I/O wait being one such edge case.  Although 99.999% of the time Roomba
 is fine, this ensures that no Roombas hang around longer than expected.
 """
 
+ROOMBA_INCREMENTAL = False
+"""
+:var ROOMBA_INCREMENTAL: EXPERIMENTAL.  Only vacuum the keys that have data
+    points that are older than the duration.
+:vartype ROOMBA_INCREMENTAL: boolean
+
+Roomba records the oldest retained timestamp of each key it vacuums in the
+horizon.oldest_timestamps.<namespace> Redis sorted set, keys that are not in
+the sorted set are fully vacuumed.  The Horizon workers lower the oldest
+timestamp of a key when a data point older than it is appended, e.g. a
+backfilled data point.  Roomba skips the keys with an oldest timestamp that is
+not older than :mod:`settings.FULL_DURATION` + :mod:`settings.ROOMBA_GRACE_TIME`,
+so on a stable metric population most keys are not fetched or rewritten on
+most runs.
+The number of keys processed, skipped, trimmed and euthanized are sent as
+skyline.horizon.<SERVER_METRICS_NAME>.roomba.<full|mini>.<stat> metrics.
+"""
+
+# @added 20261018 - Feature #3936: METRICS_SNAPSHOT
+METRICS_SNAPSHOT = False
+"""
+:var METRICS_SNAPSHOT: EXPERIMENTAL.  Horizon materialises all the
+    FULL_NAMESPACE metric time series into a memory mapped, columnar snapshot
+    file every :mod:`settings.METRICS_SNAPSHOT_INTERVAL` seconds.  Luminosity
+    and the webapp luminosity_remote_data endpoints on the same host read the
+    time series from the snapshot rather than each getting and decoding them
+    from Redis, falling back to Redis when the snapshot was created before the
+    data they require or is older than :mod:`settings.METRICS_SNAPSHOT_MAX_AGE`.
+    Analyzer and Boundary always read Redis as they require the latest data.
+:vartype METRICS_SNAPSHOT: boolean
+"""
+
+METRICS_SNAPSHOT_PATH = '/opt/skyline/snapshot/metrics.snapshot'
+"""
+:var METRICS_SNAPSHOT_PATH: The path of the :mod:`settings.METRICS_SNAPSHOT`
+    file, ideally on a tmpfs.  The snapshot requires 16 bytes per data point.
+:vartype METRICS_SNAPSHOT_PATH: str
+"""
+
+METRICS_SNAPSHOT_INTERVAL = 60
+"""
+:var METRICS_SNAPSHOT_INTERVAL: The number of seconds between the creation of
+    each :mod:`settings.METRICS_SNAPSHOT`
+:vartype METRICS_SNAPSHOT_INTERVAL: int
+"""
+
+METRICS_SNAPSHOT_MAX_AGE = 120
+"""
+:var METRICS_SNAPSHOT_MAX_AGE: The maximum age in seconds of the
+    :mod:`settings.METRICS_SNAPSHOT` for it to be used, if the snapshot is
+    older the time series are read from Redis.
+:vartype METRICS_SNAPSHOT_MAX_AGE: int
+"""
+
 ROOMBA_DO_NOT_PROCESS_BATCH_METRICS = False
 """
 :var ROOMBA_DO_NOT_PROCESS_BATCH_METRICS: Whether Horizon roomba should
@@ -1581,6 +1827,40 @@ PANORAMA_DBUSERPASS = 'the_user_password'
 :vartype PANORAMA_DBUSERPASS: str
 """
 
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+DATABASE_ENGINE_POOL = False
+"""
+:var DATABASE_ENGINE_POOL: EXPERIMENTAL.  Each process uses a single MySQL
+    SQLAlchemy engine with a pool of connections which are pre-pinged and
+    recycled for all its database calls, rather than creating and disposing of
+    an engine and its connection for every call.  Each check runs in its own
+    process, so the table meta is reflected in the Ionosphere, Panorama and
+    Luminosity parent processes before they spawn their check processes, which
+    inherit it, rather than for every check.  The webapp reflects the table
+    meta and checks for the z_fp_<metric_id> and z_ts_<metric_id> tables once
+    per process.  A forked process creates its own engine and never uses the
+    pooled connections of its parent.  If the database schema is changed the
+    Skyline apps must be restarted.
+:vartype DATABASE_ENGINE_POOL: boolean
+"""
+
+DATABASE_POOL_SIZE = 5
+"""
+:var DATABASE_POOL_SIZE: The number of connections each process keeps in the
+    :mod:`settings.DATABASE_ENGINE_POOL` pool, up to the same number again of
+    connections can be opened if required.  Ensure that the MySQL
+    max_connections allows for the number of processes.
+:vartype DATABASE_POOL_SIZE: int
+"""
+
+DATABASE_POOL_RECYCLE = 3600
+"""
+:var DATABASE_POOL_RECYCLE: The number of seconds after which a
+    :mod:`settings.DATABASE_ENGINE_POOL` connection is replaced, this must be
+    less than the MySQL wait_timeout.
+:vartype DATABASE_POOL_RECYCLE: int
+"""
+
 NUMBER_OF_ANOMALIES_TO_STORE_IN_PANORAMA = 0
 """
 :var NUMBER_OF_ANOMALIES_TO_STORE_IN_PANORAMA: The number of anomalies to store
@@ -1635,6 +1915,48 @@ PANORAMA_INSERT_METRICS_IMMEDIATELY = False
 :vartype PANORAMA_CHECK_INTERVAL: boolean
 """
 
+# @added 20261018 - Feature #3946: PANORAMA_BATCH_INSERTS
+PANORAMA_BATCH_INSERTS = False
+"""
+:var PANORAMA_BATCH_INSERTS: EXPERIMENTAL.  By default Panorama processes one
+    check file per run.  If set to True Panorama processes up to
+    PANORAMA_BATCH_SIZE check files per run in a single process, resolving the
+    metric, host, app, source and algorithm ids through an in-memory ids cache
+    and inserting the anomalies with a multi-row insert in one transaction per
+    PANORAMA_BATCH_INSERT_SIZE anomalies.  This allows Panorama to keep up when
+    many anomalies are triggered at once.  Panorama sends the checks.backlog,
+    anomalies.inserted and anomalies.insert_rate metrics to Graphite every
+    minute in this mode.
+:vartype PANORAMA_BATCH_INSERTS: boolean
+"""
+
+PANORAMA_BATCH_SIZE = 500
+"""
+:var PANORAMA_BATCH_SIZE: The maximum number of check files Panorama processes
+    per run if PANORAMA_BATCH_INSERTS is True.
+:vartype PANORAMA_BATCH_SIZE: int
+"""
+
+PANORAMA_BATCH_TIMEOUT = 120
+"""
+:var PANORAMA_BATCH_TIMEOUT: The maximum number of seconds a Panorama batch
+    process is allowed to run if PANORAMA_BATCH_INSERTS is True.  The process
+    is terminated after this, the check files that were not processed remain in
+    the check dir and are processed in the next batch and the check that was
+    being processed, or the checks of the sub-batch that was being inserted,
+    are moved to the failed checks dir.
+:vartype PANORAMA_BATCH_TIMEOUT: int
+"""
+
+PANORAMA_BATCH_INSERT_SIZE = 50
+"""
+:var PANORAMA_BATCH_INSERT_SIZE: The number of anomalies Panorama inserts in
+    each multi-row insert if PANORAMA_BATCH_INSERTS is True.  The check files
+    of each sub-batch are removed as soon as it is inserted, so a batch that
+    times out only fails the check or the sub-batch that was being processed.
+:vartype PANORAMA_BATCH_INSERT_SIZE: int
+"""
+
 """
 Mirage settings
 """
@@ -1649,6 +1971,21 @@ MIRAGE_PROCESSES = 1
 :vartype MIRAGE_PROCESSES: int
 """
 
+# @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+MIRAGE_CHECK_QUEUE = False
+"""
+:var MIRAGE_CHECK_QUEUE: EXPERIMENTAL.  Analyzer adds the Mirage checks that it
+    writes to the :mod:`settings.MIRAGE_CHECK_PATH` to a Mirage check queue in
+    Redis and notifies Mirage.  Mirage processes the queued checks in priority
+    order (by metric timestamp, with SNAB only checks last) rather than listing
+    the check directory, and when there are no checks Mirage waits on the queue
+    and processes a new check as soon as it is queued rather than sleeping
+    until the next poll.  Check files that are not queued are still processed
+    when the queue is empty.  Must be set to the same value for Analyzer and
+    Mirage.
+:vartype MIRAGE_CHECK_QUEUE: boolean
+"""
+
 MIRAGE_DATA_FOLDER = '/opt/skyline/mirage/data'
 """
 :var MIRAGE_DATA_FOLDER: This is the path for the Mirage data folder where
@@ -2458,6 +2795,26 @@ IONOSPHERE_FEATURES_PERCENT_SIMILAR = 1.0
 :vartype IONOSPHERE_FEATURES_PERCENT_SIMILAR: float
 """
 
+# @added 20261018 - Feature #3916: IONOSPHERE_FEATURES_PROFILE_MATRIX
+IONOSPHERE_FEATURES_PROFILE_MATRIX = False
+"""
+:var IONOSPHERE_FEATURES_PROFILE_MATRIX: EXPERIMENTAL.  Compare the calculated
+    features with all the features profiles of a metric in a single vectorized
+    computation on a compiled features profile matrix rather than fetching and
+    comparing the features of each features profile in turn.
+:vartype IONOSPHERE_FEATURES_PROFILE_MATRIX: boolean
+
+- If set to ``True``, Ionosphere stores the feature values of the features
+  profiles of each metric as a fp_ids x features matrix binary blob in the
+  ``ionosphere.features_profile_matrix.<metric_id>`` Redis key.  The matrix is
+  rebuilt when the features profiles of the metric change, only the features of
+  new features profiles are queried from the z_fp_<metric_id> table.  The
+  common features sums and percent_different are the same as the per features
+  profile comparison and matches are recorded as normal.  If the matrix
+  comparison fails for any reason, Ionosphere falls back to the per features
+  profile comparison.
+"""
+
 IONOSPHERE_MINMAX_SCALING_ENABLED = True
 """
 :var IONOSPHERE_MINMAX_SCALING_ENABLED: Implement Min-Max scaling on features
@@ -2802,6 +3159,30 @@ for the instances to be able to determine which Skyline instance is authorative
 for a metric.
 """
 
+# @added 20261018 - Feature #3918: cluster_data fan out
+CLUSTER_DATA_DEADLINE = 15
+"""
+:var CLUSTER_DATA_DEADLINE: The number of seconds within which all the
+    :mod:`settings.REMOTE_SKYLINE_INSTANCES` must respond to cluster data
+    requests.  The requests to the remote Skyline instances are made
+    concurrently with a pooled keep-alive connection per instance and the
+    responses of any instance that does not respond within the deadline are not
+    included, the responses of the other instances are returned as partial
+    results.  Luminosity allows at least 60 seconds for luminosity_remote_data
+    responses.
+:vartype CLUSTER_DATA_DEADLINE: int
+"""
+
+CLUSTER_DATA_CACHE_TTL = 10
+"""
+:var CLUSTER_DATA_CACHE_TTL: The number of seconds that the webapp caches the
+    complete cluster data responses of the
+    :mod:`settings.REMOTE_SKYLINE_INSTANCES` for, so that repeated
+    /api?cluster_data=true requests do not query all the remote instances
+    again.  Partial results are not cached.  Set to 0 to disable the cache.
+:vartype CLUSTER_DATA_CACHE_TTL: int
+"""
+
 CORRELATE_ALERTS_ONLY = True
 """
 :var CORRELATE_ALERTS_ONLY: Only cross correlate anomalies the have an alert
@@ -2825,6 +3206,34 @@ LUMINOL_CROSS_CORRELATION_THRESHOLD = 0.9
 :vartype LUMINOL_CROSS_CORRELATION_THRESHOLD: float
 """
 
+LUMINOSITY_VECTORIZED_CORRELATIONS = False
+"""
+:var LUMINOSITY_VECTORIZED_CORRELATIONS: EXPERIMENTAL.  Cross correlate all the
+    metrics against an anomaly in vectorized NumPy arrays rather than with a
+    luminol Correlator per metric.
+:vartype LUMINOSITY_VECTORIZED_CORRELATIONS: boolean
+
+- If set to ``True``, Luminosity crops the correlation window of every local
+  and remote metric, aligns the windows with the anomalous window into a single
+  matrix per metric resolution and calculates the luminol cross correlation
+  coefficient, shift and shifted coefficient for all the metrics at once.  The
+  results are the same as the luminol Correlator and are recorded as normal.
+  The time taken in each stage is logged.  If the vectorized correlation fails
+  for any reason, Luminosity falls back to the luminol Correlator.
+"""
+
+# @added 20261018 - Feature #3920: luminosity_remote_data stream
+LUMINOSITY_REMOTE_DATA_PAGE_SIZE = 1000
+"""
+:var LUMINOSITY_REMOTE_DATA_PAGE_SIZE: The number of metrics that the webapp
+    fetches from Redis per mget when it streams luminosity_remote_data to a
+    remote Skyline Luminosity instance.  The time series are sliced to the
+    anomaly window and streamed as line delimited JSON as each page is
+    processed, so the webapp memory used is bounded by the page size rather
+    than the number of metrics.
+:vartype LUMINOSITY_REMOTE_DATA_PAGE_SIZE: int
+"""
+
 LUMINOSITY_RELATED_TIME_PERIOD = 240
 """
 :var LUMINOSITY_RELATED_TIME_PERIOD: The time period (in seconds) either side of
@@ -3063,6 +3472,49 @@ FLUX_CARBON_PICKLE_PORT = 2004
 :vartype FLUX_CARBON_PICKLE_PORT: int
 """
 
+FLUX_CARBON_PICKLE_POOL_SIZE = 2
+"""
+:var FLUX_CARBON_PICKLE_POOL_SIZE: The number of persistent connections that
+    each flux worker holds open to the Carbon PICKLE_RECEIVER_PORT.
+    Connections are reused for every batch and reconnected with an exponential
+    backoff if they error.
+:vartype FLUX_CARBON_PICKLE_POOL_SIZE: int
+"""
+
+FLUX_CARBON_PICKLE_BATCH_SIZE = 1000
+"""
+:var FLUX_CARBON_PICKLE_BATCH_SIZE: The maximum number of data points sent to
+    Carbon in a single pickle.  The flux worker flushes its buffer when this
+    number of data points have been buffered.
+:vartype FLUX_CARBON_PICKLE_BATCH_SIZE: int
+"""
+
+FLUX_CARBON_PICKLE_FLUSH_INTERVAL = 1
+"""
+:var FLUX_CARBON_PICKLE_FLUSH_INTERVAL: The maximum number of seconds that the
+    flux worker buffers data points before flushing them to Carbon, even if
+    FLUX_CARBON_PICKLE_BATCH_SIZE has not been reached.
+:vartype FLUX_CARBON_PICKLE_FLUSH_INTERVAL: int
+"""
+
+FLUX_CARBON_PICKLE_MAX_BUFFER = 500000
+"""
+:var FLUX_CARBON_PICKLE_MAX_BUFFER: The maximum number of data points that a
+    flux worker buffers in memory if Carbon is unavailable.  When the buffer is
+    full the oldest data points are dropped and counted in the
+    skyline.flux.<SERVER_METRICS_NAME>.worker.carbon_pickle.dropped metric.
+:vartype FLUX_CARBON_PICKLE_MAX_BUFFER: int
+"""
+
+FLUX_WORKER_QUEUE_DRAIN_SIZE = 100
+"""
+:var FLUX_WORKER_QUEUE_DRAIN_SIZE: The maximum number of items a flux worker
+    takes off the flux queue in one drain.  A POST of multiple metrics is
+    queued as a single item, so a drain of 100 items from POSTs of 480 metrics
+    is 48000 metrics.
+:vartype FLUX_WORKER_QUEUE_DRAIN_SIZE: int
+"""
+
 FLUX_GRAPHITE_WHISPER_PATH = '/opt/graphite/storage/whisper'
 """
 :var FLUX_GRAPHITE_WHISPER_PATH: This is the absolute path on your GRAPHITE server, it is
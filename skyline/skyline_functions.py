@@ -6,6 +6,8 @@ These are shared functions that are required in multiple modules.
 import logging
 from os import path
 from time import time
+# @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+from time import sleep
 import socket
 import datetime
 import errno
@@ -31,6 +33,13 @@ from redis import StrictRedis
 # @added 20201012 - Feature #3780: skyline_functions - sanitise_graphite_url
 import urllib.parse
 
+# @added 20261018 - Feature #3900: Zero copy msgpack time series decode
+import numpy as np
+from msgpack import Unpacker
+# @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+from msgpack import packb
+import struct
+
 import settings
 
 try:
@@ -74,6 +83,15 @@ try:
 except:
     IONOSPHERE_CUSTOM_KEEP_TRAINING_TIMESERIES_FOR = []
 
+# @added 20261018 - Feature #3914: get_derivative_metric_statuses
+try:
+    DERIVATIVE_METRIC_STATUS_CACHE_TTL = int(settings.DERIVATIVE_METRIC_STATUS_CACHE_TTL)
+except:
+    DERIVATIVE_METRIC_STATUS_CACHE_TTL = 60
+# The per process cache of derivative metric statuses used by
+# get_derivative_metric_statuses, base_name: (known_derivative_metric, cached_at)
+derivative_metric_status_cache = {}
+
 config = {'user': settings.PANORAMA_DBUSER,
           'password': settings.PANORAMA_DBUSERPASS,
           'host': settings.PANORAMA_DBHOST,
@@ -957,16 +975,25 @@ def get_graphite_metric(
         sanitised, url = sanitise_graphite_url(current_skyline_app, url)
 
         graphite_json_fetched = False
+        # @modified 20261018 - Feature #3924: graphite_client
+        # Use the pooled graphite_client session with retries, imported here
+        # as graphite_client imports skyline_functions
         try:
-            r = requests.get(url, timeout=use_timeout)
-            graphite_json_fetched = True
+            from graphite_client import graphite_render
+            # r = requests.get(url, timeout=use_timeout)
+            js = graphite_render(current_skyline_app, url, use_timeout)
+            if js is not None:
+                graphite_json_fetched = True
+            else:
+                datapoints = [[None, str(graphite_until)]]
+                current_logger.error('error :: data retrieval from Graphite failed')
         except:
             datapoints = [[None, str(graphite_until)]]
             current_logger.error('error :: data retrieval from Graphite failed')
 
         if graphite_json_fetched:
             try:
-                js = r.json()
+                # js = r.json()
                 datapoints = js[0]['datapoints']
                 if settings.ENABLE_DEBUG:
                     current_logger.info('data retrieved OK')
@@ -1794,6 +1821,110 @@ def is_derivative_metric(current_skyline_app, base_name):
     return False
 
 
+# @added 20261018 - Feature #3914: get_derivative_metric_statuses
+def get_derivative_metric_statuses(current_skyline_app, base_names, use_cache=True):
+    """
+    Determine whether each of a list of metrics is a known derivative metric,
+    with the same logic as :func:`is_derivative_metric`.  The statuses of the
+    metrics that are not in the per process cache are resolved with a single
+    pipelined Redis read of the derivative_metrics and non_derivative_metrics
+    Redis sets and the z.derivative_metric keys of the metrics.  The statuses
+    are cached for DERIVATIVE_METRIC_STATUS_CACHE_TTL seconds and the cached
+    status of a metric is invalidated when :func:`set_metric_as_derivative` is
+    run on it in the process.
+
+    :param current_skyline_app: the Skyline app that is calling the function
+    :param base_names: the metric base_names
+    :param use_cache: whether to use the cached statuses
+    :type current_skyline_app: str
+    :type base_names: list
+    :type use_cache: boolean
+    :return: a dictionary of base_name: known_derivative_metric
+    :rtype: dict
+
+    """
+    statuses = {}
+    uncached_base_names = []
+    now = time()
+    for base_name in base_names:
+        base_name = str(base_name)
+        if base_name in statuses:
+            continue
+        if use_cache:
+            try:
+                known_derivative_metric, cached_at = derivative_metric_status_cache[base_name]
+                if (now - cached_at) < DERIVATIVE_METRIC_STATUS_CACHE_TTL:
+                    statuses[base_name] = known_derivative_metric
+                    continue
+            except KeyError:
+                pass
+        statuses[base_name] = False
+        uncached_base_names.append(base_name)
+    if not uncached_base_names:
+        return statuses
+
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+
+    try:
+        REDIS_CONN_DECODED = get_redis_conn_decoded(current_skyline_app)
+        pipe = REDIS_CONN_DECODED.pipeline(transaction=False)
+        pipe.smembers('derivative_metrics')
+        pipe.smembers('non_derivative_metrics')
+        pipe.mget(['z.derivative_metric.%s' % base_name for base_name in uncached_base_names])
+        derivative_metrics, non_derivative_metrics, last_derivative_metric_keys = pipe.execute()
+    except Exception as e:
+        # As is_derivative_metric, the metrics are not known derivative
+        # metrics if Redis fails, but the statuses are not cached
+        current_logger.error('error :: get_derivative_metric_statuses :: failed to query Redis: %s' % e)
+        return statuses
+
+    try:
+        non_derivative_monotonic_metrics = list(settings.NON_DERIVATIVE_MONOTONIC_METRICS)
+    except:
+        non_derivative_monotonic_metrics = []
+
+    for base_name, last_derivative_metric_key in zip(uncached_base_names, last_derivative_metric_keys):
+        redis_metric_name = '%s%s' % (settings.FULL_NAMESPACE, base_name)
+        known_derivative_metric = redis_metric_name in derivative_metrics
+        if not known_derivative_metric and last_derivative_metric_key:
+            known_derivative_metric = True
+        if known_derivative_metric and non_derivative_monotonic_metrics:
+            if in_list(base_name, non_derivative_monotonic_metrics):
+                known_derivative_metric = False
+        if known_derivative_metric:
+            if redis_metric_name in non_derivative_metrics:
+                known_derivative_metric = False
+        statuses[base_name] = known_derivative_metric
+        derivative_metric_status_cache[base_name] = (known_derivative_metric, now)
+
+    # Remove expired statuses so that the cache does not grow with metrics
+    # that are no longer requested
+    if len(derivative_metric_status_cache) > len(statuses):
+        for base_name in list(derivative_metric_status_cache.keys()):
+            if (now - derivative_metric_status_cache[base_name][1]) >= DERIVATIVE_METRIC_STATUS_CACHE_TTL:
+                del derivative_metric_status_cache[base_name]
+    return statuses
+
+
+# @added 20261018 - Feature #3914: get_derivative_metric_statuses
+def invalidate_derivative_metric_statuses(base_names=None):
+    """
+    Remove metrics from the per process get_derivative_metric_statuses cache.
+
+    :param base_names: the metric base_names to invalidate, all the metrics if
+        None
+    :type base_names: list
+    :return: None
+
+    """
+    if base_names is None:
+        derivative_metric_status_cache.clear()
+        return
+    for base_name in base_names:
+        derivative_metric_status_cache.pop(str(base_name), None)
+
+
 # @added 20180804 - Feature #2488: Allow user to specifically set metric as a derivative metric in training_data
 def set_metric_as_derivative(current_skyline_app, base_name):
     """
@@ -1906,6 +2037,9 @@ def set_metric_as_derivative(current_skyline_app, base_name):
     len_non_derivative_metrics = len(non_derivative_metrics)
     current_logger.info('set_metric_as_derivative :: %s metrics in non_derivative_metrics after the removal of %s' % (str(len_non_derivative_metrics), str(metric_name)))
 
+    # @added 20261018 - Feature #3914: get_derivative_metric_statuses
+    invalidate_derivative_metric_statuses([base_name])
+
     return return_boolean
 
 
@@ -2212,6 +2346,329 @@ def sort_timeseries(timeseries):
     return sorted_timeseries
 
 
+# @added 20261018 - Feature #3900: Zero copy msgpack time series decode
+# The msgpack type codes of the fixed width records that Horizon appends to
+# Redis, packb((timestamp, value)).  A fixarray header of 2 elements followed
+# by a typed timestamp and a typed value.  Each known type byte is mapped to
+# its big endian numpy dtype and to the dtype it is decoded into.
+MSGPACK_FIXARRAY_2 = 0x92
+MSGPACK_TIMESTAMP_TYPES = {
+    0xce: ('>u4', np.int64),
+    0xcf: ('>u8', np.int64),
+    0xd2: ('>i4', np.int64),
+    0xd3: ('>i8', np.int64),
+    0xcb: ('>f8', np.float64),
+}
+MSGPACK_VALUE_TYPES = {
+    0xcb: '>f8',
+    0xca: '>f4',
+}
+
+
+def _msgpack_record_dtype(raw_series):
+    """
+    Determine the fixed width record layout of a Horizon msgpack stream from
+    its first record, returns None if the first record is not a fixed width
+    (timestamp, value) record.
+    """
+    if len(raw_series) < 3 or raw_series[0] != MSGPACK_FIXARRAY_2:
+        return None, None
+    timestamp_type = MSGPACK_TIMESTAMP_TYPES.get(raw_series[1])
+    if not timestamp_type:
+        return None, None
+    timestamp_dtype, decode_timestamp_dtype = timestamp_type
+    value_type_offset = 2 + np.dtype(timestamp_dtype).itemsize
+    if len(raw_series) <= value_type_offset:
+        return None, None
+    value_dtype = MSGPACK_VALUE_TYPES.get(raw_series[value_type_offset])
+    if not value_dtype:
+        return None, None
+    record_dtype = np.dtype([
+        ('header', 'u1'), ('timestamp_type', 'u1'), ('timestamp', timestamp_dtype),
+        ('value_type', 'u1'), ('value', value_dtype)])
+    return record_dtype, decode_timestamp_dtype
+
+
+# @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+# The fixed width records that Horizon appends to Redis when
+# HORIZON_STORAGE_FORMAT is columnar.  Each record is a marker byte followed by
+# a little endian float64 timestamp and a little endian float64 value.  The
+# marker is 0xc1 which is never used in msgpack, so the format of a Redis key,
+# or of each record in a key that has been appended to in both formats, is
+# determined from its first byte.
+HORIZON_COLUMNAR_RECORD_MARKER = 0xc1
+HORIZON_COLUMNAR_RECORD_DTYPE = np.dtype([
+    ('marker', 'u1'), ('timestamp', '<f8'), ('value', '<f8')])
+HORIZON_COLUMNAR_RECORD_SIZE = HORIZON_COLUMNAR_RECORD_DTYPE.itemsize
+_horizon_columnar_record_struct = struct.Struct('<Bdd')
+
+
+# @added 20261018 - Feature #3910: ROOMBA_INCREMENTAL
+# The Redis sorted set of the oldest retained timestamp of each Horizon Redis
+# time series key in a namespace, maintained by the horizon workers and roomba
+HORIZON_OLDEST_TIMESTAMPS_KEY = 'horizon.oldest_timestamps.%s'
+
+
+def encode_columnar_datapoint(timestamp, value):
+    """
+    Encode a data point as a Horizon columnar record.  A None value is encoded
+    as NaN.
+
+    :param timestamp: the data point timestamp
+    :param value: the data point value
+    :type timestamp: int
+    :type value: float
+    :return: record
+    :rtype: bytes
+
+    """
+    if value is None:
+        value = np.nan
+    return _horizon_columnar_record_struct.pack(
+        HORIZON_COLUMNAR_RECORD_MARKER, float(timestamp), float(value))
+
+
+def encode_horizon_datapoint(datapoint, storage_format=None):
+    """
+    Encode a (timestamp, value) data point for appending to a Horizon Redis
+    time series in the HORIZON_STORAGE_FORMAT.
+
+    :param datapoint: the (timestamp, value) data point
+    :param storage_format: msgpack or columnar, settings.HORIZON_STORAGE_FORMAT
+        by default
+    :type datapoint: tuple
+    :type storage_format: str
+    :return: record
+    :rtype: bytes
+
+    """
+    if storage_format is None:
+        try:
+            storage_format = str(settings.HORIZON_STORAGE_FORMAT)
+        except:
+            storage_format = 'msgpack'
+    if storage_format == 'columnar':
+        return encode_columnar_datapoint(datapoint[0], datapoint[1])
+    return packb(datapoint)
+
+
+def encode_columnar_timeseries(timeseries):
+    """
+    Encode a time series as Horizon columnar records.
+
+    :param timeseries: a timeseries array created by decode_timeseries or a
+        list of (timestamp, value) tuples
+    :type timeseries: numpy.ndarray or list
+    :return: records
+    :rtype: bytes
+
+    """
+    if timeseries is None or not len(timeseries):
+        return b''
+    records = np.empty(len(timeseries), dtype=HORIZON_COLUMNAR_RECORD_DTYPE)
+    records['marker'] = HORIZON_COLUMNAR_RECORD_MARKER
+    if isinstance(timeseries, np.ndarray):
+        records['timestamp'] = timeseries['timestamp']
+        records['value'] = timeseries['value']
+    else:
+        records['timestamp'] = [datapoint[0] for datapoint in timeseries]
+        records['value'] = [
+            np.nan if datapoint[1] is None else datapoint[1]
+            for datapoint in timeseries]
+    return records.tobytes()
+
+
+def horizon_storage_format(raw_series):
+    """
+    The storage format of a Horizon Redis time series.
+
+    :param raw_series: the bytes as stored in Redis
+    :type raw_series: bytes
+    :return: 'columnar' if every record is a columnar record, 'msgpack' if
+        the first record is msgpack and there are no columnar records, 'mixed'
+        if the key has been appended to in both formats or None if raw_series
+        is empty
+    :rtype: str
+
+    """
+    if not raw_series:
+        return None
+    if raw_series[0] != HORIZON_COLUMNAR_RECORD_MARKER:
+        if HORIZON_COLUMNAR_RECORD_MARKER in raw_series:
+            # The marker byte can occur within msgpack records so determine
+            # whether there are columnar records by walking the records
+            if _decode_mixed_records(raw_series)[1]:
+                return 'mixed'
+        return 'msgpack'
+    if len(raw_series) % HORIZON_COLUMNAR_RECORD_SIZE == 0:
+        records = np.frombuffer(raw_series, dtype=HORIZON_COLUMNAR_RECORD_DTYPE)
+        if np.all(records['marker'] == HORIZON_COLUMNAR_RECORD_MARKER):
+            return 'columnar'
+    return 'mixed'
+
+
+def _decode_mixed_records(raw_series):
+    """
+    Walk a Horizon Redis time series record by record, decoding columnar
+    records and msgpack records.  Returns the list of datapoints and the
+    number of columnar records.
+    """
+    datapoints = []
+    columnar_records = 0
+    position = 0
+    length = len(raw_series)
+    while position < length:
+        if raw_series[position] == HORIZON_COLUMNAR_RECORD_MARKER:
+            _, timestamp, value = _horizon_columnar_record_struct.unpack_from(raw_series, position)
+            datapoints.append((timestamp, value))
+            columnar_records += 1
+            position += HORIZON_COLUMNAR_RECORD_SIZE
+            continue
+        unpacker = Unpacker(use_list=False)
+        unpacker.feed(raw_series[position:])
+        run_start = position
+        while position < length and raw_series[position] != HORIZON_COLUMNAR_RECORD_MARKER:
+            datapoints.append(unpacker.unpack())
+            position = run_start + unpacker.tell()
+    return datapoints, columnar_records
+
+
+def decode_timeseries(raw_series, deduplicate=False):
+    """
+    Decode a Horizon Redis msgpack time series directly into a numpy
+    structured array with timestamp and value fields, sorted by timestamp.
+
+    When every record in the stream has the same fixed width layout, which is
+    the case for the data Horizon appends, the stream is viewed in place with
+    np.frombuffer and the only copy made is the conversion to native dtypes.
+    Any other stream falls back to msgpack Unpacker.  Whether the time series
+    is already sorted is determined with a single vectorized check and the
+    sort (and deduplication) is only done when it is required.  Integer
+    timestamps are decoded as int64 and values as float64, so any None values
+    are decoded as NaN.
+
+    :param raw_series: the msgpack bytes as stored in Redis, or a timeseries
+        array from the metrics snapshot which is only sorted (and deduplicated)
+    :param deduplicate: whether to remove datapoints with duplicate
+        timestamps, when True the time series is ordered by timestamp and then
+        value and the first datapoint for each timestamp is kept, as roomba
+        has always done.  When False duplicates are retained in the order they
+        were received, as sort_timeseries does.
+    :type raw_series: bytes
+    :type deduplicate: boolean
+    :return: timeseries_array
+    :rtype: numpy.ndarray
+
+    """
+    timeseries_array = None
+    # @modified 20261018 - Feature #3936: METRICS_SNAPSHOT
+    # A timeseries array from the metrics snapshot is already decoded
+    # if not raw_series:
+    if isinstance(raw_series, np.ndarray):
+        timeseries_array = raw_series
+    elif not raw_series:
+        return np.empty(0, dtype=[('timestamp', np.int64), ('value', np.float64)])
+
+    # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+    # Columnar records are viewed in place, timestamps are decoded as int64
+    # if they are all whole numbers as msgpack integer timestamps are.
+    # @modified 20261018 - Feature #3936: METRICS_SNAPSHOT
+    # Added timeseries_array is None
+    if timeseries_array is None and raw_series[0] == HORIZON_COLUMNAR_RECORD_MARKER and \
+            len(raw_series) % HORIZON_COLUMNAR_RECORD_SIZE == 0:
+        records = np.frombuffer(raw_series, dtype=HORIZON_COLUMNAR_RECORD_DTYPE)
+        if np.all(records['marker'] == HORIZON_COLUMNAR_RECORD_MARKER):
+            timestamps = records['timestamp']
+            if np.all(np.isfinite(timestamps)) and np.all(np.floor(timestamps) == timestamps):
+                decode_timestamp_dtype = np.int64
+            else:
+                decode_timestamp_dtype = np.float64
+            timeseries_array = np.empty(len(records), dtype=[
+                ('timestamp', decode_timestamp_dtype), ('value', np.float64)])
+            timeseries_array['timestamp'] = timestamps
+            timeseries_array['value'] = records['value']
+
+    # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+    # record_dtype, decode_timestamp_dtype = _msgpack_record_dtype(raw_series)
+    # if record_dtype is not None and len(raw_series) % record_dtype.itemsize == 0:
+    record_dtype = None
+    if timeseries_array is None:
+        record_dtype, decode_timestamp_dtype = _msgpack_record_dtype(raw_series)
+    if record_dtype is not None and len(raw_series) % record_dtype.itemsize == 0:
+        records = np.frombuffer(raw_series, dtype=record_dtype)
+        if np.all(records['header'] == MSGPACK_FIXARRAY_2) and \
+                np.all(records['timestamp_type'] == raw_series[1]) and \
+                np.all(records['value_type'] == records['value_type'][0]):
+            timeseries_array = np.empty(len(records), dtype=[
+                ('timestamp', decode_timestamp_dtype), ('value', np.float64)])
+            timeseries_array['timestamp'] = records['timestamp']
+            timeseries_array['value'] = records['value']
+
+    if timeseries_array is None:
+        # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+        # Keys that have been appended to in both formats are walked record
+        # by record
+        # unpacker = Unpacker(use_list=False)
+        # unpacker.feed(raw_series)
+        # datapoints = [datapoint for datapoint in unpacker]
+        columnar_records = 0
+        if HORIZON_COLUMNAR_RECORD_MARKER in raw_series:
+            datapoints, columnar_records = _decode_mixed_records(raw_series)
+        else:
+            unpacker = Unpacker(use_list=False)
+            unpacker.feed(raw_series)
+            datapoints = [datapoint for datapoint in unpacker]
+        timestamps = np.array([datapoint[0] for datapoint in datapoints])
+        if columnar_records and timestamps.dtype.kind == 'f' and \
+                np.all(np.isfinite(timestamps)) and np.all(np.floor(timestamps) == timestamps):
+            # Columnar timestamps are float64, whole number timestamps are
+            # decoded as int64 as they are in a columnar key
+            timestamps = timestamps.astype(np.int64)
+        if timestamps.dtype.kind in ('i', 'u'):
+            timestamp_dtype = np.int64
+        else:
+            timestamp_dtype = np.float64
+        timeseries_array = np.empty(len(datapoints), dtype=[
+            ('timestamp', timestamp_dtype), ('value', np.float64)])
+        timeseries_array['timestamp'] = timestamps
+        timeseries_array['value'] = [datapoint[1] for datapoint in datapoints]
+        del datapoints
+
+    timestamps = timeseries_array['timestamp']
+    if len(timestamps) > 1 and not np.all(timestamps[1:] > timestamps[:-1]):
+        if deduplicate:
+            order = np.lexsort((timeseries_array['value'], timestamps))
+            timeseries_array = timeseries_array[order]
+            timestamps = timeseries_array['timestamp']
+            unique = np.ones(len(timestamps), dtype=bool)
+            unique[1:] = timestamps[1:] != timestamps[:-1]
+            timeseries_array = timeseries_array[unique]
+        else:
+            order = np.argsort(timestamps, kind='stable')
+            timeseries_array = timeseries_array[order]
+
+    return timeseries_array
+
+
+def timeseries_array_to_list(timeseries_array):
+    """
+    Convert a timeseries array created by decode_timeseries into the list of
+    (timestamp, value) tuples that the algorithms and the other Skyline
+    functions expect.
+
+    :param timeseries_array: the timeseries numpy structured array
+    :type timeseries_array: numpy.ndarray
+    :return: timeseries
+    :rtype: list
+
+    """
+    if timeseries_array is None or not len(timeseries_array):
+        return []
+    return list(zip(
+        timeseries_array['timestamp'].tolist(),
+        timeseries_array['value'].tolist()))
+
+
 # @added 20200813 - Feature #3670: IONOSPHERE_CUSTOM_KEEP_TRAINING_TIMESERIES_FOR
 def historical_data_dir_exists(current_skyline_app, ionosphere_data_dir):
     """
@@ -2576,3 +3033,154 @@ def correlate_or_relate_with(current_skyline_app, metric, metric_to_correlate_or
     except:
         pass
     return False
+
+
+# @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+# The Redis sorted set of Mirage check file names scored by priority (lowest
+# score first) and the Redis list that is pushed to wake Mirage when a check is
+# added.  The check file remains the check, the queue is an ordered index of
+# the check files so that Mirage does not have to listdir the check directory
+# and does not have to sleep until the next poll to process a new check.
+MIRAGE_CHECK_QUEUE_KEY = 'mirage.check_queue'
+MIRAGE_CHECK_QUEUE_NOTIFY_KEY = 'mirage.check_queue.notify'
+# Added to the priority score of low priority checks, e.g. SNAB only checks,
+# so that they are processed after all the checks of the last day
+MIRAGE_CHECK_QUEUE_LOW_PRIORITY_OFFSET = 86400
+
+
+# @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+def add_to_mirage_check_queue(current_skyline_app, redis_conn, check_file, priority):
+    """
+    Add a Mirage check file that has been written to the MIRAGE_CHECK_PATH to
+    the Mirage check queue and notify Mirage.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param redis_conn: a Redis connection
+    :param check_file: the check file path or file name
+    :param priority: the priority score of the check, checks with the lowest
+        score are processed first, e.g. the metric timestamp
+    :type current_skyline_app: str
+    :type redis_conn: object
+    :type check_file: str
+    :type priority: float
+    :return: True or False
+    :rtype: boolean
+
+    """
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+    check_filename = os.path.basename(str(check_file))
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.zadd(MIRAGE_CHECK_QUEUE_KEY, {check_filename: float(priority)}, nx=True)
+        pipe.lpush(MIRAGE_CHECK_QUEUE_NOTIFY_KEY, check_filename)
+        # Only a single notification is required to wake Mirage
+        pipe.ltrim(MIRAGE_CHECK_QUEUE_NOTIFY_KEY, 0, 0)
+        pipe.execute()
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: add_to_mirage_check_queue :: failed to add %s to %s' % (
+            check_filename, MIRAGE_CHECK_QUEUE_KEY))
+        return False
+    return True
+
+
+# @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+def get_mirage_check_queue(current_skyline_app, redis_conn, check_path):
+    """
+    Get the check file names in the Mirage check queue in priority order.
+    Check files that no longer exist in the check_path, e.g. checks that have
+    been removed because they were alerted on, are removed from the queue.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param redis_conn: a Redis connection
+    :param check_path: the MIRAGE_CHECK_PATH
+    :type current_skyline_app: str
+    :type redis_conn: object
+    :type check_path: str
+    :return: check_filenames
+    :rtype: list
+
+    """
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+    check_filenames = []
+    removed_filenames = []
+    try:
+        queued_filenames = redis_conn.zrange(MIRAGE_CHECK_QUEUE_KEY, 0, -1)
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: get_mirage_check_queue :: failed to get %s' % MIRAGE_CHECK_QUEUE_KEY)
+        return check_filenames
+    for check_filename in queued_filenames:
+        if isinstance(check_filename, bytes):
+            check_filename = check_filename.decode('utf-8')
+        if os.path.isfile(os.path.join(check_path, check_filename)):
+            check_filenames.append(check_filename)
+        else:
+            removed_filenames.append(check_filename)
+    if removed_filenames:
+        remove_from_mirage_check_queue(current_skyline_app, redis_conn, removed_filenames)
+    return check_filenames
+
+
+# @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+def remove_from_mirage_check_queue(current_skyline_app, redis_conn, check_filenames):
+    """
+    Remove check file names from the Mirage check queue.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param redis_conn: a Redis connection
+    :param check_filenames: the check file names
+    :type current_skyline_app: str
+    :type redis_conn: object
+    :type check_filenames: list
+    :return: True or False
+    :rtype: boolean
+
+    """
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+    if not check_filenames:
+        return True
+    try:
+        redis_conn.zrem(MIRAGE_CHECK_QUEUE_KEY, *[os.path.basename(str(f)) for f in check_filenames])
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: remove_from_mirage_check_queue :: failed to remove check files from %s' % (
+            MIRAGE_CHECK_QUEUE_KEY))
+        return False
+    return True
+
+
+# @added 20261018 - Feature #3922: MIRAGE_CHECK_QUEUE
+def wait_for_mirage_check(current_skyline_app, redis_conn, timeout):
+    """
+    Block until a check is added to the Mirage check queue or until the
+    timeout, rather than sleeping for the timeout.
+
+    :param current_skyline_app: the app calling the function so the function
+        knows which log to write too.
+    :param redis_conn: a Redis connection
+    :param timeout: the maximum number of seconds to wait
+    :type current_skyline_app: str
+    :type redis_conn: object
+    :type timeout: int
+    :return: True if notified, False if the wait timed out
+    :rtype: boolean
+
+    """
+    current_skyline_app_logger = str(current_skyline_app) + 'Log'
+    current_logger = logging.getLogger(current_skyline_app_logger)
+    notified = None
+    try:
+        notified = redis_conn.blpop(MIRAGE_CHECK_QUEUE_NOTIFY_KEY, timeout=max(int(timeout), 1))
+    except:
+        current_logger.error(traceback.format_exc())
+        current_logger.error('error :: wait_for_mirage_check :: failed to blpop %s, sleeping' % (
+            MIRAGE_CHECK_QUEUE_NOTIFY_KEY))
+        sleep(timeout)
+    return bool(notified)
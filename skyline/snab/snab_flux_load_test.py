@@ -60,6 +60,90 @@ snab_flux_load_test_metrics_set = 'snab.flux_load_test.metrics'
 snab_flux_load_test_metrics_all_set = 'snab.flux_load_test.metrics.all'
 
 
+# @added 20261018 - Feature #3906: flux - batched ingest
+def new_load_test_metric_name(namespace_prefix=SNAB_FLUX_LOAD_TEST_NAMESPACE_PREFIX):
+    """
+    A randomly generated load test metric name in the namespace.
+    """
+    new_uuid = str(uuid.uuid4())
+    new_metric_uuid = new_uuid.replace('-', '.')
+    slot = str(round(random.random(), 2))
+    return '%s.%s.%s' % (namespace_prefix, slot, new_metric_uuid)
+
+
+# @added 20261018 - Feature #3906: flux - batched ingest
+def post_load_test_metrics(
+        metrics, timestamp, metrics_per_post=SNAB_FLUX_LOAD_TEST_METRICS_PER_POST,
+        stop_at=None, url=FLUX_POST_URL, session=None):
+    """
+    POST a random value for each metric to flux in POSTs of metrics_per_post
+    metrics.
+
+    :param metrics: the metric names
+    :param timestamp: the timestamp of the data points
+    :param metrics_per_post: the number of metrics per POST
+    :param stop_at: stop POSTing at this unix timestamp
+    :param url: the flux metric_data_post url
+    :param session: a requests.Session to reuse connections, if not passed
+        each POST is made with requests.post
+    :type metrics: list
+    :type timestamp: int
+    :type metrics_per_post: int
+    :type stop_at: int
+    :type url: str
+    :type session: object
+    :return: (posted_count, post_stats) where post_stats is a dict of posts,
+        errors, post_seconds and status_codes
+    :rtype: tuple
+
+    """
+    connect_timeout = 5
+    read_timeout = 5
+    use_timeout = (int(connect_timeout), int(read_timeout))
+    auth = None
+    if settings.WEBAPP_AUTH_ENABLED:
+        auth = (str(settings.WEBAPP_AUTH_USER), str(settings.WEBAPP_AUTH_USER_PASSWORD))
+    if session:
+        post = session.post
+    else:
+        post = requests.post
+
+    posted_count = 0
+    post_stats = {'posts': 0, 'errors': 0, 'post_seconds': 0.0, 'status_codes': {}}
+    metrics_per_post = max(1, int(metrics_per_post))
+    for index in range(0, len(metrics), metrics_per_post):
+        post_metrics = metrics[index:(index + metrics_per_post)]
+        post_data_dict = {
+            'key': settings.FLUX_SELF_API_KEY,
+            'metrics': [
+                {'metric': metric, 'timestamp': str(timestamp), 'value': str(round(random.random(), 2))}
+                for metric in post_metrics]
+        }
+        response = None
+        post_start = time()
+        try:
+            response = post(url, auth=auth, json=post_data_dict, timeout=use_timeout, verify=settings.VERIFY_SSL)
+        except:
+            logger.error(traceback.format_exc())
+            logger.error('error :: failed to post %s metrics, sleeping for 1 second' % (
+                str(len(post_metrics))))
+            response = None
+            post_stats['errors'] += 1
+            sleep(1)
+        post_stats['post_seconds'] += (time() - post_start)
+        post_stats['posts'] += 1
+        if response is not None:
+            status_code = response.status_code
+            post_stats['status_codes'][status_code] = post_stats['status_codes'].get(status_code, 0) + 1
+        if response:
+            logger.info('posted %s metrics to flux with status code %s returned' % (str(len(post_metrics)), str(response.status_code)))
+            posted_count += len(post_metrics)
+        if stop_at and int(time()) > stop_at:
+            logger.info('load test has reached stop_at %s, stopping' % str(stop_at))
+            break
+    return posted_count, post_stats
+
+
 class SNAB_flux_load_test(Thread):
     """
     The SNAB class which controls the snab thread and spawned
@@ -249,10 +333,12 @@ class SNAB_flux_load_test(Thread):
             del snab_flux_load_test_metrics_all
 
         while len(snab_flux_load_test_metrics) < SNAB_FLUX_LOAD_TEST_METRICS:
-            new_uuid = str(uuid.uuid4())
-            new_metric_uuid = new_uuid.replace('-', '.')
-            slot = str(round(random.random(), 2))
-            new_metric = '%s.%s.%s' % (SNAB_FLUX_LOAD_TEST_NAMESPACE_PREFIX, slot, new_metric_uuid)
+            # @modified 20261018 - Feature #3906: flux - batched ingest
+            # new_uuid = str(uuid.uuid4())
+            # new_metric_uuid = new_uuid.replace('-', '.')
+            # slot = str(round(random.random(), 2))
+            # new_metric = '%s.%s.%s' % (SNAB_FLUX_LOAD_TEST_NAMESPACE_PREFIX, slot, new_metric_uuid)
+            new_metric = new_load_test_metric_name()
             snab_flux_load_test_metrics.append(new_metric)
             # Add to the snab_flux_load_test_metrics_set Redis set
             try:
@@ -287,56 +373,66 @@ class SNAB_flux_load_test(Thread):
         epoch_datetime = initial_datetime - one_minute
         epoch_timestamp = int(epoch_datetime.strftime('%s'))
 
-        connect_timeout = 5
-        read_timeout = 5
-        use_timeout = (int(connect_timeout), int(read_timeout))
-
-        if settings.WEBAPP_AUTH_ENABLED:
-            user = str(settings.WEBAPP_AUTH_USER)
-            password = str(settings.WEBAPP_AUTH_USER_PASSWORD)
-
-        post_count = 0
-        posted_count = 0
-        for metric in snab_flux_load_test_metrics:
-            if not post_count:
-                post_data_dict = {
-                    'key': settings.FLUX_SELF_API_KEY,
-                    'metrics': []
-                }
-            if post_count < SNAB_FLUX_LOAD_TEST_METRICS_PER_POST:
-                post_data_dict['metrics'].append({'metric': metric, 'timestamp': str(epoch_timestamp), 'value': str(round(random.random(), 2))})
-                post_count += 1
-            if post_count == SNAB_FLUX_LOAD_TEST_METRICS_PER_POST:
-                response = None
-                try:
-                    response = requests.post(FLUX_POST_URL, auth=(user, password), json=post_data_dict, timeout=use_timeout, verify=settings.VERIFY_SSL)
-                except:
-                    logger.error(traceback.format_exc())
-                    logger.error('error :: failed to post %s metrics, sleeping for 1 second' % (
-                        str(post_count)))
-                    response = None
-                    sleep(1)
-                if response:
-                    logger.info('posted %s metrics to flux with status code %s returned' % (str(post_count), str(response.status_code)))
-                    posted_count += post_count
-                    post_count = 0
-            running_for = int(time()) - current_timestamp
-            if running_for > 55:
-                logger.info('load test has run for longer than 55 seconds, stopping')
-                post_count = 0
-                break
-
-        if post_count:
-            response = None
-            try:
-                response = requests.post(FLUX_POST_URL, auth=(user, password), json=post_data_dict, timeout=use_timeout, verify=settings.VERIFY_SSL)
-            except:
-                logger.error(traceback.format_exc())
-                logger.error('error :: failed to post %s metrics' % (
-                    str(post_count)))
-                response = None
-            if response:
-                posted_count += post_count
+        # @modified 20261018 - Feature #3906: flux - batched ingest
+        # The POSTing is done in post_load_test_metrics so that it can be used
+        # by utils/flux_ingest_load_benchmark.py
+        # connect_timeout = 5
+        # read_timeout = 5
+        # use_timeout = (int(connect_timeout), int(read_timeout))
+
+        # if settings.WEBAPP_AUTH_ENABLED:
+        #     user = str(settings.WEBAPP_AUTH_USER)
+        #     password = str(settings.WEBAPP_AUTH_USER_PASSWORD)
+
+        # post_count = 0
+        # posted_count = 0
+        # for metric in snab_flux_load_test_metrics:
+        #     if not post_count:
+        #         post_data_dict = {
+        #             'key': settings.FLUX_SELF_API_KEY,
+        #             'metrics': []
+        #         }
+        #     if post_count < SNAB_FLUX_LOAD_TEST_METRICS_PER_POST:
+        #         post_data_dict['metrics'].append({'metric': metric, 'timestamp': str(epoch_timestamp), 'value': str(round(random.random(), 2))})
+        #         post_count += 1
+        #     if post_count == SNAB_FLUX_LOAD_TEST_METRICS_PER_POST:
+        #         response = None
+        #         try:
+        #             response = requests.post(FLUX_POST_URL, auth=(user, password), json=post_data_dict, timeout=use_timeout, verify=settings.VERIFY_SSL)
+        #         except:
+        #             logger.error(traceback.format_exc())
+        #             logger.error('error :: failed to post %s metrics, sleeping for 1 second' % (
+        #                 str(post_count)))
+        #             response = None
+        #             sleep(1)
+        #         if response:
+        #             logger.info('posted %s metrics to flux with status code %s returned' % (str(post_count), str(response.status_code)))
+        #             posted_count += post_count
+        #             post_count = 0
+        #     running_for = int(time()) - current_timestamp
+        #     if running_for > 55:
+        #         logger.info('load test has run for longer than 55 seconds, stopping')
+        #         post_count = 0
+        #         break
+
+        # if post_count:
+        #     response = None
+        #     try:
+        #         response = requests.post(FLUX_POST_URL, auth=(user, password), json=post_data_dict, timeout=use_timeout, verify=settings.VERIFY_SSL)
+        #     except:
+        #         logger.error(traceback.format_exc())
+        #         logger.error('error :: failed to post %s metrics' % (
+        #             str(post_count)))
+        #         response = None
+        #     if response:
+        #         posted_count += post_count
+        posted_count, post_stats = post_load_test_metrics(
+            snab_flux_load_test_metrics, epoch_timestamp,
+            SNAB_FLUX_LOAD_TEST_METRICS_PER_POST,
+            stop_at=(current_timestamp + 55))
+        logger.info('spin_snab_flux_load_test_process made %s POSTs, %s errors, POST seconds %.2f' % (
+            str(post_stats['posts']), str(post_stats['errors']),
+            post_stats['post_seconds']))
 
         spin_end = time() - spin_start
         logger.info('spin_snab_flux_load_test_process posted %s metrics to flux in %.2f seconds' % (str(posted_count), spin_end))
@@ -6,6 +6,8 @@ import time
 import re
 
 import traceback
+# @added 20261018 - Feature #3920: luminosity_remote_data stream
+import json
 from flask import request
 # import mysql.connector
 # from mysql.connector import errorcode
@@ -13,10 +15,13 @@ from flask import request
 # @added 20180720 - Feature #2464: luminosity_remote_data
 # Added redis and msgpack
 from redis import StrictRedis
-from msgpack import Unpacker
+# @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+# from msgpack import Unpacker
 
 # @added 20201103 - Feature #3824: get_cluster_data
-import requests
+# @modified 20261018 - Feature #3918: cluster_data fan out
+# The remote requests are made with cluster_data
+# import requests
 
 # @added 20201125 - Feature #3850: webapp - yhat_values API endoint
 import numpy as np
@@ -24,18 +29,30 @@ import numpy as np
 import settings
 from skyline_functions import (
     mysql_select,
+    # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+    decode_timeseries, timeseries_array_to_list,
     # @added 20180720 - Feature #2464: luminosity_remote_data
     # nonNegativeDerivative, in_list, is_derivative_metric,
     # @added 20200507 - Feature #3532: Sort all time series
     # Added sort_timeseries and removed unused in_list
-    nonNegativeDerivative, is_derivative_metric, sort_timeseries,
+    # @modified 20261018 - Feature #3914: get_derivative_metric_statuses
+    # nonNegativeDerivative, is_derivative_metric, sort_timeseries,
+    nonNegativeDerivative, sort_timeseries,
     # @added 20201123 - Feature #3824: get_cluster_data
     #                   Feature #2464: luminosity_remote_data
     #                   Bug #3266: py3 Redis binary objects not strings
     #                   Branch #3262: py3
     get_redis_conn_decoded,
     # @added 20201125 - Feature #3850: webapp - yhat_values API endoint
-    get_graphite_metric)
+    get_graphite_metric,
+    # @added 20261018 - Feature #3914: get_derivative_metric_statuses
+    get_derivative_metric_statuses)
+
+# @added 20261018 - Feature #3918: cluster_data fan out
+from cluster_data import (
+    fan_out_remote_requests, get_cluster_data_cache, set_cluster_data_cache)
+# @added 20261018 - Feature #3936: METRICS_SNAPSHOT
+from metrics_snapshot import mget_timeseries
 
 import skyline_version
 skyline_version = skyline_version.__absolute_version__
@@ -76,6 +93,12 @@ if settings.REDIS_PASSWORD:
 else:
     REDIS_CONN = StrictRedis(unix_socket_path=settings.REDIS_SOCKET_PATH)
 
+# @added 20261018 - Feature #3920: luminosity_remote_data stream
+try:
+    LUMINOSITY_REMOTE_DATA_PAGE_SIZE = int(settings.LUMINOSITY_REMOTE_DATA_PAGE_SIZE)
+except:
+    LUMINOSITY_REMOTE_DATA_PAGE_SIZE = 1000
+
 
 def panorama_request():
     """
@@ -556,7 +579,14 @@ def luminosity_remote_data(anomaly_timestamp, resolution):
     # Multi get series
     raw_assigned_failed = True
     try:
-        raw_assigned = REDIS_CONN.mget(assigned_metrics)
+        # @modified 20261018 - Feature #3936: METRICS_SNAPSHOT
+        # Read the time series from the metrics snapshot if it was created
+        # after the correlation window, the same cutoff as
+        # luminosity/process_correlations.py uses, otherwise from Redis
+        # raw_assigned = REDIS_CONN.mget(assigned_metrics)
+        raw_assigned = mget_timeseries(
+            skyline_app, REDIS_CONN, assigned_metrics,
+            min_created_at=(int(anomaly_timestamp) + resolution + 1))
         raw_assigned_failed = False
     except:
         logger.info(traceback.format_exc())
@@ -568,14 +598,29 @@ def luminosity_remote_data(anomaly_timestamp, resolution):
         logger.error(message)
         return luminosity_data, success, message
 
+    # @added 20261018 - Feature #3914: get_derivative_metric_statuses
+    # Determine the derivative status of all the metrics with a single Redis
+    # pipeline rather than a is_derivative_metric call per metric
+    assigned_base_names = []
+    for metric_name in assigned_metrics:
+        metric_name = str(metric_name)
+        if metric_name.startswith(settings.FULL_NAMESPACE):
+            assigned_base_names.append(metric_name.replace(settings.FULL_NAMESPACE, '', 1))
+        else:
+            assigned_base_names.append(metric_name)
+    derivative_metric_statuses = get_derivative_metric_statuses('webapp', assigned_base_names)
+
     # Distill timeseries strings into lists
     for i, metric_name in enumerate(assigned_metrics):
         timeseries = []
         try:
             raw_series = raw_assigned[i]
-            unpacker = Unpacker(use_list=False)
-            unpacker.feed(raw_series)
-            timeseries = list(unpacker)
+            # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+            # Decode with decode_timeseries which decodes either storage format
+            # unpacker = Unpacker(use_list=False)
+            # unpacker.feed(raw_series)
+            # timeseries = list(unpacker)
+            timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
         except:
             timeseries = []
 
@@ -607,7 +652,9 @@ def luminosity_remote_data(anomaly_timestamp, resolution):
         else:
             base_name = metric_name
 
-        known_derivative_metric = is_derivative_metric('webapp', base_name)
+        # @modified 20261018 - Feature #3914: get_derivative_metric_statuses
+        # known_derivative_metric = is_derivative_metric('webapp', base_name)
+        known_derivative_metric = derivative_metric_statuses.get(base_name, False)
         if known_derivative_metric:
             try:
                 derivative_timeseries = nonNegativeDerivative(timeseries)
@@ -633,6 +680,138 @@ def luminosity_remote_data(anomaly_timestamp, resolution):
     return luminosity_data, success, message
 
 
+# @added 20261018 - Feature #3920: luminosity_remote_data stream
+def luminosity_remote_data_window(
+        timeseries_array, from_timestamp, anomaly_timestamp, derivative=False):
+    """
+    Slice a time series decoded with decode_timeseries to the
+    luminosity_remote_data window, from_timestamp to anomaly_timestamp
+    inclusive, and convert it to its nonNegativeDerivative if it is a
+    derivative metric.  Only the window and the data point before it are
+    converted to lists, the derivative of the first data point in the window
+    requires the data point before it, so the result is the same as
+    converting the entire time series and then filtering it, as
+    luminosity_remote_data does.
+
+    :param timeseries_array: the time series structured array
+    :param from_timestamp: the window start timestamp
+    :param anomaly_timestamp: the window end timestamp
+    :param derivative: whether the metric is a derivative metric
+    :type timeseries_array: numpy.ndarray
+    :type from_timestamp: int
+    :type anomaly_timestamp: int
+    :type derivative: boolean
+    :return: correlate_ts
+    :rtype: list
+
+    """
+    if timeseries_array is None or not len(timeseries_array):
+        return []
+    timestamps = timeseries_array['timestamp']
+    start_index = int(np.searchsorted(timestamps, from_timestamp, side='left'))
+    end_index = int(np.searchsorted(timestamps, anomaly_timestamp, side='right'))
+    if end_index <= start_index:
+        return []
+    if derivative:
+        window = timeseries_array_to_list(timeseries_array[max(start_index - 1, 0):end_index])
+        try:
+            window = nonNegativeDerivative(window)
+        except:
+            logger.error('error :: nonNegativeDerivative failed')
+    else:
+        window = timeseries_array_to_list(timeseries_array[start_index:end_index])
+    return [(int(ts), value) for ts, value in window if int(ts) >= from_timestamp]
+
+
+# @added 20261018 - Feature #3920: luminosity_remote_data stream
+def luminosity_remote_data_stream(anomaly_timestamp, resolution, page_size=None):
+    """
+    A streaming version of :func:`luminosity_remote_data`.  Rather than
+    getting all the unique_metrics time series with a single mget and building
+    the whole response in memory, the time series are fetched with bounded
+    mget pages, each time series is sliced to the anomaly window and the
+    window is emitted as a line of JSON ``[metric_name, [[ts, value], ...]]``
+    as each page is processed.  The last line is
+    ``{"complete": true, "metrics": <count>}`` so that the consumer can
+    determine that the stream was not truncated.
+
+    :param anomaly_timestamp: the anomaly timestamp
+    :param resolution: the metric resolution
+    :param page_size: the number of metrics per mget, defaults to
+        settings.LUMINOSITY_REMOTE_DATA_PAGE_SIZE
+    :type anomaly_timestamp: int
+    :type resolution: int
+    :type page_size: int
+    :return: (lines, success, message), lines being a generator of utf-8
+        encoded lines
+    :rtype: tuple
+
+    """
+    if not page_size:
+        page_size = LUMINOSITY_REMOTE_DATA_PAGE_SIZE
+    # If you modify the values of 61 or 600 here, it must be modified in the
+    # luminosity_remote_data function in
+    # skyline/luminosity/process_correlations.py as well
+    from_timestamp = int(anomaly_timestamp) - (resolution * 10)
+    anomaly_timestamp = int(anomaly_timestamp)
+
+    unique_metrics = []
+    try:
+        REDIS_CONN_DECODED = get_redis_conn_decoded(skyline_app)
+        unique_metrics = list(REDIS_CONN_DECODED.smembers(settings.FULL_NAMESPACE + 'unique_metrics'))
+    except Exception as e:
+        logger.error('error :: %s' % str(e))
+        logger.error('error :: luminosity_remote_data_stream :: could not determine unique_metrics from Redis set')
+    if not unique_metrics:
+        message = 'error :: luminosity_remote_data_stream :: could not determine unique_metrics from Redis set'
+        return None, False, message
+    logger.info('luminosity_remote_data_stream :: %s unique_metrics' % str(len(unique_metrics)))
+
+    def lines():
+        metrics_count = 0
+        for page_start in range(0, len(unique_metrics), page_size):
+            page_metrics = unique_metrics[page_start:(page_start + page_size)]
+            try:
+                # @modified 20261018 - Feature #3936: METRICS_SNAPSHOT
+                # raw_page = REDIS_CONN.mget(page_metrics)
+                # Use the same snapshot cutoff as luminosity_remote_data
+                raw_page = mget_timeseries(
+                    skyline_app, REDIS_CONN, page_metrics,
+                    min_created_at=(anomaly_timestamp + resolution + 1))
+            except:
+                logger.error(traceback.format_exc())
+                logger.error('error :: luminosity_remote_data_stream :: failed to mget page, ending stream')
+                return
+            page_base_names = []
+            for metric_name in page_metrics:
+                metric_name = str(metric_name)
+                if metric_name.startswith(settings.FULL_NAMESPACE):
+                    page_base_names.append(metric_name.replace(settings.FULL_NAMESPACE, '', 1))
+                else:
+                    page_base_names.append(metric_name)
+            derivative_metric_statuses = get_derivative_metric_statuses('webapp', page_base_names)
+            page_lines = []
+            for metric_name, base_name, raw_series in zip(page_metrics, page_base_names, raw_page):
+                try:
+                    timeseries_array = decode_timeseries(raw_series)
+                except:
+                    continue
+                correlate_ts = luminosity_remote_data_window(
+                    timeseries_array, from_timestamp, anomaly_timestamp,
+                    derivative_metric_statuses.get(base_name, False))
+                if not correlate_ts:
+                    continue
+                page_lines.append(json.dumps([str(metric_name), correlate_ts]))
+                metrics_count += 1
+            del raw_page
+            if page_lines:
+                yield ('\n'.join(page_lines) + '\n').encode('utf-8')
+        logger.info('luminosity_remote_data_stream :: %s valid metric time series data streamed for the remote request' % str(metrics_count))
+        yield (json.dumps({'complete': True, 'metrics': metrics_count}) + '\n').encode('utf-8')
+
+    return lines(), True, 'luminosity_remote_data_stream returned'
+
+
 # @added 20200908 - Feature #3740: webapp - anomaly API endpoint
 def panorama_anomaly_details(anomaly_id):
     """
@@ -722,16 +901,25 @@ def get_cluster_data(api_endpoint, data_required, only_host='all', endpoint_para
     use_timeout = (int(connect_timeout), int(read_timeout))
     data = []
 
+    # @added 20261018 - Feature #3918: cluster_data fan out
+    # Return the recent response from the cache
+    cache_key = (str(api_endpoint), str(data_required), str(only_host))
+    cached_data = get_cluster_data_cache(cache_key)
+    if cached_data is not None:
+        logger.info('get_cluster_data :: using cached %s %s from %s' % (
+            str(len(cached_data)), str(data_required), str(api_endpoint)))
+        return list(cached_data)
+
     if only_host != 'all':
         logger.info('get_cluster_data :: querying all remote hosts as only_host set to %s' % (
             str(only_host)))
 
+    # @modified 20261018 - Feature #3918: cluster_data fan out
+    # Rather than requesting each remote Skyline instance in turn with a new
+    # connection, determine the requests and make them concurrently with the
+    # pooled sessions of the remote instances, within a deadline
+    remote_requests = []
     for item in settings.REMOTE_SKYLINE_INSTANCES:
-        r = None
-        user = None
-        password = None
-        use_auth = False
-
         # @added 20201127 - Feature #3824: get_cluster_data
         #                   Feature #3820: HORIZON_SHARDS
         # Allow to query only a single host in the cluster so that just the response
@@ -744,37 +932,34 @@ def get_cluster_data(api_endpoint, data_required, only_host='all', endpoint_para
             else:
                 logger.info('get_cluster_data :: querying %s as only_host set to %s' % (
                     str(item[0]), str(only_host)))
-
-        try:
-            user = str(item[1])
-            password = str(item[2])
-            use_auth = True
-        except:
-            user = None
-            password = None
         logger.info('get_cluster_data :: querying %s for %s on %s' % (
             str(item[0]), str(data_required), str(api_endpoint)))
-        try:
-            url = '%s/api?%s' % (str(item[0]), api_endpoint)
-            if use_auth:
-                r = requests.get(url, timeout=use_timeout, auth=(user, password))
-            else:
-                r = requests.get(url, timeout=use_timeout)
-        except:
-            logger.error(traceback.format_exc())
+        url = '%s/api?%s' % (str(item[0]), api_endpoint)
+        remote_requests.append((item, url))
+
+    responses = fan_out_remote_requests(
+        skyline_app, remote_requests, timeout=use_timeout)
+
+    # @modified 20261018 - Feature #3918: cluster_data fan out
+    # The responses are processed in the REMOTE_SKYLINE_INSTANCES order
+    # for item in settings.REMOTE_SKYLINE_INSTANCES:
+    responses_received = 0
+    for (item, url), r in zip(remote_requests, responses):
+        if r is None:
             logger.error('error :: get_cluster_data :: failed to %s from %s' % (
-                api_endpoint, str(item)))
+                api_endpoint, str(item[0])))
         if r:
+            responses_received += 1
             if r.status_code != 200:
                 logger.error('error :: get_cluster_data :: %s from %s responded with status code %s and reason %s' % (
-                    api_endpoint, str(item), str(r.status_code), str(r.reason)))
+                    api_endpoint, str(item[0]), str(r.status_code), str(r.reason)))
             js = None
             try:
                 js = r.json()
             except:
                 logger.error(traceback.format_exc())
                 logger.error('error :: get_cluster_data :: failed to get json from the response from %s on %s' % (
-                    api_endpoint, str(item)))
+                    api_endpoint, str(item[0])))
             remote_data = []
             if js:
                 logger.info('get_cluster_data :: got response for %s from %s' % (
@@ -784,11 +969,20 @@ def get_cluster_data(api_endpoint, data_required, only_host='all', endpoint_para
                 except:
                     logger.error(traceback.format_exc())
                     logger.error('error :: get_cluster_data :: failed to build remote_data from %s on %s' % (
-                        str(data_required), str(item)))
+                        str(data_required), str(item[0])))
             if remote_data:
                 logger.info('get_cluster_data :: got %s %s from %s' % (
                     str(len(remote_data)), str(data_required), str(item[0])))
                 data = data + remote_data
+
+    # @added 20261018 - Feature #3918: cluster_data fan out
+    # Only cache complete responses, partial results are returned but not
+    # cached so that the next request queries the failed instances again
+    if responses_received == len(remote_requests):
+        set_cluster_data_cache(cache_key, list(data))
+    else:
+        logger.warn('warning :: get_cluster_data :: partial results, responses received from %s of %s remote instances' % (
+            str(responses_received), str(len(remote_requests))))
     return data
 
 
@@ -12,9 +12,16 @@ from sqlalchemy.sql import text
 
 import settings
 import skyline_version
+# @modified 20261018 - Feature #3914: get_derivative_metric_statuses
+# Use get_derivative_metric_statuses rather than is_derivative_metric per metric
+# from skyline_functions import (
+#     mkdir_p, write_data_to_file, filesafe_metricname, is_derivative_metric)
 from skyline_functions import (
-    mkdir_p, write_data_to_file, filesafe_metricname, is_derivative_metric)
+    mkdir_p, write_data_to_file, filesafe_metricname,
+    get_derivative_metric_statuses)
 from database import (get_engine, metrics_table_meta)
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine
 
 skyline_version = skyline_version.__absolute_version__
 skyline_app = 'webapp'
@@ -47,7 +54,9 @@ def get_an_engine():
 def engine_disposal(engine):
     if engine:
         try:
-            engine.dispose()
+            # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+            # engine.dispose()
+            dispose_engine(skyline_app, engine)
         except:
             logger.error(traceback.format_exc())
             logger.error('error :: calling engine.dispose()')
@@ -207,9 +216,13 @@ def submit_crucible_job(
     datapoint = 0
     triggered_algorithms = ['histogram_bins', 'first_hour_average', 'stddev_from_average', 'grubbs', 'ks_test', 'mean_subtraction_cumulation', 'median_absolute_deviation', 'stddev_from_moving_average', 'least_squares']
     added_at = int(time())
+    # @added 20261018 - Feature #3914: get_derivative_metric_statuses
+    derivative_metric_statuses = get_derivative_metric_statuses(skyline_app, metric_names)
     for base_name in metric_names:
         sane_metricname = filesafe_metricname(str(base_name))
-        derivative_metric = is_derivative_metric(skyline_app, base_name)
+        # @modified 20261018 - Feature #3914: get_derivative_metric_statuses
+        # derivative_metric = is_derivative_metric(skyline_app, base_name)
+        derivative_metric = derivative_metric_statuses.get(str(base_name), False)
         if derivative_metric:
             target = 'nonNegativeDerivative(%s)' % base_name
         else:
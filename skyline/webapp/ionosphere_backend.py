@@ -60,6 +60,8 @@ from database import (
     #                   Branch #3068: SNAB
     snab_table_meta,
 )
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine
 # @added 20190502 - Branch #2646: slack
 from slack_functions import slack_post_message, slack_post_reaction
 
@@ -415,7 +417,9 @@ def get_an_engine():
 def engine_disposal(engine):
     if engine:
         try:
-            engine.dispose()
+            # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+            # engine.dispose()
+            dispose_engine(skyline_app, engine)
         except:
             logger.error(traceback.format_exc())
             logger.error('error :: calling engine.dispose()')
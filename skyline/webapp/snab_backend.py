@@ -9,6 +9,8 @@ from sqlalchemy.sql import select
 
 from database import (
     get_engine, snab_table_meta, metrics_table_meta, anomalies_table_meta)
+# @added 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+from database import dispose_engine
 
 skyline_version = skyline_version.__absolute_version__
 skyline_app = 'webapp'
@@ -40,7 +42,9 @@ def get_snab_engine():
 def snab_engine_disposal(engine):
     if engine:
         try:
-            engine.dispose()
+            # @modified 20261018 - Feature #3944: DATABASE_ENGINE_POOL
+            # engine.dispose()
+            dispose_engine(skyline_app, engine)
         except:
             logger.error(traceback.format_exc())
             logger.error('error :: update_snab_result :: calling engine.dispose()')
@@ -74,6 +74,8 @@ from flask import after_this_request
 # from cStringIO import StringIO as IO
 import gzip
 import functools
+# @added 20261018 - Feature #3920: luminosity_remote_data stream
+import zlib
 
 from logging.handlers import TimedRotatingFileHandler, MemoryHandler
 
@@ -90,6 +92,8 @@ if True:
     import skyline_version
     from skyline_functions import (
         get_graphite_metric,
+        # @added 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+        decode_timeseries, timeseries_array_to_list,
         # @added 20170604 - Feature #2034: analyse_derivatives
         in_list,
         # @added 20180804 - Feature #2488: Allow user to specifically set metric as a derivative metric in training_data
@@ -114,6 +118,8 @@ if True:
         panorama_request, get_list,
         # @added 20180720 - Feature #2464: luminosity_remote_data
         luminosity_remote_data,
+        # @added 20261018 - Feature #3920: luminosity_remote_data stream
+        luminosity_remote_data_stream,
         # @added 20200908 - Feature #3740: webapp - anomaly API endpoint
         panorama_anomaly_details,
         # @added 20201103 - Feature #3824: get_cluster_data
@@ -486,6 +492,21 @@ def gzipped(f):
     return view_func
 
 
+# @added 20261018 - Feature #3920: luminosity_remote_data stream
+# The gzipped decorator compresses the entire response.data which cannot be
+# done on a streamed response, so streamed responses are gzipped per chunk
+def gzip_stream(chunks):
+    """
+    Gzip a generator of bytes chunks as they are generated.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed_chunk = compressor.compress(chunk)
+        if compressed_chunk:
+            yield compressed_chunk
+    yield compressor.flush()
+
+
 @app.errorhandler(500)
 def internal_error(message, traceback_format_exc):
     """
@@ -1792,6 +1813,29 @@ def api():
             except:
                 resolution = 60
 
+        # @added 20261018 - Feature #3920: luminosity_remote_data stream
+        # Stream the time series windows as line delimited JSON as they are
+        # fetched from Redis in pages rather than building the entire response
+        # in memory
+        if anomaly_timestamp and 'stream' in request.args:
+            try:
+                lines, success, message = luminosity_remote_data_stream(anomaly_timestamp, resolution)
+            except Exception as e:
+                error = "Error: " + str(e)
+                logger.error('error :: luminosity_remote_data_stream - %s' % str(e))
+                resp = json.dumps({'results': error})
+                return resp, 500
+            if not success:
+                resp = json.dumps(
+                    {'results': 'No data found'})
+                return resp, 404
+            headers = {}
+            if 'gzip' in request.headers.get('Accept-Encoding', '').lower():
+                lines = gzip_stream(lines)
+                headers['Content-Encoding'] = 'gzip'
+                headers['Vary'] = 'Accept-Encoding'
+            return Response(lines, status=200, mimetype='application/x-ndjson', headers=headers)
+
         luminosity_data = []
         if anomaly_timestamp:
             # @modified 20201117 - Feature #3824: get_cluster_data
@@ -1844,15 +1888,19 @@ def api():
                     {'results': 'Error: No metric by that name - try /api?metric=' + settings.FULL_NAMESPACE + 'metric_namespace'})
                 return resp, 404
             else:
-                unpacker = Unpacker(use_list=False)
-                unpacker.feed(raw_series)
+                # @modified 20261018 - Feature #3908: HORIZON_STORAGE_FORMAT columnar
+                # Decode with decode_timeseries which decodes either storage
+                # format
+                # unpacker = Unpacker(use_list=False)
+                # unpacker.feed(raw_series)
                 # @modified 20201117 - Feature #3824: get_cluster_data
                 #                      Feature #2464: luminosity_remote_data
                 #                      Bug #3266: py3 Redis binary objects not strings
                 #                      Branch #3262: py3
                 # Replace redefinition of item from line 1338
                 # timeseries = [item[:2] for item in unpacker]
-                timeseries = [ts_item[:2] for ts_item in unpacker]
+                # timeseries = [ts_item[:2] for ts_item in unpacker]
+                timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
                 resp = json.dumps({'results': timeseries})
                 return resp, 200
         except Exception as e:
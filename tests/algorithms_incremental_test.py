@@ -0,0 +1,105 @@
+import unittest2 as unittest
+from time import time
+import os.path
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+from analyzer import algorithms
+from analyzer import algorithms_incremental
+import settings
+
+
+class TestAlgorithmsIncremental(unittest.TestCase):
+    """
+    Test that the incremental algorithms return the same results as the
+    algorithms run on the full time series and that the incrementally updated
+    statistics match the statistics calculated from the full time series
+    """
+
+    algorithms = algorithms_incremental.INCREMENTAL_ALGORITHMS
+
+    def data(self, random_state, now, length):
+        timestamps = now - settings.FULL_DURATION + (np.arange(length) * (settings.FULL_DURATION / float(length)))
+        values = random_state.normal(100, 5, length) + (np.arange(length) * random_state.uniform(-0.05, 0.05))
+        values[-1] += random_state.uniform(0, 60)
+        return [(float(t), float(v)) for t, v in zip(timestamps.astype(int), values)]
+
+    def assertStatesEqual(self, state, expected_state):
+        for field in algorithms_incremental.STATE_FIELDS:
+            if field == 'computed_at':
+                continue
+            self.assertTrue(
+                np.isclose(state[field], expected_state[field], rtol=1e-7, atol=1e-6),
+                msg='%s %s != %s' % (field, str(state[field]), str(expected_state[field])))
+
+    def test_results_match_algorithms(self):
+        random_state = np.random.RandomState(3930)
+        now = time()
+        for length in [2, 3, 10, 500, 1440]:
+            timeseries = self.data(random_state, now, length)
+            split = max(int(length / 2), 1)
+            results, state, recomputed = algorithms_incremental.run_incremental_algorithms(
+                timeseries[:split], None, self.algorithms, now=now)
+            self.assertTrue(recomputed)
+            results, state, recomputed = algorithms_incremental.run_incremental_algorithms(
+                timeseries, state, self.algorithms, now=now)
+            self.assertFalse(recomputed)
+            self.assertEqual(sorted(results.keys()), sorted(self.algorithms))
+            for algorithm in self.algorithms:
+                self.assertEqual(
+                    results[algorithm], bool(getattr(algorithms, algorithm)(timeseries)),
+                    msg='%s with %s data points' % (algorithm, str(length)))
+
+    def test_incremental_runs_match_full_recompute(self):
+        random_state = np.random.RandomState(3931)
+        now = time()
+        timeseries = self.data(random_state, now, 1440)
+        state = None
+        # Analyse the time series as it grows over several runs, with the first
+        # hour threshold moving each run
+        for run, end in enumerate([1000, 1001, 1100, 1300, 1440]):
+            run_now = now - ((4 - run) * 60)
+            results, state, recomputed = algorithms_incremental.run_incremental_algorithms(
+                timeseries[:end], state, self.algorithms, now=run_now)
+            self.assertEqual(recomputed, run == 0)
+        packed_state = algorithms_incremental.pack_incremental_state(state)
+        state = algorithms_incremental.unpack_incremental_state(packed_state)
+        expected_state = algorithms_incremental.full_incremental_state(timeseries, now)
+        self.assertStatesEqual(state, expected_state)
+
+    def test_recompute_conditions(self):
+        random_state = np.random.RandomState(3932)
+        now = time()
+        timeseries = self.data(random_state, now, 500)
+        results, state, recomputed = algorithms_incremental.run_incremental_algorithms(
+            timeseries[:400], None, self.algorithms, now=now)
+        # Trimmed by roomba
+        results, trimmed_state, recomputed = algorithms_incremental.run_incremental_algorithms(
+            timeseries[10:], state, self.algorithms, now=now)
+        self.assertTrue(recomputed)
+        self.assertEqual(trimmed_state['n'], 490)
+        # A data point added before the last analysed data point
+        backfilled = timeseries[:200] + [(timeseries[200][0] - 1, 100.0)] + timeseries[200:]
+        results, backfilled_state, recomputed = algorithms_incremental.run_incremental_algorithms(
+            backfilled, state, self.algorithms, now=now)
+        self.assertTrue(recomputed)
+        # Now a derivative time series
+        results, derivative_state, recomputed = algorithms_incremental.run_incremental_algorithms(
+            timeseries, state, self.algorithms, now=now, series_kind=1)
+        self.assertTrue(recomputed)
+        # Non finite values have no results
+        results, nan_state, recomputed = algorithms_incremental.run_incremental_algorithms(
+            timeseries + [(now + 60, float('nan'))], state, self.algorithms, now=now)
+        self.assertEqual(results, {})
+        self.assertIsNone(nan_state)
+        self.assertIsNone(algorithms_incremental.unpack_incremental_state(b'invalid'))
+
+
+if __name__ == '__main__':
+    unittest.main()
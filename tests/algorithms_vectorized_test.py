@@ -0,0 +1,120 @@
+import unittest2 as unittest
+from mock import patch
+from time import time
+import os.path
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+from analyzer import algorithms
+from analyzer import algorithms_vectorized
+
+
+class TestAlgorithmsVectorized(unittest.TestCase):
+    """
+    Test that the vectorized algorithms return the same results as the per
+    metric algorithms on a variety of time series
+    """
+
+    def data(self, ts):
+        """
+        A set of time series of different lengths and shapes, normal, with a
+        spike, integer values, flat, trending with a step and sparse counts.
+        """
+        random_state = np.random.RandomState(3900)
+        timeseries_list = []
+        for index in range(120):
+            length = int(random_state.randint(1, 1500))
+            values = random_state.normal(100, 10, length)
+            shape = index % 6
+            if shape == 1:
+                values[-1] += 1000
+            if shape == 2:
+                values = np.round(values)
+            if shape == 3:
+                values = np.ones(length)
+            if shape == 4:
+                values = np.arange(length, dtype=np.float64)
+                values[-3:] += 50
+            if shape == 5:
+                values = random_state.randint(0, 3, length).astype(np.float64)
+            timeseries = [
+                (float(int(ts) - (60 * (length - i))), float(value))
+                for i, value in enumerate(values)]
+            timeseries_list.append(timeseries)
+        return ts, timeseries_list
+
+    def test_timeseries_to_padded_arrays(self):
+        timeseries_list = [
+            [(1.0, 1.0), (2.0, 2.0), (3.0, 3.0)],
+            [(1.0, 5.0)],
+            [],
+            [(1.0, 1.0), (2.0, None)],
+        ]
+        timestamps, values, lengths, vectorizable = algorithms_vectorized.timeseries_to_padded_arrays(timeseries_list)
+        self.assertEqual(values.shape, (4, 3))
+        self.assertEqual(list(lengths), [3, 1, 0, 0])
+        self.assertEqual(list(vectorizable), [True, True, False, False])
+        self.assertEqual(values[0, 2], 3.0)
+        self.assertTrue(np.isnan(values[1, 1]))
+
+    def test_tail_avg_vectorized(self):
+        _, timeseries_list = self.data(time())
+        _, values, lengths, _ = algorithms_vectorized.timeseries_to_padded_arrays(timeseries_list)
+        tail_avgs = algorithms_vectorized.tail_avg_vectorized(values, lengths)
+        for index, timeseries in enumerate(timeseries_list):
+            self.assertEqual(tail_avgs[index], algorithms.tail_avg(timeseries))
+
+    def test_vectorized_algorithms_parity(self):
+        now, timeseries_list = self.data(time())
+        results = algorithms_vectorized.run_vectorized_algorithms(
+            timeseries_list, list(algorithms_vectorized.VECTORIZED_ALGORITHMS),
+            now=now, chunk_size=25)
+        with patch.object(algorithms, 'time', return_value=now):
+            for timeseries, result in zip(timeseries_list, results):
+                self.assertEqual(
+                    sorted(result.keys()),
+                    sorted(algorithms_vectorized.VECTORIZED_ALGORITHMS.keys()))
+                for algorithm, vectorized_result in result.items():
+                    per_metric_result = getattr(algorithms, algorithm)(timeseries)
+                    self.assertEqual(
+                        bool(per_metric_result), vectorized_result,
+                        '%s differs on a time series of length %s' % (
+                            algorithm, len(timeseries)))
+
+    def test_run_vectorized_algorithms_skips_unvectorizable(self):
+        results = algorithms_vectorized.run_vectorized_algorithms(
+            [[], None], ['grubbs', 'ks_test'])
+        self.assertEqual(results, [{}, {}])
+
+    def test_run_vectorized_algorithms_only_vectorized(self):
+        _, timeseries_list = self.data(time())
+        results = algorithms_vectorized.run_vectorized_algorithms(
+            timeseries_list[:5], ['ks_test', 'grubbs'])
+        for result in results:
+            self.assertEqual(list(result.keys()), ['grubbs'])
+
+    @patch.object(algorithms, 'time')
+    def test_run_selected_algorithm_precomputed_ensemble(self, timeMock):
+        now, timeseries_list = self.data(time())
+        timeMock.return_value = now
+        results = algorithms_vectorized.run_vectorized_algorithms(
+            timeseries_list, algorithms.ALGORITHMS, now=now)
+        for timeseries, result in zip(timeseries_list, results):
+            try:
+                expected = algorithms.run_selected_algorithm(
+                    timeseries, 'test.metric', [], [], False, False)
+            except (algorithms.TooShort, algorithms.Stale, algorithms.Boring, algorithms.EmptyTimeseries):
+                continue
+            precomputed = algorithms.run_selected_algorithm(
+                timeseries, 'test.metric', [], [], False, False, result)
+            self.assertEqual(expected, precomputed)
+
+
+if __name__ == '__main__':
+    unittest.main()
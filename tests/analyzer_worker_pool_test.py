@@ -0,0 +1,52 @@
+import unittest2 as unittest
+import os.path
+import sys
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+from analyzer import analyzer_worker_pool
+
+
+class TestAnalyzerWorkerPool(unittest.TestCase):
+    """
+    Test that the analyzer worker pool assigns all the unique_metrics once and
+    reduces the slice of a slow worker
+    """
+
+    unique_metrics = ['metrics.metric.%s' % str(i) for i in range(1003)]
+
+    def assigned(self, worker_slices):
+        assigned_metrics = []
+        for worker_id in sorted(worker_slices.keys()):
+            assigned_metrics += worker_slices[worker_id]
+        return assigned_metrics
+
+    def test_equal_slices_without_throughputs(self):
+        worker_slices = analyzer_worker_pool.get_worker_slices(self.unique_metrics, [1, 2, 3])
+        self.assertEqual(self.assigned(worker_slices), self.unique_metrics)
+        self.assertEqual(sorted([len(s) for s in worker_slices.values()]), [334, 334, 335])
+
+    def test_slow_worker_is_assigned_fewer_metrics(self):
+        throughputs = {1: 1000.0, 2: 250.0, 3: 1000.0}
+        worker_slices = analyzer_worker_pool.get_worker_slices(self.unique_metrics, [1, 2, 3], throughputs)
+        self.assertEqual(self.assigned(worker_slices), self.unique_metrics)
+        self.assertEqual(len(worker_slices[2]), 111)
+        # A very slow worker still has the minimum share
+        throughputs = {1: 1000.0, 2: 1.0, 3: 1000.0}
+        worker_slices = analyzer_worker_pool.get_worker_slices(self.unique_metrics, [1, 2, 3], throughputs)
+        self.assertEqual(self.assigned(worker_slices), self.unique_metrics)
+        self.assertGreater(len(worker_slices[2]), 50)
+
+    def test_update_worker_throughput(self):
+        throughput = analyzer_worker_pool.update_worker_throughput(None, 1000, 10)
+        self.assertEqual(throughput, 100.0)
+        throughput = analyzer_worker_pool.update_worker_throughput(throughput, 1000, 5)
+        self.assertEqual(throughput, 150.0)
+        self.assertEqual(analyzer_worker_pool.update_worker_throughput(throughput, 0, 5), 150.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
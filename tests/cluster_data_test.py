@@ -0,0 +1,77 @@
+import unittest2 as unittest
+from mock import patch
+import os.path
+import sys
+from time import sleep, time
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+import cluster_data
+
+
+class MockSession(object):
+    def __init__(self, delays):
+        self.delays = delays
+
+    def get(self, url, timeout=None, verify=True, stream=False):
+        delay = self.delays.get(url, 0)
+        if delay is None:
+            raise ValueError('connection refused')
+        sleep(delay)
+        return url
+
+
+class TestFanOutRemoteRequests(unittest.TestCase):
+    """
+    Test that the remote requests are made concurrently, returned in order
+    and that the requests that do not respond within the deadline are
+    returned as None
+    """
+
+    remote_requests = [
+        (['http://skyline-1', 'user', 'pass', 'skyline-1'], 'http://skyline-1/api?unique_metrics'),
+        (['http://skyline-2', 'user', 'pass', 'skyline-2'], 'http://skyline-2/api?unique_metrics'),
+        (['http://skyline-3', 'user', 'pass', 'skyline-3'], 'http://skyline-3/api?unique_metrics'),
+    ]
+
+    def test_concurrent_requests_in_order(self):
+        delays = {
+            'http://skyline-1/api?unique_metrics': 0.3,
+            'http://skyline-2/api?unique_metrics': 0.3,
+            'http://skyline-3/api?unique_metrics': 0.3,
+        }
+        with patch.object(cluster_data, 'get_remote_session', return_value=MockSession(delays)):
+            start = time()
+            responses = cluster_data.fan_out_remote_requests('test', self.remote_requests, deadline=5)
+            runtime = time() - start
+        self.assertEqual(responses, [url for instance, url in self.remote_requests])
+        self.assertLess(runtime, 0.8)
+
+    def test_partial_results(self):
+        delays = {
+            'http://skyline-1/api?unique_metrics': 0,
+            'http://skyline-2/api?unique_metrics': 2,
+            'http://skyline-3/api?unique_metrics': None,
+        }
+        with patch.object(cluster_data, 'get_remote_session', return_value=MockSession(delays)):
+            start = time()
+            responses = cluster_data.fan_out_remote_requests('test', self.remote_requests, deadline=0.5)
+            runtime = time() - start
+        self.assertEqual(responses, ['http://skyline-1/api?unique_metrics', None, None])
+        self.assertLess(runtime, 1.5)
+
+    def test_cluster_data_cache(self):
+        cache_key = ('unique_metrics', 'metrics', 'all')
+        with patch.object(cluster_data, 'CLUSTER_DATA_CACHE_TTL', 10):
+            self.assertIsNone(cluster_data.get_cluster_data_cache(cache_key))
+            cluster_data.set_cluster_data_cache(cache_key, ['metric.1'])
+            self.assertEqual(cluster_data.get_cluster_data_cache(cache_key), ['metric.1'])
+        with patch.object(cluster_data, 'CLUSTER_DATA_CACHE_TTL', -1):
+            self.assertIsNone(cluster_data.get_cluster_data_cache(cache_key))
+
+
+if __name__ == '__main__':
+    unittest.main()
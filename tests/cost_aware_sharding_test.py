@@ -0,0 +1,67 @@
+import unittest2 as unittest
+import os.path
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+from analyzer import cost_aware_sharding
+
+
+class TestCostAwareSharding(unittest.TestCase):
+    """
+    Test that the cost aware assignment assigns every metric once and is
+    better balanced than equal sized ranges when the metric costs vary
+    """
+
+    def data(self):
+        random_state = np.random.RandomState(3928)
+        unique_metrics = ['metrics.metric.%s' % str(i) for i in range(2000)]
+        # Mostly cheap metrics with a block of expensive ones, as equal sized
+        # ranges of metrics with similar names often are
+        costs = random_state.uniform(0.0005, 0.002, len(unique_metrics))
+        costs[100:300] = random_state.uniform(0.02, 0.05, 200)
+        metric_costs = dict(zip(unique_metrics, costs.tolist()))
+        return unique_metrics, metric_costs
+
+    def test_assign_metrics_by_cost(self):
+        unique_metrics, metric_costs = self.data()
+        worker_ids = [1, 2, 3, 4]
+        assigned, worker_costs = cost_aware_sharding.assign_metrics_by_cost(
+            unique_metrics, metric_costs, worker_ids)
+        assigned_metrics = []
+        for worker_id in worker_ids:
+            assigned_metrics += assigned[worker_id]
+        self.assertEqual(sorted(assigned_metrics), sorted(unique_metrics))
+        range_costs = [
+            sum(metric_costs[metric] for metric in unique_metrics[i * 500:(i + 1) * 500])
+            for i in range(4)]
+        cost_balance = cost_aware_sharding.shard_balance(worker_costs.values())
+        self.assertLess(cost_balance, 1.01)
+        self.assertLess(cost_balance, cost_aware_sharding.shard_balance(range_costs))
+
+    def test_worker_speeds_and_unknown_costs(self):
+        unique_metrics, metric_costs = self.data()
+        # Metrics without a cost are given the median cost
+        del metric_costs[unique_metrics[0]]
+        assigned, worker_costs = cost_aware_sharding.assign_metrics_by_cost(
+            unique_metrics, metric_costs, [1, 2], {1: 2.0, 2: 1.0})
+        self.assertEqual(len(assigned[1]) + len(assigned[2]), len(unique_metrics))
+        self.assertAlmostEqual(worker_costs[1] / worker_costs[2], 2.0, places=1)
+
+    def test_encode_decode_metric_costs(self):
+        metric_costs = {'metrics.metric.1': 0.0012345, 'metrics.metric.2': 0.0}
+        encoded = cost_aware_sharding.encode_metric_costs(metric_costs)
+        self.assertEqual(encoded, {'metrics.metric.1': 1234, 'metrics.metric.2': 1})
+        decoded = cost_aware_sharding.decode_metric_costs(dict((k, str(v)) for k, v in encoded.items()))
+        self.assertEqual(decoded['metrics.metric.1'], 0.001234)
+        self.assertEqual(cost_aware_sharding.shard_balance([10, 10, 20, 20]), 20 / 15.0)
+        self.assertIsNone(cost_aware_sharding.shard_balance([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
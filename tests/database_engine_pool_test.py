@@ -0,0 +1,134 @@
+import unittest2 as unittest
+from mock import patch, MagicMock
+import os.path
+import sys
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+# create_engine and Table are patched in the tests, if SQLAlchemy is not
+# installed database is imported with mock sqlalchemy modules
+try:
+    import database
+except ImportError:
+    sqlalchemy_modules = {
+        'sqlalchemy': MagicMock(),
+        'sqlalchemy.dialects': MagicMock(),
+        'sqlalchemy.dialects.mysql': MagicMock(),
+    }
+    with patch.dict(sys.modules, sqlalchemy_modules):
+        import database
+
+
+class TestDatabaseEnginePool(unittest.TestCase):
+    """
+    Test the DATABASE_ENGINE_POOL process engine and table meta cache
+    """
+
+    def setUp(self):
+        self.patches = [
+            patch.object(database, 'DATABASE_ENGINE_POOL', True),
+            patch.object(database, 'process_engines', {}),
+            patch.object(database, 'process_tables', {}),
+            patch.object(database, 'static_tables_reflected', False),
+            patch.object(database, 'add_engine_pidguard'),
+            patch.object(database, 'create_engine', side_effect=lambda *args, **kwargs: MagicMock()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_get_engine_is_keyed_by_pid(self):
+        with patch.object(database.os, 'getpid', return_value=100):
+            engine, _, _ = database.get_engine('test')
+            same_engine, _, _ = database.get_engine('test')
+        with patch.object(database.os, 'getpid', return_value=101):
+            child_engine, _, _ = database.get_engine('test')
+        self.assertIs(engine, same_engine)
+        self.assertIsNot(engine, child_engine)
+        self.assertEqual(database.create_engine.call_count, 2)
+        self.assertEqual(database.process_engines, {100: engine, 101: child_engine})
+
+    def test_get_engine_without_pool(self):
+        with patch.object(database, 'DATABASE_ENGINE_POOL', False):
+            engine, _, _ = database.get_engine('test')
+            other_engine, _, _ = database.get_engine('test')
+        self.assertIsNot(engine, other_engine)
+        self.assertEqual(database.process_engines, {})
+
+    def test_dispose_engine_skips_the_process_engine(self):
+        with patch.object(database.os, 'getpid', return_value=100):
+            engine, _, _ = database.get_engine('test')
+            database.dispose_engine('test', engine)
+            engine.dispose.assert_not_called()
+            other_engine = MagicMock()
+            database.dispose_engine('test', other_engine)
+            other_engine.dispose.assert_called_once_with()
+        # The engine of another process, e.g. inherited by a forked process,
+        # is disposed
+        with patch.object(database.os, 'getpid', return_value=101):
+            database.dispose_engine('test', engine)
+        engine.dispose.assert_called_once_with()
+
+    def test_reflect_table_meta_caches_by_table_name(self):
+        engine = MagicMock()
+        with patch.object(database, 'Table') as table_class:
+            table_class.side_effect = self.table
+            metrics_table = database.reflect_table_meta(engine, 'metrics')
+            anomalies_table = database.reflect_table_meta(engine, 'anomalies')
+            self.assertIs(database.reflect_table_meta(engine, 'metrics'), metrics_table)
+            self.assertIs(database.reflect_table_meta(engine, 'anomalies'), anomalies_table)
+            self.assertEqual(table_class.call_count, 2)
+        self.assertEqual(
+            database.process_tables,
+            {'metrics': metrics_table, 'anomalies': anomalies_table})
+
+    def test_reflect_table_meta_without_pool(self):
+        engine = MagicMock()
+        with patch.object(database, 'DATABASE_ENGINE_POOL', False):
+            with patch.object(database, 'Table') as table_class:
+                table_class.side_effect = self.table
+                database.reflect_table_meta(engine, 'metrics')
+                database.reflect_table_meta(engine, 'metrics')
+                self.assertEqual(table_class.call_count, 2)
+        self.assertEqual(database.process_tables, {})
+
+    def test_reflect_static_tables(self):
+        with patch.object(database, 'Table') as table_class:
+            table_class.side_effect = self.table
+            database.reflect_static_tables('test')
+            database.reflect_static_tables('test')
+            self.assertEqual(table_class.call_count, len(database.STATIC_TABLES))
+        self.assertEqual(sorted(database.process_tables), sorted(database.STATIC_TABLES))
+        # The engine used to reflect the tables is not the process engine and
+        # is disposed of so that no connections are inherited
+        self.assertEqual(database.create_engine.call_count, 1)
+        self.assertEqual(database.process_engines, {})
+        engine = table_class.call_args[1]['autoload_with']
+        engine.dispose.assert_called_once_with()
+
+    def test_reflect_static_tables_reflects_the_remaining_tables_on_error(self):
+        def table(name, *args, **kwargs):
+            if name == 'snab':
+                raise Exception('no such table')
+            return self.table(name)
+
+        with patch.object(database, 'Table', side_effect=table):
+            database.reflect_static_tables('test')
+        self.assertEqual(
+            sorted(database.process_tables),
+            sorted([t for t in database.STATIC_TABLES if t != 'snab']))
+
+    def table(self, name, *args, **kwargs):
+        table = MagicMock()
+        table.name = name
+        return table
+
+
+if __name__ == '__main__':
+    unittest.main()
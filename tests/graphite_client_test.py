@@ -0,0 +1,93 @@
+import unittest2 as unittest
+from mock import patch
+import os.path
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+import graphite_client
+
+
+class MockResponse(object):
+    def __init__(self, js):
+        self.js = js
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.js
+
+
+class MockSession(object):
+    def __init__(self, data):
+        self.data = data
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        targets = [p.split('=', 1)[1] for p in url.split('?', 1)[1].split('&') if p.startswith('target=')]
+        return MockResponse([
+            {'target': target, 'datapoints': self.data[target]}
+            for target in targets if target in self.data])
+
+
+class TestGraphiteClient(unittest.TestCase):
+    """
+    Test that the graphite_client batches the targets into multi-target render
+    requests and returns the datapoints as [timestamp, value] arrays
+    """
+
+    data = {
+        'metric.1': [[1.0, 60], [None, 120], [3.0, 180]],
+        'metric.2': [[4, 60], [5, 120]],
+        'metric.3': [],
+    }
+
+    def test_datapoints_to_array(self):
+        timeseries_array = graphite_client.datapoints_to_array(self.data['metric.1'])
+        self.assertEqual(timeseries_array.tolist(), [[60.0, 1.0], [180.0, 3.0]])
+        self.assertEqual(graphite_client.datapoints_to_array([]).shape, (0, 2))
+
+    def test_fetch_graphite_metrics_batched(self):
+        session = MockSession(self.data)
+        with patch.object(graphite_client, 'get_graphite_session', return_value=session):
+            timeseries_arrays = graphite_client.fetch_graphite_metrics(
+                'test', ['metric.1', 'metric.2', 'metric.3', 'metric.4'], 0, 600,
+                batch_size=2, use_cache=False)
+        self.assertEqual(len(session.urls), 2)
+        self.assertEqual(timeseries_arrays['metric.1'].tolist(), [[60.0, 1.0], [180.0, 3.0]])
+        self.assertEqual(timeseries_arrays['metric.2'].tolist(), [[60.0, 4.0], [120.0, 5.0]])
+        self.assertEqual(len(timeseries_arrays['metric.3']), 0)
+        self.assertEqual(len(timeseries_arrays['metric.4']), 0)
+
+    def test_fetch_graphite_metric_failed(self):
+        session = MockSession(self.data)
+        with patch.object(graphite_client, 'get_graphite_session', return_value=session):
+            with patch.object(session, 'get', side_effect=ValueError('connection refused')):
+                self.assertIsNone(graphite_client.fetch_graphite_metric('test', 'metric.1', 0, 600, use_cache=False))
+
+    def test_fetch_graphite_metric_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            session = MockSession(self.data)
+            with patch.object(graphite_client, 'GRAPHITE_CLIENT_CACHE_DIR', cache_dir):
+                with patch.object(graphite_client, 'get_graphite_session', return_value=session):
+                    first = graphite_client.fetch_graphite_metric('test', 'metric.2', 0, 600)
+                    second = graphite_client.fetch_graphite_metric('test', 'metric.2', 0, 600)
+                    graphite_client.fetch_graphite_metric('test', 'metric.2', 0, 660)
+            self.assertEqual(len(session.urls), 2)
+            np.testing.assert_array_equal(first, second)
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
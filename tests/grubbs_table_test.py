@@ -0,0 +1,53 @@
+import unittest2 as unittest
+import os.path
+import sys
+
+import numpy as np
+import scipy.stats
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+import grubbs_table
+from analyzer import algorithms
+
+
+class TestGrubbsTable(unittest.TestCase):
+    """
+    Test that the memoised Grubbs scores match the scores calculated with
+    scipy.stats.t.isf and that grubbs_batch matches algorithms.grubbs
+    """
+
+    def test_grubbs_scores_match_scipy(self):
+        for len_series in [3, 4, 100, 511, 512, 1441, 10081]:
+            threshold = scipy.stats.t.isf(.05 / (2 * len_series), len_series - 2)
+            threshold_squared = threshold * threshold
+            grubbs_score = ((len_series - 1) / np.sqrt(len_series)) * np.sqrt(threshold_squared / (len_series - 2 + threshold_squared))
+            self.assertEqual(grubbs_table.get_grubbs_critical_value(len_series), threshold)
+            self.assertEqual(grubbs_table.get_grubbs_score(len_series), grubbs_score)
+        self.assertTrue(np.isnan(grubbs_table.get_grubbs_score(2)))
+        scores = grubbs_table.get_grubbs_scores([100, 1441, 2])
+        self.assertEqual(scores[0], grubbs_table.get_grubbs_score(100))
+        self.assertEqual(scores[1], grubbs_table.get_grubbs_score(1441))
+        self.assertTrue(np.isnan(scores[2]))
+
+    def test_grubbs_batch_matches_grubbs(self):
+        random_state = np.random.RandomState(3932)
+        timeseries_list = []
+        for length in [1, 2, 3, 50, 1440, 1441]:
+            values = random_state.normal(10, 1, length)
+            if length > 10:
+                values[-1] = 30
+            timeseries_list.append([[float(ts), float(value)] for ts, value in enumerate(values)])
+        timeseries_list.append([[float(ts), 1.0] for ts in range(100)])
+        results = grubbs_table.grubbs_batch(timeseries_list)
+        self.assertEqual(len(results), len(timeseries_list))
+        for index, timeseries in enumerate(timeseries_list):
+            self.assertEqual(results[index], bool(algorithms.grubbs(timeseries)))
+        self.assertTrue(results[4])
+
+
+if __name__ == '__main__':
+    unittest.main()
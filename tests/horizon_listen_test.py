@@ -0,0 +1,82 @@
+import unittest2 as unittest
+import os.path
+import pickle
+import socket
+import sys
+from multiprocessing import Queue
+from struct import Struct
+from time import sleep, time
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+from horizon import listen
+
+
+def pickle_frame(datapoints):
+    payload = pickle.dumps(datapoints, protocol=2)
+    return Struct('!I').pack(len(payload)) + payload
+
+
+class TestHorizonListen(unittest.TestCase):
+    """
+    Test that the pickle frames are unpacked from partial reads and that the
+    selectors listener queues all the datapoints from concurrent connections
+    """
+
+    def test_unpack_pickle_frames(self):
+        frames = [pickle_frame([('metric.%s' % str(i), (1600000000, float(i)))]) for i in range(3)]
+        data = bytearray(b''.join(frames))
+        # An incomplete header and an incomplete frame are not consumed
+        self.assertEqual(listen.unpack_pickle_frames(data[:3]), ([], 0))
+        unpacked, consumed = listen.unpack_pickle_frames(data[:len(frames[0]) + 6])
+        self.assertEqual(consumed, len(frames[0]))
+        self.assertEqual(listen.SafeUnpickler.loads(unpacked[0]), [('metric.0', (1600000000, 0.0))])
+        unpacked, consumed = listen.unpack_pickle_frames(data)
+        self.assertEqual(consumed, len(data))
+        self.assertEqual(len(unpacked), 3)
+        with self.assertRaises(ValueError):
+            listen.unpack_pickle_frames(bytearray(Struct('!I').pack(101) + b'x'), max_frame_size=100)
+
+    @unittest.skipIf(listen.selectors is None, 'requires selectors')
+    def test_listen_pickle_selectors(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+        s.close()
+        queue = Queue()
+        listener = listen.Listen(port, queue, os.getpid(), type='pickle')
+        listener.ip = '127.0.0.1'
+        listener.selectors = True
+        listener.start()
+        try:
+            sleep(0.5)
+            connections = [socket.create_connection(('127.0.0.1', port)) for i in range(3)]
+            expected = []
+            for i, conn in enumerate(connections):
+                datapoints = [('metric.%s.%s' % (str(i), str(j)), (1600000000 + j, float(j))) for j in range(25)]
+                expected += datapoints
+                frame = pickle_frame(datapoints)
+                # Send the frame in two parts to test partial reads
+                conn.sendall(frame[:7])
+            for i, conn in enumerate(connections):
+                conn.sendall(pickle_frame(expected[(i * 25):((i + 1) * 25)])[7:])
+            received = []
+            timeout = time() + 10
+            while len(received) < len(expected) and time() < timeout:
+                try:
+                    received += queue.get(True, 0.5)
+                except Exception:
+                    continue
+            for conn in connections:
+                conn.close()
+        finally:
+            listener.terminate()
+            listener.join()
+        self.assertEqual(sorted(received), sorted(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest2 as unittest
+import os.path
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+sys.path.append(skyline_dir + '/ionosphere')
+
+from tsfresh_feature_names import TSFRESH_FEATURES
+import features_profile_matrix
+
+
+class MockRedis(object):
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+
+class MockConnection(object):
+    def __init__(self, engine):
+        self.engine = engine
+
+    def execute(self, stmt):
+        self.engine.statements.append(stmt)
+        fp_ids = [int(fp_id) for fp_id in stmt.split('IN (')[1].rstrip(')').split(', ')]
+        return [
+            {'fp_id': fp_id, 'feature_id': feature_id, 'value': value}
+            for fp_id, feature_id, value in self.engine.rows if fp_id in fp_ids]
+
+    def close(self):
+        pass
+
+
+class MockEngine(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def connect(self):
+        return MockConnection(self)
+
+
+class TestFeaturesProfileMatrix(unittest.TestCase):
+    """
+    Test that the features profile matrix comparison results are the same as
+    the per features profile comparison in Ionosphere.spin_process
+    """
+
+    def data(self):
+        random_state = np.random.RandomState(3916)
+        rows = []
+        for fp_id in range(1, 21):
+            for feature_id, name in TSFRESH_FEATURES:
+                # Not all features profiles have all the features
+                if random_state.randint(0, 10) == 0:
+                    continue
+                rows.append((fp_id, int(feature_id), float(random_state.normal(100, 50))))
+        calculated_features = [
+            (name, float(random_state.normal(100, 50))) for feature_id, name in TSFRESH_FEATURES
+            if random_state.randint(0, 10)]
+        # An exact match of fp_id 1
+        fp_1_values = dict((feature_id, value) for fp_id, feature_id, value in rows if fp_id == 1)
+        exact_calculated_features = [
+            (name, fp_1_values[int(feature_id)]) for feature_id, name in TSFRESH_FEATURES
+            if int(feature_id) in fp_1_values]
+        return rows, calculated_features, exact_calculated_features
+
+    def spin_process_comparison(self, fp_features, calculated_features):
+        calc_features_by_id = []
+        for feature_name, calc_value in calculated_features:
+            for skyline_feature_id, name in TSFRESH_FEATURES:
+                if feature_name == name:
+                    calc_features_by_id.append([skyline_feature_id, float(calc_value)])
+        relevant_fp_feature_values = []
+        relevant_calc_feature_values = []
+        for skyline_feature_id, calc_value in calc_features_by_id:
+            for fp_feature_id, fp_value in fp_features:
+                if int(skyline_feature_id) == fp_feature_id:
+                    relevant_fp_feature_values.append(fp_value)
+                    relevant_calc_feature_values.append(calc_value)
+        sum_fp_values = sum(relevant_fp_feature_values)
+        sum_calc_values = sum(relevant_calc_feature_values)
+        sums_array = np.array([sum_fp_values, sum_calc_values], dtype=float)
+        percent_different = (np.diff(sums_array) / sums_array[:-1] * 100.)[0]
+        try:
+            np.testing.assert_array_almost_equal([sum_fp_values], [sum_calc_values])
+            almost_equal = True
+        except AssertionError:
+            almost_equal = False
+        return len(relevant_fp_feature_values), sum_fp_values, sum_calc_values, percent_different, almost_equal
+
+    def test_compare_features_profiles_matches_spin_process(self):
+        rows, calculated_features, exact_calculated_features = self.data()
+        matrix = features_profile_matrix.build_features_profile_matrix(rows)
+        for features in [calculated_features, exact_calculated_features]:
+            results = features_profile_matrix.compare_features_profiles(matrix, features)
+            self.assertEqual(sorted(results.keys()), list(range(1, 21)))
+            for fp_id, result in results.items():
+                fp_features = [[feature_id, value] for row_fp_id, feature_id, value in rows if row_fp_id == fp_id]
+                count, sum_fp_values, sum_calc_values, percent_different, almost_equal = self.spin_process_comparison(
+                    fp_features, features)
+                self.assertEqual(result['common_features_count'], count)
+                self.assertAlmostEqual(result['sum_fp_values'], sum_fp_values, places=6)
+                self.assertAlmostEqual(result['sum_calc_values'], sum_calc_values, places=6)
+                self.assertAlmostEqual(result['percent_different'], percent_different, places=6)
+                self.assertEqual(result['almost_equal'], almost_equal)
+        self.assertTrue(features_profile_matrix.compare_features_profiles(matrix, exact_calculated_features)[1]['almost_equal'])
+
+    def test_encode_decode_features_profile_matrix(self):
+        rows, calculated_features, exact_calculated_features = self.data()
+        matrix = features_profile_matrix.build_features_profile_matrix(rows)
+        decoded = features_profile_matrix.decode_features_profile_matrix(
+            features_profile_matrix.encode_features_profile_matrix(*matrix))
+        self.assertEqual(decoded[0].tolist(), matrix[0].tolist())
+        self.assertEqual(decoded[1].tolist(), matrix[1].tolist())
+        np.testing.assert_array_equal(decoded[2], matrix[2])
+        self.assertIsNone(features_profile_matrix.decode_features_profile_matrix(b'FPM0'))
+
+    def test_get_features_profile_matrix_only_queries_new_fp_ids(self):
+        rows, calculated_features, exact_calculated_features = self.data()
+        redis_conn = MockRedis()
+        engine = MockEngine(rows)
+        matrix = features_profile_matrix.get_features_profile_matrix(
+            'test', redis_conn, engine, 1, [3, 1, 2])
+        self.assertEqual(matrix[0].tolist(), [3, 1, 2])
+        self.assertEqual(len(engine.statements), 1)
+        matrix = features_profile_matrix.get_features_profile_matrix(
+            'test', redis_conn, engine, 1, [1, 2, 3])
+        self.assertEqual(matrix[0].tolist(), [1, 2, 3])
+        self.assertEqual(len(engine.statements), 1)
+        # A new features profile
+        matrix = features_profile_matrix.get_features_profile_matrix(
+            'test', redis_conn, engine, 1, [1, 2, 3, 4])
+        self.assertEqual(matrix[0].tolist(), [1, 2, 3, 4])
+        self.assertEqual(len(engine.statements), 2)
+        self.assertIn('IN (4)', engine.statements[-1])
+        expected = features_profile_matrix.build_features_profile_matrix(rows, [1, 2, 3, 4])
+        np.testing.assert_array_equal(
+            features_profile_matrix.compare_features_profiles(matrix, calculated_features)[4]['sum_fp_values'],
+            features_profile_matrix.compare_features_profiles(expected, calculated_features)[4]['sum_fp_values'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+import unittest2 as unittest
+import os.path
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+sys.path.append(skyline_dir + '/luminosity')
+
+from skyline_functions import nonNegativeDerivative
+import correlations_vectorized
+
+
+class Anomaly(object):
+    def __init__(self, exact_timestamp):
+        self.exact_timestamp = exact_timestamp
+
+
+def luminol_align(a, b):
+    """
+    The luminol TimeSeries.align merge, a and b being dicts.
+    """
+    a_items = sorted(a.items())
+    b_items = sorted(b.items())
+    aligned, other_aligned = {}, {}
+    i, j = 0, 0
+    while i < len(a_items) and j < len(b_items):
+        timestamp, value = a_items[i]
+        other_timestamp, other_value = b_items[j]
+        if timestamp == other_timestamp:
+            aligned[timestamp] = value
+            other_aligned[other_timestamp] = other_value
+            i += 1
+            j += 1
+        elif timestamp < other_timestamp:
+            aligned[timestamp] = value
+            other_aligned[timestamp] = other_value
+            i += 1
+        else:
+            aligned[other_timestamp] = value
+            other_aligned[other_timestamp] = other_value
+            j += 1
+    while i < len(a_items):
+        aligned[a_items[i][0]] = a_items[i][1]
+        other_aligned[a_items[i][0]] = b_items[-1][1]
+        i += 1
+    while j < len(b_items):
+        aligned[b_items[j][0]] = a_items[-1][1]
+        other_aligned[b_items[j][0]] = b_items[j][1]
+        j += 1
+    return aligned, other_aligned
+
+
+def luminol_find_allowed_shift(timestamps, max_shift_milliseconds):
+    """
+    The luminol CrossCorrelator _find_allowed_shift and _find_first_bigger,
+    which returns the last position probed by the binary search.
+    """
+    init_ts = timestamps[0]
+    residual_timestamps = [ts - init_ts for ts in timestamps]
+    lower_bound = 0
+    upper_bound = len(residual_timestamps)
+    while lower_bound < upper_bound:
+        pos = lower_bound + (upper_bound - lower_bound) / 2
+        pos = int(pos)
+        if residual_timestamps[pos] > max_shift_milliseconds:
+            upper_bound = pos
+        else:
+            lower_bound = pos + 1
+    return pos
+
+
+def luminol_correlate(anomaly_ts_dict, correlate_ts_dict, time_period):
+    """
+    A pure Python port of the luminol Correlator with the default
+    CrossCorrelator, returns None for NotEnoughDataPoints.
+    """
+    a = dict((ts, v) for ts, v in anomaly_ts_dict.items() if time_period[0] <= ts <= time_period[1])
+    b = dict((ts, v) for ts, v in correlate_ts_dict.items() if time_period[0] <= ts <= time_period[1])
+    if len(a) < 2 or len(b) < 2:
+        return None
+    for series in (a, b):
+        maximum = max(series.values())
+        if maximum:
+            for ts in series:
+                series[ts] = series[ts] / maximum
+    a, b = luminol_align(a, b)
+    timestamps = sorted(a)
+    a_values = [a[ts] for ts in timestamps]
+    b_values = [b[ts] for ts in timestamps]
+    n = len(timestamps)
+    a_avg, b_avg = np.mean(a_values), np.mean(b_values)
+    denom = np.std(a_values) * np.std(b_values) * n
+    max_shift_milliseconds = 60 * 1000
+    allowed_shift_step = luminol_find_allowed_shift(timestamps, max_shift_milliseconds)
+    if allowed_shift_step:
+        bounds = (-allowed_shift_step, allowed_shift_step)
+    else:
+        bounds = (0, 1)
+    correlations = []
+    shifted_correlations = []
+    for delay in range(*bounds):
+        delay_in_seconds = timestamps[abs(delay)] - timestamps[0]
+        if delay < 0:
+            delay_in_seconds = -delay_in_seconds
+        s = 0
+        for i in range(n):
+            j = i + delay
+            if j < 0 or j >= n:
+                continue
+            s += ((a_values[i] - a_avg) * (b_values[j] - b_avg))
+        r = s / denom if denom != 0 else s
+        correlations.append([delay_in_seconds, r])
+        shifted_correlations.append(r * (1 + float(delay_in_seconds) / max_shift_milliseconds * 0.05))
+    max_correlation = list(max(correlations, key=lambda k: k[1]))
+    max_correlation.append(max(shifted_correlations))
+    return max_correlation
+
+
+class TestVectorizedCorrelations(unittest.TestCase):
+    """
+    Test that the vectorized correlations are the same as the per metric
+    luminol Correlator correlations in get_correlations.
+    """
+
+    def data(self):
+        random_state = np.random.RandomState(3912)
+        anomaly_timestamp = 1600000000
+        anomalous_ts = [
+            (anomaly_timestamp - (60 * i), float(random_state.normal(10, 2)))
+            for i in range(30, -1, -1)]
+        candidates = []
+        for index in range(200):
+            shape = index % 5
+            resolution = 60
+            offset = 0
+            if shape == 1:
+                offset = int(random_state.randint(1, 59))
+            if shape == 2:
+                resolution = 30
+            if shape == 3:
+                resolution = 300
+            values = random_state.normal(10, 2, 200)
+            if index % 7 == 0:
+                values = np.array([v for ts, v in anomalous_ts][-1:] * 200) * 2
+            if index % 11 == 0:
+                values = np.cumsum(np.abs(values))
+            timeseries = [
+                (anomaly_timestamp - (resolution * (150 - i)) + offset, float(value))
+                for i, value in enumerate(values)]
+            candidates.append(('metric.%s' % str(index), timeseries, (index % 11 == 0)))
+        anomalies = [Anomaly(anomaly_timestamp - 60), Anomaly(anomaly_timestamp)]
+        return anomaly_timestamp, anomalous_ts, candidates, anomalies
+
+    def luminol_correlations(self, anomaly_timestamp, anomalous_ts, candidates, anomalies, from_timestamp, threshold):
+        correlated_metrics = []
+        correlations = []
+        for metric_base_name, timeseries, derivative in candidates:
+            if derivative:
+                timeseries = nonNegativeDerivative(timeseries)
+            resolution = correlations_vectorized.determine_resolution_array([ts for ts, value in timeseries])
+            correlate_ts = [
+                (int(ts), value) for ts, value in timeseries
+                if from_timestamp <= int(ts) <= anomaly_timestamp]
+            if not correlate_ts:
+                continue
+            correlated = False
+            for a in anomalies:
+                if int(a.exact_timestamp) < int(anomaly_timestamp - (resolution * 2)):
+                    continue
+                if int(a.exact_timestamp) > int(anomaly_timestamp + (resolution * 2)):
+                    continue
+                time_period = (int(anomaly_timestamp - (resolution * 2)), int(anomaly_timestamp + (resolution * 2)))
+                correlation = luminol_correlate(dict(anomalous_ts), dict(correlate_ts), time_period)
+                if correlation and correlation[1] >= threshold:
+                    correlated = True
+                    correlations.append([metric_base_name, correlation[1], correlation[0], correlation[2]])
+            if correlated:
+                correlated_metrics.append(metric_base_name)
+        return correlated_metrics, correlations
+
+    def test_vectorized_correlations_match_luminol(self):
+        anomaly_timestamp, anomalous_ts, candidates, anomalies = self.data()
+        from_timestamp = anomaly_timestamp - 600
+        for threshold in [-1.0, 0.5]:
+            expected_metrics, expected_correlations = self.luminol_correlations(
+                anomaly_timestamp, anomalous_ts, candidates, anomalies, from_timestamp, threshold)
+            correlated_metrics, correlations, checked, sampled, timings = correlations_vectorized.vectorized_correlations(
+                'anomalous.metric', anomaly_timestamp, anomalous_ts, candidates,
+                anomalies, from_timestamp, threshold)
+            self.assertEqual(correlated_metrics, expected_metrics)
+            self.assertEqual(len(correlations), len(expected_correlations))
+            for correlation, expected in zip(correlations, expected_correlations):
+                self.assertEqual(correlation[0], expected[0])
+                self.assertAlmostEqual(correlation[1], expected[1], places=9)
+                self.assertEqual(correlation[2], expected[2])
+                self.assertAlmostEqual(correlation[3], expected[3], places=9)
+            self.assertEqual(sorted(timings.keys()), sorted(correlations_vectorized.CORRELATION_STAGES))
+
+    def test_crop_window_keeps_last_duplicate(self):
+        timestamps = np.array([1, 2, 2, 3, 4], dtype=np.int64)
+        values = np.array([1.0, 2.0, 5.0, 3.0, 4.0])
+        window_timestamps, window_values = correlations_vectorized.crop_window(timestamps, values, 2, 3)
+        self.assertEqual(window_timestamps.tolist(), [2, 3])
+        self.assertEqual(window_values.tolist(), [5.0, 3.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest2 as unittest
+import os.path
+import random
+import sys
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+from matched_or_regexed_in_list import matched_or_regexed_in_list, MatchList
+
+
+class TestMatchList(unittest.TestCase):
+    """
+    Test that the MatchList returns the same (matched, matched_by) as
+    matched_or_regexed_in_list
+    """
+
+    match_list = [
+        'stats.host-1.cpu', 'carbon', 'disk.sda', 'host-2\\.mem.*', '(?i)STATS\\.HOST-3',
+        'x.y', 'idle.idle', 'cpu', '^stats\\.(host-4)', 'invalid[regex', 'mem.host-2',
+        'stats.host-5.disk.sda', '.*\\.user$', 'stats']
+    elements = ['stats', 'carbon', 'host-1', 'host-2', 'host-3', 'host-4', 'host-5', 'cpu', 'idle', 'user', 'disk', 'sda', 'mem']
+
+    def base_names(self):
+        random_state = random.Random(3942)
+        base_names = [
+            '.'.join(random_state.choice(self.elements) for i in range(random_state.randint(1, 5)))
+            for j in range(3000)]
+        return base_names + ['stats', 'carbon', 'stats.host-1.cpu', 'STATS.HOST-3.cpu', 'other']
+
+    def test_match(self):
+        for match_list in [self.match_list, list(reversed(self.match_list)), self.match_list[3:5], [], ['stats']]:
+            matcher = MatchList(match_list)
+            for base_name in self.base_names():
+                self.assertEqual(
+                    matcher.match(base_name),
+                    matched_or_regexed_in_list('test', base_name, match_list),
+                    msg='%s - %s' % (base_name, str(match_list)))
+        base_names = self.base_names()[:100]
+        self.assertEqual(
+            MatchList(self.match_list).match_many(base_names),
+            [matched_or_regexed_in_list('test', base_name, self.match_list) for base_name in base_names])
+
+    def test_matched_ids(self):
+        for match_list in [self.match_list, list(reversed(self.match_list))]:
+            matcher = MatchList(match_list)
+            for base_name in self.base_names():
+                expected = [
+                    match_id for match_id, match_namespace in enumerate(match_list)
+                    if matched_or_regexed_in_list('test', base_name, [match_namespace])[0]]
+                self.assertEqual(list(matcher.matched_ids(base_name)), expected, msg=base_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest2 as unittest
+from time import time
+import os.path
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+from msgpack import packb
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+import metrics_snapshot
+from skyline_functions import decode_timeseries
+
+
+class RedisMget(object):
+    """
+    A Redis connection with only mget, returning the raw time series of the
+    metrics it has and None for the others
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.mget_metrics = []
+
+    def mget(self, metrics):
+        self.mget_metrics.append(list(metrics))
+        return [self.data.get(metric) for metric in metrics]
+
+
+class TestMetricsSnapshot(unittest.TestCase):
+    """
+    Test that the time series read from the metrics snapshot match the time
+    series written to it and that mget_timeseries falls back to Redis
+    """
+
+    def setUp(self):
+        self.METRICS_SNAPSHOT = metrics_snapshot.METRICS_SNAPSHOT
+        self.METRICS_SNAPSHOT_PATH = metrics_snapshot.METRICS_SNAPSHOT_PATH
+        self.tmp_dir = tempfile.mkdtemp()
+        self.snapshot_path = os.path.join(self.tmp_dir, 'metrics.snapshot')
+        now = int(time())
+        self.timeseries = {
+            'metrics.test.a': [[now - 120, 1.0], [now - 60, 2.5], [now, 3.0]],
+            'metrics.test.b': [[now - 90.5, 10.0], [now - 30.25, 11.0]],
+            'metrics.test.c': [[now, 5.0]],
+        }
+        metrics_timeseries = [
+            (metric, decode_timeseries(b''.join(packb(tuple(item)) for item in timeseries)))
+            for metric, timeseries in sorted(self.timeseries.items())]
+        self.created_at = now
+        self.counts = metrics_snapshot.write_metrics_snapshot(
+            self.snapshot_path, metrics_timeseries, self.created_at)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        metrics_snapshot.metrics_snapshot_cache.clear()
+        metrics_snapshot.METRICS_SNAPSHOT = self.METRICS_SNAPSHOT
+        metrics_snapshot.METRICS_SNAPSHOT_PATH = self.METRICS_SNAPSHOT_PATH
+
+    def test_snapshot_timeseries(self):
+        self.assertEqual(self.counts, (3, 6))
+        snapshot = metrics_snapshot.MetricsSnapshot(self.snapshot_path)
+        for metric, timeseries in self.timeseries.items():
+            self.assertTrue(metric in snapshot)
+            timeseries_array = snapshot.get_timeseries_array(metric)
+            self.assertEqual(timeseries_array['timestamp'].tolist(), [item[0] for item in timeseries])
+            self.assertEqual(timeseries_array['value'].tolist(), [item[1] for item in timeseries])
+            # A snapshot timeseries array is returned as is by decode_timeseries
+            self.assertTrue(decode_timeseries(timeseries_array) is not None)
+            self.assertEqual(decode_timeseries(timeseries_array).tolist(), timeseries_array.tolist())
+        self.assertEqual(snapshot.get_timeseries_array('metrics.test.d'), None)
+        self.assertEqual(snapshot.get_timeseries_array('metrics.test.a')['timestamp'].dtype, np.int64)
+        self.assertEqual(snapshot.get_timeseries_array('metrics.test.b')['timestamp'].dtype, np.float64)
+        self.assertTrue(snapshot.is_fresh(max_age=60))
+        self.assertTrue(snapshot.is_fresh(max_age=60, min_created_at=self.created_at))
+        self.assertFalse(snapshot.is_fresh(max_age=60, min_created_at=self.created_at + 1))
+
+    def test_mget_timeseries(self):
+        metrics_snapshot.METRICS_SNAPSHOT = True
+        metrics_snapshot.METRICS_SNAPSHOT_PATH = self.snapshot_path
+        redis_conn = RedisMget({'metrics.test.d': b'raw'})
+        metrics = ['metrics.test.a', 'metrics.test.d', 'metrics.test.c']
+        results = metrics_snapshot.mget_timeseries('test', redis_conn, metrics, max_age=60)
+        self.assertEqual(redis_conn.mget_metrics, [['metrics.test.d']])
+        self.assertEqual(results[0]['value'].tolist(), [1.0, 2.5, 3.0])
+        self.assertEqual(results[1], b'raw')
+        self.assertEqual(results[2]['value'].tolist(), [5.0])
+
+        # A snapshot created before the data required is not used
+        redis_conn = RedisMget({})
+        results = metrics_snapshot.mget_timeseries(
+            'test', redis_conn, metrics, max_age=60, min_created_at=self.created_at + 1)
+        self.assertEqual(redis_conn.mget_metrics, [metrics])
+        self.assertEqual(results, [None, None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
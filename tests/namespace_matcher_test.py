@@ -0,0 +1,52 @@
+import unittest2 as unittest
+import os.path
+import random
+import sys
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+from namespace_matcher import NamespaceMatcher
+
+
+def in_namespaces(metric_name, namespaces):
+    # The horizon worker in_skip_list SKIP_LIST loop
+    metric_namespace_elements = metric_name.split('.')
+    for namespace in namespaces:
+        if namespace in metric_name:
+            return True
+        namespace_elements = namespace.split('.')
+        elements_matched = set(metric_namespace_elements) & set(namespace_elements)
+        if len(elements_matched) == len(namespace_elements):
+            return True
+    return False
+
+
+class TestNamespaceMatcher(unittest.TestCase):
+    """
+    Test that the NamespaceMatcher matches the same metrics as matching each
+    namespace in turn
+    """
+
+    def test_namespace_matcher(self):
+        random_state = random.Random(3940)
+        elements = ['stats', 'carbon', 'host-1', 'host-2', 'cpu', 'idle', 'user', 'disk', 'sda', 'a', 'ab']
+        namespaces = [
+            'carbon.agents', 'skyline.analyzer.', 'cpu.idle', 'sda.stats',
+            'idle.idle', 'host-1.disk.user', 'b.st', 'a', 'x.y.z']
+        metric_names = ['.'.join(random_state.choice(elements) for i in range(random_state.randint(1, 5))) for j in range(2000)]
+        metric_names += ['carbon.agents.host-1.cpu', 'skyline.analyzer.run_time', 'cpu.idle', 'idle']
+        for namespace_list in [namespaces, namespaces[2:4], [], ['']]:
+            matcher = NamespaceMatcher(namespace_list)
+            for metric_name in metric_names:
+                self.assertEqual(
+                    matcher.match(metric_name), in_namespaces(metric_name, namespace_list),
+                    msg='%s - %s' % (metric_name, str(namespace_list)))
+        matcher = NamespaceMatcher(namespaces)
+        self.assertEqual(matcher.elements_matched_ids('host-1.cpu.disk.idle.user'.split('.')), [2, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
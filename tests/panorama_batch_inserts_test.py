@@ -0,0 +1,121 @@
+import unittest2 as unittest
+from mock import Mock
+import os.path
+import sys
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+from panorama.batch_inserts import (
+    batch_known_ids, batch_determine_id, inserted_anomalies_query,
+    match_anomaly_ids)
+
+
+class TestMatchAnomalyIds(unittest.TestCase):
+    """
+    Test that the ids of a multi-row anomalies insert are matched to the rows
+    inserted
+    """
+
+    def anomalies(self):
+        return [
+            {'metric_id': 3, 'metric_timestamp': 1600000060},
+            {'metric_id': 1, 'metric_timestamp': 1600000000},
+            {'metric_id': 3, 'metric_timestamp': 1600000000},
+            {'metric_id': 1, 'metric_timestamp': 1600000000},
+        ]
+
+    def test_ids_are_not_assumed_to_be_consecutive(self):
+        # auto_increment_increment of 2 with rows from another writer
+        # interleaved
+        results = [
+            (101, 3, 1600000060), (103, 1, 1600000000), (105, 7, 1600000000),
+            (107, 3, 1600000000), (109, 1, 1600000000)]
+        self.assertEqual(match_anomaly_ids(self.anomalies(), results), [101, 103, 107, 109])
+
+    def test_missing_rows_have_no_id(self):
+        results = [(101, 3, 1600000060), (103, 1, 1600000000)]
+        self.assertEqual(match_anomaly_ids(self.anomalies(), results), [101, 103, None, None])
+
+    def test_inserted_anomalies_query(self):
+        query = inserted_anomalies_query(101, self.anomalies())
+        self.assertEqual(
+            query,
+            'select id, metric_id, anomaly_timestamp FROM anomalies WHERE id >= 101 AND metric_id IN (1, 3) ORDER BY id')
+
+
+class TestBatchKnownIds(unittest.TestCase):
+    """
+    Test that the batch ids cache is populated with a select per table
+    """
+
+    def mysql_select(self, query):
+        results = {
+            'select id, host FROM hosts': [(1, 'skyline-1')],
+            'select id, app FROM apps': [(1, 'analyzer'), (2, 'mirage')],
+            'select id, source FROM sources': [],
+            'select id, algorithm FROM algorithms': [(4, 'ks_test')],
+            'select id, metric FROM metrics WHERE metric IN (\'metrics.a\', \'metrics.b\')': [(10, 'metrics.a')],
+        }
+        return results[query]
+
+    def test_batch_known_ids(self):
+        mysql_select = Mock(side_effect=self.mysql_select)
+        known_ids = batch_known_ids(
+            mysql_select, ['metrics.b', 'metrics.a', 'metrics.a', 'metrics.it\'s'])
+        self.assertEqual(known_ids, {
+            ('hosts', 'host', 'skyline-1'): 1,
+            ('apps', 'app', 'analyzer'): 1,
+            ('apps', 'app', 'mirage'): 2,
+            ('algorithms', 'algorithm', 'ks_test'): 4,
+            ('metrics', 'metric', 'metrics.a'): 10,
+        })
+        self.assertEqual(mysql_select.call_count, 5)
+
+    def test_batch_known_ids_select_failure(self):
+        def mysql_select(query):
+            if 'FROM apps' in query:
+                raise Exception('mysql error')
+            return self.mysql_select(query)
+
+        known_ids = batch_known_ids(mysql_select, [])
+        self.assertEqual(known_ids, {
+            ('hosts', 'host', 'skyline-1'): 1,
+            ('algorithms', 'algorithm', 'ks_test'): 4,
+        })
+
+
+class TestBatchDetermineId(unittest.TestCase):
+    """
+    Test that the batch determine_id resolves the ids from the batch ids cache
+    """
+
+    def test_known_ids_are_not_determined(self):
+        ids = {('apps', 'app', 'analyzer'): 1}
+        determine_id = Mock(return_value=2)
+        cached_determine_id = batch_determine_id(ids, determine_id)
+        self.assertEqual(cached_determine_id('apps', 'app', 'analyzer'), 1)
+        determine_id.assert_not_called()
+
+    def test_determined_ids_are_cached(self):
+        ids = {}
+        determine_id = Mock(return_value=2)
+        cached_determine_id = batch_determine_id(ids, determine_id)
+        self.assertEqual(cached_determine_id('apps', 'app', 'mirage'), 2)
+        self.assertEqual(cached_determine_id('apps', 'app', 'mirage'), 2)
+        determine_id.assert_called_once_with('apps', 'app', 'mirage')
+        self.assertEqual(ids, {('apps', 'app', 'mirage'): 2})
+
+    def test_unknown_ids_are_not_cached(self):
+        ids = {}
+        determine_id = Mock(side_effect=[False, 3])
+        cached_determine_id = batch_determine_id(ids, determine_id)
+        self.assertFalse(cached_determine_id('metrics', 'metric', 'metrics.a'))
+        self.assertEqual(cached_determine_id('metrics', 'metric', 'metrics.a'), 3)
+        self.assertEqual(determine_id.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
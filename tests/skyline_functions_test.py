@@ -0,0 +1,240 @@
+import unittest2 as unittest
+from mock import patch
+import os.path
+import sys
+
+import numpy as np
+from msgpack import Unpacker, packb
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.join(os.path.dirname(os.path.realpath(current_dir)))
+skyline_dir = parent_dir + '/skyline'
+sys.path.append(skyline_dir)
+
+from skyline_functions import (
+    decode_timeseries, timeseries_array_to_list, sort_timeseries,
+    encode_columnar_datapoint, encode_columnar_timeseries,
+    horizon_storage_format)
+import skyline_functions
+
+
+class TestDecodeTimeseries(unittest.TestCase):
+    """
+    Test that decode_timeseries returns the same time series as msgpack
+    Unpacker and sort_timeseries on Horizon Redis data
+    """
+
+    def raw_series(self, timeseries):
+        """
+        Pack a time series as Horizon appends it to Redis.
+        """
+        return b''.join([packb(datapoint) for datapoint in timeseries])
+
+    def unpacked(self, raw_series):
+        unpacker = Unpacker(use_list=False)
+        unpacker.feed(raw_series)
+        return sort_timeseries(list(unpacker))
+
+    def test_decode_fixed_width(self):
+        timeseries = [(1600000000 + (60 * i), float(i) / 3) for i in range(1000)]
+        raw_series = self.raw_series(timeseries)
+        timeseries_array = decode_timeseries(raw_series)
+        self.assertEqual(timeseries_array['timestamp'].dtype, np.int64)
+        self.assertEqual(timeseries_array_to_list(timeseries_array), self.unpacked(raw_series))
+
+    def test_decode_float_timestamps(self):
+        timeseries = [(1600000000.5 + (60 * i), float(i)) for i in range(100)]
+        raw_series = self.raw_series(timeseries)
+        self.assertEqual(
+            timeseries_array_to_list(decode_timeseries(raw_series)),
+            self.unpacked(raw_series))
+
+    def test_decode_mixed_types(self):
+        timeseries = [(1600000000, 1), (1600000060, 2.5), (1600000120, -3), (1600000180, 4.0)]
+        raw_series = self.raw_series(timeseries)
+        self.assertEqual(
+            timeseries_array_to_list(decode_timeseries(raw_series)),
+            self.unpacked(raw_series))
+
+    def test_decode_unsorted(self):
+        timeseries = [(1600000120, 3.0), (1600000000, 1.0), (1600000060, 2.0), (1600000000, 0.5)]
+        raw_series = self.raw_series(timeseries)
+        self.assertEqual(
+            timeseries_array_to_list(decode_timeseries(raw_series)),
+            self.unpacked(raw_series))
+
+    def test_decode_deduplicate(self):
+        timeseries = [(1600000120, 3.0), (1600000000, 1.0), (1600000060, 2.0), (1600000000, 0.5)]
+        raw_series = self.raw_series(timeseries)
+        self.assertEqual(
+            timeseries_array_to_list(decode_timeseries(raw_series, deduplicate=True)),
+            [(1600000000, 0.5), (1600000060, 2.0), (1600000120, 3.0)])
+
+    def test_decode_empty(self):
+        self.assertEqual(timeseries_array_to_list(decode_timeseries(None)), [])
+        self.assertEqual(timeseries_array_to_list(decode_timeseries(b'')), [])
+
+
+class TestColumnarTimeseries(unittest.TestCase):
+    """
+    Test that HORIZON_STORAGE_FORMAT columnar keys and keys appended to in
+    both formats decode to the same time series as msgpack keys
+    """
+
+    def test_decode_columnar(self):
+        timeseries = [(1600000000 + (60 * i), float(i) / 3) for i in range(1000)]
+        raw_series = b''.join([encode_columnar_datapoint(ts, value) for ts, value in timeseries])
+        self.assertEqual(horizon_storage_format(raw_series), 'columnar')
+        timeseries_array = decode_timeseries(raw_series)
+        self.assertEqual(timeseries_array['timestamp'].dtype, np.int64)
+        self.assertEqual(timeseries_array_to_list(timeseries_array), timeseries)
+        self.assertEqual(encode_columnar_timeseries(timeseries_array), raw_series)
+
+    def test_decode_mixed_formats(self):
+        timeseries = [(1600000000 + (60 * i), float(i)) for i in range(20)]
+        raw_series = b''.join([packb(datapoint) for datapoint in timeseries[:10]])
+        raw_series += b''.join([encode_columnar_datapoint(ts, value) for ts, value in timeseries[10:15]])
+        raw_series += b''.join([packb(datapoint) for datapoint in timeseries[15:]])
+        self.assertEqual(horizon_storage_format(raw_series), 'mixed')
+        self.assertEqual(timeseries_array_to_list(decode_timeseries(raw_series)), timeseries)
+
+
+class MockPipeline(object):
+    def __init__(self, redis_data):
+        self.redis_data = redis_data
+        self.commands = []
+
+    def smembers(self, key):
+        self.commands.append(set(self.redis_data.get(key, [])))
+
+    def mget(self, keys):
+        self.commands.append([self.redis_data.get(key) for key in keys])
+
+    def execute(self):
+        return self.commands
+
+
+class MockRedis(object):
+    def __init__(self, redis_data):
+        self.redis_data = redis_data
+        self.pipelines = 0
+
+    def pipeline(self, transaction=True):
+        self.pipelines += 1
+        return MockPipeline(self.redis_data)
+
+
+class TestDerivativeMetricStatuses(unittest.TestCase):
+    """
+    Test that get_derivative_metric_statuses resolves the statuses of all the
+    metrics with one Redis pipeline and caches them
+    """
+
+    def setUp(self):
+        skyline_functions.invalidate_derivative_metric_statuses()
+        full_namespace = skyline_functions.settings.FULL_NAMESPACE
+        self.redis_conn = MockRedis({
+            'derivative_metrics': ['%sderivative.metric' % full_namespace, '%soverridden.metric' % full_namespace],
+            'non_derivative_metrics': ['%soverridden.metric' % full_namespace],
+            'z.derivative_metric.expiring.metric': '1600000000',
+        })
+
+    def test_get_derivative_metric_statuses(self):
+        base_names = ['derivative.metric', 'overridden.metric', 'expiring.metric', 'gauge.metric']
+        with patch.object(skyline_functions, 'get_redis_conn_decoded', return_value=self.redis_conn):
+            statuses = skyline_functions.get_derivative_metric_statuses('test', base_names)
+            self.assertEqual(statuses, {
+                'derivative.metric': True, 'overridden.metric': False,
+                'expiring.metric': True, 'gauge.metric': False})
+            self.assertEqual(self.redis_conn.pipelines, 1)
+            # Cached
+            skyline_functions.get_derivative_metric_statuses('test', base_names)
+            self.assertEqual(self.redis_conn.pipelines, 1)
+            # Invalidated
+            skyline_functions.invalidate_derivative_metric_statuses(['gauge.metric'])
+            statuses = skyline_functions.get_derivative_metric_statuses('test', base_names)
+            self.assertEqual(self.redis_conn.pipelines, 2)
+            self.assertFalse(statuses['gauge.metric'])
+
+
+class MockQueueRedis(object):
+    def __init__(self):
+        self.zsets = {}
+        self.lists = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+    def zadd(self, key, mapping, nx=False):
+        zset = self.zsets.setdefault(key, {})
+        for member, score in mapping.items():
+            if nx and member in zset:
+                continue
+            zset[member] = score
+
+    def zrange(self, key, start, end):
+        zset = self.zsets.get(key, {})
+        return [member.encode('utf-8') for member, score in sorted(zset.items(), key=lambda item: (item[1], item[0]))]
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:(end + 1)]
+
+    def blpop(self, key, timeout=0):
+        if self.lists.get(key):
+            return (key, self.lists[key].pop(0))
+        return None
+
+
+class TestMirageCheckQueue(unittest.TestCase):
+    """
+    Test that the Mirage check queue returns the existing check files in
+    priority order and wakes Mirage when a check is added
+    """
+
+    def test_mirage_check_queue(self):
+        import tempfile
+        import shutil
+        check_path = tempfile.mkdtemp()
+        try:
+            redis_conn = MockQueueRedis()
+            checks = [
+                ('1600000120.metric.a.txt', 1600000120),
+                ('1600000060.metric.b.txt', 1600000060 + skyline_functions.MIRAGE_CHECK_QUEUE_LOW_PRIORITY_OFFSET),
+                ('1600000000.metric.c.txt', 1600000000),
+                ('1600000180.metric.removed.txt', 1600000180),
+            ]
+            for check_filename, priority in checks:
+                if 'removed' not in check_filename:
+                    open(os.path.join(check_path, check_filename), 'w').close()
+                self.assertTrue(skyline_functions.add_to_mirage_check_queue(
+                    'test', redis_conn, os.path.join(check_path, check_filename), priority))
+            self.assertEqual(len(redis_conn.lists[skyline_functions.MIRAGE_CHECK_QUEUE_NOTIFY_KEY]), 1)
+            self.assertEqual(
+                skyline_functions.get_mirage_check_queue('test', redis_conn, check_path),
+                ['1600000000.metric.c.txt', '1600000120.metric.a.txt', '1600000060.metric.b.txt'])
+            # The check file that does not exist is removed from the queue
+            self.assertNotIn(
+                '1600000180.metric.removed.txt',
+                redis_conn.zsets[skyline_functions.MIRAGE_CHECK_QUEUE_KEY])
+            skyline_functions.remove_from_mirage_check_queue('test', redis_conn, ['1600000000.metric.c.txt'])
+            self.assertEqual(
+                skyline_functions.get_mirage_check_queue('test', redis_conn, check_path),
+                ['1600000120.metric.a.txt', '1600000060.metric.b.txt'])
+            self.assertTrue(skyline_functions.wait_for_mirage_check('test', redis_conn, 1))
+            self.assertFalse(skyline_functions.wait_for_mirage_check('test', redis_conn, 1))
+        finally:
+            shutil.rmtree(check_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
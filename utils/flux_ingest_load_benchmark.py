@@ -0,0 +1,171 @@
+from __future__ import division
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Process, Queue
+from os.path import dirname, join, realpath
+
+"""
+Benchmark the flux ingest path, the queueing of POSTed metrics by listen and
+the draining of the queue by the worker, with each metric queued individually
+(as listen did) and with each POST queued as one validated batch.
+
+By default the listen and worker queue operations are run in process with a
+multiprocessing Queue and a consumer Process, so flux is not required.  Pass
+--redis to include the FLUX_PERSIST_QUEUE flux.queue Redis set operations
+(made on a benchmark.flux.queue set which is deleted after the run).
+
+Pass --flux to run the snab_flux_load_test POSTs against the running flux
+defined in settings, reporting the metrics per second ingested at each metrics
+per POST size.
+
+Usage: python utils/flux_ingest_load_benchmark.py [--redis] [--flux] [metrics]
+"""
+
+__location__ = realpath(join(os.getcwd(), dirname(__file__)))
+sys.path.insert(0, join(__location__, '..', 'skyline'))
+sys.path.insert(0, join(__location__, '..', 'skyline', 'snab'))
+if True:
+    # ignoreErrorCodes E402
+    import settings
+    from snab_flux_load_test import (
+        new_load_test_metric_name, post_load_test_metrics)
+
+METRICS = 48000
+METRICS_PER_POST = [1, 10, 100, 480]
+DRAIN_SIZE = 100
+FLUX_QUEUE_REDIS_SET = 'benchmark.flux.queue'
+
+
+def is_metrics_batch(queue_item):
+    # As flux.worker.is_metrics_batch, flux.worker is not imported so that the
+    # benchmark does not require the flux dependencies
+    try:
+        return isinstance(queue_item[0], (list, tuple))
+    except (IndexError, KeyError, TypeError):
+        return False
+
+
+def worker_drain(q, expected, batched, results):
+    """
+    Consume the queue as the flux worker does and put the number of metrics
+    consumed and the seconds taken on the results queue.
+    """
+    start = None
+    consumed = 0
+    metric_data_batch = deque()
+    while consumed < expected:
+        if batched:
+            if not metric_data_batch:
+                queue_items = [q.get(True, 5)]
+                if start is None:
+                    start = time.time()
+                while len(queue_items) < DRAIN_SIZE:
+                    try:
+                        queue_items.append(q.get_nowait())
+                    except Exception:
+                        break
+                for queue_item in queue_items:
+                    if is_metrics_batch(queue_item):
+                        metric_data_batch.extend(queue_item)
+                    else:
+                        metric_data_batch.append(queue_item)
+            metric_data = metric_data_batch.popleft()
+        else:
+            metric_data = q.get(True, 5)
+            if start is None:
+                start = time.time()
+        if metric_data:
+            consumed += 1
+    results.put((consumed, time.time() - start))
+
+
+def listen_put(q, redis_conn, posts, batched):
+    """
+    Queue the metrics of each POST as listen does.
+    """
+    redis_calls = 0
+    for post_metrics in posts:
+        if batched:
+            metrics_batch = [list(metric_data) for metric_data in post_metrics]
+            if redis_conn:
+                pipe = redis_conn.pipeline(transaction=False)
+                pipe.sadd(FLUX_QUEUE_REDIS_SET, *[str(metric_data) for metric_data in metrics_batch])
+                pipe.execute()
+            redis_calls += 1
+            q.put(metrics_batch, block=False)
+        else:
+            for metric_data in post_metrics:
+                metric_data = list(metric_data)
+                if redis_conn:
+                    redis_conn.sadd(FLUX_QUEUE_REDIS_SET, str(metric_data))
+                redis_calls += 1
+                q.put(metric_data, block=False)
+    return redis_calls
+
+
+def run_queue_benchmark(metrics, metrics_per_post, batched, redis_conn):
+    timestamp = int(time.time())
+    metric_data_list = [[metric, 1.0, timestamp, False] for metric in metrics]
+    posts = [
+        metric_data_list[index:(index + metrics_per_post)]
+        for index in range(0, len(metric_data_list), metrics_per_post)]
+    q = Queue()
+    results = Queue()
+    consumer = Process(target=worker_drain, args=(q, len(metric_data_list), batched, results))
+    consumer.start()
+    start = time.time()
+    redis_calls = listen_put(q, redis_conn, posts, batched)
+    listen_seconds = time.time() - start
+    consumed, worker_seconds = results.get(True, 600)
+    consumer.join()
+    total_seconds = time.time() - start
+    if redis_conn:
+        redis_conn.delete(FLUX_QUEUE_REDIS_SET)
+    return listen_seconds, worker_seconds, total_seconds, consumed, redis_calls
+
+
+if __name__ == '__main__':
+    use_redis = '--redis' in sys.argv
+    use_flux = '--flux' in sys.argv
+    metric_count = METRICS
+    for arg in sys.argv[1:]:
+        if arg.isdigit():
+            metric_count = int(arg)
+    metrics = [new_load_test_metric_name() for i in range(metric_count)]
+
+    if use_flux:
+        print('metrics per POST, metrics posted, POSTs, errors, seconds, metrics per second')
+        for metrics_per_post in METRICS_PER_POST:
+            start = time.time()
+            timestamp = int(start) - 60
+            posted_count, post_stats = post_load_test_metrics(metrics, timestamp, metrics_per_post)
+            seconds = time.time() - start
+            print('%s, %s, %s, %s, %.3f, %.1f' % (
+                str(metrics_per_post), str(posted_count), str(post_stats['posts']),
+                str(post_stats['errors']), seconds, (posted_count / max(seconds, 0.000001))))
+        sys.exit(0)
+
+    redis_conn = None
+    if use_redis:
+        from redis import StrictRedis
+        if settings.REDIS_PASSWORD:
+            redis_conn = StrictRedis(
+                password=settings.REDIS_PASSWORD,
+                unix_socket_path=settings.REDIS_SOCKET_PATH)
+        else:
+            redis_conn = StrictRedis(unix_socket_path=settings.REDIS_SOCKET_PATH)
+        redis_conn.delete(FLUX_QUEUE_REDIS_SET)
+
+    print('metrics per POST, mode, listen seconds, worker seconds, total seconds, redis calls, metrics per second')
+    for metrics_per_post in METRICS_PER_POST:
+        for batched in [False, True]:
+            listen_seconds, worker_seconds, total_seconds, consumed, redis_calls = run_queue_benchmark(
+                metrics, metrics_per_post, batched, redis_conn)
+            if consumed != len(metrics):
+                print('error :: worker consumed %s of %s metrics' % (str(consumed), str(len(metrics))))
+            print('%s, %s, %.3f, %.3f, %.3f, %s, %.1f' % (
+                str(metrics_per_post), ('batch' if batched else 'per metric'),
+                listen_seconds, worker_seconds, total_seconds, str(redis_calls),
+                (consumed / max(total_seconds, 0.000001))))
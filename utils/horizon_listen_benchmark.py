@@ -0,0 +1,138 @@
+from __future__ import division
+import os
+import pickle
+import socket
+import sys
+import time
+from multiprocessing import Process, Queue
+from os.path import dirname, join, realpath
+from struct import Struct
+
+"""
+Benchmark the Horizon pickle listener, the datapoints per second that the
+blocking listener and the HORIZON_LISTEN_SELECTORS listener queue with 1 to 32
+concurrent carbon-relay like connections sending pickles, and the number of
+connections that the datapoints were received from.
+
+The listener is run in its own process with a multiprocessing Queue which this
+process drains, counting the datapoints, so Redis and the Horizon workers are
+not required.  The blocking listener only serves the first connection, the
+other connections are connected but not read, or refused once its listen
+backlog is full.  On a host with few CPUs the senders compete with the listener
+for CPU, so the datapoints per second are only comparable between listeners at
+the same number of connections served.
+
+Usage: python utils/horizon_listen_benchmark.py [seconds] [connections ...]
+"""
+
+__location__ = realpath(join(os.getcwd(), dirname(__file__)))
+sys.path.insert(0, join(__location__, '..', 'skyline'))
+sys.path.insert(0, join(__location__, '..', 'skyline', 'horizon'))
+if True:
+    # ignoreErrorCodes E402
+    from listen import Listen
+
+SECONDS = 5
+CONNECTIONS = [1, 2, 4, 8, 16, 32]
+DATAPOINTS_PER_PICKLE = 500
+QUEUE_SIZE = 500
+
+
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def pickle_frame(connection_number):
+    """
+    A pickle of DATAPOINTS_PER_PICKLE datapoints as a carbon-relay sends them.
+    """
+    now = int(time.time())
+    datapoints = [
+        ('benchmark.horizon.listen.%s.%s' % (str(connection_number), str(i)), (now, float(i)))
+        for i in range(DATAPOINTS_PER_PICKLE)]
+    payload = pickle.dumps(datapoints, protocol=2)
+    return Struct('!I').pack(len(payload)) + payload
+
+
+def send_pickles(port, connection_number, until):
+    frame = pickle_frame(connection_number)
+    try:
+        sock = socket.create_connection(('127.0.0.1', port))
+    except socket.error:
+        # Refused by the blocking listener once its listen backlog is full
+        return
+    sock.settimeout(0.5)
+    while time.time() < until:
+        try:
+            sock.sendall(frame)
+        except socket.timeout:
+            continue
+        except socket.error:
+            break
+    sock.close()
+
+
+def benchmark(use_selectors, connections, seconds):
+    """
+    Return the datapoints per second queued by the listener and the number of
+    connections served.
+    """
+    port = free_port()
+    queue = Queue(maxsize=QUEUE_SIZE)
+    listener = Listen(port, queue, os.getpid(), type='pickle')
+    listener.ip = '127.0.0.1'
+    listener.selectors = use_selectors
+    listener.start()
+    time.sleep(1)
+
+    until = time.time() + seconds
+    senders = [
+        Process(target=send_pickles, args=(port, i, until)) for i in range(connections)]
+    for sender in senders:
+        sender.daemon = True
+        sender.start()
+
+    datapoints = 0
+    connections_served = set()
+    start = time.time()
+    while time.time() < until:
+        try:
+            chunk = queue.get(True, 0.1)
+        except Exception:
+            continue
+        datapoints += len(chunk)
+        # The connection number of the first datapoint of the chunk
+        connections_served.add(chunk[0][0].split('.')[3])
+    elapsed = time.time() - start
+
+    listener.terminate()
+    listener.join()
+    for sender in senders:
+        sender.join(2)
+        if sender.is_alive():
+            sender.terminate()
+    return datapoints / elapsed, len(connections_served)
+
+
+if __name__ == '__main__':
+    seconds = SECONDS
+    connections_list = []
+    for index, arg in enumerate(sys.argv[1:]):
+        if index == 0:
+            seconds = float(arg)
+        else:
+            connections_list.append(int(arg))
+    if not connections_list:
+        connections_list = CONNECTIONS
+
+    print('connections, blocking datapoints/s, blocking connections served, selectors datapoints/s, selectors connections served')
+    for connections in connections_list:
+        blocking, blocking_served = benchmark(False, connections, seconds)
+        selectors, selectors_served = benchmark(True, connections, seconds)
+        print('%s, %.0f, %s, %.0f, %s' % (
+            str(connections), blocking, str(blocking_served), selectors,
+            str(selectors_served)))
@@ -0,0 +1,181 @@
+from __future__ import division
+import os
+import sys
+import time
+from os.path import dirname, join, realpath
+
+"""
+Benchmark the speed and the accuracy of the Luminosity vectorized
+correlations against the luminol Correlator that get_correlations runs per
+metric.
+
+Synthetic metrics are generated with a mix of resolutions, timestamp offsets,
+correlated, anti-correlated, flat and derivative time series and are msgpacked
+as they are in Redis.  The same metrics are decoded and correlated against a
+synthetic anomaly with the luminol Correlator (as get_correlations does) and
+with vectorized_correlations and the runtimes,
+per stage timings and the maximum differences in the coefficient, shift and
+shifted_coefficient are reported.  Any metric that is correlated by one method
+and not the other is reported as a mismatch.
+
+Requires luminol, Redis is not required.
+
+Usage: python utils/luminosity_correlations_benchmark.py [metrics]
+"""
+
+__location__ = realpath(join(os.getcwd(), dirname(__file__)))
+sys.path.insert(0, join(__location__, '..', 'skyline'))
+sys.path.insert(0, join(__location__, '..', 'skyline', 'luminosity'))
+if True:
+    # ignoreErrorCodes E402
+    import numpy as np
+    from msgpack import packb
+    from luminol.anomaly_detector import AnomalyDetector
+    from luminol.correlator import Correlator
+    import settings
+    from skyline_functions import (
+        nonNegativeDerivative, decode_timeseries, timeseries_array_to_list)
+    from correlations_vectorized import (
+        vectorized_correlations, determine_resolution_array, CORRELATION_STAGES)
+
+METRICS = 10000
+FULL_DURATION_DATAPOINTS = 1440
+
+try:
+    CROSS_CORRELATION_THRESHOLD = settings.LUMINOL_CROSS_CORRELATION_THRESHOLD
+except:
+    CROSS_CORRELATION_THRESHOLD = 0.9
+
+
+def generate_data(metric_count):
+    """
+    Generate the anomalous time series and the candidate metrics.
+    """
+    random_state = np.random.RandomState(3912)
+    anomaly_timestamp = int(time.time()) // 60 * 60
+    anomaly_values = random_state.normal(100, 5, FULL_DURATION_DATAPOINTS)
+    anomaly_values[-3:] += [50, 120, 200]
+    anomalous_timeseries = [
+        (anomaly_timestamp - (60 * (FULL_DURATION_DATAPOINTS - 1 - i)), float(value))
+        for i, value in enumerate(anomaly_values)]
+    candidates = []
+    for index in range(metric_count):
+        shape = index % 10
+        resolution = 60
+        offset = 0
+        if shape == 1:
+            offset = int(random_state.randint(1, 59))
+        if shape == 2:
+            resolution = 300
+        values = random_state.normal(100, 5, FULL_DURATION_DATAPOINTS)
+        if shape in [3, 4]:
+            # Correlated and anti-correlated with noise
+            direction = 1 if shape == 3 else -1
+            values = (anomaly_values * direction) + random_state.normal(0, 5, FULL_DURATION_DATAPOINTS)
+        if shape == 5:
+            values = np.ones(FULL_DURATION_DATAPOINTS)
+        derivative = False
+        if shape == 6:
+            values = np.cumsum(np.abs(values))
+            derivative = True
+        raw_series = b''.join([
+            packb((anomaly_timestamp - (resolution * (FULL_DURATION_DATAPOINTS - 1 - i)) + offset, float(value)))
+            for i, value in enumerate(values)])
+        candidates.append(('benchmark.metric.%s' % str(index), raw_series, derivative))
+    return anomaly_timestamp, anomalous_timeseries, candidates
+
+
+def luminol_correlations(anomaly_timestamp, anomalous_ts, candidates, anomalies, from_timestamp):
+    """
+    The per metric luminol Correlator correlations as get_correlations does.
+    """
+    correlated_metrics = []
+    correlations = []
+    for metric_base_name, raw_series, derivative in candidates:
+        timeseries = timeseries_array_to_list(decode_timeseries(raw_series))
+        if derivative:
+            timeseries = nonNegativeDerivative(timeseries)
+        resolution = determine_resolution_array([ts for ts, value in timeseries])
+        correlate_ts = []
+        for ts, value in timeseries:
+            if int(ts) < from_timestamp:
+                continue
+            if int(ts) <= anomaly_timestamp:
+                correlate_ts.append((int(ts), value))
+            if int(ts) > (anomaly_timestamp + (resolution + 1)):
+                break
+        if not correlate_ts:
+            continue
+        anomaly_ts_dict = dict(anomalous_ts)
+        correlate_ts_dict = dict(correlate_ts)
+        correlated = None
+        for a in anomalies:
+            if int(a.exact_timestamp) < int(anomaly_timestamp - (resolution * 2)):
+                continue
+            if int(a.exact_timestamp) > int(anomaly_timestamp + (resolution * 2)):
+                continue
+            try:
+                time_period = (int(anomaly_timestamp - (resolution * 2)), int(anomaly_timestamp + (resolution * 2)))
+                my_correlator = Correlator(anomaly_ts_dict, correlate_ts_dict, time_period)
+                if my_correlator.is_correlated(threshold=CROSS_CORRELATION_THRESHOLD):
+                    correlation = my_correlator.get_correlation_result()
+                    correlated = True
+                    correlations.append([metric_base_name, correlation.coefficient, correlation.shift, correlation.shifted_coefficient])
+            except:
+                pass
+        if correlated:
+            correlated_metrics.append(metric_base_name)
+    return correlated_metrics, correlations
+
+
+if __name__ == '__main__':
+    metric_count = METRICS
+    for arg in sys.argv[1:]:
+        if arg.isdigit():
+            metric_count = int(arg)
+
+    anomaly_timestamp, anomalous_timeseries, candidates = generate_data(metric_count)
+    # Sample the anomalous time series as get_anomalous_ts does
+    from_timestamp = anomaly_timestamp - (60 * 10)
+    anomalous_ts = [
+        (int(ts), value) for ts, value in anomalous_timeseries
+        if from_timestamp <= int(ts) <= anomaly_timestamp]
+    anomalies = AnomalyDetector(dict(anomalous_ts), score_threshold=1.5).get_anomalies()
+    print('metrics: %s, anomalies: %s' % (str(len(candidates)), str(len(anomalies))))
+
+    start = time.time()
+    luminol_metrics, luminol_results = luminol_correlations(
+        anomaly_timestamp, anomalous_ts, candidates, anomalies, from_timestamp)
+    luminol_seconds = time.time() - start
+
+    start = time.time()
+    vectorized_metrics, vectorized_results, checked, sampled, timings = vectorized_correlations(
+        'benchmark.anomalous.metric', anomaly_timestamp, anomalous_ts, candidates,
+        anomalies, from_timestamp, CROSS_CORRELATION_THRESHOLD)
+    vectorized_seconds = time.time() - start
+
+    print('luminol Correlator: %.3f seconds, correlated %s metrics' % (
+        luminol_seconds, str(len(luminol_metrics))))
+    print('vectorized: %.3f seconds, correlated %s metrics, %.1fx' % (
+        vectorized_seconds, str(len(vectorized_metrics)),
+        (luminol_seconds / max(vectorized_seconds, 0.000001))))
+    print('vectorized stage timings: %s' % ', '.join([
+        '%s: %.4f' % (stage, timings[stage]) for stage in CORRELATION_STAGES]))
+
+    mismatched = set(luminol_metrics).symmetric_difference(set(vectorized_metrics))
+    luminol_by_metric = dict((result[0], result) for result in luminol_results)
+    max_coefficient_diff = 0.0
+    max_shifted_coefficient_diff = 0.0
+    shift_mismatches = 0
+    for result in vectorized_results:
+        if result[0] not in luminol_by_metric:
+            continue
+        luminol_result = luminol_by_metric[result[0]]
+        max_coefficient_diff = max(max_coefficient_diff, abs(result[1] - luminol_result[1]))
+        max_shifted_coefficient_diff = max(max_shifted_coefficient_diff, abs(result[3] - luminol_result[3]))
+        if result[2] != luminol_result[2]:
+            shift_mismatches += 1
+    print('accuracy: correlated metric mismatches: %s, correlations: %s luminol vs %s vectorized' % (
+        str(len(mismatched)), str(len(luminol_results)), str(len(vectorized_results))))
+    print('accuracy: max coefficient difference: %.3e, max shifted_coefficient difference: %.3e, shift mismatches: %s' % (
+        max_coefficient_diff, max_shifted_coefficient_diff, str(shift_mismatches)))
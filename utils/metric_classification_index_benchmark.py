@@ -0,0 +1,149 @@
+from __future__ import division
+import os
+import sys
+import time
+from os.path import dirname, join, realpath
+
+"""
+Benchmark the per metric classification checks that Analyzer spin_process
+does in the assigned_metrics loop, using lists of the Redis set members as
+Analyzer did and using the MetricClassificationIndex.
+
+By default the Redis sets are served from memory so that only the
+classification checks are timed, pass --redis to build the Redis sets in the
+Redis defined in settings (the sets are created under a benchmark. prefix and
+deleted after the run).
+
+Usage: python utils/metric_classification_index_benchmark.py [--redis]
+"""
+
+__location__ = realpath(join(os.getcwd(), dirname(__file__)))
+sys.path.insert(0, join(__location__, '..', 'skyline'))
+if True:
+    # ignoreErrorCodes E402
+    import settings
+    import metric_classification_index
+    from metric_classification_index import (
+        MetricClassificationIndex, METRIC_CLASSIFICATION_REDIS_SETS)
+
+METRIC_COUNTS = [1000, 2500, 5000, 10000]
+
+# The proportion of metrics in each classification
+CLASSIFICATION_PROPORTIONS = {
+    'mirage': 0.2,
+    'ionosphere': 0.1,
+    'derivative': 0.3,
+    'non_derivative': 0.7,
+    'smtp_alerter': 0.25,
+    'non_smtp_alerter': 0.75,
+    'inactive': 0.01,
+}
+
+
+class MemoryPipeline(object):
+    """
+    Serve smembers from in memory sets so that the benchmark does not require
+    Redis.
+    """
+    def __init__(self, redis_sets):
+        self.redis_sets = redis_sets
+        self.commands = []
+
+    def smembers(self, redis_set):
+        self.commands.append(redis_set)
+
+    def execute(self):
+        return [set(self.redis_sets.get(redis_set, [])) for redis_set in self.commands]
+
+
+class MemoryRedis(object):
+    def __init__(self, redis_sets):
+        self.redis_sets = redis_sets
+
+    def pipeline(self, transaction=True):
+        return MemoryPipeline(self.redis_sets)
+
+    def smembers(self, redis_set):
+        return set(self.redis_sets.get(redis_set, []))
+
+
+def redis_sets_for(metrics):
+    redis_sets = {}
+    for classification, proportion in CLASSIFICATION_PROPORTIONS.items():
+        step = int(1 / proportion)
+        redis_set = METRIC_CLASSIFICATION_REDIS_SETS[classification]
+        redis_sets[redis_set] = metrics[::step]
+    return redis_sets
+
+
+def spin_lists(redis_conn, metrics):
+    """
+    The classification checks with lists of the Redis set members.
+    """
+    start = time.time()
+    classification_lists = {}
+    for classification in CLASSIFICATION_PROPORTIONS:
+        redis_set = METRIC_CLASSIFICATION_REDIS_SETS[classification]
+        classification_lists[classification] = list(redis_conn.smembers(redis_set))
+    flagged = 0
+    for metric_name in metrics:
+        for classification in CLASSIFICATION_PROPORTIONS:
+            if metric_name in classification_lists[classification]:
+                flagged += 1
+    return time.time() - start, flagged
+
+
+def spin_index(redis_conn, metrics):
+    """
+    The classification checks with the MetricClassificationIndex.
+    """
+    start = time.time()
+    index = MetricClassificationIndex(
+        'benchmark', redis_conn, list(CLASSIFICATION_PROPORTIONS.keys()))
+    flagged = 0
+    for metric_name in metrics:
+        for classification in CLASSIFICATION_PROPORTIONS:
+            if index.is_member(classification, metric_name):
+                flagged += 1
+    return time.time() - start, flagged
+
+
+if __name__ == '__main__':
+    use_redis = '--redis' in sys.argv
+    if use_redis:
+        from redis import StrictRedis
+        if settings.REDIS_PASSWORD:
+            redis_conn = StrictRedis(
+                password=settings.REDIS_PASSWORD,
+                unix_socket_path=settings.REDIS_SOCKET_PATH,
+                charset='utf-8', decode_responses=True)
+        else:
+            redis_conn = StrictRedis(
+                unix_socket_path=settings.REDIS_SOCKET_PATH,
+                charset='utf-8', decode_responses=True)
+        # Use benchmark Redis sets so that the real sets are not touched
+        metric_classification_index.METRIC_CLASSIFICATION_REDIS_SETS = {
+            classification: 'benchmark.%s' % redis_set
+            for classification, redis_set in METRIC_CLASSIFICATION_REDIS_SETS.items()}
+        METRIC_CLASSIFICATION_REDIS_SETS = metric_classification_index.METRIC_CLASSIFICATION_REDIS_SETS
+
+    print('metrics, list spin seconds, index spin seconds, speedup')
+    for metric_count in METRIC_COUNTS:
+        metrics = ['%sbenchmark.metric.%s' % (settings.FULL_NAMESPACE, str(i)) for i in range(metric_count)]
+        redis_sets = redis_sets_for(metrics)
+        if use_redis:
+            for redis_set, members in redis_sets.items():
+                redis_conn.delete(redis_set)
+                if members:
+                    redis_conn.sadd(redis_set, *members)
+        else:
+            redis_conn = MemoryRedis(redis_sets)
+        list_time, list_flagged = spin_lists(redis_conn, metrics)
+        index_time, index_flagged = spin_index(redis_conn, metrics)
+        if list_flagged != index_flagged:
+            print('error :: list and index classifications differ')
+        print('%s, %.4f, %.4f, %.1fx' % (
+            str(metric_count), list_time, index_time, (list_time / max(index_time, 0.000001))))
+        if use_redis:
+            for redis_set in redis_sets:
+                redis_conn.delete(redis_set)
@@ -0,0 +1,157 @@
+from __future__ import division
+import json
+import os
+import subprocess
+import sys
+from os.path import dirname, join, realpath
+
+"""
+Benchmark the startup import time of each Skyline app, the time a new Python
+process takes to import the modules that the app agent imports, which every
+bin/<app>.d start and every spawned Process that imports them pays.
+
+Each app is imported in a new Python process RUNS times and the minimum and
+median seconds and the number of modules loaded are reported.  Pass --json to
+output the results as json and pass --baseline <file> with the json from a
+previous run to report the change against it, the benchmark exits 1 if the
+median of any app is more than --max-regression (default 0.2, 20%) slower than
+the baseline, so that startup regressions show up.
+
+Pass --importtime to also print the slowest imports of each app, as reported
+by python -X importtime.
+
+Usage: python utils/startup_benchmark.py [--json] [--baseline <file>] [--max-regression <float>] [--importtime] [app ...]
+"""
+
+__location__ = realpath(join(os.getcwd(), dirname(__file__)))
+SKYLINE_DIR = realpath(join(__location__, '..', 'skyline'))
+
+RUNS = 5
+
+# The app directory and the modules the app agent imports
+APPS = {
+    'analyzer': ('analyzer', ['analyzer', 'metrics_manager']),
+    'horizon': ('horizon', ['listen', 'roomba', 'worker']),
+    'flux': ('flux', ['flux']),
+    'webapp': ('webapp', ['webapp']),
+    'ionosphere': ('ionosphere', ['ionosphere', 'learn']),
+}
+
+IMPORT_CODE = """
+import importlib, json, sys, time
+sys.path.insert(0, %r)
+sys.path.insert(0, %r)
+modules_before = len(sys.modules)
+start = time.time()
+for module in %r:
+    importlib.import_module(module)
+print(json.dumps({'seconds': time.time() - start, 'modules': len(sys.modules) - modules_before}))
+"""
+
+
+def time_app_import(app):
+    """
+    Import the app modules in a new Python process and return the seconds the
+    imports took and the number of modules loaded.
+    """
+    app_dir, modules = APPS[app]
+    code = IMPORT_CODE % (SKYLINE_DIR, join(SKYLINE_DIR, app_dir), modules)
+    process = subprocess.Popen(
+        [sys.executable, '-c', code], cwd=join(SKYLINE_DIR, app_dir),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    if process.returncode != 0:
+        error = stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(error[-1] if error else 'import failed')
+    result = json.loads(stdout.decode('utf-8').strip().splitlines()[-1])
+    return result['seconds'], result['modules']
+
+
+def slowest_imports(app, count=10):
+    """
+    Return the slowest imports of the app, by cumulative microseconds, from
+    python -X importtime.
+    """
+    app_dir, modules = APPS[app]
+    code = IMPORT_CODE % (SKYLINE_DIR, join(SKYLINE_DIR, app_dir), modules)
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', code], cwd=join(SKYLINE_DIR, app_dir),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    imports = []
+    for line in stderr.decode('utf-8', 'replace').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len('import time:'):].split('|')
+            imports.append((int(cumulative_us), module.rstrip()))
+        except ValueError:
+            continue
+    # Only the top level imports of each package, the cumulative time of the
+    # nested imports is included in them
+    top_level = [item for item in imports if not item[1].startswith('   ')]
+    return sorted(top_level, reverse=True)[:count]
+
+
+def median(values):
+    values = sorted(values)
+    middle = int(len(values) / 2)
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+if __name__ == '__main__':
+    output_json = '--json' in sys.argv
+    show_importtime = '--importtime' in sys.argv
+    baseline = None
+    max_regression = 0.2
+    apps = []
+    args = sys.argv[1:]
+    for index, arg in enumerate(args):
+        if arg in APPS:
+            apps.append(arg)
+        if arg == '--baseline':
+            with open(args[index + 1]) as f:
+                baseline = json.load(f)
+        if arg == '--max-regression':
+            max_regression = float(args[index + 1])
+    if not apps:
+        apps = sorted(APPS.keys())
+
+    results = {}
+    regressions = []
+    if not output_json:
+        print('app, min seconds, median seconds, modules loaded, baseline median seconds, change')
+    for app in apps:
+        try:
+            runs = [time_app_import(app) for i in range(RUNS)]
+        except RuntimeError as e:
+            results[app] = {'error': str(e)}
+            if not output_json:
+                print('%s, error :: %s' % (app, str(e)))
+            continue
+        seconds = [run[0] for run in runs]
+        results[app] = {
+            'min': min(seconds), 'median': median(seconds), 'modules': runs[-1][1]}
+        change = None
+        if baseline and baseline.get(app, {}).get('median'):
+            change = (results[app]['median'] - baseline[app]['median']) / baseline[app]['median']
+            if change > max_regression:
+                regressions.append(app)
+        if not output_json:
+            print('%s, %.3f, %.3f, %s, %s, %s' % (
+                app, results[app]['min'], results[app]['median'],
+                str(results[app]['modules']),
+                ('%.3f' % baseline[app]['median']) if change is not None else '',
+                ('%+.1f%%' % (change * 100)) if change is not None else ''))
+        if show_importtime and not output_json:
+            for cumulative_us, module in slowest_imports(app):
+                print('    %.3f seconds :: %s' % ((cumulative_us / 1000000), module.strip()))
+
+    if output_json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    if regressions:
+        sys.stderr.write('startup regression :: %s more than %.0f%% slower than the baseline\n' % (
+            ', '.join(regressions), (max_regression * 100)))
+        sys.exit(1)